@@ -0,0 +1,123 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Callable, Awaitable, Hashable, Iterable
+
+
+class RequestCache:
+    """
+    Single-flight + TTL cache for node requests.
+    Concurrent identical requests share one in-flight call.
+    Answers are kept for the TTL of the longest matching path prefix. The answers for a fixed height
+    (?height=N, N > 0) never change; for the "historical" path prefixes they are kept until evicted by the LRU limit.
+    It is opt-in: the blocks the scanner reads by height are big and read only once, they must not push out the rest.
+    """
+
+    FOREVER = float('inf')
+    HEIGHT_RE = re.compile(r'[?&]height=(\d+)')
+    DEFAULT_HISTORICAL_PREFIXES = ('/mayachain/pools',)
+
+    def __init__(self, ttl_rules: Optional[Dict[str, float]] = None, max_size=2000,
+                 historical_prefixes: Iterable[str] = DEFAULT_HISTORICAL_PREFIXES):
+        """
+        :param ttl_rules: path prefix -> TTL in seconds (0 = do not keep, only coalesce)
+        :param max_size: max number of the cached answers
+        :param historical_prefixes: path prefixes whose answers for fixed heights are kept forever
+        """
+        self.ttl_rules = dict(ttl_rules or {})
+        self.max_size = max_size
+        self.historical_prefixes = tuple(historical_prefixes or ())
+
+        self._cache: OrderedDict = OrderedDict()  # key -> (expires_at, data)
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def ttl_for(self, path: str) -> float:
+        if path.startswith(self.historical_prefixes):
+            m = self.HEIGHT_RE.search(path)
+            if m and int(m.group(1)) > 0:
+                return self.FOREVER
+
+        best_prefix, ttl = '', 0.0
+        for prefix, rule_ttl in self.ttl_rules.items():
+            if path.startswith(prefix) and len(prefix) > len(best_prefix):
+                best_prefix, ttl = prefix, rule_ttl
+        return ttl
+
+    @staticmethod
+    def is_cacheable(data) -> bool:
+        # errors and empty answers must be asked again
+        return data is not None and not (isinstance(data, dict) and 'error' in data)
+
+    def _get_cached(self, key):
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        expires_at, data = item
+        if expires_at < self._now():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return data
+
+    def _put(self, key, data, ttl):
+        self._cache[key] = (self._now() + ttl, data)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, path: str, fetch: Callable[[], Awaitable]):
+        ttl = self.ttl_for(path)
+        if ttl > 0:
+            data = self._get_cached(key)
+            if data is not None:
+                self.hits += 1
+                return data
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shielded: if this caller is cancelled, the others still get the answer
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(fetch())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._on_done(key, f, ttl))
+        return await asyncio.shield(future)
+
+    def _on_done(self, key, future: asyncio.Future, ttl):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if ttl > 0 and not future.cancelled() and future.exception() is None:
+            data = future.result()
+            if self.is_cacheable(data):
+                self._put(key, data, ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def size(self):
+        return len(self._cache)
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def __repr__(self):
+        return (f'RequestCache(size={self.size}, hits={self.hits}, misses={self.misses}, '
+                f'coalesced={self.coalesced})')
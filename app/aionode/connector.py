@@ -1,10 +1,13 @@
 import asyncio
 import logging
-from typing import Dict
+import time
+from typing import Dict, List, Optional
 
 from aiohttp import ClientSession, ClientError, ServerDisconnectedError
 
+from .cache import RequestCache
 from .env import ThorEnvironment
+from .health import EndpointHealth
 from .nodeclient import ThorNodeClient
 from .types import *
 
@@ -90,7 +93,7 @@ class ThorConnector:
 
     async def query_tendermint_block_raw(self, height):
         path = self.env.path_block_by_height.format(height=height)
-        data = await self._request(path, is_rpc=True)
+        data = await self._request(path, is_rpc=True, hedge=True)
         return data
 
     async def query_block(self, height) -> ThorBalances:
@@ -112,11 +115,11 @@ class ThorConnector:
         return data['result']['genesis'] if data else None
 
     async def query_native_status_raw(self):
-        return await self._request(self.env.path_status, is_rpc=True)
+        return await self._request(self.env.path_status, is_rpc=True, hedge=True)
 
     async def query_native_block_results_raw(self, height):
         url = self.env.path_block_results.format(height=height)
-        return await self._request(url, is_rpc=True)
+        return await self._request(url, is_rpc=True, hedge=True)
 
     async def query_liquidity_providers(self, asset, height=0):
         url = self.env.path_liq_providers.format(asset=asset, height=height)
@@ -157,11 +160,25 @@ class ThorConnector:
     # ---- Internal ----
 
     def __init__(self, env: ThorEnvironment, session: ClientSession, logger=None, extra_headers=None,
-                 additional_envs=None, silent=True):
+                 additional_envs=None, silent=True,
+                 failure_threshold=3, cool_off=30.0, hedge_after=None,
+                 cache: Optional[RequestCache] = None):
+        """
+        :param failure_threshold: consecutive failures of an endpoint to skip it for a while (circuit breaker)
+        :param cool_off: how long a failed endpoint is skipped, sec
+        :param hedge_after: for hedged requests, after this delay (or the endpoint's p95 latency if longer)
+            the same request is sent to the next endpoint; the first answer wins. None = no hedging
+        :param cache: single-flight + TTL cache; by default identical concurrent requests are only coalesced
+        """
         self.session = session
         self.env = env
         self.silent = silent
         self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.failure_threshold = failure_threshold
+        self.cool_off = cool_off
+        self.hedge_after = hedge_after
+        self.cache = cache if cache is not None else RequestCache()
+        self._health: Dict[str, EndpointHealth] = {}
         self._clients = [
             self._make_client(env, extra_headers)
         ]
@@ -193,35 +210,127 @@ class ThorConnector:
     def first_client_rpc_url(self):
         return self.first_client.env.rpc_url
 
-    async def _request(self, path, is_rpc=False, treat_empty_as_ok=True):
-        for client in self._clients:
-            for attempt in range(1, client.env.retries + 1):
-                if attempt > 1:
-                    self.logger.debug(f'Retry #{attempt} for path "{path}"')
-                try:
-                    data = await client.request(path, is_rpc=is_rpc)
-
-                    if treat_empty_as_ok:
-                        if data is not None:
-                            return data
+    # ---- Endpoint health ----
+
+    @property
+    def health(self) -> Dict[str, EndpointHealth]:
+        """base URL -> EndpointHealth"""
+        return self._health
+
+    def endpoint_health(self, client: ThorNodeClient, is_rpc) -> EndpointHealth:
+        # clients may share the same base URL (e.g. RPC), so the health is tracked per URL
+        url = client.env.rpc_url if is_rpc else client.env.thornode_url
+        health = self._health.get(url)
+        if health is None:
+            health = self._health[url] = EndpointHealth(url, failure_threshold=self.failure_threshold,
+                                                        cool_off=self.cool_off)
+        return health
+
+    def ranked_clients(self, is_rpc=False) -> List[ThorNodeClient]:
+        """Available clients, the fastest healthy first; the configured order breaks ties"""
+        available = [c for c in self._clients if self.endpoint_health(c, is_rpc).is_available()]
+        available.sort(key=lambda c: self.endpoint_health(c, is_rpc).score)
+        return available
+
+    # ---- Internal ----
+
+    async def _request(self, path, is_rpc=False, treat_empty_as_ok=True, hedge=False):
+        if self.cache is None:
+            return await self._request_uncached(path, is_rpc, treat_empty_as_ok, hedge)
+        return await self.cache.get_or_fetch(
+            (path, is_rpc, treat_empty_as_ok), path,
+            lambda: self._request_uncached(path, is_rpc, treat_empty_as_ok, hedge)
+        )
+
+    async def _request_uncached(self, path, is_rpc=False, treat_empty_as_ok=True, hedge=False):
+        clients = self.ranked_clients(is_rpc)
+        if not clients:
+            self.logger.warning(f'All endpoints are down; "{path}" is not requested.')
+            return None
+
+        if hedge and self.hedge_after is not None and len(clients) > 1:
+            data = await self._hedged_request(clients[:2], path, is_rpc, treat_empty_as_ok)
+            if data is not None:
+                return data
+            clients = clients[2:]
+
+        for client in clients:
+            data = await self._request_client(client, path, is_rpc, treat_empty_as_ok)
+            if data is not None:
+                return data
+
+    async def _hedged_request(self, clients, path, is_rpc, treat_empty_as_ok):
+        primary, backup = clients
+        p95 = self.endpoint_health(primary, is_rpc).latency_percentile(95)
+        delay = max(self.hedge_after, p95 or 0.0)
+
+        tasks = [asyncio.create_task(self._request_client(primary, path, is_rpc, treat_empty_as_ok))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.logger.debug(f'Hedging "{path}": {primary} is slower than {delay:.2f} sec, asking {backup}.')
+                tasks.append(asyncio.create_task(self._request_client(backup, path, is_rpc, treat_empty_as_ok)))
+            elif (data := tasks[0].result()) is not None:
+                return data
+            else:
+                return await self._request_client(backup, path, is_rpc, treat_empty_as_ok)
+
+            for next_done in asyncio.as_completed(tasks):
+                data = await next_done
+                if data is not None:
+                    return data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request_client(self, client: ThorNodeClient, path, is_rpc, treat_empty_as_ok):
+        """Returns the data or None if the next client should be tried"""
+        health = self.endpoint_health(client, is_rpc)
+        for attempt in range(1, client.env.retries + 1):
+            if attempt > 1:
+                if not health.is_available():
+                    break
+                self.logger.debug(f'Retry #{attempt} for path "{path}"')
+            health.on_start()
+            t0 = time.monotonic()
+            try:
+                data = await client.request(path, is_rpc=is_rpc)
+                health.record_success(time.monotonic() - t0)
+
+                if treat_empty_as_ok:
+                    if data is not None:
+                        return data
+                else:
+                    if data:
+                        # only non-empty data is considered as valid
+                        return data
                     else:
-                        if data:
-                            # only non-empty data is considered as valid
-                            return data
-                        else:
-                            # if data is empty and treat_empty_as_ok==False, try next client
-                            break  # breaks the retry loop
-                except NotImplementedError:
-                    # Do no retries, no backups. Something is wrong with your code
+                        # if data is empty and treat_empty_as_ok==False, try next client
+                        break  # breaks the retry loop
+            except NotImplementedError:
+                # Do no retries, no backups. Something is wrong with your code
+                health.record_success(time.monotonic() - t0)
+                raise
+            except asyncio.CancelledError:
+                health.on_cancel()
+                raise
+            except (FileNotFoundError, AttributeError, ValueError,
+                    ConnectionError, asyncio.TimeoutError,
+                    ClientError, ServerDisconnectedError) as e:
+                if isinstance(e, FileNotFoundError):
+                    # the node is alive, it just has no such data
+                    health.record_success(time.monotonic() - t0)
+                else:
+                    health.record_failure(time.monotonic() - t0)
+                if not self.silent:
                     raise
-                except (FileNotFoundError, AttributeError,
-                        ConnectionError, asyncio.TimeoutError,
-                        ClientError, ServerDisconnectedError) as e:
-                    if not self.silent:
-                        raise
-                    else:
-                        err_type = type(e).__name__
-                        self.logger.warning(f'#{attempt}. Failed to query {client} for "{path}" (err: {err_type}).')
-                if d := client.env.retry_delay:
-                    self.logger.debug(f'#{attempt}. Delay before retry: {d} sec...')
-                    await asyncio.sleep(d)
+                else:
+                    err_type = type(e).__name__
+                    self.logger.warning(f'#{attempt}. Failed to query {client} for "{path}" (err: {err_type}).')
+            except BaseException:
+                # settle the half-open probe, or the endpoint is never tried again
+                health.record_failure(time.monotonic() - t0)
+                raise
+            if d := client.env.retry_delay:
+                self.logger.debug(f'#{attempt}. Delay before retry: {d} sec...')
+                await asyncio.sleep(d)
@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from statistics import median
+from typing import Optional
+
+from services.lib.lru import percentile
+
+
+class EndpointHealth:
+    """
+    Rolling health of one node endpoint (base URL) and its circuit breaker.
+    Closed: requests go through. Open: the endpoint is skipped until the cool-off period is over.
+    Half-open: after the cool-off one request is let through; success closes the breaker, failure opens it again.
+    """
+
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half-open'
+
+    def __init__(self, url: str, window=50, failure_threshold=3, cool_off=30.0, max_cool_off=300.0,
+                 error_penalty=5.0):
+        """
+        :param window: number of the recent requests to estimate latency and error rate
+        :param failure_threshold: consecutive failures to open the breaker
+        :param cool_off: how long the endpoint is skipped after the breaker opens, sec; doubles on every relapse
+        :param error_penalty: how much the error rate worsens the score
+        """
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.base_cool_off = cool_off
+        self.max_cool_off = max_cool_off
+        self.error_penalty = error_penalty
+
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)  # True = ok
+        self.consecutive_failures = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.times_opened = 0
+
+        self._cool_off = cool_off
+        self._open_until = 0.0
+        self._probing = False
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    @property
+    def state(self):
+        if not self._open_until:
+            return self.STATE_CLOSED
+        return self.STATE_OPEN if self._now() < self._open_until else self.STATE_HALF_OPEN
+
+    @property
+    def open_until(self):
+        return self._open_until
+
+    def is_available(self) -> bool:
+        state = self.state
+        if state == self.STATE_CLOSED:
+            return True
+        # half-open: only one probe at a time
+        return state == self.STATE_HALF_OPEN and not self._probing
+
+    def on_start(self):
+        if self.state == self.STATE_HALF_OPEN:
+            self._probing = True
+
+    def on_cancel(self):
+        # a hedged request was cancelled: it tells nothing about the endpoint
+        self._probing = False
+
+    def record_success(self, latency: float):
+        self.total_requests += 1
+        self._latencies.append(latency)
+        self._outcomes.append(True)
+        self.consecutive_failures = 0
+        self._probing = False
+        if self._open_until:
+            # the probe went fine: close the breaker
+            self._open_until = 0.0
+            self._cool_off = self.base_cool_off
+
+    def record_failure(self, latency: Optional[float] = None):
+        self.total_requests += 1
+        self.total_failures += 1
+        if latency is not None:
+            self._latencies.append(latency)
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+
+        if self._probing or self.state == self.STATE_HALF_OPEN:
+            # the probe failed: open again for longer
+            self._cool_off = min(self.max_cool_off, self._cool_off * 2)
+            self._open()
+        elif self.consecutive_failures >= self.failure_threshold and not self._open_until:
+            self._open()
+        self._probing = False
+
+    def _open(self):
+        self._open_until = self._now() + self._cool_off
+        self.times_opened += 1
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return 1.0 - sum(self._outcomes) / len(self._outcomes)
+
+    @property
+    def median_latency(self) -> Optional[float]:
+        return median(self._latencies) if self._latencies else None
+
+    def latency_percentile(self, q) -> Optional[float]:
+        return percentile(self._latencies, q)
+
+    @property
+    def score(self) -> float:
+        """The lower, the better. Unknown endpoints get 0, so they are tried (and measured) first"""
+        latency = self.median_latency
+        if latency is None:
+            return 0.0
+        return latency * (1.0 + self.error_penalty * self.error_rate)
+
+    def __repr__(self):
+        latency = self.median_latency
+        latency = f'{latency * 1000:.0f} ms' if latency is not None else 'n/a'
+        return (f'EndpointHealth({self.url!r}, {self.state}, median={latency}, '
+                f'errors={self.error_rate * 100:.0f}%)')
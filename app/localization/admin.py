@@ -83,6 +83,16 @@ class AdminMessages:
         if not data_ctrl.summary:
             message += 'No info'
 
+        if slowest_edges := data_ctrl.slowest_edges():
+            message += bold('Slowest listeners (p95)') + '\n'
+            for emitter_name, listener_name, stats in slowest_edges:
+                errors = f', {stats.errors} err' if stats.errors else ''
+                timeouts = f', {stats.timeouts} timeouts' if stats.timeouts else ''
+                message += (
+                    f'{emitter_name} → {listener_name}: '
+                    f'{pre(round(stats.percentile(95) * 1000, 1))} ms{errors}{timeouts}\n'
+                )
+
         message += f'\n<b>Uptime:</b> {self.uptime}'
 
         return message
@@ -150,7 +160,7 @@ class AdminMessages:
     async def get_message_about_scanner(self):
         scanner: NativeScannerBlock = self.deps.block_scanner
         last_thor_block = int(self.deps.last_block_store)
-        block_diff = (last_thor_block - scanner.last_block)
+        block_diff = scanner.blocks_behind
 
         return (
             f'<b>Native block scanner</b>\n\n'
@@ -158,5 +168,7 @@ class AdminMessages:
             f'Time since: {bold(format_time_ago(now_ts() - scanner.last_block_ts))}\n'
             f'Node last block: {bold(last_thor_block)}\n'
             f'Difference last - processed: {bold(block_diff)} or '
-            f'{bold(format_time_ago(block_diff * THOR_BLOCK_TIME))}'
+            f'{bold(format_time_ago(block_diff * THOR_BLOCK_TIME))}\n'
+            f'Prefetch window: {bold(scanner.prefetch_window)}, '
+            f'in flight: {bold(scanner.prefetch_in_flight)} / {scanner.max_in_flight}'
         )
@@ -2,11 +2,14 @@ import asyncio
 import logging
 import os
 
+from aionode.cache import RequestCache
 from aionode.connector import ThorConnector
 from localization.admin import AdminMessages
 from localization.manager import LocalizationManager
 from services.dialog.discord.discord_bot import DiscordBot
 from services.dialog.main import init_dialogs
+from services.dialog.picture.render_service import RenderService
+from services.dialog.picture.resources import Resources
 from services.dialog.slack.slack_bot import SlackBot
 from services.dialog.telegram.sticker_downloader import TelegramStickerDownloader
 from services.dialog.telegram.telegram import TelegramBot
@@ -24,11 +27,17 @@ from services.jobs.fetch.node_info import NodeInfoFetcher
 from services.jobs.fetch.pol import POLFetcher
 from services.jobs.fetch.pool_price import PoolFetcher, PoolInfoFetcherMidgard
 from services.jobs.fetch.queue import QueueFetcher
+from services.jobs.fetch.runeyield.date2block import BlockAnchorIndex
 from services.jobs.fetch.savers import SaversStatsFetcher
 from services.jobs.fetch.tx import TxFetcher
 from services.jobs.ilp_summer import ILPSummer
 from services.jobs.node_churn import NodeChurnDetector
+from services.jobs.price_history import PriceHistoryCache
+from services.jobs.scanner.block_archive import BlockArchive
+from services.jobs.scanner.block_decoder import BlockDecoder
+from services.jobs.scanner.block_source import TendermintBlockSource
 from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.jobs.scanner.scan_cache import NativeScannerBlockCached
 from services.jobs.scanner.swap_extractor import SwapExtractorBlock
 from services.jobs.scanner.swap_routes import SwapRouteRecorder
 from services.jobs.transfer_detector import RuneTransferDetectorTxLogs
@@ -36,12 +45,13 @@ from services.jobs.user_counter import UserCounter
 from services.jobs.volume_filler import VolumeFillerUpdater
 from services.jobs.volume_recorder import VolumeRecorder
 from services.lib.config import Config, SubConfig
-from services.lib.constants import HTTP_CLIENT_ID
+from services.lib.constants import HTTP_CLIENT_ID, CACAO_SYMBOL
 from services.lib.date_utils import parse_timespan_to_seconds
 from services.lib.db import DB
 from services.lib.depcont import DepContainer
 from services.lib.emergency import EmergencyReport
 from services.lib.logs import WithLogger
+from services.lib.metrics_server import MetricsServer
 from services.lib.midgard.connector import MidgardConnector
 from services.lib.midgard.name_service import NameService
 from services.lib.money import DepthCurve
@@ -60,6 +70,7 @@ from services.notify.personal.balance import PersonalBalanceNotifier
 from services.notify.personal.bond_provider import PersonalBondProviderNotifier
 from services.notify.personal.personal_main import NodeChangePersonalNotifier
 from services.notify.personal.price_divergence import PersonalPriceDivergenceNotifier, SettingsProcessorPriceDivergence
+from services.notify.personal.report_jobs import LPReportJobs
 from services.notify.personal.scheduled import PersonalPeriodicNotificationService
 from services.notify.types.best_pool_notify import BestPoolsNotifier
 from services.notify.types.block_notify import BlockHeightNotifier, LastBlockStore
@@ -89,6 +100,7 @@ class App(WithLogger):
         d = self.deps = DepContainer()
         d.is_loading = True
         self._bg_task = None
+        self._metrics_server = None
 
         self._admin_messages = AdminMessages(d)
 
@@ -99,9 +111,19 @@ class App(WithLogger):
         d.mimir_const_fetcher = ConstMimirFetcher(d)
         d.mimir_const_holder = MimirHolder()
         d.pool_fetcher = PoolFetcher(d)
+        if d.cfg.get('price.history_cache.enabled', True):
+            d.price_history = PriceHistoryCache(
+                d.db,
+                max_age=d.cfg.as_interval('price.history_cache.max_age', '30d'),
+                tick_interval=d.pool_fetcher.sleep_period,
+            )
+        if d.cfg.get('render.enabled', True):
+            d.render_service = RenderService.from_config(d.cfg).install()
+        d.logo_downloader = Resources().logo_downloader
         d.last_block_fetcher = LastBlockFetcher(d)
         d.last_block_store = LastBlockStore(d)
         d.last_block_fetcher.add_subscriber(d.last_block_store)
+        d.last_block_store.add_subscriber(BlockAnchorIndex(d.db, deps=d))  # timestamp => height anchors for the LP charts
         d.rune_market_fetcher = RuneMarketInfoFetcher(d)
 
         self._init_settings()
@@ -163,9 +185,23 @@ class App(WithLogger):
         d.thor_env = thor_env or d.cfg.get_thor_env_by_network_id()
         thor_env_backup = thor_env or d.cfg.get_thor_env_by_network_id(backup=True)
 
-        d.thor_connector = ThorConnector(d.thor_env, d.session, additional_envs=[
-            thor_env_backup
-        ])
+        hedge_after = d.cfg.as_float('thor.node.hedge_after', 0.0)
+        d.thor_connector = ThorConnector(
+            d.thor_env, d.session,
+            additional_envs=[thor_env_backup],
+            failure_threshold=d.cfg.as_int('thor.node.circuit_breaker.failure_threshold', 3),
+            cool_off=parse_timespan_to_seconds(d.cfg.as_str('thor.node.circuit_breaker.cool_off', '30s')),
+            hedge_after=hedge_after if hedge_after > 0 else None,
+            cache=RequestCache(
+                ttl_rules={
+                    path: parse_timespan_to_seconds(str(ttl))
+                    for path, ttl in d.cfg.get_pure('thor.node.cache.ttl', {}).items()
+                },
+                max_size=d.cfg.as_int('thor.node.cache.max_size', 2000),
+                historical_prefixes=d.cfg.get_pure('thor.node.cache.historical',
+                                                   RequestCache.DEFAULT_HISTORICAL_PREFIXES),
+            ),
+        )
         d.thor_connector.set_client_id_for_all(HTTP_CLIENT_ID)
 
         cfg: SubConfig = d.cfg.get('thor.midgard')
@@ -176,6 +212,11 @@ class App(WithLogger):
             public_url=d.thor_env.midgard_url,
             network_id=d.cfg.network_id,
         )
+        d.midgard_connector.set_rate_limit(
+            rps=cfg.as_float('rate_limit.rps', 0.0),
+            burst=cfg.as_int('rate_limit.burst', 1),
+            backoff=cfg.as_interval('rate_limit.backoff', '5s'),
+        )
 
         d.name_service = NameService(d.db, d.cfg, d.midgard_connector, d.node_holder)
         d.alert_presenter.name_service = d.name_service
@@ -213,8 +254,16 @@ class App(WithLogger):
                 current_pools = await d.pool_fetcher.reload_global_pools()
                 if not current_pools:
                     raise Exception("No pool data at startup!")
+                await d.pool_fetcher.drop_legacy_cache()
                 await asyncio.sleep(sleep_step)
 
+                if d.price_history and not d.price_history.is_ready:
+                    self.logger.info('Loading price history...')
+                    await d.price_history.rebuild()
+
+                self.logger.info('Loading logos...')
+                await d.logo_downloader.warm_up(list(current_pools.keys()) + [CACAO_SYMBOL])
+
                 self.logger.info('Loading node info...')
                 await d.node_info_fetcher.run_once()  # get nodes beforehand
                 await asyncio.sleep(sleep_step)
@@ -250,6 +299,9 @@ class App(WithLogger):
         store_queue = QueueStoreMetrics(d)
         fetcher_queue.add_subscriber(store_queue)
 
+        if d.price_history:
+            d.pool_fetcher.add_subscriber(d.price_history)
+
         tasks = [
             d.pool_fetcher,
             d.mimir_const_fetcher,
@@ -271,7 +323,25 @@ class App(WithLogger):
         if d.cfg.get('native_scanner.enabled', True):
             # The block scanner itself
             max_attempts = d.cfg.as_int('native_scanner.max_attempts_per_block', 5)
-            d.block_scanner = NativeScannerBlock(d, max_attempts=max_attempts)
+            archive_cfg = d.cfg.get('native_scanner.archive', SubConfig({}))
+            scanner_class, scanner_kwargs = NativeScannerBlock, {}
+            if archive_cfg.get('enabled', False):
+                scanner_class = NativeScannerBlockCached
+                scanner_kwargs['archive'] = BlockArchive.from_config(archive_cfg)
+            if d.cfg.as_str('native_scanner.source', 'poll') == 'websocket':
+                ws_url = d.cfg.as_str('native_scanner.websocket_url', '') or \
+                    TendermintBlockSource.url_from_rpc(d.cfg.get_thor_env_by_network_id().rpc_url)
+                scanner_kwargs['block_source'] = TendermintBlockSource(ws_url)
+
+            d.block_scanner = scanner_class(
+                d, max_attempts=max_attempts,
+                prefetch_window=d.cfg.as_int('native_scanner.prefetch.window',
+                                             NativeScannerBlock.DEFAULT_PREFETCH_WINDOW),
+                max_in_flight=d.cfg.as_int('native_scanner.prefetch.max_in_flight',
+                                           NativeScannerBlock.DEFAULT_MAX_IN_FLIGHT),
+                decoder=BlockDecoder.from_config(d.cfg.get('native_scanner.decoder', SubConfig({}))),
+                **scanner_kwargs,
+            )
             tasks.append(d.block_scanner)
             reserve_address = d.cfg.as_str('native_scanner.reserve_address')
 
@@ -514,10 +584,20 @@ class App(WithLogger):
             poll_interval = parse_timespan_to_seconds(scheduler_cfg.get_pure('poll_interval', '1m'))
             d.scheduler = Scheduler(d.db.redis, 'PersonalLPReports', poll_interval)
             tasks.append(d.scheduler)
+            d.lp_report_jobs = LPReportJobs.from_config(d)
 
             personal_lp_notifier = PersonalPeriodicNotificationService(d)
             d.scheduler.add_subscriber(personal_lp_notifier)
 
+        # ------- FAN-OUT -------
+
+        fan_out_cfg = d.cfg.get('fan_out', SubConfig({}))
+        concurrent_fan_out = bool(fan_out_cfg.get('concurrent', False))
+        listener_timeout = fan_out_cfg.as_float('listener_timeout', 0.0)
+        if concurrent_fan_out or listener_timeout:
+            self.logger.info(f'Fan-out: {concurrent_fan_out = }, {listener_timeout = } sec.')
+            d.data_controller.set_fan_out(concurrent_fan_out, listener_timeout)
+
         # ------- BOTS -------
 
         sticker_downloader = TelegramStickerDownloader(d.telegram_bot.dp)
@@ -587,12 +667,36 @@ class App(WithLogger):
         # text = await self._admin_messages.get_debug_message_text_session()
         # await self.deps.telegram_bot.send_message(self.deps.cfg.first_admin_id, BoardMessage(text))
 
+    async def _start_metrics_server(self):
+        metrics_cfg = self.deps.cfg.get('metrics', SubConfig({}))
+        if not metrics_cfg.get('enabled', False):
+            return
+        try:
+            self._metrics_server = MetricsServer.from_config(self.deps, metrics_cfg)
+            await self._metrics_server.start()
+        except Exception as e:
+            self.logger.exception(f'Failed to start the metrics server: {e!r}')
+            self._metrics_server = None
+
     async def on_startup(self, _):
         self.deps.make_http_session()  # it must be inside a coroutine!
 
+        await self._start_metrics_server()
+
+        if self.deps.render_service:
+            await self.deps.render_service.warm_up()
+
         self._bg_task = asyncio.create_task(self._run_background_jobs())
 
     async def on_shutdown(self, _):
+        if self.deps.broadcaster:
+            await self.deps.broadcaster.stop()
+        if self._metrics_server:
+            await self._metrics_server.stop()
+        if self.deps.render_service:
+            self.deps.render_service.shutdown()
+        if self.deps.block_scanner:
+            self.deps.block_scanner.decoder.close()
         if self.deps.session:
             await self.deps.session.close()
 
@@ -1,4 +1,5 @@
 import base64
+import dataclasses
 import hashlib
 import inspect
 import typing
@@ -33,6 +34,23 @@ def register_thorchain_messages():
 THORCHAIN_MESSAGES_MAP = register_thorchain_messages()
 
 
+def materialize_message(msg):
+    """
+    Betterproto fills unset fields lazily with a module level PLACEHOLDER sentinel.
+    A pickled copy does not recognize that sentinel anymore, so we touch every field beforehand.
+    """
+    if isinstance(msg, betterproto.Message):
+        for field in dataclasses.fields(msg):
+            materialize_message(getattr(msg, field.name))
+    elif isinstance(msg, (list, tuple)):
+        for item in msg:
+            materialize_message(item)
+    elif isinstance(msg, dict):
+        for item in msg.values():
+            materialize_message(item)
+    return msg
+
+
 class NativeThorTx:
     def __init__(self, tx: Tx, tx_hash: str = ''):
         self.tx = tx
@@ -44,6 +62,11 @@ class NativeThorTx:
     def __str__(self):
         return str(self.tx)
 
+    def __getstate__(self):
+        # to be passed between processes (see BlockDecoder)
+        materialize_message(self.tx)
+        return self.__dict__
+
     @classmethod
     def from_bytes(cls, data: bytes):
         tx = Tx().parse(data)
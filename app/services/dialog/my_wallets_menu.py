@@ -132,26 +132,25 @@ class MyWalletsMenu(DialogWithSettings):
     async def _make_address_keyboard_list(self, my_addresses: dict):
         extra_row = []
 
-        local_ns = self.get_name_service(self.message)
-
-        async def address_label(address):
-            # 1) try local name
-            name = await local_ns.get_wallet_local_name(address)
-            if not name:
-                # 2) try THOR name
-                name = await self.deps.name_service.lookup_name_by_address(address)
-                if name:
-                    name = add_thor_suffix(name)
-
-            if not name:
-                # 3) just use address if no name
-                name = address
-
+        addresses = list(my_addresses.keys())
+
+        # 1) try local names, 2) THOR names for the rest: a round trip or two for the whole list
+        names = await self.get_name_service(self.message).get_wallet_local_names(addresses)
+        unnamed = [address for address in addresses if not names.get(address)]
+        if unnamed:
+            thor_names = await self.deps.name_service.lookup_names_by_addresses(unnamed)
+            for address, thor_name in thor_names.items():
+                if thor_name:
+                    names[address] = add_thor_suffix(thor_name)
+
+        def address_label(address):
+            # 3) just use address if no name
+            name = names.get(address) or address
             label = short_address(name, 11, 4, filler='..')
             return label, address
 
         # Every button is tuple of (label, full_address)
-        short_addresses = await asyncio.gather(*[address_label(addr) for addr in my_addresses.keys()])
+        short_addresses = [address_label(addr) for addr in addresses]
 
         return TelegramInlineList(
             short_addresses, data_proxy=self.data,
@@ -1,5 +1,10 @@
+import asyncio
+import json
 import logging
 import os
+import time
+from collections import OrderedDict, Counter
+from typing import Dict, Iterable
 
 import web3
 from PIL import Image
@@ -53,14 +58,34 @@ class CryptoLogoDownloader:
         ETH_USDT_TEST_SYMBOL: ETH_USDT_SYMBOL,
     }
 
+    MEMORY_CACHE_SIZE = 512  # (asset, size) pairs
+    MISS_TTL = 3600.0  # sec; a logo that failed to download is not requested again for this long
+    ATLAS_FILE = '_atlas.png'
+    ATLAS_INDEX_FILE = '_atlas.json'
+    ATLAS_COLUMNS = 16
+
+    # where a logo came from (the keys of "stats")
+    SRC_MEMORY = 'memory'
+    SRC_ATLAS = 'atlas'
+    SRC_DISK = 'disk'
+    SRC_DOWNLOAD = 'download'
+    SRC_MISS = 'miss'  # unknown logo: the download failed recently
+
     def path_to_local_storage(self, path):
         return os.path.join(self.base_dir, path)
 
     def path_to_local_coin_image(self, coin):
         return self.path_to_local_storage(f'{coin}.png')
 
-    def __init__(self, data_dir: str) -> None:
+    def __init__(self, data_dir: str, memory_cache_size=MEMORY_CACHE_SIZE, miss_ttl=MISS_TTL) -> None:
         self.base_dir = data_dir
+        self.memory_cache_size = memory_cache_size
+        self.miss_ttl = miss_ttl
+        self._memory: OrderedDict = OrderedDict()  # (asset, size) => RGBA image
+        self._atlas: Dict[str, Image.Image] = {}  # asset => full size RGBA image
+        self._misses: Dict[str, float] = {}  # asset => when it failed
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.stats = Counter()  # source of the logo => count; see "hit_rate"
 
     @classmethod
     def image_url(cls, asset: str):
@@ -101,23 +126,170 @@ class CryptoLogoDownloader:
         with open(target_path, 'wb') as f:
             logo.save(f, 'png')
 
-    async def get_or_download_logo_cached(self, asset, forced=False):
-        try:
-            local_path = self.path_to_local_coin_image(asset)
-            if forced or not os.path.exists(local_path):
-                await self._download_logo(asset)
-            logo = Image.open(local_path).convert("RGBA")
-        except Exception as e:
-            logo = Image.open(self.path_to_local_storage(self.UNKNOWN_LOGO))
-            logger.error(f'error ({e}) loading logo for "{asset}". using the default one...')
+    # --- cache ---
+
+    @property
+    def hit_rate(self):
+        """Share of the requests served from memory or the atlas"""
+        total = sum(self.stats.values())
+        return (self.stats[self.SRC_MEMORY] + self.stats[self.SRC_ATLAS]) / total if total else 0.0
+
+    @property
+    def memory_cache_items(self):
+        return len(self._memory)
+
+    @property
+    def atlas_items(self):
+        return len(self._atlas)
 
+    def _remember(self, key, logo):
+        self._memory[key] = logo
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_cache_size:
+            self._memory.popitem(last=False)
+
+    def forget(self, asset):
+        for key in [k for k in self._memory if k[0] == asset]:
+            del self._memory[key]
+        self._atlas.pop(asset, None)
+        self._misses.pop(asset, None)
+
+    def _load_local(self, asset) -> Image.Image:
+        logo = Image.open(self.path_to_local_coin_image(asset)).convert('RGBA')
         if logo.size != (self.LOGO_WIDTH, self.LOGO_HEIGHT):
             logo.thumbnail((self.LOGO_WIDTH, self.LOGO_HEIGHT))
         return logo
 
-    async def get_logo_for_chain(self, chain, forced=False):
+    def _unknown_logo(self):
+        key = (self.UNKNOWN_LOGO, self.LOGO_WIDTH)
+        logo = self._memory.get(key)
+        if logo is None:
+            logo = Image.open(self.path_to_local_storage(self.UNKNOWN_LOGO)).convert('RGBA')
+            logo.thumbnail((self.LOGO_WIDTH, self.LOGO_HEIGHT))
+            self._remember(key, logo)
+        return logo
+
+    async def _load_full_size(self, asset, forced=False):
+        """(logo, source); the logo is None if it could not be found nor downloaded"""
+        if not forced:
+            if (logo := self._atlas.get(asset)) is not None:
+                return logo, self.SRC_ATLAS
+
+            failed_ts = self._misses.get(asset)
+            if failed_ts and time.monotonic() - failed_ts < self.miss_ttl:
+                return None, self.SRC_MISS
+
+        try:
+            source = self.SRC_DISK
+            if forced or not os.path.exists(self.path_to_local_coin_image(asset)):
+                source = self.SRC_DOWNLOAD
+                await self._download_logo(asset)
+            logo = self._load_local(asset)
+            self._misses.pop(asset, None)
+            return logo, source
+        except Exception as e:
+            self._misses[asset] = time.monotonic()
+            logger.error(f'error ({e}) loading logo for "{asset}". using the default one for {self.miss_ttl} sec...')
+            return None, self.SRC_MISS
+
+    async def get_logo(self, asset, size=LOGO_WIDTH, forced=False) -> Image.Image:
+        """
+        RGBA logo that fits in size x size. It is shared: make a copy before modifying it!
+        Memory LRU by (asset, size) -> the atlas -> the local file -> download. Failures are remembered for a while.
+        """
+        key = (asset, size)
+        if forced:
+            self.forget(asset)
+        elif (logo := self._memory.get(key)) is not None:
+            self._memory.move_to_end(key)
+            self.stats[self.SRC_MEMORY] += 1
+            return logo
+
+        full_key = (asset, self.LOGO_WIDTH)
+        logo = self._memory.get(full_key)
+        if logo is None:
+            # the same logo requested by several pictures at once is loaded once
+            task = self._loading.get(asset)
+            if task is None:
+                task = self._loading[asset] = asyncio.ensure_future(self._load_full_size(asset, forced))
+                task.add_done_callback(lambda _: self._loading.pop(asset, None))
+            logo, source = await asyncio.shield(task)
+            self.stats[source] += 1
+            if logo is None:
+                return self._sized(self._unknown_logo(), self.UNKNOWN_LOGO, size)
+            self._remember(full_key, logo)
+        else:
+            self.stats[self.SRC_MEMORY] += 1
+
+        return self._sized(logo, asset, size)
+
+    def _sized(self, logo, asset, size):
+        if size == self.LOGO_WIDTH:
+            return logo
+        key = (asset, size)
+        sized = self._memory.get(key)
+        if sized is None:
+            sized = logo.copy()
+            sized.thumbnail((size, size))
+            self._remember(key, sized)
+        return sized
+
+    async def get_or_download_logo_cached(self, asset, forced=False):
+        return (await self.get_logo(asset, forced=forced)).copy()
+
+    async def get_logo_for_chain(self, chain, forced=False, size=LOGO_WIDTH):
         # for example: for ARB.XXX-0X123123, we need to get the logo for ARB
         virtual_asset = self.CHAIN_TO_LOGO_ASSET.get(chain)
         if not virtual_asset:
             return
-        return await self.get_or_download_logo_cached(virtual_asset, forced)
+        return (await self.get_logo(virtual_asset, size, forced)).copy()
+
+    # --- atlas ---
+
+    def _load_atlas(self):
+        index_path = self.path_to_local_storage(self.ATLAS_INDEX_FILE)
+        atlas_path = self.path_to_local_storage(self.ATLAS_FILE)
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            atlas = Image.open(atlas_path).convert('RGBA')
+        except (OSError, ValueError):
+            return {}
+        return {asset: atlas.crop((x, y, x + w, y + h)) for asset, (x, y, w, h) in index.items()}
+
+    def _save_atlas(self, logos: Dict[str, Image.Image]):
+        w, h = self.LOGO_WIDTH, self.LOGO_HEIGHT
+        columns = self.ATLAS_COLUMNS
+        rows = max(1, -(-len(logos) // columns))
+        atlas = Image.new('RGBA', (columns * w, rows * h), (0, 0, 0, 0))
+        index = {}
+        for i, (asset, logo) in enumerate(sorted(logos.items())):
+            x, y = (i % columns) * w, (i // columns) * h
+            atlas.paste(logo, (x, y))
+            index[asset] = (x, y, logo.width, logo.height)  # not all the logos are square
+
+        tmp_path = self.path_to_local_storage(self.ATLAS_FILE + '.tmp')
+        atlas.save(tmp_path, 'PNG')
+        os.replace(tmp_path, self.path_to_local_storage(self.ATLAS_FILE))
+        with open(self.path_to_local_storage(self.ATLAS_INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+
+    async def warm_up(self, assets: Iterable[str]):
+        """
+        Loads the atlas (all the logos in one file) and adds the missing assets to it.
+        Call it on startup with the active pools, so no picture has to wait for a logo.
+        """
+        loop = asyncio.get_running_loop()
+        self._atlas = await loop.run_in_executor(None, self._load_atlas)
+
+        assets = set(assets) | set(self.CHAIN_TO_LOGO_ASSET.values())
+        added = 0
+        for asset in assets - set(self._atlas):
+            logo, _ = await self._load_full_size(asset)
+            if logo is not None:
+                self._atlas[asset] = logo
+                added += 1
+
+        if added:
+            await loop.run_in_executor(None, self._save_atlas, dict(self._atlas))
+        logger.info(f'Logo atlas: {len(self._atlas)} logos ({added} new).')
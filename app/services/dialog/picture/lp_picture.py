@@ -6,6 +6,7 @@ from typing import List
 from PIL import ImageDraw
 
 from localization.manager import BaseLocalization
+from services.dialog.picture.render_service import async_render
 from services.dialog.picture.resources import Resources
 from services.lib.constants import CACAO_SYMBOL
 from services.lib.draw_utils import CATEGORICAL_PALETTE, pos_percent, result_color, hor_line, LIGHT_TEXT_COLOR, \
@@ -14,7 +15,7 @@ from services.lib.money import pretty_money, format_percent, pretty_percent, Ass
     short_dollar, short_money, is_cacao
 from services.lib.plot_graph import PlotBarGraph
 from services.lib.texts import bracketify
-from services.lib.utils import async_wrap, grouper
+from services.lib.utils import grouper
 from services.models.lp_info import LiquidityPoolReport, LPDailyGraphPoint, ILProtectionReport
 from services.models.price import LastPriceHolder
 
@@ -43,13 +44,13 @@ async def generate_yield_picture(price_holder: LastPriceHolder,
 
     if report.is_savers:
         # savings position
-        asset_image = await r.logo_downloader.get_or_download_logo_cached(asset)
+        asset_image = await r.logo_downloader.get_logo(asset)
         return await _generate_savings_picture(price_holder, report, loc, asset_image, value_hidden)
     else:
         # LP position
         rune_image, asset_image = await asyncio.gather(
-            r.logo_downloader.get_or_download_logo_cached(CACAO_SYMBOL),
-            r.logo_downloader.get_or_download_logo_cached(asset)
+            r.logo_downloader.get_logo(CACAO_SYMBOL),
+            r.logo_downloader.get_logo(asset)
         )
         return await _generate_lp_pool_picture(price_holder, report, loc, rune_image, asset_image, value_hidden)
 
@@ -58,7 +59,7 @@ def put_title(draw, title, fonts):
     draw.text(pos_percent_lp(59, 5.8), title, fill=TC_WHITE, anchor='lm', font=fonts.get_font(62))
 
 
-@async_wrap
+@async_render
 def _generate_lp_pool_picture(price_holder: LastPriceHolder,
                               report: LiquidityPoolReport,
                               loc: BaseLocalization,
@@ -470,7 +471,7 @@ def lp_weekly_graph(w, h, weekly_charts: dict, color_map: dict, value_hidden):
     return graph_img
 
 
-@async_wrap
+@async_render
 def sync_lp_address_summary_picture(reports: List[LiquidityPoolReport], weekly_charts, loc: BaseLocalization,
                                     value_hidden):
 
@@ -696,11 +697,11 @@ async def savings_pool_picture(price_holder: LastPriceHolder,
                                value_hidden=False):
     r = Resources()
     asset = report.pool.asset
-    asset_image = await r.logo_downloader.get_or_download_logo_cached(asset)
+    asset_image = await r.logo_downloader.get_logo(asset)
     return await _generate_savings_picture(price_holder, report, loc, asset_image, value_hidden)
 
 
-@async_wrap
+@async_render
 def _generate_savings_picture(price_holder: LastPriceHolder,
                               report: LiquidityPoolReport,
                               loc: BaseLocalization,
@@ -6,6 +6,7 @@ from typing import List
 from PIL import Image, ImageDraw
 
 from localization.eng_base import BaseLocalization
+from services.dialog.picture.render_service import async_render
 from services.dialog.picture.resources import Resources
 from services.lib.date_utils import DAY, now_ts, today_str
 from services.lib.draw_utils import default_background, CacheGrid, TC_YGGDRASIL_GREEN, \
@@ -14,7 +15,7 @@ from services.lib.draw_utils import default_background, CacheGrid, TC_YGGDRASIL_
 from services.lib.money import clamp, short_rune, format_percent
 from services.lib.plot_graph import plot_legend, PlotGraphLines
 from services.lib.texts import bracketify
-from services.lib.utils import async_wrap, Singleton, most_common_and_other, linear_transform
+from services.lib.utils import Singleton, most_common_and_other, linear_transform
 from services.models.location_info import LocationInfo
 from services.models.node_info import NetworkNodeIpInfo, NodeStatsItem
 
@@ -37,10 +38,10 @@ class ResourcesNodePic(metaclass=Singleton):
         self.font_subtitle = f.get_font(44, f.FONT_BOLD)
         self.font_head = f.get_font(80)
 
-        self.world_map = Image.open(self.WORLD_FILE)
+        self.world_map = r.get_image(self.WORLD_FILE)
         self.tc_logo = r.tc_logo
-        self.circle = Image.open(self.CIRCLE_FILE)
-        self.circle_dim = Image.open(self.CIRCLE_DIM_FILE)
+        self.circle = r.get_image(self.CIRCLE_FILE)
+        self.circle_dim = r.get_image(self.CIRCLE_DIM_FILE)
 
 
 class WorldMap:
@@ -277,7 +278,7 @@ class NodePictureGenerator:
     def index_to_color(i):
         return get_palette_color_by_index(i, TC_PALETTE)
 
-    @async_wrap
+    @async_render
     def generate(self):
         active_nodes = self.data.active_nodes
         providers_all = self.data.get_providers(self.data.node_info_list, unknown=self.loc.TEXT_PIC_UNKNOWN)
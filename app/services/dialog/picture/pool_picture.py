@@ -2,10 +2,10 @@ from PIL import Image, ImageDraw
 
 from localization.eng_base import BaseLocalization
 from services.dialog.picture.common import BasePictureGenerator
+from services.dialog.picture.render_service import async_render
 from services.dialog.picture.resources import Resources
 from services.lib.draw_utils import result_color, TC_LIGHTNING_BLUE
 from services.lib.money import pretty_money, Asset, short_money, short_dollar
-from services.lib.utils import async_wrap
 from services.models.asset import is_ambiguous_asset
 from services.models.pool_info import PoolMapPair
 
@@ -15,10 +15,10 @@ class PoolPictureGenerator(BasePictureGenerator):
     BG_FILE = f'{BASE}/pools_bg.png'
 
     N_POOLS = 7
+    LOGO_SIZE = 50
 
     def __init__(self, loc: BaseLocalization, event: PoolMapPair):
         super().__init__(loc)
-        self.bg = Image.open(self.BG_FILE)
         self.event = event
         self.logos = {}
         self.chain_logos = {}
@@ -29,14 +29,13 @@ class PoolPictureGenerator(BasePictureGenerator):
     async def prepare(self):
         r = Resources()
 
+        # already resized; shared, so they are not modified
         for vault in self.event.all_assets:
-            logo = await r.logo_downloader.get_or_download_logo_cached(vault)
-            self.logos[vault] = logo
+            self.logos[vault] = await r.logo_downloader.get_logo(vault, self.LOGO_SIZE)
 
             chain = Asset(vault).chain
-            if chain:
-                chain_logo = await r.logo_downloader.get_logo_for_chain(chain)
-                self.chain_logos[chain] = chain_logo
+            if chain and chain not in self.chain_logos:
+                self.chain_logos[chain] = await r.logo_downloader.get_logo_for_chain(chain, size=self.LOGO_SIZE // 2)
 
     def draw_one_number(self, draw, image, name, row, col, value, percent_diff, prefix='', suffix='',
                         total_value=None, attr_value_accum=0.0):
@@ -47,7 +46,7 @@ class PoolPictureGenerator(BasePictureGenerator):
 
         x = [110, 749, 1392][col]
         y = 300 + 124 * row
-        logo_size = 50
+        logo_size = self.LOGO_SIZE
 
         # row number
         draw.text((x, y), f'{row}.', fill='#999', font=number_font, anchor='lt')
@@ -56,16 +55,12 @@ class PoolPictureGenerator(BasePictureGenerator):
         a = Asset(name.asset)
         logo = self.logos.get(name.asset)
         if logo:
-            logo = logo.copy()
-            logo.thumbnail((logo_size, logo_size))
             logo_x, logo_y = x + 49, y - logo_size // 2 + 12
             image.paste(logo, (logo_x, logo_y), logo)
 
             if is_ambiguous_asset(name.asset, self.event.all_assets):
                 gas_logo = self.chain_logos.get(a.chain)
                 if gas_logo:
-                    gas_logo = gas_logo.copy()
-                    gas_logo.thumbnail((logo_size // 2, logo_size // 2))
                     image.paste(gas_logo, (logo_x - 4, logo_y - 4), gas_logo)
 
         # asset
@@ -102,13 +97,14 @@ class PoolPictureGenerator(BasePictureGenerator):
             draw.line((x + x_offset + partial_width, line_y - 4, x + x_offset + partial_width, line_y + 4),
                       fill=TC_LIGHTNING_BLUE, width=1)
 
-    @async_wrap
+    @async_render
     def _get_picture_sync(self):
         # prepare data
         r, loc, e = self.r, self.loc, self.event
 
         # prepare painting stuff
-        image = self.bg.copy()
+        bg = r.get_image(self.BG_FILE)
+        image = bg.copy()
         draw = ImageDraw.Draw(image)
 
         # header = loc.top_pools()
@@ -142,8 +138,8 @@ class PoolPictureGenerator(BasePictureGenerator):
                 self.draw_one_number(draw, image, pool, i, column, v, p, prefix, suffix, total_value, attr_value_accum)
                 attr_value_accum += v
 
-        bottom_value_y = self.bg.height - 192
-        bottom_text_y = self.bg.height - 134
+        bottom_value_y = bg.height - 192
+        bottom_text_y = bg.height - 134
         bottom_value_font = r.fonts.get_font_bold(80)
         bottom_text_font = r.fonts.get_font(48)
 
@@ -5,7 +5,8 @@ from services.lib.constants import RUNE_SYMBOL_DET, RUNE_SYMBOL_POOL, RUNE_SYMBO
 from services.lib.date_utils import DAY, today_str
 from services.lib.depcont import DepContainer
 from services.lib.plot_graph import PlotGraphLines
-from services.lib.utils import async_wrap, pluck_from_series
+from services.dialog.picture.render_service import async_render
+from services.lib.utils import pluck_from_series
 from services.models.time_series import PriceTimeSeries
 
 PRICE_GRAPH_WIDTH = 1024
@@ -21,9 +22,10 @@ BAR_COLOR_ADD = '#04cf4e'
 BAR_COLOR_WITHDRAW = '#cf0448'
 
 VOLUME_N_POINTS = 58
+CHART_MAX_POINTS = 1500  # about one per horizontal pixel
 
 
-@async_wrap
+@async_render
 def price_graph(pool_price_df, det_price_df, cex_prices_df, volumes, loc: BaseLocalization, time_scale_mode='date'):
     graph = PlotGraphLines(PRICE_GRAPH_WIDTH, PRICE_GRAPH_HEIGHT)
     graph.show_min_max = True
@@ -92,9 +94,16 @@ async def price_graph_from_db(deps: DepContainer, loc: BaseLocalization, period=
     if period >= 7 * DAY:
         max_points = 60_000
 
-    prices = await series.get_last_values(period, with_ts=True, max_points=max_points)
-    det_prices = await det_series.get_last_values(period, with_ts=True, max_points=max_points)
-    cex_prices = await cex_price_series.get_last_values(period, with_ts=True, max_points=max_points)
+    cache = deps.price_history
+    if cache and cache.covers(period):
+        prices = cache.last_values(cache.COL_POOL_PRICE, period, max_points=CHART_MAX_POINTS)
+        det_prices = cache.last_values(cache.COL_DET_PRICE, period, max_points=CHART_MAX_POINTS)
+        cex_prices = cache.last_values(cache.COL_CEX_PRICE, period, max_points=CHART_MAX_POINTS)
+    else:
+        # long periods are read from the rollups
+        prices = await series.get_last_values_rolled(period, with_ts=True, max_points=max_points)
+        det_prices = await det_series.get_last_values_rolled(period, with_ts=True, max_points=max_points)
+        cex_prices = await cex_price_series.get_last_values_rolled(period, with_ts=True, max_points=max_points)
     volumes = await volume_recorder.get_data_range_ago_n(period, n=VOLUME_N_POINTS)
 
     time_scale_mode = 'time' if period <= DAY else 'date'
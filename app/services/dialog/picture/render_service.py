@@ -0,0 +1,350 @@
+import asyncio
+import hashlib
+import importlib
+import io
+import multiprocessing
+import os
+import pickle
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps, partial
+from typing import Optional, Dict
+
+import PIL.Image
+
+from localization.eng_base import BaseLocalization
+from services.dialog.picture.resources import Resources
+from services.lib.config import Config, SubConfig
+from services.lib.lru import WindowAverage
+from services.lib.utils import WithLogger
+
+# the modules with @async_render functions; they are imported by the workers on start
+_render_modules = set()
+
+# set by RenderService.install()
+_service: Optional['RenderService'] = None
+
+
+def async_render(func):
+    """
+    Same as "async_wrap" for the functions that return a picture.
+    If a RenderService is installed, the picture is rendered by its worker pool and cached.
+    The function must be reachable by its module and qualified name (no closures).
+    """
+    _render_modules.add(func.__module__)
+
+    @wraps(func)
+    async def run(*args, **kwargs):
+        if _service is None:
+            return await asyncio.get_event_loop().run_in_executor(None, partial(func, *args, **kwargs))
+        return await _service.render(func, *args, **kwargs)
+
+    return run
+
+
+# --- passing the arguments ---
+
+class _RenderPickler(pickle.Pickler):
+    # localizations and resources are not sent, every worker has its own
+    def persistent_id(self, obj):
+        if isinstance(obj, BaseLocalization):
+            return 'loc', obj.name
+        if isinstance(obj, Resources):
+            return 'res', ''
+        return None
+
+
+class _RenderUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind == 'loc':
+            return _worker_locs[name]
+        if kind == 'res':
+            return Resources()
+        raise pickle.UnpicklingError(f'Unknown persistent id: {pid!r}')
+
+
+def dump_render_args(args, kwargs) -> bytes:
+    bio = io.BytesIO()
+    _RenderPickler(bio, protocol=pickle.HIGHEST_PROTOCOL).dump((args, kwargs))
+    return bio.getvalue()
+
+
+def image_size_bytes(image: PIL.Image.Image):
+    return image.width * image.height * len(image.getbands())
+
+
+# --- worker side ---
+
+_worker_locs: Dict[str, BaseLocalization] = {}
+
+PRELOAD_FONT_SIZES = (24, 28, 36, 38, 40, 48, 50, 64)
+
+
+def _init_worker(config_data, modules):
+    from localization.manager import LocalizationManager
+
+    global _worker_locs
+    loc_man = LocalizationManager(Config(data=config_data))
+    _worker_locs = {loc.name: loc for loc in loc_man.all}
+
+    fonts = Resources().fonts
+    for size in PRELOAD_FONT_SIZES:
+        fonts.get_font(size)
+        fonts.get_font_bold(size)
+
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _resolve(module_name, qualname):
+    obj = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return getattr(obj, '__wrapped__', obj)  # the original function under @async_render
+
+
+def _render_in_worker(module_name, qualname, payload: bytes):
+    # the image goes back as raw pixels: that is much faster than encoding a PNG
+    args, kwargs = _RenderUnpickler(io.BytesIO(payload)).load()
+    func = _resolve(module_name, qualname)
+    return func(*args, **kwargs)
+
+
+def _ping():
+    return os.getpid()
+
+
+# --- parent side ---
+
+class RenderCache:
+    """
+    LRU of the rendered pictures, limited by the number of items and their total size (raw pixels).
+    Optionally, they are also saved on disk as PNG files, so they survive a restart.
+    The disk methods do blocking I/O, call them in an executor.
+    """
+
+    PNG_COMPRESS_LEVEL = 1  # several times faster than the default (6); the files are ~40% bigger
+
+    def __init__(self, max_items=256, max_bytes=256 * 1024 * 1024, ttl=300.0, disk_dir=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._items: OrderedDict = OrderedDict()  # key => (ts, image)
+        self.total_bytes = 0
+        self._disk_writes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, now=None) -> Optional[PIL.Image.Image]:
+        now = now or time.time()
+        item = self._items.get(key)
+        if item:
+            ts, image = item
+            if now - ts <= self.ttl:
+                self._items.move_to_end(key)
+                return image
+            self._remove(key)
+        return None
+
+    def put(self, key, image: PIL.Image.Image, ts=None):
+        if key in self._items:
+            self._remove(key)
+        self._items[key] = (ts or time.time(), image)
+        self.total_bytes += image_size_bytes(image)
+        while self._items and (len(self._items) > self.max_items or self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        _, image = self._items.pop(key)
+        self.total_bytes -= image_size_bytes(image)
+
+    def clear(self):
+        self._items.clear()
+        self.total_bytes = 0
+
+    # --- disk ---
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.png')
+
+    def load_from_disk(self, key, now=None) -> Optional[PIL.Image.Image]:
+        if not self.disk_dir:
+            return None
+        now = now or time.time()
+        path = self._disk_path(key)
+        try:
+            ts = os.path.getmtime(path)
+            if now - ts > self.ttl:
+                return None
+            image = PIL.Image.open(path)
+            image.load()
+        except OSError:
+            return None
+        self.put(key, image, ts)
+        return image
+
+    def save_to_disk(self, key, image: PIL.Image.Image):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f'{path}.tmp'
+        image.save(tmp_path, 'PNG', compress_level=self.PNG_COMPRESS_LEVEL)
+        os.replace(tmp_path, path)
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self.prune_disk()
+
+    def prune_disk(self, now=None):
+        now = now or time.time()
+        removed = 0
+        for entry in os.scandir(self.disk_dir):
+            try:
+                if entry.name.endswith('.png') and now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class RenderStats:
+    def __init__(self, window=200):
+        self.renders = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.latency = WindowAverage(window)
+
+    def add_render(self, seconds):
+        self.renders += 1
+        self.total_time += seconds
+        self.latency.append(seconds)
+
+
+class RenderService(WithLogger):
+    """
+    Renders the pictures (see "async_render") in a pool of worker processes, so PIL and numpy do not
+    hold the GIL of the bot's process. Every worker has the fonts, the resources and the localizations preloaded.
+    The results are cached by the hash of the input data and the locale, so the same picture requested by many
+    chats at once is rendered only once. With workers = 0, the pictures are rendered in a thread (still cached).
+    """
+
+    def __init__(self, config_data=None, workers=2, cache: Optional[RenderCache] = None, start_method='spawn'):
+        super().__init__()
+        self.config_data = config_data or {}
+        self.workers = workers
+        self.start_method = start_method
+        self.cache = cache or RenderCache()
+        self.stats: Dict[str, RenderStats] = defaultdict(RenderStats)
+        self.fallbacks = 0  # the arguments could not be pickled
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._start_pool()
+
+    @classmethod
+    def from_config(cls, cfg: Config):
+        render_cfg = cfg.get('render', SubConfig({}))
+        cache = RenderCache(
+            max_items=render_cfg.as_int('cache.max_items', 256),
+            max_bytes=render_cfg.as_int('cache.max_mb', 256) * 1024 * 1024,
+            ttl=render_cfg.as_interval('cache.ttl', '5m'),
+            disk_dir=render_cfg.get('cache.disk_dir', '') or None,
+        )
+        return cls(
+            config_data=cfg.get(),
+            workers=render_cfg.as_int('workers', 2),
+            cache=cache,
+            start_method=render_cfg.get('start_method', 'spawn'),
+        )
+
+    def _start_pool(self):
+        if self.workers > 0:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.config_data, sorted(_render_modules)),
+            )
+
+    def install(self):
+        global _service
+        _service = self
+        return self
+
+    async def warm_up(self):
+        """Starts the workers now rather than on the first picture"""
+        if self._pool:
+            loop = asyncio.get_running_loop()
+            pids = await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)))
+            self.logger.info(f'Render workers are ready: {len(set(pids))} processes.')
+
+    def shutdown(self):
+        global _service
+        if _service is self:
+            _service = None
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, func, *args, **kwargs) -> Optional[PIL.Image.Image]:
+        name = func.__qualname__
+        loop = asyncio.get_running_loop()
+        try:
+            payload = dump_render_args(args, kwargs)
+        except Exception as e:
+            self.fallbacks += 1
+            self.logger.warning(f'{name}: cannot pass the arguments to a worker ({e!r}), rendering in a thread.')
+            return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+        key = hashlib.sha1(f'{func.__module__}:{name}:'.encode() + payload).hexdigest()
+        image = self.cache.get(key)
+        if image is None and self.cache.disk_dir:
+            image = await loop.run_in_executor(None, self.cache.load_from_disk, key)
+        if image is not None:
+            self.stats[name].cache_hits += 1
+            return image.copy()  # the caller may draw on it
+
+        # the same picture is being rendered for someone else right now
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._render(key, func, payload, args, kwargs))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.stats[name].cache_hits += 1
+
+        image = await asyncio.shield(task)
+        return image.copy() if image is not None else None
+
+    async def _render(self, key, func, payload, args, kwargs) -> Optional[PIL.Image.Image]:
+        stats = self.stats[func.__qualname__]
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            if self._pool:
+                image = await loop.run_in_executor(self._pool, _render_in_worker,
+                                                   func.__module__, func.__qualname__, payload)
+            else:
+                image = await loop.run_in_executor(None, partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            stats.errors += 1
+            self.logger.error('The render pool is broken (a worker died?). Restarting it.')
+            self._pool = None
+            self._start_pool()
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+
+        stats.add_render(time.perf_counter() - t0)
+        if image is not None:
+            self.cache.put(key, image)
+            if self.cache.disk_dir:
+                loop.run_in_executor(None, self.cache.save_to_disk, key, image)
+        return image
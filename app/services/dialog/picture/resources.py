@@ -52,6 +52,8 @@ class Resources(metaclass=Singleton):
     CUSTOM_FONT_BALLOON = f'{BASE}/achievement/numbers_balloon'
 
     def __init__(self) -> None:
+        self._images = {}
+
         self.fonts = FontCache(self.BASE)
         self.hidden_img = Image.open(self.HIDDEN_IMG)
         self.hidden_img.thumbnail((200, 36))
@@ -63,10 +65,11 @@ class Resources(metaclass=Singleton):
         self.font = self.fonts.get_font(40)
         self.font_head = self.fonts.get_font(48)
 
-        self.bg_image = Image.open(self.BG_IMG)
+        # loaded at once: lazy loading of a shared image from several threads breaks it
+        self.bg_image = self.get_image(self.BG_IMG)
 
-        self.tc_logo = Image.open(self.LOGO_FILE)
-        self.tc_logo_transparent = Image.open(self.LOGO_FILE_TRANSPARENT)
+        self.tc_logo = self.get_image(self.LOGO_FILE)
+        self.tc_logo_transparent = self.get_image(self.LOGO_FILE_TRANSPARENT)
 
         self.logo_downloader = CryptoLogoDownloader(self.LOGO_BASE)
 
@@ -74,6 +77,15 @@ class Resources(metaclass=Singleton):
         self.custom_font_runic_bw = SpriteFont(self.CUSTOM_FONT_RUNIC_BW, filename_prefix='bw_')
         self.custom_font_balloon = SpriteFont(self.CUSTOM_FONT_BALLOON, available_symbols=string.digits)
 
+    def get_image(self, path):
+        """Loaded once; make a copy before drawing on it!"""
+        image = self._images.get(path)
+        if image is None:
+            image = Image.open(path)
+            image.load()
+            self._images[path] = image
+        return image
+
     def put_hidden_plate(self, image, position, anchor='left', ey=-3):
         x, y = position
         if anchor == 'right':
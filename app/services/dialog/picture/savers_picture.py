@@ -2,10 +2,10 @@ from PIL import Image, ImageDraw
 
 from localization.manager import BaseLocalization
 from services.dialog.picture.common import BasePictureGenerator
+from services.dialog.picture.render_service import async_render
 from services.dialog.picture.resources import Resources
 from services.lib.draw_utils import TC_WHITE, result_color, rect_progress_bar
 from services.lib.money import Asset, short_money, short_dollar
-from services.lib.utils import async_wrap
 from services.models.asset import is_ambiguous_asset
 from services.models.savers import SaverVault, AlertSaverStats
 
@@ -20,22 +20,25 @@ class SaversPictureGenerator(BasePictureGenerator):
     WIDTH = 2048
     HEIGHT = 1200
 
+    LOGO_SIZE = 32 * 2
+
     def __init__(self, loc: BaseLocalization, event: AlertSaverStats):
         super().__init__(loc)
-        self.bg = Image.open(self.BG_FILE)
         self.event = event
         self.logos = {}
+        self.small_logos = {}
 
     FILENAME_PREFIX = 'thorchain_savers'
 
     async def prepare(self):
         r = Resources()
 
+        # already resized; shared, so they are not modified
         for vault in self.event.current_stats.vaults:
-            logo = await r.logo_downloader.get_or_download_logo_cached(vault.asset)
-            self.logos[vault.asset] = logo
+            self.logos[vault.asset] = await r.logo_downloader.get_logo(vault.asset, self.LOGO_SIZE)
+            self.small_logos[vault.asset] = await r.logo_downloader.get_logo(vault.asset, self.LOGO_SIZE // 2)
 
-    @async_wrap
+    @async_render
     def _get_picture_sync(self):
         # prepare data
         cur_data = self.event.current_stats
@@ -48,7 +51,7 @@ class SaversPictureGenerator(BasePictureGenerator):
 
         # prepare painting stuff
         r = Resources()
-        image = self.bg.copy()
+        image = r.get_image(self.BG_FILE).copy()
         draw = ImageDraw.Draw(image)
 
         # title
@@ -109,7 +112,7 @@ class SaversPictureGenerator(BasePictureGenerator):
         table_x = 46 * 2
         y, dy = 460, 84
         y_start = y
-        logo_size = 32 * 2
+        logo_size = self.LOGO_SIZE
 
         asset_x = 42 * 2 + table_x
         dollar_x = 200 * 2 + table_x
@@ -163,17 +166,13 @@ class SaversPictureGenerator(BasePictureGenerator):
         for vault in cur_data.vaults:
             logo = self.logos.get(vault.asset)
             if logo:
-                logo = logo.copy()
-                logo.thumbnail((logo_size, logo_size))
                 image.paste(logo, (table_x, y - logo_size // 2), logo)
 
             a = Asset.from_string(vault.asset)
             if is_ambiguous_asset(vault.asset, [v.asset for v in cur_data.vaults]):
                 gas_asset = a.gas_asset_from_chain(a.chain)
-                gas_logo = self.logos.get(str(gas_asset))
+                gas_logo = self.small_logos.get(str(gas_asset))
                 if gas_logo:
-                    gas_logo = gas_logo.copy()
-                    gas_logo.thumbnail((logo_size // 2, logo_size // 2))
                     image.paste(gas_logo, (table_x - 4, y - logo_size // 2 - 4), gas_logo)
 
             draw_metric(asset_x, y, 'total_asset_saved', vault,
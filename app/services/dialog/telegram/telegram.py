@@ -1,4 +1,3 @@
-import asyncio
 import urllib.parse
 
 import aiohttp
@@ -10,7 +9,7 @@ from services.lib.config import Config
 from services.lib.db import DB
 from services.lib.texts import shorten_text
 from services.lib.utils import WithLogger
-from services.notify.channel import MessageType, CHANNEL_INACTIVE, BoardMessage
+from services.notify.channel import MessageType, CHANNEL_INACTIVE, BoardMessage, DeliveryRetry
 
 TG_TEST_USER = 192398802
 
@@ -38,7 +37,8 @@ class TelegramBot(WithLogger):
                 del kwargs['disable_notification']
         return kwargs
 
-    async def send_message(self, chat_id, msg: BoardMessage, **kwargs) -> bool:
+    async def send_message(self, chat_id, msg: BoardMessage, retry_later=False, **kwargs) -> bool:
+        """retry_later: the caller (the delivery queue) sends it again itself, so flood control raises DeliveryRetry"""
         try:
             text = msg.text
             bot = self.bot
@@ -63,10 +63,9 @@ class TelegramBot(WithLogger):
         except exceptions.ChatNotFound:
             self.logger.error(f"Target [ID:{chat_id}]: invalid user ID")
         except exceptions.RetryAfter as e:
-            self.logger.error(f"Target [ID:{chat_id}]: Flood limit is exceeded. Sleep {e.timeout} seconds.")
-            await asyncio.sleep(e.timeout + self.EXTRA_RETRY_DELAY)
-            # Recursive call
-            return await self.send_message(chat_id, msg, **kwargs)
+            self.logger.error(f"Target [ID:{chat_id}]: Flood limit is exceeded. Retry in {e.timeout} seconds.")
+            if retry_later:
+                raise DeliveryRetry(e.timeout + self.EXTRA_RETRY_DELAY)
         except exceptions.Unauthorized as e:
             self.logger.error(f"Target [ID:{chat_id}]: user is deactivated: {e!r}")
             return CHANNEL_INACTIVE
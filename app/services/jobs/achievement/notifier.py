@@ -19,8 +19,7 @@ class AchievementsNotifier(WithLogger, WithDelegates, INotified):
                 if event:
                     self.logger.info(f'Achievement event occurred {event}!')
 
-                    if await self.cd.can_do():
-                        await self.cd.do()
+                    if await self.cd.try_do():
                         await self.pass_data_to_listeners(event)
                     else:
                         self.logger.warning(f'Cooldown is active. Skipping achievement event {event}')
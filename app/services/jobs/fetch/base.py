@@ -4,13 +4,13 @@ import os
 import random
 import time
 from abc import ABC, abstractmethod
-from collections import deque
-from typing import Dict
+from collections import deque, defaultdict
+from typing import Dict, List, Tuple, Optional
 
 from redis import BusyLoadingError
 
 from services.lib.date_utils import now_ts
-from services.lib.delegates import WithDelegates
+from services.lib.delegates import WithDelegates, EdgeStats
 from services.lib.depcont import DepContainer
 from services.lib.utils import WithLogger
 
@@ -39,11 +39,47 @@ def qualname(obj):
     return obj.__class__.__qualname__
 
 
+def find_emitters(roots) -> List[WithDelegates]:
+    """All the nodes of the graph that can have listeners, reachable from the roots"""
+    results, seen = [], set()
+    queue = list(roots)
+    while queue:
+        node = queue.pop(0)
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, WithDelegates):
+            results.append(node)
+            queue.extend(node.delegates)
+    return results
+
+
+class FanOutPolicy:
+    """The fan-out mode of the whole graph. It sticks to the emitters, so the listeners wired later get it too."""
+
+    def __init__(self, concurrent: bool, timeout: Optional[float] = None):
+        self.concurrent = concurrent
+        self.timeout = timeout  # None = keep as is, 0 = no limit
+
+    def apply(self, root):
+        """To the root and all the emitters below it"""
+        for emitter in find_emitters([root]):
+            emitter.fan_out_policy = self
+            emitter.set_fan_out(self.concurrent, self.timeout)
+
+    def apply_to_edge(self, emitter: WithDelegates, listener):
+        if self.timeout is not None:
+            emitter.edge_stats_for(listener).timeout = self.timeout or None
+        if isinstance(listener, WithDelegates) and listener.fan_out_policy is not self:
+            self.apply(listener)
+
+
 class DataController(WithLogger):
     def __init__(self):
         super().__init__()
         self._tracker = {}
         self._all_paused = False
+        self.fan_out: Optional[FanOutPolicy] = None
 
     @property
     def all_paused(self):
@@ -62,6 +98,8 @@ class DataController(WithLogger):
             return
         name = entity.name
         self._tracker[name] = entity
+        if self.fan_out and isinstance(entity, WithDelegates):
+            self.fan_out.apply(entity)
 
     def unregister(self, entity):
         if not entity:
@@ -72,6 +110,28 @@ class DataController(WithLogger):
     def summary(self) -> Dict[str, WatchedEntity]:
         return self._tracker
 
+    def all_emitters(self) -> List[WithDelegates]:
+        return find_emitters(self._tracker.values())
+
+    def edge_stats(self) -> List[Tuple[str, str, EdgeStats]]:
+        """(emitter name, listener name, stats) for every edge of the graph"""
+        return [
+            (qualname(emitter), qualname(listener), emitter.edge_stats_for(listener))
+            for emitter in self.all_emitters()
+            for listener in emitter.delegates
+        ]
+
+    def slowest_edges(self, n=5, q=95) -> List[Tuple[str, str, EdgeStats]]:
+        edges = [e for e in self.edge_stats() if e[2].latencies]
+        edges.sort(key=lambda e: e[2].percentile(q), reverse=True)
+        return edges[:n]
+
+    def set_fan_out(self, concurrent: bool, timeout: Optional[float] = None):
+        self.fan_out = FanOutPolicy(concurrent, timeout)
+        for entity in self._tracker.values():
+            if isinstance(entity, WithDelegates):
+                self.fan_out.apply(entity)
+
 
 class GraphBuilder:
     def __init__(self, tracker: dict):
@@ -95,8 +155,27 @@ class GraphBuilder:
 
         return results
 
+    def edge_labels(self) -> Dict[Tuple[str, str], str]:
+        """(emitter name, listener name) -> timing annotation; edges between the same classes are merged"""
+        stats_by_edge = defaultdict(list)
+        for emitter in find_emitters(self._tracker.values()):
+            for listener in emitter.delegates:
+                stats_by_edge[(qualname(emitter), qualname(listener))].append(emitter.edge_stats_for(listener))
+
+        labels = {}
+        for edge, stats_list in stats_by_edge.items():
+            stats = EdgeStats.merged(stats_list)
+            if not stats.latencies:
+                continue
+            label = f'p50 {stats.percentile(50) * 1000:.1f} ms\\np95 {stats.percentile(95) * 1000:.1f} ms'
+            if stats.errors or stats.timeouts:
+                label += f'\\nerr {stats.errors}, t/o {stats.timeouts}'
+            labels[edge] = label
+        return labels
+
     @staticmethod
-    def make_digraph_dot(list_of_connections):
+    def make_digraph_dot(list_of_connections, edge_labels=None):
+        edge_labels = edge_labels or {}
         dot_code = (
             "digraph G {\n"
             "  layout=fdp;\n"
@@ -107,15 +186,18 @@ class GraphBuilder:
             if is_root:
                 color = 'green' if is_root else 'black'
                 dot_code += f'    "{node_from}" [fillcolor="{color}"; style="filled"; shape="box"];\n'
-            dot_code += f'    "{node_from}" -> "{node_to}";\n'
+            if label := edge_labels.get((node_from, node_to)):
+                dot_code += f'    "{node_from}" -> "{node_to}" [label="{label}"];\n'
+            else:
+                dot_code += f'    "{node_from}" -> "{node_to}";\n'
 
         dot_code += "}"
         return dot_code
 
-    def save_dot_graph(self, filename):
+    def save_dot_graph(self, filename, with_timings=True):
         with open(filename, 'w') as f:
             connections = self.make_graph()
-            dot_code = self.make_digraph_dot(connections)
+            dot_code = self.make_digraph_dot(connections, self.edge_labels() if with_timings else None)
             f.write(dot_code)
 
     def display_graph(self, out_filename=None):
@@ -200,7 +282,10 @@ class BaseFetcher(WithDelegates, WatchedEntity, ABC, WithLogger):
 
         while True:
             await self.run_once()
-            await asyncio.sleep(self.sleep_period)
+            await self.wait_next_tick()
+
+    async def wait_next_tick(self):
+        await asyncio.sleep(self.sleep_period)
 
     async def run(self):
         try:
@@ -1,11 +1,14 @@
 import asyncio
+import hashlib
+import json
 import random
-from typing import List, NamedTuple
+from typing import List, NamedTuple, FrozenSet, Optional, Dict
 
 from aionode.types import ThorConstants, ThorMimir, ThorMimirVote
 from services.jobs.fetch.base import BaseFetcher
 from services.lib.date_utils import parse_timespan_to_seconds
 from services.lib.depcont import DepContainer
+from services.lib.rate_limit import TokenBucket
 
 
 class MimirTuple(NamedTuple):
@@ -13,18 +16,60 @@ class MimirTuple(NamedTuple):
     mimir: ThorMimir
     node_mimir: dict
     votes: List[ThorMimirVote]
+    changed: FrozenSet[str] = frozenset()  # the parts (see ALL_PARTS) changed since the previous delivery
+
+    CONSTANTS = 'constants'
+    MIMIR = 'mimir'
+    NODE_MIMIR = 'node_mimir'
+    VOTES = 'votes'  # the votes and the set of active nodes, i.e. everything the vote tally depends on
+    ALL_PARTS = frozenset((CONSTANTS, MIMIR, NODE_MIMIR, VOTES))
+
+    def has_changed(self, *parts):
+        return any(part in self.changed for part in parts)
+
+
+def digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
 
 
 class ConstMimirFetcher(BaseFetcher):
     ATTEMPTS = 5
 
     def __init__(self, deps: DepContainer):
-        sleep_period = parse_timespan_to_seconds(deps.cfg.constants.fetch_period)
+        cfg = deps.cfg.get('constants')
+        sleep_period = parse_timespan_to_seconds(cfg.fetch_period)
         super().__init__(deps, sleep_period)
         self.step_sleep = deps.cfg.sleep_step
         self._dbg_new_votes = []
 
-    async def fetch(self) -> MimirTuple:
+        # all 4 queries at once, but no faster than the shared rate limit allows
+        self.concurrent = bool(cfg.get('concurrent', False))
+        rps = float(cfg.get('rate_limit.rps', 2))
+        self.rate_limit = TokenBucket(rps, cfg.as_int('rate_limit.burst', 2)) if rps > 0 else None
+
+        # pass the data to the listeners only if something has changed
+        self.change_only = bool(cfg.get('change_only', False))
+
+        self._digests: Dict[str, str] = {}  # what MimirHolder was built from
+        self._delivered: Dict[str, str] = {}  # what the listeners have seen
+        self.rebuilds = 0
+        self.unchanged_ticks = 0
+
+    async def _query(self, method):
+        if self.rate_limit:
+            await self.rate_limit.acquire()
+        return await method()
+
+    async def _query_concurrently(self):
+        thor = self.deps.thor_connector
+        return await asyncio.gather(
+            self._query(thor.query_constants),
+            self._query(thor.query_mimir),
+            self._query(thor.query_mimir_node_accepted),
+            self._query(thor.query_mimir_votes),
+        )
+
+    async def _query_step_by_step(self):
         thor = self.deps.thor_connector
 
         # step by step
@@ -57,6 +102,24 @@ class ConstMimirFetcher(BaseFetcher):
         # # fixme ------------------------------------
 
         await asyncio.sleep(self.step_sleep)
+        return constants, mimir, node_mimir, votes
+
+    @staticmethod
+    def make_digests(constants: ThorConstants, mimir: ThorMimir, node_mimir: dict, votes: List[ThorMimirVote],
+                     active_nodes) -> Dict[str, str]:
+        active_signers = sorted(n.node_address for n in active_nodes if n.node_address and n.is_active)
+        return {
+            MimirTuple.CONSTANTS: digest(constants.constants),
+            MimirTuple.MIMIR: digest(mimir.constants),
+            MimirTuple.NODE_MIMIR: digest(node_mimir),
+            MimirTuple.VOTES: digest([sorted(map(tuple, votes)), active_signers, len(active_nodes)]),
+        }
+
+    async def fetch(self) -> Optional[MimirTuple]:
+        if self.concurrent:
+            constants, mimir, node_mimir, votes = await self._query_concurrently()
+        else:
+            constants, mimir, node_mimir, votes = await self._query_step_by_step()
 
         votes: List[ThorMimirVote]
         node_mimir: dict
@@ -64,13 +127,27 @@ class ConstMimirFetcher(BaseFetcher):
         if not constants or not mimir or node_mimir is None or votes is None:
             raise FileNotFoundError('failed to get Mimir data from THORNode')
 
-        self.deps.mimir_const_holder.update(
-            constants, mimir, node_mimir, votes,
-            self.deps.node_holder.active_nodes
-        )
+        active_nodes = self.deps.node_holder.active_nodes
+        digests = self.make_digests(constants, mimir, node_mimir, votes, active_nodes)
+
+        if digests != self._digests:
+            self.deps.mimir_const_holder.update(constants, mimir, node_mimir, votes, active_nodes)
+            self._digests = digests
+            self.rebuilds += 1
+        else:
+            self.unchanged_ticks += 1
+
+        changed = frozenset(part for part, d in digests.items() if self._delivered.get(part) != d)
+        if self.delegates:
+            # nobody has seen it yet, if it is a startup tick before the subscription
+            self._delivered = digests
 
         self.logger.info(f'Got {len(constants.constants)} CONST'
                          f', {len(mimir.constants)} MIMIR'
                          f', {len(votes)} votes'
-                         f' and {len(node_mimir)} accepted node mimirs.')
-        return MimirTuple(constants, mimir, node_mimir, votes)
+                         f' and {len(node_mimir)} accepted node mimirs.'
+                         f' Changed: {", ".join(sorted(changed)) or "nothing"}.')
+
+        if self.change_only and not changed:
+            return None
+        return MimirTuple(constants, mimir, node_mimir, votes, changed)
@@ -1,20 +1,20 @@
-import json
-from contextlib import suppress
 from random import random
 from typing import Optional, List, Dict
 
 from redis.asyncio import Redis
 
 from services.jobs.fetch.base import BaseFetcher
+from services.jobs.fetch.pool_state_store import PoolStateStore
+from services.jobs.price_history import POOL_DEPTH_SERIES
 from services.lib.config import Config
-from services.lib.constants import RUNE_SYMBOL_DET, RUNE_SYMBOL_POOL, RUNE_SYMBOL_CEX, THOR_BLOCK_TIME, CACAO_DENOM
-from services.lib.date_utils import parse_timespan_to_seconds, DAY
+from services.lib.constants import RUNE_SYMBOL_DET, RUNE_SYMBOL_POOL, RUNE_SYMBOL_CEX, CACAO_DENOM
+from services.lib.date_utils import parse_timespan_to_seconds
 from services.lib.depcont import DepContainer
 from services.lib.midgard.parser import get_parser_by_network_id
 from services.lib.midgard.urlgen import free_url_gen
 from services.models.pool_info import parse_thor_pools, PoolInfo, PoolInfoMap
 from services.models.price import RuneMarketInfo
-from services.models.time_series import PriceTimeSeries
+from services.models.time_series import PriceTimeSeries, TimeSeries
 
 
 class PoolFetcher(BaseFetcher):
@@ -34,8 +34,11 @@ class PoolFetcher(BaseFetcher):
         self.use_thor_consensus = False
         self.parser = get_parser_by_network_id(self.deps.cfg.network_id)
         self.history_max_points = 200000
-        self._pool_cache_saves = 0
-        self._pool_cache_clear_every = 1000
+        self.state_store = PoolStateStore(
+            deps.db,
+            retention_sec=cfg.as_interval('price.pool_states.retention', '1000d'),
+            concurrency=cfg.as_int('price.pool_states.concurrency', 8),
+        )
 
     async def fetch(self) -> RuneMarketInfo:
         current_pools = await self.reload_global_pools()
@@ -75,28 +78,31 @@ class PoolFetcher(BaseFetcher):
 
         # Pool price fill
         if rune_market_info.pool_rune_price and rune_market_info.pool_rune_price > 0:
-            pool_price_series = PriceTimeSeries(RUNE_SYMBOL_POOL, db)
+            pool_price_series = PriceTimeSeries(RUNE_SYMBOL_POOL, db, max_len=self.history_max_points)
             await pool_price_series.add(price=rune_market_info.pool_rune_price)
-            await pool_price_series.trim_oldest(self.history_max_points)
         else:
             self.logger.error(f'Odd {rune_market_info.pool_rune_price = }')
 
         # CEX price fill
         if rune_market_info.cex_price and rune_market_info.cex_price > 0:
-            cex_price_series = PriceTimeSeries(RUNE_SYMBOL_CEX, db)
+            cex_price_series = PriceTimeSeries(RUNE_SYMBOL_CEX, db, max_len=self.history_max_points)
             await cex_price_series.add(price=rune_market_info.cex_price)
-            await cex_price_series.trim_oldest(self.history_max_points)
         # else:
         #     self.logger.warning(f'Odd {rune_market_info.cex_price = }')
 
         # Deterministic price fill
         if rune_market_info.fair_price and rune_market_info.fair_price > 0:
-            deterministic_price_series = PriceTimeSeries(RUNE_SYMBOL_DET, db)
+            deterministic_price_series = PriceTimeSeries(RUNE_SYMBOL_DET, db, max_len=self.history_max_points)
             await deterministic_price_series.add(price=rune_market_info.fair_price)
-            await deterministic_price_series.trim_oldest(self.history_max_points)
         else:
             self.logger.warning(f'Odd {rune_market_info.fair_price = }')
 
+        # Pool depth fill
+        pooled_cacao = rune_market_info.total_pooled_cacao
+        if pooled_cacao > 0:
+            depth_series = TimeSeries(POOL_DEPTH_SERIES, db, max_len=self.history_max_points)
+            await depth_series.add(cacao=pooled_cacao)
+
     async def _fetch_current_pool_data_from_thornode(self, height=None) -> PoolInfoMap:
         try:
             thor_pools = await self.deps.thor_connector.query_pools(height)
@@ -106,69 +112,42 @@ class PoolFetcher(BaseFetcher):
 
         return {}
 
-    DB_KEY_POOL_INFO_HASH = 'PoolInfo:hashtable_v2'
-
-    async def clear_cache(self, max_age=1000 * DAY):
-        r: Redis = await self.deps.db.get_redis()
-
-        top_block = self.deps.last_block_store.maya
-        if top_block is None or top_block < 1:
-            self.logger.warning(f'Failed to get top block from the store ({top_block = })')
-            return
-
-        min_block = int(max(1, top_block - max_age / THOR_BLOCK_TIME))
-        block_numbers = await r.hkeys(self.DB_KEY_POOL_INFO_HASH)
-
-        cache_size = len(block_numbers)
-        blocks_to_delete = [b for b in block_numbers if int(b) < min_block or int(b) > top_block]
-        self.logger.info(f'Cache size: {cache_size}, entries to delete: {len(blocks_to_delete)}')
-
-        for block_number in blocks_to_delete:
-            await r.hdel(self.DB_KEY_POOL_INFO_HASH, block_number)
-
-        self.logger.info('Cache cleared successfully!')
+    DB_KEY_POOL_INFO_HASH = 'PoolInfo:hashtable_v2'  # legacy: JSON per height in one hash
 
-    async def _save_to_cache(self, r: Redis, subkey, pool_map: PoolInfoMap):
-        j_pools = json.dumps({key: p.as_dict_brief() for key, p in pool_map.items()})
-        await r.hset(self.DB_KEY_POOL_INFO_HASH, str(subkey), j_pools)
-
-        with suppress(Exception):
-            if self._pool_cache_saves % self._pool_cache_clear_every == 0:
-                await self.clear_cache()
-            self._pool_cache_saves += 1
-
-    async def _load_from_cache(self, r: Redis, subkey) -> Optional[PoolInfoMap]:
-        try:
-            cached_item = await r.hget(self.DB_KEY_POOL_INFO_HASH, str(subkey))
-            if cached_item:
-                raw_dict = json.loads(cached_item)
-                pool_map = {k: PoolInfo.from_dict_brief(it) for k, it in raw_dict.items()}
-                if all(p is not None for p in pool_map.values()):
-                    return pool_map
-        except (TypeError, ValueError):
-            self.logger.warning(f'Failed to load PoolInfoMap from the cache ({subkey = })')
-            return
+    @property
+    def _top_block(self):
+        top_block = self.deps.last_block_store.maya if self.deps.last_block_store else None
+        return top_block if top_block and top_block > 0 else None
 
     async def load_pools(self, height=None, caching=True, usd_per_rune=None) -> PoolInfoMap:
         if caching:
-            r: Redis = await self.deps.db.get_redis()
-
             if height is None:
                 # latest
                 pool_map = await self._fetch_current_pool_data_from_thornode()
-                cache_key = self.deps.last_block_store.maya
-                await self._save_to_cache(r, cache_key, pool_map)
+                if self._top_block:
+                    await self.state_store.put(self._top_block, pool_map, self._top_block)
             else:
-                pool_map = await self._load_from_cache(r, height)
+                pool_map = await self.state_store.get(height)
                 if not pool_map:
                     pool_map = await self._fetch_current_pool_data_from_thornode(height)
-                    await self._save_to_cache(r, height, pool_map)
+                    await self.state_store.put(height, pool_map, self._top_block)
         else:
             pool_map = await self._fetch_current_pool_data_from_thornode(height)
 
         self.fill_usd_in_pools(pool_map, usd_per_rune)
         return pool_map
 
+    async def load_pools_at_heights(self, heights, usd_per_rune=None) -> Dict[int, PoolInfoMap]:
+        """
+        Historical pool states for many heights at once: the cached ones in one round trip,
+        the rest from THORNode with bounded concurrency.
+        """
+        results = await self.state_store.prefetch(heights, self._fetch_current_pool_data_from_thornode,
+                                                  self._top_block)
+        for pool_map in results.values():
+            self.fill_usd_in_pools(pool_map, usd_per_rune)
+        return results
+
     @staticmethod
     def fill_usd_in_pools(pool_map: PoolInfoMap, usd_per_rune):
         if pool_map and usd_per_rune:
@@ -176,9 +155,14 @@ class PoolFetcher(BaseFetcher):
                 pool: PoolInfo
                 pool.fill_usd_per_asset(usd_per_rune)
 
-    async def purge_pool_height_cache(self):
+    async def drop_legacy_cache(self):
+        # the old hash may be huge; UNLINK frees it in the background
         r: Redis = await self.deps.db.get_redis()
-        await r.delete(self.DB_KEY_POOL_INFO_HASH)
+        await r.unlink(self.DB_KEY_POOL_INFO_HASH)
+
+    async def purge_pool_height_cache(self):
+        await self.drop_legacy_cache()
+        await self.state_store.clear()
 
     _dbg_flag = 1
 
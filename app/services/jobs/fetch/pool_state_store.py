@@ -0,0 +1,177 @@
+import asyncio
+import dataclasses
+import zlib
+from collections import defaultdict, Counter
+from typing import Dict, Iterable, Optional, Callable, Awaitable
+
+import ujson
+
+from services.lib.constants import THOR_BLOCK_TIME
+from services.lib.date_utils import DAY
+from services.lib.db import DB
+from services.lib.key_registry import delete_by_pattern
+from services.lib.utils import WithLogger
+from services.models.pool_info import PoolInfo, PoolInfoMap
+
+HeightToPools = Dict[int, PoolInfoMap]
+
+
+class PoolStateStore(WithLogger):
+    """
+    Historical pool states (all pools at some block height) in Redis.
+    A snapshot is stored as a compact binary blob: the rows of PoolInfo fields by position (no keys), zlib-compressed.
+    The heights are grouped into buckets, one hash per "bucket_size" blocks. Every bucket has a TTL
+    calculated from its age, so the old states expire with their buckets, nothing is deleted one by one.
+    """
+
+    KEY_PREFIX = 'PoolState:v3'
+    BUCKET_SIZE = 10_000  # blocks, ~14 hours
+    FORMAT = 1  # the first byte of a blob; bump it when the layout changes
+    FIELDS = tuple(f.name for f in dataclasses.fields(PoolInfo))
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, db: DB, retention_sec=1000 * DAY, concurrency=8,
+                 block_time=THOR_BLOCK_TIME, bucket_size=BUCKET_SIZE):
+        super().__init__()
+        self.db = db
+        self.retention_sec = retention_sec
+        self.concurrency = concurrency
+        self.block_time = block_time
+        self.bucket_size = bucket_size
+        self.stats = Counter()  # hits, misses, fetched, saved, errors
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    def bucket_key(self, height):
+        return f'{self.KEY_PREFIX}:{int(height) // self.bucket_size}'
+
+    def bucket_ttl(self, height, top_height=None) -> int:
+        """Seconds left for the bucket of this height: the retention minus the age of its last block"""
+        if not top_height:
+            return int(self.retention_sec)
+        bucket_last_height = (int(height) // self.bucket_size + 1) * self.bucket_size - 1
+        age_sec = max(0, top_height - bucket_last_height) * self.block_time
+        return int(self.retention_sec - age_sec)
+
+    # --- encoding ---
+
+    @classmethod
+    def encode(cls, pool_map: PoolInfoMap) -> bytes:
+        rows = [[getattr(pool, name) for name in cls.FIELDS] for pool in pool_map.values()]
+        return bytes([cls.FORMAT]) + zlib.compress(ujson.dumps(rows).encode(), cls.COMPRESSION_LEVEL)
+
+    @classmethod
+    def decode(cls, blob: bytes) -> Optional[PoolInfoMap]:
+        if not blob or blob[0] != cls.FORMAT:
+            return None
+        rows = ujson.loads(zlib.decompress(blob[1:]))
+        if any(len(row) != len(cls.FIELDS) for row in rows):
+            return None
+        pools = [PoolInfo(*row) for row in rows]
+        return {pool.asset: pool for pool in pools}
+
+    # --- reading and writing ---
+
+    async def get_many(self, heights: Iterable[int]) -> HeightToPools:
+        """All the cached states of these heights in one round trip (HMGET per bucket)"""
+        by_bucket = defaultdict(list)
+        for height in set(int(h) for h in heights):
+            by_bucket[self.bucket_key(height)].append(height)
+        if not by_bucket:
+            return {}
+
+        r = await self.db.get_redis_binary()
+        async with r.pipeline(transaction=False) as pipe:
+            for key, bucket_heights in by_bucket.items():
+                pipe.hmget(key, [str(h) for h in bucket_heights])
+            replies = await pipe.execute()
+
+        results = {}
+        for bucket_heights, blobs in zip(by_bucket.values(), replies):
+            for height, blob in zip(bucket_heights, blobs):
+                if not blob:
+                    continue
+                try:
+                    pool_map = self.decode(blob)
+                except (zlib.error, ValueError, TypeError):
+                    pool_map = None
+                if pool_map:
+                    results[height] = pool_map
+                else:
+                    self.stats['errors'] += 1
+                    self.logger.warning(f'Failed to decode the pool state at #{height}')
+        return results
+
+    async def get(self, height: int) -> Optional[PoolInfoMap]:
+        return (await self.get_many([height])).get(int(height))
+
+    async def put_many(self, states: HeightToPools, top_height=None):
+        by_bucket = defaultdict(dict)
+        for height, pool_map in states.items():
+            if pool_map:
+                by_bucket[int(height) // self.bucket_size][str(height)] = self.encode(pool_map)
+        if not by_bucket:
+            return
+
+        r = await self.db.get_redis_binary()
+        async with r.pipeline(transaction=False) as pipe:
+            for bucket, mapping in by_bucket.items():
+                ttl = self.bucket_ttl(bucket * self.bucket_size, top_height)
+                if ttl <= 0:
+                    continue  # too old to be kept anyway
+                key = self.bucket_key(bucket * self.bucket_size)
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, ttl)
+                self.stats['saved'] += len(mapping)
+            await pipe.execute()
+
+    async def put(self, height: int, pool_map: PoolInfoMap, top_height=None):
+        await self.put_many({height: pool_map}, top_height)
+
+    async def prefetch(self, heights: Iterable[int],
+                       fetch: Callable[[int], Awaitable[PoolInfoMap]],
+                       top_height=None) -> HeightToPools:
+        """
+        Returns the states of all the heights. The cached ones are read in bulk,
+        the rest are fetched with "fetch" (no more than "concurrency" at once) and saved.
+        Concurrent calls share the fetches of the same heights.
+        A height that could not be fetched gets an empty dict.
+        """
+        heights = set(int(h) for h in heights)
+        results = await self.get_many(heights)
+        missing = sorted(heights - results.keys())
+        self.stats['hits'] += len(results)
+        self.stats['misses'] += len(missing)
+        if not missing:
+            return results
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(height):
+            async with semaphore:
+                return await fetch(height)
+
+        # a height being fetched for another report right now is not requested again
+        tasks, own = [], {}
+        for height in missing:
+            task = self._pending.get(height)
+            if task is None:
+                task = own[height] = self._pending[height] = asyncio.ensure_future(fetch_one(height))
+                task.add_done_callback(lambda _, h=height: self._pending.pop(h, None))
+            tasks.append(task)
+
+        fetched = await asyncio.gather(*tasks)
+        self.stats['fetched'] += len(own)
+
+        fresh = {h: pool_map for h, pool_map in zip(missing, fetched) if pool_map}
+        await self.put_many({h: pool_map for h, pool_map in fresh.items() if h in own}, top_height)
+
+        for height, pool_map in fresh.items():
+            # the caller may modify the pools (e.g. fill the USD prices), the shared ones are copied
+            results[height] = pool_map if height in own else {a: p.copy() for a, p in pool_map.items()}
+        for height in missing:
+            results.setdefault(height, {})
+        return results
+
+    async def clear(self):
+        r = await self.db.get_redis()
+        return await delete_by_pattern(r, f'{self.KEY_PREFIX}:*')
@@ -0,0 +1,138 @@
+import json
+import zlib
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import ujson
+
+from services.lib.date_utils import DAY
+from services.lib.depcont import DepContainer
+from services.lib.midgard.urlgen import free_url_gen
+from services.lib.utils import WithLogger
+
+
+class AddressActionCache(WithLogger):
+    """
+    Raw Midgard actions of an address (of the given types, in one stream), newest first, in Redis.
+    Next time only the pages above the "boundary" height are downloaded: the boundary is the height right after
+    the newest known action or the height of the oldest pending one (it may have changed since then).
+    If the total count that Midgard reports does not match the merged list, everything is downloaded again.
+    """
+
+    KEY_PREFIX = 'LPActions:v1'
+    FORMAT = 1  # the first byte of a blob
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, deps: DepContainer, page_size=50, expire_sec=30 * DAY):
+        super().__init__()
+        self.deps = deps
+        self.page_size = page_size
+        self.expire_sec = int(expire_sec)
+        self.stats = Counter()  # hits, misses, pages, resyncs
+
+    def key(self, address: str, tx_types: List[str]):
+        return f'{self.KEY_PREFIX}:{address}:{",".join(tx_types)}'
+
+    @classmethod
+    def encode(cls, boundary: int, actions: List[dict]) -> bytes:
+        data = ujson.dumps({'boundary': boundary, 'actions': actions}).encode()
+        return bytes([cls.FORMAT]) + zlib.compress(data, cls.COMPRESSION_LEVEL)
+
+    @classmethod
+    def decode(cls, blob: bytes) -> Tuple[int, List[dict]]:
+        if not blob or blob[0] != cls.FORMAT:
+            return 0, []
+        data = ujson.loads(zlib.decompress(blob[1:]))
+        return int(data['boundary']), data['actions']
+
+    @staticmethod
+    def height(action: dict) -> int:
+        return int(action.get('height', 0))
+
+    @classmethod
+    def next_boundary(cls, actions: List[dict]) -> int:
+        pending = [cls.height(a) for a in actions if str(a.get('status', '')).lower() == 'pending']
+        if pending:
+            return min(pending)
+        return max((cls.height(a) for a in actions), default=-1) + 1
+
+    async def load(self, address: str, tx_types: List[str]) -> Tuple[int, List[dict]]:
+        r = await self.deps.db.get_redis_binary()
+        return self.decode(await r.get(self.key(address, tx_types)))
+
+    async def save(self, address: str, tx_types: List[str], boundary: int, actions: List[dict]):
+        r = await self.deps.db.get_redis_binary()
+        await r.set(self.key(address, tx_types), self.encode(boundary, actions), ex=self.expire_sec or None)
+
+    async def clear(self, address: str, tx_types: List[str]):
+        r = await self.deps.db.get_redis_binary()
+        await r.delete(self.key(address, tx_types))
+
+    async def _request_page(self, address, tx_types, page) -> dict:
+        mdg = self.deps.midgard_connector
+        j = await mdg.request(free_url_gen.url_for_tx(page * self.page_size, self.page_size,
+                                                      address=address, tx_type=tx_types))
+        self.stats['pages'] += 1
+        if j == mdg.ERROR_NOT_FOUND:
+            return {}
+        if not isinstance(j, dict):
+            raise FileNotFoundError(f'Failed to load actions of {address} ({tx_types}) from Midgard')
+        return j
+
+    async def fetch(self, address: str, tx_types: List[str]) -> Tuple[List[dict], int]:
+        """
+        All the actions of these types, newest first, and the height below which nothing has changed
+        since the previous call (0 if everything has been downloaded now)
+        """
+        boundary, cached = await self.load(address, tx_types)
+        self.stats['hits' if cached else 'misses'] += 1
+        known = [a for a in cached if self.height(a) < boundary]
+
+        fresh, page, total = [], 0, None
+        while True:
+            j = await self._request_page(address, tx_types, page)
+            if total is None and 'count' in j:
+                total = int(j['count'])
+            actions = j.get('actions') or []
+            fresh.extend(a for a in actions if self.height(a) >= boundary)
+            reached_known = known and any(self.height(a) < boundary for a in actions)
+            if reached_known or len(actions) < self.page_size:
+                break
+            page += 1
+
+        actions = fresh + known
+        if known and total is not None and len(actions) != total:
+            self.logger.warning(f'{address} ({tx_types}): {len(actions)} actions after merging, '
+                                f'but Midgard says {total}. Downloading them all again.')
+            self.stats['resyncs'] += 1
+            await self.clear(address, tx_types)
+            return await self.fetch(address, tx_types)
+
+        await self.save(address, tx_types, self.next_boundary(actions), actions)
+        return actions, (boundary if known else 0)
+
+
+class LPCheckpointStore:
+    """The LP session state of (address, pool filter, pool) after the last report, see PoolSessionState"""
+
+    KEY_PREFIX = 'LPCheckpoint:v1'
+
+    def __init__(self, deps: DepContainer, expire_sec=30 * DAY):
+        self.deps = deps
+        self.expire_sec = int(expire_sec)
+
+    def key(self, address: str, pool_filter: Optional[str], pool: str):
+        return f'{self.KEY_PREFIX}:{address}:{pool_filter or "*"}:{pool}'
+
+    async def load(self, address: str, pool_filter: Optional[str], pool: str) -> Optional[dict]:
+        r = await self.deps.db.get_redis()
+        data = await r.get(self.key(address, pool_filter, pool))
+        try:
+            return json.loads(data) if data else None
+        except ValueError:
+            return None
+
+    async def save(self, address: str, pool_filter: Optional[str], pool: str, checkpoint: dict):
+        r = await self.deps.db.get_redis()
+        # plain json: the floats must come back bit for bit
+        await r.set(self.key(address, pool_filter, pool), json.dumps(checkpoint), ex=self.expire_sec or None)
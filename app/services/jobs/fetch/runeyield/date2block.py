@@ -1,14 +1,109 @@
+from bisect import bisect_left, insort
 from datetime import date, datetime, timedelta
+from typing import List, Tuple, Optional, Iterable, Dict
 
 from redis.asyncio import Redis
 from aionode.types import ThorLastBlock
 
 from services.lib.constants import THOR_BLOCK_TIME
-from services.lib.date_utils import day_to_key, days_ago_noon, date_parse_rfc
+from services.lib.date_utils import day_to_key, days_ago_noon, date_parse_rfc, now_ts, MINUTE
+from services.lib.db import DB
+from services.lib.delegates import INotified
 from services.lib.depcont import DepContainer
 from services.lib.midgard.parser import get_parser_by_network_id
 from services.lib.utils import WithLogger
 
+Anchor = Tuple[float, int]  # (timestamp, block height)
+
+
+def nearest_anchors(anchors: List[Anchor], ts: float) -> Tuple[Optional[Anchor], Optional[Anchor]]:
+    """The last anchor before "ts" and the first one at or after it (the list is sorted)"""
+    i = bisect_left(anchors, (ts,))
+    return (anchors[i - 1] if i > 0 else None), (anchors[i] if i < len(anchors) else None)
+
+
+def interpolate_height(anchors: List[Anchor], ts: float, block_time=THOR_BLOCK_TIME) -> Optional[int]:
+    """
+    Linear interpolation between the nearest anchors around "ts".
+    Outside the known range, it extrapolates from the nearest one with the nominal block time.
+    """
+    left, right = nearest_anchors(anchors, ts)
+    if left and right:
+        (t0, h0), (t1, h1) = left, right
+        height = h0 + (ts - t0) * (h1 - h0) / (t1 - t0) if t1 > t0 else h0
+    elif left:
+        height = left[1] + (ts - left[0]) / block_time
+    elif right:
+        height = right[1] - (right[0] - ts) / block_time
+    else:
+        return None
+    return max(1, int(round(height)))
+
+
+def block_header_ts(block_info) -> float:
+    """Block time from the Tendermint "block" reply or -1 if there is no such block"""
+    if not block_info or 'result' not in block_info:
+        return -1
+    rfc_time = block_info['result']['block']['header']['time']
+    return date_parse_rfc(rfc_time).timestamp()
+
+
+class BlockAnchorIndex(INotified, WithLogger):
+    """
+    Known (timestamp, block height) points in a Redis sorted set: score = timestamp, member = height.
+    They come from the last block ticks (subscribe it to LastBlockStore) and from the past lookups.
+    A tick arrives later than its block was made, so a tick anchor takes the time from the block header (deps needed).
+    """
+
+    DB_KEY = 'Date2Block:Anchors'
+
+    def __init__(self, db: DB, min_tick_interval=10 * MINUTE, deps: Optional[DepContainer] = None):
+        super().__init__()
+        self.db = db
+        self.deps = deps
+        self.min_tick_interval = min_tick_interval
+        self._last_tick_ts = 0.0
+
+    async def add_many(self, anchors: Iterable[Anchor]):
+        mapping = {str(int(height)): float(ts) for ts, height in anchors if height > 0 and ts > 0}
+        if mapping:
+            r: Redis = await self.db.get_redis()
+            await r.zadd(self.DB_KEY, mapping)
+
+    async def add(self, ts: float, height: int):
+        await self.add_many([(ts, height)])
+
+    async def load(self, ts_min: float, ts_max: float) -> List[Anchor]:
+        """The anchors from ts_min to ts_max and one more on each side, sorted by time"""
+        r: Redis = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.zrevrangebyscore(self.DB_KEY, f'({ts_min}', '-inf', start=0, num=1, withscores=True)
+            pipe.zrangebyscore(self.DB_KEY, ts_min, ts_max, withscores=True)
+            pipe.zrangebyscore(self.DB_KEY, f'({ts_max}', '+inf', start=0, num=1, withscores=True)
+            replies = await pipe.execute()
+        return sorted((ts, int(height)) for reply in replies for height, ts in reply)
+
+    async def count(self):
+        r: Redis = await self.db.get_redis()
+        return await r.zcard(self.DB_KEY)
+
+    async def clear(self):
+        r: Redis = await self.db.get_redis()
+        await r.delete(self.DB_KEY)
+
+    async def on_data(self, sender, data):
+        # data is the last block height from LastBlockStore
+        height, now = int(data), now_ts()
+        if height <= 0 or now - self._last_tick_ts < self.min_tick_interval:
+            return
+        if not self.deps or not self.deps.thor_connector:
+            return
+
+        self._last_tick_ts = now
+        block_ts = block_header_ts(await self.deps.thor_connector.query_tendermint_block_raw(height))
+        if block_ts > 0:
+            await self.add(block_ts, height)
+
 
 class DateToBlockMapper(WithLogger):
     def __init__(self, deps: DepContainer):
@@ -19,25 +114,26 @@ class DateToBlockMapper(WithLogger):
         self.iterative_algo_max_steps = 10
         self.iterative_algo_tolerance = THOR_BLOCK_TIME * 1.6
 
+        self.anchors = BlockAnchorIndex(deps.db)
+        self.rpc_calls = 0
+        self.lookups = 0
+
     async def get_last_thorchain_block(self) -> int:
         last_blocks = await self.deps.last_block_fetcher.fetch()
         last_block: ThorLastBlock = list(last_blocks.values())[0]
         return last_block.thorchain
 
     async def get_timestamp_by_block_height(self, block_height) -> float:
+        self.rpc_calls += 1
         block_info = await self.deps.thor_connector.query_tendermint_block_raw(block_height)
-        if not block_info or 'result' not in block_info:
-            return -1
-
-        rfc_time = block_info['result']['block']['header']['time']
-        dt = date_parse_rfc(rfc_time)
-        return dt.timestamp()
+        return block_header_ts(block_info)
 
     DB_KEY_DATE_TO_BLOCK_MAPPER = 'Date2Block:Thorchain'
 
     async def clear(self):
         r: Redis = await self.deps.db.get_redis()
         await r.delete(self.DB_KEY_DATE_TO_BLOCK_MAPPER)
+        await self.anchors.clear()
 
     async def save_height_to_day_cache(self, day: date, block_height):
         if block_height is not None and block_height > 0:
@@ -83,42 +179,105 @@ class DateToBlockMapper(WithLogger):
 
         return estimated_block_height
 
-    async def calibrate(self, days=14, overwrite=False):
-        last_block = await self.get_last_thorchain_block()
-
-        today_beginning = days_ago_noon(0, hour=0)
-
-        blocks = []
-
-        for day_ago in range(days):
-            that_day = today_beginning - timedelta(days=day_ago)
+    async def _resolve_timestamp(self, anchors: List[Anchor], ts: float, new_anchors: List[Anchor]) -> int:
+        """
+        Interpolation search: the guess between the nearest anchors is verified by RPC,
+        the answer becomes an anchor and narrows the next guess.
+        With the anchors every few minutes (see BlockAnchorIndex), it takes 0-2 RPC calls.
+        """
+        tolerance = self.iterative_algo_tolerance
+        for step in range(self.iterative_algo_max_steps):
+            left, right = nearest_anchors(anchors, ts)
+            for anchor in (left, right):
+                if anchor and abs(anchor[0] - ts) <= tolerance:
+                    return anchor[1]
+            if left and right and right[1] - left[1] <= 1:
+                return left[1]  # no block in between (e.g. the chain was halted)
+
+            if step % 2 and left and right:
+                # every other step is a bisection: the interpolation alone crawls if the block time has jumped
+                guess = (left[1] + right[1]) // 2
+            else:
+                guess = interpolate_height(anchors, ts)
+            # always step inside the bracket
+            if left:
+                guess = max(guess, left[1] + 1)
+            if right:
+                guess = min(guess, right[1] - 1)
+            guess_ts = await self.get_timestamp_by_block_height(guess)
+            if guess_ts < 0:
+                self.logger.warning(f'Probably there is no block #{guess}.')
+                return guess  # hard fork fallback
+
+            anchor = (guess_ts, guess)
+            insort(anchors, anchor)
+            new_anchors.append(anchor)
+            if abs(guess_ts - ts) <= tolerance or guess == 1:
+                return guess
+
+        return interpolate_height(anchors, ts)
+
+    async def get_block_heights_by_timestamps(self, timestamps: List[float], last_block=None) -> List[int]:
+        """
+        Block heights for many timestamps in one pass: the anchors around them are loaded once,
+        every verified guess helps the next timestamps, and the new anchors are saved at the end.
+        """
+        if not timestamps:
+            return []
+
+        anchors = await self.anchors.load(min(timestamps), max(timestamps))
+        if last_block or not anchors:
+            last_block = last_block or await self.get_last_thorchain_block()
+            insort(anchors, (now_ts(), last_block))
+
+        new_anchors = []
+        results: Dict[float, int] = {}
+        for ts in sorted(set(timestamps)):
+            self.lookups += 1
+            results[ts] = await self._resolve_timestamp(anchors, ts, new_anchors)
+
+        await self.anchors.add_many(new_anchors)
+        return [results[ts] for ts in timestamps]
+
+    @property
+    def rpc_calls_per_lookup(self):
+        return self.rpc_calls / self.lookups if self.lookups else 0.0
+
+    @staticmethod
+    def _day_start_ts(d: date):
+        return datetime(d.year, d.month, d.day).timestamp()
+
+    async def get_block_heights_by_dates(self, dates: List[date], last_block=None) -> List[int]:
+        r: Redis = await self.deps.db.get_redis()
+        unique_dates = list(set(dates))
+        cached = await r.hmget(self.DB_KEY_DATE_TO_BLOCK_MAPPER, [day_to_key(d) for d in unique_dates])
+        results = {d: int(h) for d, h in zip(unique_dates, cached) if h and int(h) > 0}
 
-            if not overwrite:
-                block_no = await self.load_height_from_day_cache(that_day)
-                if block_no is not None:
-                    blocks.append((that_day, block_no))
-                    continue
+        missing = [d for d in unique_dates if d not in results]
+        if missing:
+            heights = await self.get_block_heights_by_timestamps([self._day_start_ts(d) for d in missing],
+                                                                 last_block)
+            results.update(zip(missing, heights))
+            to_save = {day_to_key(d): h for d, h in zip(missing, heights) if h and h > 0}
+            if to_save:
+                await r.hset(self.DB_KEY_DATE_TO_BLOCK_MAPPER, mapping=to_save)
 
-            block_no = await self.iterative_block_discovery_by_timestamp(that_day.timestamp(), last_block,
-                                                                         max_steps=self.iterative_algo_max_steps,
-                                                                         tolerance_sec=self.iterative_algo_tolerance)
-            self.logger.info(f'Writing date2block cache: {day_ago = }, {that_day = }, {block_no = }')
+        return [results[d] for d in dates]
 
-            await self.save_height_to_day_cache(that_day, block_no)
+    async def calibrate(self, days=14, overwrite=False):
+        today_beginning = days_ago_noon(0, hour=0)
+        days = [today_beginning - timedelta(days=day_ago) for day_ago in range(days)]
 
-            blocks.append((that_day, block_no))
+        if overwrite:
+            heights = await self.get_block_heights_by_timestamps([d.timestamp() for d in days])
+            for that_day, block_no in zip(days, heights):
+                self.logger.info(f'Writing date2block cache: {that_day = }, {block_no = }')
+                await self.save_height_to_day_cache(that_day, block_no)
+        else:
+            heights = await self.get_block_heights_by_dates([d.date() for d in days])
 
-        return blocks
+        return list(zip(days, heights))
 
     async def get_block_height_by_date(self, d: date, last_block=None) -> int:
-        cached_block = await self.load_height_from_day_cache(d)
-        if cached_block is not None and cached_block > 0:
-            return cached_block
-
-        that_date = datetime(d.year, d.month, d.day)
-        block = await self.iterative_block_discovery_by_timestamp(that_date.timestamp(), last_block=last_block,
-                                                                  max_steps=self.iterative_algo_max_steps,
-                                                                  tolerance_sec=self.iterative_algo_tolerance)
-
-        await self.save_height_to_day_cache(d, block)
-        return block
+        heights = await self.get_block_heights_by_dates([d], last_block)
+        return heights[0]
@@ -2,9 +2,11 @@ import asyncio
 import datetime
 import operator
 from collections import defaultdict, Counter
+from dataclasses import dataclass, field, asdict
 from typing import List, Tuple, Dict, Optional
 
 from services.jobs.fetch.runeyield import AsgardConsumerConnectorBase
+from services.jobs.fetch.runeyield.action_cache import AddressActionCache, LPCheckpointStore
 from services.jobs.fetch.runeyield.base import YieldSummary
 from services.jobs.fetch.runeyield.date2block import DateToBlockMapper
 from services.jobs.fetch.tx import TxFetcher
@@ -14,7 +16,6 @@ from services.lib.depcont import DepContainer
 from services.lib.midgard.parser import get_parser_by_network_id
 from services.lib.midgard.urlgen import free_url_gen
 from services.lib.money import Asset
-from services.lib.utils import pairwise
 from services.models.lp_info import LiquidityPoolReport, CurrentLiquidity, FeeReport, ReturnMetrics, \
     LPDailyGraphPoint, LPDailyChartByPoolDict, ILProtectionReport, LPPosition
 from services.models.pool_info import PoolInfoMap, PoolInfo, pool_share
@@ -28,6 +29,77 @@ DEFAULT_RUNE_PRICE = 1.0  # USD
 BLOCK_ILP_DEPRECATION = 9_450_000
 
 
+@dataclass
+class PoolSessionState:
+    """
+    Everything the report of one pool needs from the user's txs, accumulated tx by tx.
+    It is saved after the report (see LPCheckpointStore), so the next report only processes the new txs.
+    """
+    pool: str
+    is_savings: bool = False
+    tx_count: int = 0
+    last_height: int = 0
+
+    # CurrentLiquidity
+    first_add_ts: int = 0
+    last_add_ts: int = 0
+    rune_added: float = 0.0
+    asset_added: float = 0.0
+    rune_withdrawn: float = 0.0
+    asset_withdrawn: float = 0.0
+    total_added_as_rune: float = 0.0
+    total_added_as_usd: float = 0.0
+    total_added_as_asset: float = 0.0
+    total_withdrawn_as_rune: float = 0.0
+    total_withdrawn_as_usd: float = 0.0
+    total_withdrawn_as_asset: float = 0.0
+    pool_units: int = 0
+
+    # prices at the earliest tx
+    start_height: int = 0
+    usd_per_asset_start: Optional[float] = None
+    usd_per_rune_start: Optional[float] = None
+
+    # sum of the windows between the txs (the last one, up to now, is added in the report)
+    fee_metrics: ReturnMetrics = field(default_factory=ReturnMetrics)
+
+    # IL protection
+    r0: float = 0.0
+    a0: float = 0.0
+    deposit_units: int = 0
+    last_deposit_height: int = -1
+    grandfathered: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, j: dict) -> 'PoolSessionState':
+        return cls(**{
+            **j,
+            'fee_metrics': ReturnMetrics(**j['fee_metrics']),
+        })
+
+    @property
+    def current_liquidity(self) -> CurrentLiquidity:
+        return CurrentLiquidity(
+            pool=self.pool,
+            rune_added=self.rune_added,
+            asset_added=self.asset_added,
+            pool_units=self.pool_units,
+            asset_withdrawn=self.asset_withdrawn,
+            rune_withdrawn=self.rune_withdrawn,
+            total_added_as_asset=self.total_added_as_asset,
+            total_added_as_rune=self.total_added_as_rune,
+            total_added_as_usd=self.total_added_as_usd,
+            total_withdrawn_as_asset=self.total_withdrawn_as_asset,
+            total_withdrawn_as_rune=self.total_withdrawn_as_rune,
+            total_withdrawn_as_usd=self.total_withdrawn_as_usd,
+            first_add_ts=self.first_add_ts,
+            last_add_ts=int(self.last_add_ts),
+        )
+
+
 class HomebrewLPConnector(AsgardConsumerConnectorBase):
     def __init__(self, deps: DepContainer):
         super().__init__(deps)
@@ -40,28 +112,29 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         self.last_block = 0
         self.add_il_protection_to_final_figures = True
 
+        self.action_cache: Optional[AddressActionCache] = None
+        self.checkpoints: Optional[LPCheckpointStore] = None
+        if deps.cfg.get('tx.lp_action_cache.enabled', True):
+            expire_sec = deps.cfg.as_interval('tx.lp_action_cache.expire', '30d')
+            self.action_cache = AddressActionCache(deps, self.tx_fetcher.tx_per_batch, expire_sec)
+            self.checkpoints = LPCheckpointStore(deps, expire_sec)
+        self.stats = Counter()  # checkpoint_hits, checkpoint_misses, txs_processed
+
     async def generate_yield_summary(self, address, pools: List[str]) -> Tuple[dict, List[LiquidityPoolReport]]:
         self.update_fees()
 
-        user_txs = await self._get_user_tx_actions(address)
+        user_txs, unchanged_below = await self._get_user_tx_actions(address)
 
         if not pools:
             pools = await self.get_my_pools(address)
 
-        historic_all_pool_states = await self._fetch_historical_pool_states(user_txs)
+        txs_by_pool = {pool_name: [tx for tx in user_txs if tx.first_pool == pool_name] for pool_name in pools}
+        states, historic_all_pool_states = await self._get_session_states(address, None, txs_by_pool,
+                                                                          unchanged_below)
 
         reports = []
         for pool_name in pools:
-            this_pool_txs = [tx for tx in user_txs if tx.first_pool == pool_name]
-
-            if Asset.from_string(pool_name).is_synth:
-                # Savers position
-                liq_report = await self._get_savers_position(historic_all_pool_states, pool_name, this_pool_txs)
-            else:
-                # Normal liquidity position
-                liq_report = await self._create_lp_report_single(historic_all_pool_states, pool_name, this_pool_txs)
-
-            reports.append(liq_report)
+            reports.append(await self._create_report(historic_all_pool_states, states[pool_name]))
 
         weekly_charts = await self._get_charts(user_txs, days=self.days_for_chart)
         return YieldSummary(reports, weekly_charts)
@@ -69,15 +142,16 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
     async def generate_yield_report_single_pool(self, address, pool_name, user_txs=None) -> LiquidityPoolReport:
         self.update_fees()
 
-        user_txs = await self._get_user_tx_actions(address, pool_name) if not user_txs else user_txs
-        historic_all_pool_states = await self._fetch_historical_pool_states(user_txs)
-
-        if Asset.from_string(pool_name).is_synth:
-            # Savers position
-            return await self._get_savers_position(historic_all_pool_states, pool_name, user_txs)
+        if user_txs:
+            # given from outside: nothing to compare the checkpoint with
+            checkpoint_address, unchanged_below = None, 0
         else:
-            # Normal liquidity position
-            return await self._create_lp_report_single(historic_all_pool_states, pool_name, user_txs)
+            user_txs, unchanged_below = await self._get_user_tx_actions(address, pool_name)
+            checkpoint_address = address
+
+        states, historic_all_pool_states = await self._get_session_states(checkpoint_address, pool_name,
+                                                                          {pool_name: user_txs}, unchanged_below)
+        return await self._create_report(historic_all_pool_states, states[pool_name])
 
     async def get_my_pools(self, address, show_savers=True) -> List[str]:
         mdg = self.deps.midgard_connector
@@ -98,25 +172,26 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         withdraw_fee_rune = self.deps.mimir_const_holder.get_constant(self.KEY_CONST_FEE_OUTBOUND, default=2000000)
         self.withdraw_fee_rune = thor_to_float(int(withdraw_fee_rune))
 
+    async def _create_report(self, historic_all_pool_states: HeightToAllPools,
+                             state: PoolSessionState) -> LiquidityPoolReport:
+        if state.is_savings:
+            # Savers position
+            return await self._get_savers_position(state)
+        else:
+            # Normal liquidity position
+            return await self._create_lp_report_single(historic_all_pool_states, state)
+
     async def _create_lp_report_single(self,
                                        historic_all_pool_states: HeightToAllPools,
-                                       pool_name: str,
-                                       user_txs: List[ThorTx]) -> LiquidityPoolReport:
-        # todo: idea: check date_last_added, if it is not changed - get user_txs from local cache
-        # todo: or you can compare current liq_units! if it has changed, you reload tx! (unsafe)
+                                       state: PoolSessionState) -> LiquidityPoolReport:
+        cur_liq = state.current_liquidity
 
-        cur_liq = self._get_current_liquidity(user_txs, pool_name, historic_all_pool_states,
-                                              withdraw_fee_rune=self.withdraw_fee_rune)
-
-        fees = self._get_fee_report(user_txs, pool_name, historic_all_pool_states)
-
-        usd_per_asset_start, usd_per_rune_start = self._get_earliest_prices(user_txs, historic_all_pool_states)
+        fees = self._get_fee_report(state, historic_all_pool_states)
 
         pool_info = self.deps.price_holder.pool_info_map.get(cur_liq.pool)
 
         protection_report = await self._get_il_report(
-            pool_info, user_txs,
-            historic_all_pool_states,
+            pool_info, state,
             final_my_liq_units=cur_liq.pool_units
         )
 
@@ -130,18 +205,15 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         liq_report = LiquidityPoolReport(
             self.deps.price_holder.usd_per_asset(cur_liq.pool),
             self.deps.price_holder.usd_per_rune,
-            usd_per_asset_start, usd_per_rune_start,
+            state.usd_per_asset_start, state.usd_per_rune_start,
             cur_liq, fees=fees,
             pool=pool_info,
             protection=protection_report
         )
         return liq_report
 
-    async def _get_savers_position(self, historic_all_pool_states, pool, user_txs):
-        cur_liq = self._get_current_liquidity(user_txs, pool, historic_all_pool_states,
-                                              withdraw_fee_rune=self.withdraw_fee_rune,
-                                              is_savings=True)
-        usd_per_asset_start, usd_per_rune_start = self._get_earliest_prices(user_txs, historic_all_pool_states)
+    async def _get_savers_position(self, state: PoolSessionState):
+        cur_liq = state.current_liquidity
 
         l1_pool = Asset.to_L1_pool_name(cur_liq.pool)
         pool_info = self.deps.price_holder.pool_info_map.get(l1_pool)
@@ -149,7 +221,7 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         liq_report = LiquidityPoolReport(
             self.deps.price_holder.usd_per_asset(l1_pool),
             self.deps.price_holder.usd_per_rune,
-            usd_per_asset_start, usd_per_rune_start,
+            state.usd_per_asset_start, state.usd_per_rune_start,
             cur_liq, fees=FeeReport(),
             pool=pool_info,
             protection=ILProtectionReport(),
@@ -183,8 +255,26 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         else:
             return txs
 
-    async def _get_user_tx_actions(self, address: str, pool_filter=None) -> List[ThorTx]:
-        txs = await self.tx_fetcher.fetch_all_tx(address, liquidity_change_only=True)
+    async def _fetch_liquidity_txs(self, address: str) -> Tuple[List[ThorTx], int]:
+        """
+        All add/withdraw txs of the address sorted by height and the height below which they are the same
+        as the last time (0 if unknown)
+        """
+        if not self.action_cache:
+            return await self.tx_fetcher.fetch_all_tx(address, liquidity_change_only=True), 0
+
+        tx_types = free_url_gen.LIQUIDITY_TX_TYPES
+        actions, unchanged_below = await self.action_cache.fetch(address, tx_types)
+
+        # the same order as TxFetcher.fetch_all_tx gives: grouped by type, then sorted by height
+        actions = sorted(actions, key=lambda a: tx_types.index(a['type']) if a.get('type') in tx_types else 0)
+        txs = self.parser.parse_tx_response({'actions': actions}).txs
+        txs.sort(key=operator.attrgetter('height_int'))
+        self.logger.info(f'User {address = } has {len(txs)} tx (unchanged below #{unchanged_below}).')
+        return txs, unchanged_below
+
+    async def _get_user_tx_actions(self, address: str, pool_filter=None) -> Tuple[List[ThorTx], int]:
+        txs, unchanged_below = await self._fetch_liquidity_txs(address)
 
         txs = self._apply_pool_filter(txs, pool_filter)
 
@@ -197,8 +287,9 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             if thor_address:
                 self.logger.info(f'Found THOR address: "{thor_address}" for asset address: "{address}".')
 
-                txs_from_thor_address = await self.tx_fetcher.fetch_all_tx(thor_address, liquidity_change_only=True)
+                txs_from_thor_address, thor_unchanged_below = await self._fetch_liquidity_txs(thor_address)
                 txs_from_thor_address = self._apply_pool_filter(txs_from_thor_address, pool_filter)
+                unchanged_below = min(unchanged_below, thor_unchanged_below)
 
                 old_txs_len = len(txs)
                 new_txs_len = len(txs_from_thor_address)
@@ -223,92 +314,140 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             self.logger.warning(f'[{address}]@[POOL:{pool_filter}] has interrupted session: '
                                 f'{last_session_tx_count} of {full_tx_count} txs will be processed.')
 
-        return txs
+        return txs, unchanged_below
 
-    async def _fetch_historical_pool_states(self, txs: List[ThorTx]) -> HeightToAllPools:
-        heights = list(set(tx.height_int for tx in txs))
-        ppf = self.deps.pool_fetcher
-        tasks = [ppf.load_pools(h, caching=True) for h in heights]
-        pool_states = await asyncio.gather(*tasks)
-        return dict(zip(heights, pool_states))
+    # ------------------------------------------------------------------------------------------------------------------
 
-    def _get_current_liquidity(self, txs: List[ThorTx],
-                               pool_name,
-                               pool_historic: HeightToAllPools,
-                               withdraw_fee_rune,
-                               is_savings=False) -> CurrentLiquidity:
-        first_add_date, last_add_date = 0, 0
-        total_added_as_rune, total_withdrawn_as_rune = 0.0, 0.0
-        total_added_as_usd, total_withdrawn_as_usd = 0.0, 0.0
-        total_added_as_asset, total_withdrawn_as_asset = 0.0, 0.0
+    async def _get_session_states(self, address: Optional[str], pool_filter: Optional[str],
+                                  txs_by_pool: Dict[str, List[ThorTx]],
+                                  unchanged_below: int) -> Tuple[Dict[str, PoolSessionState], HeightToAllPools]:
+        """
+        The states of the pools after all their txs. If there is a valid checkpoint, only the txs after it
+        are processed, so only their pool states are loaded (and the one of the last tx for the fee window).
+        No checkpoints if the address is None.
+        """
+        use_checkpoints = bool(self.checkpoints and address)
+        if use_checkpoints:
+            restored = await asyncio.gather(*(
+                self._restore_session_state(address, pool_filter, pool, txs, unchanged_below)
+                for pool, txs in txs_by_pool.items()
+            ))
+        else:
+            restored = [(self._new_session_state(pool), txs) for pool, txs in txs_by_pool.items()]
+
+        heights = set()
+        for state, new_txs in restored:
+            heights.update(tx.height_int for tx in new_txs)
+            if state.tx_count and not state.is_savings:
+                heights.add(state.last_height)
+        historic_all_pool_states = await self.deps.pool_fetcher.load_pools_at_heights(heights) if heights else {}
+
+        states = {}
+        for (pool, txs), (state, new_txs) in zip(txs_by_pool.items(), restored):
+            if new_txs:
+                self._advance_session_state(state, new_txs, historic_all_pool_states)
+                if use_checkpoints:
+                    await self.checkpoints.save(address, pool_filter, pool, {
+                        'first': str(txs[0].tx_hash),
+                        'last': str(txs[-1].tx_hash),
+                        'count': len(txs),
+                        'fee': self.withdraw_fee_rune,
+                        'state': state.to_dict(),
+                    })
+            states[pool] = state
+        return states, historic_all_pool_states
 
-        asset_added, asset_withdrawn = 0.0, 0.0
-        rune_added, rune_withdrawn = 0.0, 0.0
+    @staticmethod
+    def _new_session_state(pool: str) -> PoolSessionState:
+        return PoolSessionState(pool, is_savings=Asset.from_string(pool).is_synth)
+
+    async def _restore_session_state(self, address, pool_filter, pool, txs: List[ThorTx],
+                                     unchanged_below: int) -> Tuple[PoolSessionState, List[ThorTx]]:
+        """The state from the checkpoint and the txs after it; or an empty state and all the txs"""
+        checkpoint = await self.checkpoints.load(address, pool_filter, pool)
+        if checkpoint:
+            count = int(checkpoint.get('count', 0))
+            if (
+                    0 < count <= len(txs)
+                    and str(txs[0].tx_hash) == checkpoint.get('first')
+                    and str(txs[count - 1].tx_hash) == checkpoint.get('last')
+                    and txs[count - 1].height_int < unchanged_below  # nothing new could appear before it
+                    and checkpoint.get('fee') == self.withdraw_fee_rune
+            ):
+                try:
+                    state = PoolSessionState.from_dict(checkpoint['state'])
+                except (KeyError, TypeError):
+                    self.logger.warning(f'Bad checkpoint of {address} ({pool}).')
+                else:
+                    self.stats['checkpoint_hits'] += 1
+                    return state, txs[count:]
+        self.stats['checkpoint_misses'] += 1
+        return self._new_session_state(pool), txs
 
+    def _advance_session_state(self, state: PoolSessionState, txs: List[ThorTx], pool_historic: HeightToAllPools):
+        """Processes the txs that come after the ones already accounted in the state"""
+        for tx in txs:
+            if not state.tx_count or tx.height_int < state.start_height:
+                state.start_height = tx.height_int
+                state.usd_per_asset_start, state.usd_per_rune_start = self._get_prices_at_tx(tx, pool_historic)
+
+            if not state.is_savings:
+                # these use the units before this tx
+                self._add_fee_window(state, tx, pool_historic)
+                self._update_deposit_values_r0_and_a0(state, tx, pool_historic)
+
+            self._update_current_liquidity(state, tx, pool_historic)
+
+            state.tx_count += 1
+            state.last_height = tx.height_int
+        self.stats['txs_processed'] += len(txs)
+
+    def _update_current_liquidity(self, state: PoolSessionState, tx: ThorTx, pool_historic: HeightToAllPools):
+        pool_name = state.pool
         l1_pool_name = Asset.to_L1_pool_name(pool_name)
 
-        for tx in txs:
-            tx_timestamp = tx.date_timestamp
-            first_add_date = min(first_add_date, tx_timestamp) if first_add_date else tx_timestamp
-            last_add_date = max(last_add_date, tx_timestamp) if last_add_date else tx_timestamp
+        tx_timestamp = tx.date_timestamp
+        state.first_add_ts = min(state.first_add_ts, tx_timestamp) if state.first_add_ts else tx_timestamp
+        state.last_add_ts = max(state.last_add_ts, tx_timestamp) if state.last_add_ts else tx_timestamp
 
-            pools_info: PoolInfoMap = pool_historic[tx.height_int]
-            usd_per_rune = self._calculate_weighted_rune_price_in_usd(pools_info, use_default_price=True)
+        pools_info: PoolInfoMap = pool_historic[tx.height_int]
+        usd_per_rune = self._calculate_weighted_rune_price_in_usd(pools_info, use_default_price=True)
 
-            # fixme: block has final state after all TX settled. this_asset_pool_info may be None!
-            # so this_asset_pool_info is a real object, but 1/1:1 values inside.
-            this_asset_pool_info = self._get_pool(pool_historic, tx.height_int, l1_pool_name)
+        # fixme: block has final state after all TX settled. this_asset_pool_info may be None!
+        # so this_asset_pool_info is a real object, but 1/1:1 values inside.
+        this_asset_pool_info = self._get_pool(pool_historic, tx.height_int, l1_pool_name)
 
-            if tx.type == TxType.ADD_LIQUIDITY:
-                runes = tx.sum_of_rune(in_only=True) if not is_savings else 0
-                assets = tx.sum_of_asset(pool_name, in_only=True)
+        if tx.type == TxType.ADD_LIQUIDITY:
+            runes = tx.sum_of_rune(in_only=True) if not state.is_savings else 0
+            assets = tx.sum_of_asset(pool_name, in_only=True)
 
-                asset_added += assets
-                rune_added += runes
+            state.asset_added += assets
+            state.rune_added += runes
 
-                total_this_runes = runes + this_asset_pool_info.runes_per_asset * assets
+            total_this_runes = runes + this_asset_pool_info.runes_per_asset * assets
 
-                total_added_as_rune += total_this_runes
-                total_added_as_usd += total_this_runes * usd_per_rune
-                total_added_as_asset += assets + this_asset_pool_info.asset_per_rune * runes
+            state.total_added_as_rune += total_this_runes
+            state.total_added_as_usd += total_this_runes * usd_per_rune
+            state.total_added_as_asset += assets + this_asset_pool_info.asset_per_rune * runes
+        else:
+            if state.is_savings:
+                runes = 0
+                assets = tx.sum_of_asset(pool_name, out_only=True) + tx.sum_of_asset(l1_pool_name, out_only=True)
             else:
-                if is_savings:
-                    runes = 0
-                    assets = tx.sum_of_asset(pool_name, out_only=True) + tx.sum_of_asset(l1_pool_name, out_only=True)
-                else:
-                    half_fee = withdraw_fee_rune * 0.5
-                    runes = tx.sum_of_rune(out_only=True) + half_fee
-                    assets = tx.sum_of_asset(pool_name, out_only=True) + half_fee * this_asset_pool_info.asset_per_rune
-
-                asset_withdrawn += assets
-                rune_withdrawn += runes
-
-                total_this_runes = runes + this_asset_pool_info.runes_per_asset * assets
-
-                total_withdrawn_as_rune += total_this_runes
-                total_withdrawn_as_usd += total_this_runes * usd_per_rune
-                total_withdrawn_as_asset += assets + this_asset_pool_info.asset_per_rune * runes
-
-        liquidity_units = final_liquidity(txs)
-
-        results = CurrentLiquidity(
-            pool=pool_name,
-            rune_added=rune_added,
-            asset_added=asset_added,
-            pool_units=liquidity_units,
-            asset_withdrawn=asset_withdrawn,
-            rune_withdrawn=rune_withdrawn,
-            total_added_as_asset=total_added_as_asset,
-            total_added_as_rune=total_added_as_rune,
-            total_added_as_usd=total_added_as_usd,
-            total_withdrawn_as_asset=total_withdrawn_as_asset,
-            total_withdrawn_as_rune=total_withdrawn_as_rune,
-            total_withdrawn_as_usd=total_withdrawn_as_usd,
-            first_add_ts=first_add_date,
-            last_add_ts=int(last_add_date),
-        )
+                half_fee = self.withdraw_fee_rune * 0.5
+                runes = tx.sum_of_rune(out_only=True) + half_fee
+                assets = tx.sum_of_asset(pool_name, out_only=True) + half_fee * this_asset_pool_info.asset_per_rune
 
-        return results
+            state.asset_withdrawn += assets
+            state.rune_withdrawn += runes
+
+            total_this_runes = runes + this_asset_pool_info.runes_per_asset * assets
+
+            state.total_withdrawn_as_rune += total_this_runes
+            state.total_withdrawn_as_usd += total_this_runes * usd_per_rune
+            state.total_withdrawn_as_asset += assets + this_asset_pool_info.asset_per_rune * runes
+
+        state.pool_units = self._update_units(state.pool_units, tx)
 
     def _calculate_weighted_rune_price_in_usd(self, pool_map: PoolInfoMap, use_default_price=False) -> Optional[float]:
         price = self.deps.price_holder.calculate_rune_price_here(pool_map)
@@ -318,21 +457,13 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             self.logger.warning('No USD price can be extracted. Perhaps USD pools are missing at that point')
             return DEFAULT_RUNE_PRICE  # todo: get rune price somewhere else!
 
-    def _get_earliest_prices(self, txs: List[ThorTx], pool_historic: HeightToAllPools) \
+    def _get_prices_at_tx(self, tx: ThorTx, pool_historic: HeightToAllPools) \
             -> Tuple[Optional[float], Optional[float]]:
-        if not txs:
-            return None, None
-
-        earliest_tx = txs[0]
-        for tx in txs[1:]:
-            if tx.height_int < earliest_tx.height_int:
-                earliest_tx = tx
+        pools = pool_historic.get(tx.height_int)
 
-        earliest_pools = pool_historic.get(earliest_tx.height_int)
+        usd_per_rune = self._calculate_weighted_rune_price_in_usd(pools, use_default_price=True)
 
-        usd_per_rune = self._calculate_weighted_rune_price_in_usd(earliest_pools, use_default_price=True)
-
-        this_pool = earliest_pools.get(Asset.to_L1_pool_name(earliest_tx.first_pool))
+        this_pool = pools.get(Asset.to_L1_pool_name(tx.first_pool))
 
         if this_pool is None:
             return None, None
@@ -363,46 +494,31 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             units += tx.meta_withdraw.liquidity_units_int
         return units
 
-    def _get_fee_report(self,
-                        txs: List[ThorTx],
-                        pool: str,
-                        pool_historic: HeightToAllPools):
+    def _add_fee_window(self, state: PoolSessionState, tx: ThorTx, pool_historic: HeightToAllPools):
+        """The position (same lp units) between the previous tx of the user and this one"""
+        if not state.tx_count:
+            return
 
-        if not txs:
-            return FeeReport(pool)  # empty
-
-        # metrics (fee, imp loss, etc) accumulator
-        return_metrics = ReturnMetrics()
-
-        # pairs of position (same lp units) between each add/withdraw tx of the user
-        position_pairs: List[Tuple[LPPosition, LPPosition]] = []
+        # User quit completely and entered again
+        if state.pool_units <= 0:
+            self.logger.warning(f'{tx.sender_address} completely withdrawn assets. resetting his positions!')
+            state.fee_metrics = ReturnMetrics()
+        else:
+            p0 = self._create_lp_position(state.pool, state.last_height, state.pool_units, pool_historic)
+            p1 = self._create_lp_position(state.pool, tx.height_int, state.pool_units, pool_historic)
+            state.fee_metrics = state.fee_metrics + ReturnMetrics.from_position_window(p0, p1)
 
-        units = 0
-        for tx0, tx1 in pairwise(txs):
-            tx0: ThorTx
-            tx1: ThorTx
-            units = self._update_units(units, tx0)
+    def _get_fee_report(self, state: PoolSessionState, pool_historic: HeightToAllPools):
+        pool = state.pool
 
-            # User quit completely and entered again
-            if units <= 0:
-                self.logger.warning(f'{tx0.sender_address} completely withdrawn assets. resetting his positions!')
-                position_pairs = []
-            else:
-                p0 = self._create_lp_position(pool, tx0.height_int, units, pool_historic)
-                p1 = self._create_lp_position(pool, tx1.height_int, units, pool_historic)
-                position_pairs.append((p0, p1))
+        if not state.tx_count:
+            return FeeReport(pool)  # empty
 
         # add the last window from the latest tx to the present moment
-        last_tx = txs[-1]
-        units = self._update_units(units, last_tx)
-        position_pairs.append((
-            self._create_lp_position(pool, last_tx.height_int, units, pool_historic),
-            self._create_current_lp_position(pool, units)
-        ))
-
-        # collect and accumulate all metrics
-        for p0, p1 in position_pairs:
-            return_metrics += ReturnMetrics.from_position_window(p0, p1)
+        return_metrics = state.fee_metrics + ReturnMetrics.from_position_window(
+            self._create_lp_position(pool, state.last_height, state.pool_units, pool_historic),
+            self._create_current_lp_position(pool, state.pool_units)
+        )
 
         # some aux calculations for FeeReport
         current_pool = self.deps.price_holder.find_pool(pool)
@@ -468,17 +584,25 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             tx_by_pool_map[tx.first_pool].append(tx)
 
         self.last_block = await self.get_last_thorchain_block()
-        results = {}
         now = datetime.datetime.now()
-        ppf = self.deps.pool_fetcher
-        for pool, pool_txs in tx_by_pool_map.items():
-            day_to_units = self._pool_units_by_day(pool_txs, days=days)  # List of (day_no, timestamp, units)
 
+        day_to_units_by_pool = {
+            pool: self._pool_units_by_day(pool_txs, days=days)  # List of (day_no, timestamp, units)
+            for pool, pool_txs in tx_by_pool_map.items()
+        }
+
+        # the days are the same for all pools: find their heights and load all the pool states at once
+        all_days = sorted(set(day for day_to_units in day_to_units_by_pool.values() for day, *_ in day_to_units))
+        heights = await self.block_mapper.get_block_heights_by_dates(
+            [(now - datetime.timedelta(days=day)).date() for day in all_days], self.last_block)
+        day_to_height = dict(zip(all_days, heights))
+        pools_by_height = await self.deps.pool_fetcher.load_pools_at_heights(day_to_height.values())
+
+        results = {}
+        for pool, day_to_units in day_to_units_by_pool.items():
             graph_points = []
             for day, ts, units in day_to_units:
-                that_day = now - datetime.timedelta(days=day)
-                height = await self.block_mapper.get_block_height_by_date(that_day.date(), self.last_block)
-                pools_at_height = await ppf.load_pools(height, caching=True)
+                pools_at_height = pools_by_height.get(day_to_height[day], {})
                 pool_info = pools_at_height.get(pool, None)
 
                 if pool_info:
@@ -494,14 +618,28 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
 
         return results
 
-    @staticmethod
-    def _get_last_deposit_height(txs: List[ThorTx]) -> int:
-        last_deposit_height = -1
-        for tx in txs:
-            if tx.type == TxType.ADD_LIQUIDITY:
-                if last_deposit_height < tx.height_int:
-                    last_deposit_height = tx.height_int
-        return last_deposit_height
+    def _update_deposit_values_r0_and_a0(self, state: PoolSessionState, tx: ThorTx,
+                                         historic_all_pool_states: HeightToAllPools):
+        """
+        r0 = runeDepositValue // the deposit value of the rune received
+        a0 = assetDepositValue // the deposit value of the asset received
+        """
+        if tx.type == TxType.ADD_LIQUIDITY:
+            pool = self._get_pool(historic_all_pool_states, tx.height_int, state.pool)
+            r, a = pool.get_share_rune_and_asset(tx.meta_add.liquidity_units_int)
+            state.r0 += r
+            state.a0 += a
+            state.deposit_units += tx.meta_add.liquidity_units_int
+
+            state.last_deposit_height = max(state.last_deposit_height, tx.height_int)
+            if tx.first_pool == state.pool and tx.height_int >= BLOCK_ILP_DEPRECATION:
+                state.grandfathered = True
+        elif tx.type == TxType.WITHDRAW:
+            delta_units = abs(tx.meta_withdraw.liquidity_units_int)
+            part_ratio = delta_units / state.deposit_units if state.deposit_units else 1.0
+            state.deposit_units -= delta_units
+            state.r0 -= state.r0 * part_ratio
+            state.a0 -= state.a0 * part_ratio
 
     def get_il_protection_progress(self, current_block_height: int, last_deposit_height: int) -> (float, str):
         blocks_protected_full = int(self.deps.mimir_const_holder.get_constant(
@@ -544,55 +682,29 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         coverage = deposit_value - redeem_value
         return max(0.0, coverage)
 
-    def _get_deposit_values_r0_and_a0(self, txs: List[ThorTx],
-                                      historic_all_pool_states: HeightToAllPools,
-                                      pool_name: str) -> (float, float):
-        """
-        r0 = runeDepositValue // the deposit value of the rune received
-        a0 = assetDepositValue // the deposit value of the asset received
-        """
-        r0, a0 = 0.0, 0.0
-        units = 0
-        for tx in txs:
-            if tx.type == TxType.ADD_LIQUIDITY:
-                pool = self._get_pool(historic_all_pool_states, tx.height_int, pool_name)
-                r, a = pool.get_share_rune_and_asset(tx.meta_add.liquidity_units_int)
-                r0 += r
-                a0 += a
-                units += tx.meta_add.liquidity_units_int
-            elif tx.type == TxType.WITHDRAW:
-                delta_units = abs(tx.meta_withdraw.liquidity_units_int)
-                part_ratio = delta_units / units
-                units -= delta_units
-                r0 -= r0 * part_ratio
-                a0 -= a0 * part_ratio
-
-        return r0, a0
-
     @staticmethod
     def _get_pool(historic_all_pool_states: HeightToAllPools, height, pool_name: str) -> PoolInfo:
         pools = historic_all_pool_states.get(int(height), {})
         pool = pools.get(pool_name)
         return pool or PoolInfo(pool_name, 1, 1, 1, PoolInfo.STAGED)
 
-    async def _get_il_report(self, pool: PoolInfo, txs: List[ThorTx],
-                             historic_all_pool_states: HeightToAllPools,
+    async def _get_il_report(self, pool: PoolInfo, state: PoolSessionState,
                              final_my_liq_units: int) -> ILProtectionReport:
         # Explanation: https://gitlab.com/thorchain/thornode/-/issues/794
         last_block = await self.get_last_thorchain_block()
-        last_deposit_height = self._get_last_deposit_height(txs)
+        last_deposit_height = state.last_deposit_height
 
         if last_deposit_height <= 0 and pool.is_enabled:
             return ILProtectionReport(corrected_pool=pool)
 
-        if self.is_lp_grandfathered(txs, pool.asset):
+        if state.grandfathered and pool.asset == state.pool:
             return ILProtectionReport(status=ILProtectionReport.STATUS_DISABLED, corrected_pool=pool)
 
         protection_progress, protection_status = self.get_il_protection_progress(last_block, last_deposit_height)
 
         self.logger.info(f'Protection for "{pool.asset}" is {protection_progress * 100:.1f} % ({protection_status}).')
 
-        r0, a0 = self._get_deposit_values_r0_and_a0(txs, historic_all_pool_states, pool.asset)
+        r0, a0 = state.r0, state.a0
 
         full_imp_loss_rune = self.calculate_imp_loss_v58(pool, final_my_liq_units, r0, a0)
         coverage_rune = full_imp_loss_rune * protection_progress
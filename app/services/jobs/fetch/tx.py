@@ -1,3 +1,5 @@
+import asyncio
+from collections import deque
 from typing import List, Optional
 
 from aiohttp import ContentTypeError
@@ -26,6 +28,7 @@ class TxFetcher(BaseFetcher):
 
         self.tx_per_batch = int(s_cfg.tx_per_batch)
         self.max_page_deep = int(s_cfg.max_page_deep)
+        self.max_concurrent_pages = max(1, int(s_cfg.get('max_concurrent_pages', 1)))
         self.max_age_sec = parse_timespan_to_seconds(s_cfg.max_age)
         self.announce_pending_after_blocks = int(s_cfg.announce_pending_after_blocks)
 
@@ -173,65 +176,92 @@ class TxFetcher(BaseFetcher):
             self.logger.exception(f'Failed to recover old TXs ({e})', stack_info=True)
             return []
 
+    async def _iterate_pages(self):
+        """
+        Yields the pages in order. Up to "max_concurrent_pages" requests are in flight;
+        the Midgard connector's rate limiter keeps them from hitting the server too hard.
+        """
+        in_flight = deque()
+        next_page = 0
+        try:
+            while in_flight or next_page < self.max_page_deep:
+                while next_page < self.max_page_deep and len(in_flight) < self.max_concurrent_pages:
+                    in_flight.append(asyncio.ensure_future(
+                        self._fetch_one_batch_tries(next_page, tries=self.RETRY_COUNT)))
+                    next_page += 1
+                yield await in_flight.popleft()
+        finally:
+            # the caller stopped early: the deeper pages are not needed
+            for task in in_flight:
+                task.cancel()
+
+    def _nothing_new_below(self, results: TxParseResult, seen_flags, txs_after_age_filter) -> bool:
+        """Whether the pages deeper than this one can be skipped"""
+        if results.tx_count_unfiltered < self.tx_per_batch:
+            return True  # the last page
+        if not txs_after_age_filter:
+            return True  # all too old, the deeper pages are even older
+        if not seen_flags or not all(seen_flags) or any(tx.is_pending for tx in results.txs):
+            return False
+        # all successful TXs are seen already, but a TX we saw pending deeper may have finished by now
+        page_min_height = min(tx.height_int for tx in results.txs)
+        return not self.get_pending_hashes_prior_to(page_min_height)
+
     async def _fetch_unseen_txs(self):
         all_txs = []
 
         deepest_block_height = 1_000_000_000_000_000
         top_block_height = 0
 
-        futures = [
-            self._fetch_one_batch_tries(page, tries=self.RETRY_COUNT) for page in range(self.max_page_deep)
-        ]
-
         number_of_pending_txs_this_tick = 0
         cleared_pending_hashes = set()
 
-        # future_tasks = asyncio.as_completed(futures)  # parallel
-        # fixme: as we use 9R servers, we have to run sequential fetching in order to avoid 503 errors
-        future_tasks = futures  # sequential
-
-        for future in future_tasks:
-            # get a batch of TXs
-            results = await future
-
-            if results is None:
-                self.logger.warning('Got None from Midgard. For now, we just skip it.')
-                continue
-
-            # estimate "top_block_height"
-            deepest_block_height, top_block_height = self._estimate_min_max_height(
-                results, deepest_block_height, top_block_height)
-
-            # filter out old really TXs
-            txs = list(self._filter_by_age(results.txs))
-
-            # first, we select only successful TXs
-            selected_txs = [tx for tx in txs if tx.is_success]
-
-            # then handle pending TXs
-            this_batch_pending = [tx for tx in txs if tx.is_pending]
-            self._update_pending_txs_here(this_batch_pending)
-            number_of_pending_txs_this_tick += len(this_batch_pending)
-
-            # TXs which are in pending state for quite a long time deserve to be announced with a corresponding mark
-            pending_old_txs = self._select_old_pending_txs(top_block_height, this_batch_pending)
-            if pending_old_txs:
-                # second, we select additionally OLD enough pending TXs
-                selected_txs += pending_old_txs
-
-            # filter out TXs from "selected_txs" that have been seen already
-            unseen_new_txs = []
-            for tx in selected_txs:
-                is_seen = await self.is_seen(self.get_seen_hash(tx))
-                if not is_seen:
-                    unseen_new_txs.append(tx)
-
-                    # It was previously pending, but now it's successful
-                    if (tx_hash := tx.tx_hash) in self.pending_hash_to_height:
-                        del self.pending_hash_to_height[tx_hash]
-                        cleared_pending_hashes.add(tx_hash)
-
-            all_txs += unseen_new_txs
+        pages = self._iterate_pages()
+        try:
+            async for results in pages:
+                if results is None:
+                    self.logger.warning('Got None from Midgard. For now, we just skip it.')
+                    continue
+
+                # estimate "top_block_height"
+                deepest_block_height, top_block_height = self._estimate_min_max_height(
+                    results, deepest_block_height, top_block_height)
+
+                # filter out old really TXs
+                txs = list(self._filter_by_age(results.txs))
+
+                # first, we select only successful TXs
+                selected_txs = [tx for tx in txs if tx.is_success]
+
+                # then handle pending TXs
+                this_batch_pending = [tx for tx in txs if tx.is_pending]
+                self._update_pending_txs_here(this_batch_pending)
+                number_of_pending_txs_this_tick += len(this_batch_pending)
+
+                # TXs which are in pending state for quite a long time deserve to be announced with a corresponding mark
+                pending_old_txs = self._select_old_pending_txs(top_block_height, this_batch_pending)
+                if pending_old_txs:
+                    # second, we select additionally OLD enough pending TXs
+                    selected_txs += pending_old_txs
+
+                # filter out TXs from "selected_txs" that have been seen already (one query for the whole page)
+                seen_flags = await self.are_seen([self.get_seen_hash(tx) for tx in selected_txs])
+                unseen_new_txs = []
+                for tx, is_seen in zip(selected_txs, seen_flags):
+                    if not is_seen:
+                        unseen_new_txs.append(tx)
+
+                        # It was previously pending, but now it's successful
+                        if (tx_hash := tx.tx_hash) in self.pending_hash_to_height:
+                            del self.pending_hash_to_height[tx_hash]
+                            cleared_pending_hashes.add(tx_hash)
+
+                all_txs += unseen_new_txs
+
+                if self._nothing_new_below(results, seen_flags, txs):
+                    break
+        finally:
+            await pages.aclose()
 
         # Take care of pending TXs that were not seen for a long time
         # extra_txs = await self.try_to_recover_old_txs(deepest_block_height)
@@ -272,6 +302,17 @@ class TxFetcher(BaseFetcher):
         r: Redis = self.deps.db.redis
         return await r.sismember(self.KEY_LAST_SEEN_TX_HASH, tx_hash)
 
+    async def are_seen(self, tx_hashes: List[str]) -> List[bool]:
+        """Bulk version of is_seen: one SMISMEMBER instead of a round trip per hash"""
+        if not tx_hashes:
+            return []
+        real_hashes = [h for h in tx_hashes if h]
+        if not real_hashes:
+            return [True] * len(tx_hashes)
+        r: Redis = self.deps.db.redis
+        flags = iter(await r.smismember(self.KEY_LAST_SEEN_TX_HASH, real_hashes))
+        return [bool(next(flags)) if h else True for h in tx_hashes]
+
     async def mark_tx_hashes_as_seen(self, hashes):
         if hashes:
             r: Redis = await self.deps.db.get_redis()
@@ -0,0 +1,206 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from services.lib.constants import RUNE_SYMBOL_POOL, RUNE_SYMBOL_DET, RUNE_SYMBOL_CEX
+from services.lib.date_utils import DAY, now_ts
+from services.lib.db import DB
+from services.lib.delegates import INotified
+from services.lib.utils import WithLogger
+from services.models.price import RuneMarketInfo
+from services.models.time_series import PriceTimeSeries, TimeSeries
+
+POOL_DEPTH_SERIES = 'PoolDepth'  # total CACAO in the active pools; written by PoolFetcher
+
+
+class PriceHistoryCache(WithLogger, INotified):
+    """
+    Process-local columnar copy of the last days of the CACAO price series (pool, deterministic, CEX)
+    and the total pool depth. One row per PoolFetcher tick, the columns are numpy arrays of fixed capacity,
+    so memory is bounded. Charts and "price N ago" queries slice the arrays instead of reading Redis.
+    On startup, it is filled from the Redis streams ("rebuild").
+    """
+
+    COL_POOL_PRICE = 'pool_price'
+    COL_DET_PRICE = 'det_price'
+    COL_CEX_PRICE = 'cex_price'
+    COL_POOL_DEPTH = 'pool_depth'
+    COLUMNS = (COL_POOL_PRICE, COL_DET_PRICE, COL_CEX_PRICE, COL_POOL_DEPTH)
+
+    # the other series are written within a second of the pool price on the same tick
+    MATCH_TOLERANCE = 30.0  # sec
+
+    def __init__(self, db: DB, max_age=30 * DAY, tick_interval=60.0, capacity=None):
+        super().__init__()
+        self.db = db
+        self.max_age = max_age
+        # 20% extra for irregular ticks; the oldest rows are dropped when it is full
+        self.capacity = capacity or int(max_age / max(1.0, tick_interval) * 1.2) + 1
+        self._ts = np.zeros(self.capacity, dtype=np.float64)
+        self._data = np.full((len(self.COLUMNS), self.capacity), np.nan, dtype=np.float64)
+        self._n = 0
+        self._complete_since = None  # nothing before this time is missing (compared to Redis)
+        self.is_ready = False
+
+    # --- writing ---
+
+    @property
+    def size(self):
+        return self._n
+
+    @property
+    def memory_bytes(self):
+        return self._ts.nbytes + self._data.nbytes
+
+    @property
+    def oldest_ts(self):
+        return float(self._ts[0]) if self._n else None
+
+    def clear(self):
+        self._n = 0
+        self._data.fill(np.nan)
+        self._complete_since = None
+
+    def _make_room(self, n_new):
+        if self._n + n_new <= self.capacity:
+            return
+        n = self._n
+        # drop the outdated rows first, then the oldest ones if it is still not enough
+        start = int(np.searchsorted(self._ts[:n], self._ts[n - 1] - self.max_age, side='left')) if n else 0
+        start = max(start, n + n_new - self.capacity)
+        keep = n - start
+        self._ts[:keep] = self._ts[start:n]
+        self._data[:, :keep] = self._data[:, start:n]
+        self._data[:, keep:] = np.nan
+        self._n = keep
+        if keep and self._complete_since is not None:
+            self._complete_since = max(self._complete_since, float(self._ts[0]))
+
+    def append(self, ts: float, **values):
+        if self._n and ts < self._ts[self._n - 1]:
+            return  # older than the last row: ignore
+        self._make_room(1)
+        i = self._n
+        self._ts[i] = ts
+        for col_index, col in enumerate(self.COLUMNS):
+            value = values.get(col)
+            self._data[col_index, i] = value if value and value > 0 else np.nan
+        self._n += 1
+
+    def append_many(self, ts: np.ndarray, columns: dict):
+        """Rows must be sorted by time and newer than the existing ones"""
+        n_new = min(len(ts), self.capacity)
+        ts = ts[-n_new:]
+        self._make_room(n_new)
+        i = self._n
+        self._ts[i:i + n_new] = ts
+        for col_index, col in enumerate(self.COLUMNS):
+            values = columns.get(col)
+            self._data[col_index, i:i + n_new] = values[-n_new:] if values is not None else np.nan
+        self._n += n_new
+
+    async def on_data(self, sender, rune_market_info: RuneMarketInfo):
+        if not rune_market_info:
+            return
+        self.append(
+            now_ts(),
+            pool_price=rune_market_info.pool_rune_price,
+            det_price=rune_market_info.fair_price,
+            cex_price=rune_market_info.cex_price,
+            pool_depth=rune_market_info.total_pooled_cacao,
+        )
+
+    # --- loading ---
+
+    async def _load_column(self, series: TimeSeries, key, start_ts) -> Tuple[np.ndarray, np.ndarray]:
+        r = await self.db.get_redis()
+        points = await r.xrange(series.stream_name, int(start_ts * 1000), '+')
+        ts = np.array([TimeSeries.get_ts_from_index(index) for index, _ in points], dtype=np.float64)
+        values = np.array([float(d.get(key, 'nan')) for _, d in points], dtype=np.float64)
+        return ts, values
+
+    def _match(self, master_ts: np.ndarray, ts: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Values of another series at the master timestamps (nearest point within the tolerance) or NaN"""
+        result = np.full(len(master_ts), np.nan)
+        if not len(ts) or not len(master_ts):
+            return result
+        idx = np.searchsorted(ts, master_ts)
+        left = np.clip(idx - 1, 0, len(ts) - 1)
+        right = np.clip(idx, 0, len(ts) - 1)
+        nearest = np.where(np.abs(master_ts - ts[left]) <= np.abs(ts[right] - master_ts), left, right)
+        close = np.abs(ts[nearest] - master_ts) <= self.MATCH_TOLERANCE
+        result[close] = values[nearest[close]]
+        return result
+
+    async def rebuild(self):
+        """Fills the cache from the Redis streams; the pool price series gives the timeline"""
+        start_ts = now_ts() - self.max_age
+        master_ts, pool_prices = await self._load_column(
+            PriceTimeSeries(RUNE_SYMBOL_POOL, self.db), PriceTimeSeries.KEY, start_ts)
+
+        columns = {self.COL_POOL_PRICE: pool_prices}
+        for col, series, key in (
+                (self.COL_DET_PRICE, PriceTimeSeries(RUNE_SYMBOL_DET, self.db), PriceTimeSeries.KEY),
+                (self.COL_CEX_PRICE, PriceTimeSeries(RUNE_SYMBOL_CEX, self.db), PriceTimeSeries.KEY),
+                (self.COL_POOL_DEPTH, TimeSeries(POOL_DEPTH_SERIES, self.db), 'cacao'),
+        ):
+            ts, values = await self._load_column(series, key, start_ts - self.MATCH_TOLERANCE)
+            columns[col] = self._match(master_ts, ts, values)
+
+        for values in columns.values():
+            values[~(values > 0)] = np.nan
+
+        self.clear()
+        self._complete_since = start_ts
+        self.append_many(master_ts, columns)
+        self.is_ready = True
+        self.logger.info(f'Loaded {self.size} rows; memory: {self.memory_bytes / 1024 / 1024:.1f} MB.')
+
+    # --- reading ---
+
+    def covers(self, period_sec, now=None) -> bool:
+        """Does the cache have everything that Redis has for the period?"""
+        if not self.is_ready or self._complete_since is None:
+            return False
+        now = now or now_ts()
+        return self._complete_since <= now - period_sec
+
+    def _slice(self, start_ts, end_ts) -> slice:
+        ts = self._ts[:self._n]
+        return slice(int(np.searchsorted(ts, start_ts, side='left')), int(np.searchsorted(ts, end_ts, side='right')))
+
+    def window(self, column, start_ts, end_ts) -> Tuple[np.ndarray, np.ndarray]:
+        """Views (not copies!) of the timestamps and the column's values within [start_ts, end_ts]"""
+        s = self._slice(start_ts, end_ts)
+        return self._ts[s], self._data[self.COLUMNS.index(column), s]
+
+    def average(self, column, start_ts, end_ts) -> Optional[float]:
+        _, values = self.window(column, start_ts, end_ts)
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else None
+
+    def average_ago(self, column, ago_sec, tolerance_sec, now=None) -> Optional[float]:
+        now = now or now_ts()
+        return self.average(column, now - ago_sec - tolerance_sec, now - ago_sec + tolerance_sec)
+
+    def last_values(self, column, period_sec, max_points=1000, now=None) -> List[Tuple[float, float]]:
+        """
+        (ts, value) points for a chart. If there are more than "max_points", they are averaged in equal groups.
+        """
+        now = now or now_ts()
+        ts, values = self.window(column, now - period_sec, now)
+        valid = ~np.isnan(values)
+        ts, values = ts[valid], values[valid]
+
+        n = len(ts)
+        if n > max_points:
+            group = -(-n // max_points)  # ceil
+            cut = n - n % group
+            head_ts = ts[:cut].reshape(-1, group).mean(axis=1)
+            head_values = values[:cut].reshape(-1, group).mean(axis=1)
+            if cut < n:
+                head_ts = np.append(head_ts, ts[cut:].mean())
+                head_values = np.append(head_values, values[cut:].mean())
+            ts, values = head_ts, head_values
+
+        return list(zip(ts.tolist(), values.tolist()))
@@ -0,0 +1,349 @@
+import asyncio
+import mmap
+import os
+import re
+import shutil
+import struct
+import zlib
+from array import array
+from typing import Optional, Dict, Iterable, Tuple
+
+import ujson
+
+from services.lib.utils import WithLogger
+
+
+class BlockArchiveSegment:
+    """
+    One segment covers a fixed range of heights [first_height, first_height + size).
+    Data file: compressed JSON blobs appended one after another.
+    Index file: fixed size records (height, kind, offset, length), appended after the data is written,
+    so a torn write leaves no dangling index entry behind.
+    """
+
+    INDEX_RECORD = struct.Struct('<QBQI')
+
+    def __init__(self, directory: str, first_height: int, size: int, n_kinds: int):
+        self.first_height = first_height
+        self.size = size
+        self.n_kinds = n_kinds
+
+        base = os.path.join(directory, f'seg_{first_height:012d}')
+        self.data_path = base + '.dat'
+        self.index_path = base + '.idx'
+
+        # offset/length per (kind, height - first_height); -1 means "absent"
+        self._offsets = array('q', [-1]) * (size * n_kinds)
+        self._lengths = array('q', [0]) * (size * n_kinds)
+        self.count = 0
+        self.last_height = 0
+
+        self._data_file = None
+        self._index_file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+        self._load_index()
+
+    @property
+    def last_possible_height(self):
+        return self.first_height + self.size - 1
+
+    def _slot(self, height, kind):
+        return kind * self.size + (height - self.first_height)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        rec = self.INDEX_RECORD
+        with open(self.index_path, 'rb') as f:
+            raw = f.read()
+
+        for pos in range(0, len(raw) - rec.size + 1, rec.size):
+            height, kind, offset, length = rec.unpack_from(raw, pos)
+            if offset + length > data_size or kind >= self.n_kinds:
+                continue  # the data has not been flushed completely
+            self._remember(height, kind, offset, length)
+
+    def _remember(self, height, kind, offset, length):
+        slot = self._slot(height, kind)
+        if self._offsets[slot] < 0:
+            self.count += 1
+        self._offsets[slot] = offset
+        self._lengths[slot] = length
+        self.last_height = max(self.last_height, height)
+
+    def has(self, height, kind):
+        return self._offsets[self._slot(height, kind)] >= 0
+
+    def append(self, height, kind, blob: bytes):
+        if self._data_file is None:
+            self._data_file = open(self.data_path, 'ab')
+            self._index_file = open(self.index_path, 'ab')
+
+        offset = self._data_file.seek(0, os.SEEK_END)
+        self._data_file.write(blob)
+        self._data_file.flush()
+
+        self._index_file.write(self.INDEX_RECORD.pack(height, kind, offset, len(blob)))
+        self._index_file.flush()
+
+        self._remember(height, kind, offset, len(blob))
+
+    def read(self, height, kind) -> Optional[bytes]:
+        slot = self._slot(height, kind)
+        offset = self._offsets[slot]
+        if offset < 0:
+            return None
+        length = self._lengths[slot]
+
+        if self._mmap is None or offset + length > len(self._mmap):
+            # the file has grown since the last mapping
+            self._unmap()
+            with open(self.data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._mmap[offset:offset + length]
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def close(self):
+        self._unmap()
+        for f in (self._data_file, self._index_file):
+            if f:
+                f.close()
+        self._data_file = self._index_file = None
+
+    def delete(self):
+        self.close()
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def disk_size(self):
+        return sum(os.path.getsize(p) for p in (self.data_path, self.index_path) if os.path.exists(p))
+
+
+class BlockArchive(WithLogger):
+    """
+    Local persistent storage of raw blocks (block_results and block with txs), append-only.
+    Blocks are split into segments by height; old segments are removed as a whole according to the retention.
+    """
+
+    KIND_RESULTS = 0  # /block_results
+    KIND_TXS = 1  # /block
+    N_KINDS = 2
+
+    DEFAULT_SEGMENT_SIZE = 10_000
+    DEFAULT_COMPRESSION_LEVEL = 6
+
+    SEGMENT_FILE_RE = re.compile(r'^seg_(\d+)\.idx$')
+
+    def __init__(self, path: str, segment_size=DEFAULT_SEGMENT_SIZE, retention_blocks: int = 0,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL, read_only=False):
+        """
+        :param path: directory of the archive
+        :param segment_size: number of heights in one segment file
+        :param retention_blocks: keep only that many last blocks (0 = keep forever)
+        :param compression_level: zlib level
+        :param read_only: do not write and do not prune (e.g. for the tools while the bot is running)
+        """
+        super().__init__()
+        self.path = path
+        self.segment_size = int(segment_size)
+        self.retention_blocks = int(retention_blocks or 0)
+        self.compression_level = compression_level
+        self.read_only = read_only
+        self._segments: Dict[int, BlockArchiveSegment] = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._load_meta()
+        self._open_segments()
+
+    @classmethod
+    def from_config(cls, cfg, read_only=False):
+        """cfg is the "native_scanner.archive" sub-config"""
+        return cls(
+            path=cfg.as_str('path', '../temp/block_archive'),
+            segment_size=cfg.as_int('segment_size', cls.DEFAULT_SEGMENT_SIZE),
+            retention_blocks=cfg.as_int('retention_blocks', 0),
+            compression_level=cfg.as_int('compression_level', cls.DEFAULT_COMPRESSION_LEVEL),
+            read_only=read_only,
+        )
+
+    META_FILE = 'archive.json'
+
+    def _load_meta(self):
+        # the segment size is fixed once the archive is created
+        meta_path = os.path.join(self.path, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = ujson.load(f)
+            stored_size = int(meta.get('segment_size', self.segment_size))
+            if stored_size != self.segment_size:
+                self.logger.warning(f'Archive "{self.path}" has segment size {stored_size}; '
+                                    f'{self.segment_size} is ignored.')
+                self.segment_size = stored_size
+        elif not self.read_only:
+            with open(meta_path, 'w') as f:
+                ujson.dump({'segment_size': self.segment_size}, f)
+
+    def _open_segments(self):
+        for name in os.listdir(self.path):
+            if m := self.SEGMENT_FILE_RE.match(name):
+                first_height = int(m.group(1))
+                self._segments[first_height] = BlockArchiveSegment(self.path, first_height,
+                                                                   self.segment_size, self.N_KINDS)
+        if self._segments:
+            self.logger.info(f'Opened block archive "{self.path}": {len(self._segments)} segments, '
+                             f'heights {self.first_height}..{self.last_height}.')
+
+    def _segment_start(self, height):
+        return height - height % self.segment_size
+
+    def _segment(self, height, create=False) -> Optional[BlockArchiveSegment]:
+        start = self._segment_start(height)
+        segment = self._segments.get(start)
+        if segment is None and create:
+            segment = self._segments[start] = BlockArchiveSegment(self.path, start, self.segment_size, self.N_KINDS)
+        return segment
+
+    # --- raw access ---
+
+    def put(self, height: int, kind: int, data):
+        if self.read_only:
+            raise PermissionError('Block archive is opened read-only')
+        if data is None:
+            return
+        height = int(height)
+        if self.retention_blocks and height < self.last_height - self.retention_blocks:
+            return  # it would be pruned right away
+
+        blob = zlib.compress(ujson.dumps(data).encode(), self.compression_level)
+        self._segment(height, create=True).append(height, kind, blob)
+        self.prune()
+
+    def get(self, height: int, kind: int):
+        segment = self._segment(int(height))
+        if segment is None:
+            return None
+        blob = segment.read(int(height), kind)
+        if blob is None:
+            return None
+        return ujson.loads(zlib.decompress(blob))
+
+    def has(self, height: int, kind: int) -> bool:
+        segment = self._segment(int(height))
+        return segment is not None and segment.has(int(height), kind)
+
+    # --- convenience ---
+
+    def put_block(self, height, block_results_raw, block_txs_raw):
+        self.put(height, self.KIND_RESULTS, block_results_raw)
+        self.put(height, self.KIND_TXS, block_txs_raw)
+
+    def get_block(self, height) -> Tuple[Optional[dict], Optional[dict]]:
+        return self.get(height, self.KIND_RESULTS), self.get(height, self.KIND_TXS)
+
+    def has_block(self, height):
+        return self.has(height, self.KIND_RESULTS) and self.has(height, self.KIND_TXS)
+
+    def iter_blocks(self, start: int = 0, end: int = 0) -> Iterable[Tuple[int, dict, dict]]:
+        """ Yields (height, block_results_raw, block_txs_raw) for complete blocks in [start, end] """
+        start = start or self.first_height
+        end = end or self.last_height
+        for height in range(start, end + 1):
+            if self.has_block(height):
+                yield (height, *self.get_block(height))
+
+    @property
+    def first_height(self):
+        for start in sorted(self._segments):
+            segment = self._segments[start]
+            for height in range(start, start + self.segment_size):
+                if segment.has(height, self.KIND_RESULTS) or segment.has(height, self.KIND_TXS):
+                    return height
+        return 0
+
+    @property
+    def last_height(self):
+        return max((s.last_height for s in self._segments.values()), default=0)
+
+    @property
+    def total_records(self):
+        return sum(s.count for s in self._segments.values())
+
+    @property
+    def disk_size(self):
+        return sum(s.disk_size for s in self._segments.values())
+
+    def prune(self):
+        """ Removes whole segments that are older than the retention """
+        if not self.retention_blocks or self.read_only:
+            return 0
+        threshold = self.last_height - self.retention_blocks
+        old_segments = [s for s in self._segments.values() if s.last_possible_height < threshold]
+        for segment in old_segments:
+            self.logger.info(f'Pruning block archive segment starting at #{segment.first_height}.')
+            segment.delete()
+            del self._segments[segment.first_height]
+        return len(old_segments)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+
+    def clear(self):
+        self.close()
+        self._segments.clear()
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        self._load_meta()
+
+    # --- bulk import ---
+
+    async def import_range(self, thor_connector, start: int, end: int, concurrency=8, skip_existing=True,
+                           on_progress=None):
+        """
+        Downloads blocks [start, end] from the node and stores them in the height order.
+        :return: number of blocks imported
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(height):
+            async with semaphore:
+                return await asyncio.gather(
+                    thor_connector.query_native_block_results_raw(height),
+                    thor_connector.query_tendermint_block_raw(height),
+                )
+
+        heights = [h for h in range(start, end + 1) if not (skip_existing and self.has_block(h))]
+        imported = 0
+
+        # bounded batches keep the memory flat for long ranges
+        batch_size = concurrency * 4
+        for i in range(0, len(heights), batch_size):
+            batch = heights[i:i + batch_size]
+            results = await asyncio.gather(*(fetch(h) for h in batch), return_exceptions=True)
+            for height, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f'Failed to import block #{height}: {result!r}')
+                    continue
+                block_results_raw, block_txs_raw = result
+                if not block_results_raw or not block_txs_raw or 'error' in block_results_raw:
+                    self.logger.warning(f'Block #{height} is not available; skipped.')
+                    continue
+                self.put_block(height, block_results_raw, block_txs_raw)
+                imported += 1
+            if on_progress:
+                on_progress(min(i + batch_size, len(heights)), len(heights))
+
+        return imported
+
+    def __repr__(self):
+        return f'BlockArchive({self.path!r}, {self.first_height}..{self.last_height}, {self.total_records} records)'
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from proto.access import NativeThorTx
+from services.jobs.scanner.block_loader import BlockResult
+from services.lib.utils import WithLogger, safe_get
+
+
+class BlockDecoder(WithLogger):
+    """
+    Decodes raw Tendermint blocks into BlockResult/NativeThorTx outside the asyncio thread.
+    All txs (and end block events) of a block go to the pool as one batch.
+    If the pool is broken or not used, it falls back to the synchronous decoding.
+    """
+
+    MODE_SYNC = 'sync'
+    MODE_THREAD = 'thread'
+    MODE_PROCESS = 'process'
+
+    MODES = (MODE_SYNC, MODE_THREAD, MODE_PROCESS)
+
+    DEFAULT_WORKERS = 2
+    DEFAULT_MIN_ITEMS_TO_OFFLOAD = 4
+
+    def __init__(self, mode=MODE_SYNC, workers=DEFAULT_WORKERS, min_items_to_offload=DEFAULT_MIN_ITEMS_TO_OFFLOAD):
+        super().__init__()
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown decoder mode {mode!r}; expected one of {self.MODES}')
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.min_items_to_offload = min_items_to_offload
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls, cfg):
+        """cfg is the "native_scanner.decoder" sub-config"""
+        return cls(
+            mode=cfg.as_str('mode', cls.MODE_SYNC),
+            workers=cfg.as_int('workers', cls.DEFAULT_WORKERS),
+            min_items_to_offload=cfg.as_int('min_items_to_offload', cls.DEFAULT_MIN_ITEMS_TO_OFFLOAD),
+        )
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        if self._executor is None:
+            if self.mode == self.MODE_THREAD:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='block_decoder')
+            elif self.mode == self.MODE_PROCESS:
+                self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, n_items, func, *args):
+        if self.mode == self.MODE_SYNC or n_items < self.min_items_to_offload:
+            return func(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except BrokenProcessPool as e:
+            self.logger.error(f'Decoder pool is broken ({e!r}). Falling back to the synchronous decoding.')
+            self.close()
+            self.mode = self.MODE_SYNC
+            return func(*args)
+
+    async def load_txs(self, result, block_no) -> Optional[List[NativeThorTx]]:
+        n_items = len(BlockResult.extract_raw_txs(result))
+        return await self._run(n_items, BlockResult.load_txs, result, block_no)
+
+    async def load_block(self, block_results_raw, block_no) -> BlockResult:
+        n_items = len(safe_get(block_results_raw, 'result', 'txs_results') or []) + \
+                  len(safe_get(block_results_raw, 'result', 'end_block_events') or [])
+        return await self._run(n_items, BlockResult.load_block, block_results_raw, block_no)
@@ -108,14 +108,21 @@ class BlockResult:
         except Exception as e:
             logger.error(f'Error decoding tx: {e}')
 
+    @classmethod
+    def decode_txs(cls, raw_txs):
+        # some of them can be None!
+        return [cls._decode_one_tx(raw) for raw in raw_txs]
+
+    @staticmethod
+    def extract_raw_txs(result):
+        return safe_get(result, 'result', 'block', 'data', 'txs') or []
+
     @classmethod
     def load_txs(cls, result, block_no):
         if cls._get_is_error(result, block_no):
             return
 
-        raw_txs = safe_get(result, 'result', 'block', 'data', 'txs') or []
-        # some of them can be None!
-        return [cls._decode_one_tx(raw) for raw in raw_txs]
+        return cls.decode_txs(cls.extract_raw_txs(result))
 
     @classmethod
     def load_block(cls, block_results_raw, block_no):
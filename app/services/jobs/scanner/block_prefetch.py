@@ -0,0 +1,77 @@
+import asyncio
+from typing import Dict, Callable, Awaitable, Optional
+
+from services.lib.utils import WithLogger
+
+
+class BlockPrefetcher(WithLogger):
+    """
+    Keeps a bounded window of block heights being fetched concurrently.
+    Results are handed out strictly by height, so the consumer sees the same order as in sequential mode.
+    """
+
+    def __init__(self, fetch_func: Callable[[int], Awaitable], window: int = 10, max_in_flight: int = 10):
+        super().__init__()
+        assert window >= 1
+        assert max_in_flight >= 1
+        self._fetch_func = fetch_func
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._in_flight = 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def scheduled(self):
+        return len(self._tasks)
+
+    async def limited(self, coro: Awaitable):
+        """Runs one request under the shared limit of concurrent requests"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                return await coro
+            finally:
+                self._in_flight -= 1
+
+    def _schedule(self, start: int, limit: Optional[int] = None):
+        end = start + self.window
+        if limit:
+            # do not ask for the blocks that surely do not exist yet, but always fetch at least "start"
+            end = max(start + 1, min(end, limit + 1))
+
+        for height in range(start, end):
+            if height not in self._tasks:
+                self._tasks[height] = asyncio.create_task(self._fetch_func(height))
+
+    @staticmethod
+    def _discard(task: asyncio.Task):
+        if task.done():
+            if not task.cancelled():
+                # retrieve it to avoid "exception was never retrieved" warnings
+                task.exception()
+        else:
+            task.cancel()
+
+    def _drop_below(self, height: int):
+        for h in [h for h in self._tasks if h < height]:
+            self._discard(self._tasks.pop(h))
+
+    async def get(self, height: int, limit: Optional[int] = None):
+        """
+        Returns the result for the given height and tops up the window ahead of it.
+        If the consumer has jumped forward, stale tasks below the height are cancelled.
+        """
+        self._drop_below(height)
+        self._schedule(height, limit)
+        task = self._tasks.pop(height)
+        return await task
+
+    def cancel(self):
+        for task in self._tasks.values():
+            self._discard(task)
+        self._tasks.clear()
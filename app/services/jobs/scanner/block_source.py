@@ -0,0 +1,82 @@
+import asyncio
+from typing import Optional
+
+from services.lib.date_utils import now_ts
+from services.lib.utils import safe_get
+from services.lib.web_sockets import WSClient
+
+
+class TendermintBlockSource(WSClient):
+    """
+    Subscribes to the "NewBlock" events of the Tendermint websocket and remembers the last announced height.
+    The block scanner waits for them (see "wait") instead of sleeping for a fixed period.
+    It is woken up on reconnection too, to backfill the heights missed while the socket was down.
+    """
+
+    SUBSCRIBE_QUERY = "tm.event='NewBlock'"
+
+    def __init__(self, url, reply_timeout=30.0, ping_timeout=5, sleep_time=3):
+        super().__init__(url, reply_timeout=reply_timeout, ping_timeout=ping_timeout, sleep_time=sleep_time)
+        self.connected = False
+        self.last_height = 0
+        self.last_event_ts = 0.0
+        self.total_events = 0
+        self.total_connections = 0
+        self._new_block = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def url_from_rpc(rpc_url: str) -> str:
+        """https://rpc.host => wss://rpc.host/websocket"""
+        url = rpc_url.rstrip('/')
+        if url.startswith('http'):
+            url = 'ws' + url[len('http'):]
+        return url if url.endswith('/websocket') else f'{url}/websocket'
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.listen_forever())
+        return self
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def on_connected(self):
+        self.connected = True
+        self.total_connections += 1
+        self.logger.info(f'Connected to {self.url}, subscribing to new blocks.')
+        await self.send_message({
+            'jsonrpc': '2.0',
+            'method': 'subscribe',
+            'id': self.total_connections,
+            'params': {'query': self.SUBSCRIBE_QUERY},
+        })
+        self._new_block.set()
+
+    async def on_disconnected(self):
+        if self.connected:
+            self.logger.warning('Disconnected, the scanner falls back to polling.')
+        self.connected = False
+        self._new_block.set()
+
+    async def handle_wss_message(self, reply: dict):
+        height = safe_get(reply, 'result', 'data', 'value', 'block', 'header', 'height')
+        if height is None:
+            return  # subscription confirmation
+
+        height = int(height)
+        if height > self.last_height:
+            self.last_height = height
+            self.last_event_ts = now_ts()
+            self.total_events += 1
+            self._new_block.set()
+
+    async def wait(self, timeout):
+        """Until a new block, a (re)connection/disconnection or the timeout, whatever comes first"""
+        try:
+            await asyncio.wait_for(self._new_block.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._new_block.clear()
@@ -1,12 +1,13 @@
 import json
 from contextlib import suppress
-from typing import Optional
+from typing import Optional, Dict, Iterable
 
 from redis.asyncio import Redis
 
 from services.jobs.scanner.swap_props import SwapProps
 from services.lib.date_utils import DAY
 from services.lib.db import DB
+from services.lib.key_registry import scan_keys, scan_batches
 from services.lib.utils import WithLogger
 
 
@@ -38,37 +39,70 @@ class EventDatabase(WithLogger):
                 return str(v)
 
     async def write_tx_status(self, tx_id, mapping):
-        if mapping:
-            r: Redis = await self.db.get_redis()
-            kwargs = {k: self._convert_type(v) for k, v in mapping.items()}
-
-            key = self.key_to_tx(tx_id)
-
-            await r.hset(key, mapping=kwargs)
-            await r.expire(key, int(self._expiration_sec))
+        await self.write_tx_statuses({tx_id: mapping})
 
     async def write_tx_status_kw(self, tx_id, **kwargs):
         await self.write_tx_status(tx_id, kwargs)
 
+    # --- batch API: one round trip for many tx records ---
+
+    async def read_tx_statuses(self, tx_ids: Iterable[str]) -> Dict[str, Optional[SwapProps]]:
+        tx_ids = list(dict.fromkeys(tx_ids))  # unique, but keep the order
+        if not tx_ids:
+            return {}
+
+        r: Redis = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for tx_id in tx_ids:
+                pipe.hgetall(self.key_to_tx(tx_id))
+            results = await pipe.execute()
+
+        return {
+            tx_id: SwapProps.restore_events_from_tx_status(props)
+            for tx_id, props in zip(tx_ids, results)
+        }
+
+    async def write_tx_statuses(self, mappings: Dict[str, dict], transaction=False):
+        """
+        Writes (merges) fields of many tx records and refreshes their TTL in a single round trip
+        :param mappings: tx_id -> {field: value}
+        :param transaction: wrap everything into MULTI/EXEC
+        """
+        mappings = {tx_id: mapping for tx_id, mapping in mappings.items() if mapping}
+        if not mappings:
+            return
+
+        r: Redis = await self.db.get_redis()
+        expiration_sec = int(self._expiration_sec)
+        async with r.pipeline(transaction=transaction) as pipe:
+            for tx_id, mapping in mappings.items():
+                key = self.key_to_tx(tx_id)
+                pipe.hset(key, mapping={k: self._convert_type(v) for k, v in mapping.items()})
+                pipe.expire(key, expiration_sec)
+            await pipe.execute()
+
     @property
     def all_keys_pattern(self):
         return self.key_to_tx('*')
 
     async def load_all_keys(self):
-        pattern = self.all_keys_pattern
+        # the records expire by themselves, so there is no registry: SCAN, never KEYS
         r: Redis = await self.db.get_redis()
-        keys = await r.keys(pattern)
-        return keys
+        return await scan_keys(r, self.all_keys_pattern)
 
     async def backup(self, filename):
         self.logger.info('Saving a backup')
         r: Redis = await self.db.get_redis()
-        keys = await self.load_all_keys()
 
         local_db = {}
-        for key in keys:
-            props = await r.hgetall(key)
-            local_db[key] = props
+        async for keys in scan_batches(r, self.all_keys_pattern):
+            async with r.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                results = await pipe.execute()
+            for key, props in zip(keys, results):
+                if props:  # might have expired meanwhile
+                    local_db[key] = props
 
         with open(filename, 'w') as f:
             json.dump(local_db, f, indent=4)
@@ -3,7 +3,10 @@ from typing import List, Optional
 
 from proto.access import NativeThorTx
 from services.jobs.fetch.base import BaseFetcher
+from services.jobs.scanner.block_decoder import BlockDecoder
 from services.jobs.scanner.block_loader import BlockResult
+from services.jobs.scanner.block_prefetch import BlockPrefetcher
+from services.jobs.scanner.block_source import TendermintBlockSource
 from services.lib.constants import THOR_BLOCK_TIME
 from services.lib.date_utils import now_ts
 from services.lib.depcont import DepContainer
@@ -15,7 +18,12 @@ class NativeScannerBlock(BaseFetcher):
 
     NAME = 'block_scanner'
 
-    def __init__(self, deps: DepContainer, sleep_period=None, last_block=0, max_attempts=MAX_ATTEMPTS_TO_SKIP_BLOCK):
+    DEFAULT_PREFETCH_WINDOW = 1  # 1 = no prefetch, strictly sequential
+    DEFAULT_MAX_IN_FLIGHT = 8
+
+    def __init__(self, deps: DepContainer, sleep_period=None, last_block=0, max_attempts=MAX_ATTEMPTS_TO_SKIP_BLOCK,
+                 prefetch_window=DEFAULT_PREFETCH_WINDOW, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 decoder: Optional[BlockDecoder] = None, block_source: Optional[TendermintBlockSource] = None):
         sleep_period = sleep_period or THOR_BLOCK_TIME * 0.99
         super().__init__(deps, sleep_period)
         self._last_block = last_block
@@ -29,6 +37,19 @@ class NativeScannerBlock(BaseFetcher):
         # if more time has passed since the last block, we should run aggressive scan
         self._time_tolerance_for_aggressive_scan = THOR_BLOCK_TIME * 1.1  # 6 sec + 10%
 
+        # in aggressive mode the next blocks are fetched concurrently within this window
+        self.prefetch_window = max(1, int(prefetch_window))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._prefetcher: Optional[BlockPrefetcher] = None
+
+        # protobuf decoding may go to a thread/process pool not to block the event loop
+        self.decoder = decoder or BlockDecoder()
+
+        # push mode: new heights come from the websocket; polling is only the fallback while it is down
+        self.block_source = block_source
+        self.push_retry_delay = 0.5  # the announced block is not available yet
+        self.push_safety_timeout = THOR_BLOCK_TIME * 5  # no events for so long: poll anyway
+
     @property
     def last_block_ts(self):
         return self._last_block_ts
@@ -46,6 +67,28 @@ class NativeScannerBlock(BaseFetcher):
         self.logger.warning(f'Last block number manually changed from {self._last_block} to {value}.')
         self._last_block = value
 
+    @property
+    def node_last_block(self):
+        polled = int(self.deps.last_block_store) if self.deps.last_block_store else 0
+        pushed = self.block_source.last_height if self.block_source else 0
+        return max(polled, pushed)
+
+    @property
+    def push_mode(self):
+        return bool(self.block_source and self.block_source.connected)
+
+    @property
+    def blocks_behind(self):
+        """How many blocks the scanner is lagging behind the node's last block (0 if unknown)"""
+        node_last_block = self.node_last_block
+        if not node_last_block or not self._last_block:
+            return 0
+        return max(0, node_last_block - self._last_block)
+
+    @property
+    def prefetch_in_flight(self):
+        return self._prefetcher.in_flight if self._prefetcher else 0
+
     def _on_error(self, reason='', **kwargs):
         self.logger.warning(f'Error fetching block #{self._last_block} ({reason = !r}).')
         self._this_block_attempts += 1
@@ -90,12 +133,16 @@ class NativeScannerBlock(BaseFetcher):
                        last_available=block.last_available_block)
 
     def should_run_aggressive_scan(self):
+        if self.push_mode and self.block_source.last_height > self._last_block:
+            self.logger.info(f'{self.block_source.last_height - self._last_block + 1} announced blocks to fetch.')
+            return True
+
         time_since_last_block = now_ts() - self._last_block_ts
         if time_since_last_block > self._time_tolerance_for_aggressive_scan:
             self.logger.info(f'😡 time_since_last_block = {time_since_last_block:.3f} sec. Run aggressive scan!')
             return True
 
-        lag_behind_node_block = int(self.deps.last_block_store) - self._last_block
+        lag_behind_node_block = self.blocks_behind
         if lag_behind_node_block > 2:
             self.logger.info(f"😡 {lag_behind_node_block = }. Run aggressive scan!")
             return True
@@ -114,12 +161,52 @@ class NativeScannerBlock(BaseFetcher):
 
         aggressive = self.should_run_aggressive_scan()
         if aggressive:
-            self.logger.info('Aggressive scan will be run at this tick.')
+            self.logger.info(f'Aggressive scan will be run at this tick. Behind: {self.blocks_behind} blocks.')
+            if self.prefetch_window > 1 and not self.one_block_per_run:
+                self._prefetcher = BlockPrefetcher(self._fetch_one_block_concurrently,
+                                                   self.prefetch_window, self.max_in_flight)
+
+        try:
+            await self._scan_loop(aggressive)
+        finally:
+            if self._prefetcher:
+                self._prefetcher.cancel()
+                self._prefetcher = None
+
+    async def _run(self):
+        if self.block_source:
+            self.block_source.start()
+        try:
+            await super()._run()
+        finally:
+            if self.block_source:
+                self.block_source.stop()
+
+    async def wait_next_tick(self):
+        source = self.block_source
+        if not source:
+            return await super().wait_next_tick()
+
+        if not source.connected:
+            # polling, but a reconnection wakes it up at once to backfill the missed heights
+            await source.wait(self.sleep_period)
+        elif source.last_height >= self._last_block:
+            # the announced block is not fetched yet: not ready on the node or an error; retry soon
+            await asyncio.sleep(self.sleep_period if self._this_block_attempts else self.push_retry_delay)
+        else:
+            await source.wait(self.push_safety_timeout)
 
+    async def _next_block(self, block_index) -> Optional[BlockResult]:
+        if self._prefetcher:
+            return await self._prefetcher.get(block_index, limit=self.node_last_block)
+        else:
+            return await self.fetch_one_block(block_index)
+
+    async def _scan_loop(self, aggressive):
         while True:
             try:
                 self.logger.info(f'Fetching block #{self._last_block}. Cycle: {self._block_cycle}.')
-                block_result = await self.fetch_one_block(self._last_block)
+                block_result = await self._next_block(self._last_block)
 
                 if block_result is None:
                     self._on_error('None returned')
@@ -179,7 +266,7 @@ class NativeScannerBlock(BaseFetcher):
     async def fetch_block_results(self, block_no) -> Optional[BlockResult]:
         block_results_raw = await self._fetch_block_results_raw(block_no)
         if block_results_raw is not None:
-            block_result = BlockResult.load_block(block_results_raw, block_no)
+            block_result = await self.decoder.load_block(block_results_raw, block_no)
             return block_result
         else:
             self.logger.warning(f'Error fetching block txs results #{block_no}.')
@@ -190,7 +277,7 @@ class NativeScannerBlock(BaseFetcher):
     async def fetch_block_txs(self, block_no) -> Optional[List[NativeThorTx]]:
         result = await self._fetch_block_txs_raw(block_no)
         if result is not None:
-            return BlockResult.load_txs(result, block_no)
+            return await self.decoder.load_txs(result, block_no)
         else:
             self.logger.warning(f'Error fetching block #{block_no}.')
             self.deps.emergency.report(self.NAME, 'Error fetching block', block_no=block_no)
@@ -206,6 +293,25 @@ class NativeScannerBlock(BaseFetcher):
 
         # This is needed to get user intents from the block (Deposits and Sends).
         txs = await self.fetch_block_txs(block_index)
+        return self._combine_block(block_result, txs)
+
+    async def _fetch_one_block_concurrently(self, block_index) -> Optional[BlockResult]:
+        # Both requests go in parallel; used by the prefetcher in the aggressive mode
+        limited = self._prefetcher.limited if self._prefetcher else (lambda c: c)
+        block_result, txs = await asyncio.gather(
+            limited(self.fetch_block_results(block_index)),
+            limited(self.fetch_block_txs(block_index)),
+        )
+        if block_result is None:
+            return
+
+        if block_result.is_error:
+            return block_result
+
+        return self._combine_block(block_result, txs)
+
+    def _combine_block(self, block_result: BlockResult, txs) -> Optional[BlockResult]:
+        block_index = block_result.block_no
         block_result.fill_transactions(txs)
         if block_result.txs is None:
             self.logger.error(f'Failed to get transactions of the block #{block_index}.')
@@ -0,0 +1,212 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.lib.delegates import WithDelegates
+from services.lib.lru import percentile
+from services.lib.utils import WithLogger
+
+
+class RedisOpsCounter:
+    """
+    Counts the traffic of a Redis client (real or fakeredis) by wrapping its methods in place.
+    A round trip is a single command or a pipeline execution; commands include every command of a pipeline.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.round_trips = 0
+        self.commands = 0
+
+        original_execute_command = redis.execute_command
+        original_pipeline = redis.pipeline
+
+        async def execute_command(*args, **options):
+            self.round_trips += 1
+            self.commands += 1
+            return await original_execute_command(*args, **options)
+
+        def pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            original_pipe_execute = pipe.execute
+
+            async def pipe_execute(*e_args, **e_kwargs):
+                self.round_trips += 1
+                self.commands += len(pipe.command_stack)
+                return await original_pipe_execute(*e_args, **e_kwargs)
+
+            pipe.execute = pipe_execute
+            return pipe
+
+        redis.execute_command = execute_command
+        redis.pipeline = pipeline
+
+    def snapshot(self):
+        return self.round_trips, self.commands
+
+
+@dataclass
+class LatencyStats:
+    name: str
+    samples: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def calls(self):
+        return len(self.samples)
+
+    @property
+    def total(self):
+        return sum(self.samples)
+
+    def p(self, q):
+        return percentile(self.samples, q, default=0.0)
+
+
+@dataclass
+class ReplayReport:
+    blocks: int = 0
+    skipped_blocks: int = 0
+    txs: int = 0
+    elapsed: float = 0.0
+    fetch_time: float = 0.0  # reading from the source + decoding
+    redis_round_trips: int = 0
+    redis_commands: int = 0
+    block_latency: LatencyStats = field(default_factory=lambda: LatencyStats('block'))
+    subscribers: Dict[str, LatencyStats] = field(default_factory=dict)
+
+    @property
+    def blocks_per_sec(self):
+        return self.blocks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def redis_round_trips_per_block(self):
+        return self.redis_round_trips / self.blocks if self.blocks else 0.0
+
+    @property
+    def redis_commands_per_block(self):
+        return self.redis_commands / self.blocks if self.blocks else 0.0
+
+    def format(self) -> str:
+        ms = 1000.0
+        lines = [
+            f'Blocks: {self.blocks} (skipped {self.skipped_blocks}), txs: {self.txs}',
+            f'Elapsed: {self.elapsed:.3f} sec, {self.blocks_per_sec:.1f} blocks/sec '
+            f'(fetch & decode {self.fetch_time:.3f} sec)',
+            f'Redis: {self.redis_round_trips_per_block:.2f} round trips/block, '
+            f'{self.redis_commands_per_block:.2f} commands/block',
+            f'Block latency: p50 {self.block_latency.p(50) * ms:.2f} ms, '
+            f'p95 {self.block_latency.p(95) * ms:.2f} ms, p99 {self.block_latency.p(99) * ms:.2f} ms',
+            '',
+            f'{"Subscriber":<40} {"calls":>7} {"errors":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+            f'{"total s":>9}',
+        ]
+        for stats in sorted(self.subscribers.values(), key=lambda s: s.total, reverse=True):
+            lines.append(
+                f'{stats.name:<40} {stats.calls:>7} {stats.errors:>6} {stats.p(50) * ms:>9.2f} '
+                f'{stats.p(95) * ms:>9.2f} {stats.p(99) * ms:>9.2f} {stats.total:>9.3f}'
+            )
+        return '\n'.join(lines)
+
+
+class BlockReplay(WithLogger):
+    """
+    Feeds blocks from an offline scanner (see NativeScannerBlockCached with offline=True)
+    through the real subscriber graph and measures the throughput.
+    Subscriber latencies are inclusive: a node's time contains the time of its own subscribers.
+    """
+
+    def __init__(self, scanner: NativeScannerBlock, redis=None):
+        super().__init__()
+        self.scanner = scanner
+        self.redis_counter = RedisOpsCounter(redis) if redis is not None else None
+        self._stats: Dict[str, LatencyStats] = {}
+        self._instrumented = set()
+
+    @staticmethod
+    def node_name(node, counter: Dict[str, int]):
+        name = node.__class__.__name__
+        counter[name] += 1
+        return name if counter[name] == 1 else f'{name}#{counter[name]}'
+
+    def instrument(self):
+        """ Walks the delegate graph down from the scanner and wraps every on_data with a timer """
+        counter = defaultdict(int)
+        queue = list(self.scanner.delegates)
+        while queue:
+            node = queue.pop(0)
+            if id(node) in self._instrumented:
+                continue
+            self._instrumented.add(id(node))
+            self._wrap(node, self.node_name(node, counter))
+            if isinstance(node, WithDelegates):
+                queue.extend(node.delegates)
+        return self
+
+    def _wrap(self, node, name):
+        stats = self._stats[name] = LatencyStats(name)
+        original_on_data = node.on_data
+
+        async def on_data(sender, data):
+            t0 = time.perf_counter()
+            try:
+                return await original_on_data(sender, data)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.samples.append(time.perf_counter() - t0)
+
+        node.on_data = on_data
+
+    async def run(self, start: int, end: int) -> ReplayReport:
+        """ Replays blocks [start, end] one by one, as the scanner would do it """
+        for stats in self._stats.values():
+            stats.samples.clear()
+            stats.errors = 0
+        report = ReplayReport(subscribers=self._stats)
+        ops_before = self.redis_counter.snapshot() if self.redis_counter else (0, 0)
+
+        t_start = time.perf_counter()
+        for height in range(start, end + 1):
+            t0 = time.perf_counter()
+            block = await self.scanner.fetch_one_block(height)
+            t1 = time.perf_counter()
+            report.fetch_time += t1 - t0
+
+            if block is None or block.is_error:
+                report.skipped_blocks += 1
+                continue
+
+            await self.scanner.pass_data_to_listeners(block)
+            report.block_latency.samples.append(time.perf_counter() - t0)
+            report.blocks += 1
+            report.txs += len(block.txs or [])
+
+        report.elapsed = time.perf_counter() - t_start
+
+        if self.redis_counter:
+            round_trips, commands = self.redis_counter.snapshot()
+            report.redis_round_trips = round_trips - ops_before[0]
+            report.redis_commands = commands - ops_before[1]
+
+        self.logger.info(f'Replay of #{start}..#{end} is done: {report.blocks} blocks, '
+                         f'{report.blocks_per_sec:.1f} blocks/sec.')
+        return report
+
+
+class StubMessenger:
+    """ Pretends to be a messenger bot; only counts the messages """
+
+    def __init__(self):
+        self.sent: Dict[str, int] = defaultdict(int)
+
+    @property
+    def total_sent(self):
+        return sum(self.sent.values())
+
+    async def send_message(self, channel_id, message, **kwargs):
+        self.sent[str(channel_id)] += 1
+        return True
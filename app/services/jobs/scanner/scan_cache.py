@@ -1,34 +1,64 @@
-import ujson
+from typing import Optional
 
+from services.jobs.scanner.block_archive import BlockArchive
 from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.lib.config import SubConfig
 from services.lib.depcont import DepContainer
 
 
 class NativeScannerBlockCached(NativeScannerBlock):
-    DB_KEY_BLOCK = 'tx:scanner:cache:block'
-    DB_KEY_TXS = 'tx:scanner:cache:transactions'
+    """
+    Reads blocks from the local BlockArchive first; missing blocks are fetched from the node and archived.
+    With offline=True the node is never asked (replays, tests).
+    """
 
     def __init__(self, deps: DepContainer,
                  sleep_period=None, last_block=0,
-                 max_attempts=NativeScannerBlock.MAX_ATTEMPTS_TO_SKIP_BLOCK):
-        super().__init__(deps, sleep_period, last_block, max_attempts)
+                 max_attempts=NativeScannerBlock.MAX_ATTEMPTS_TO_SKIP_BLOCK,
+                 archive: Optional[BlockArchive] = None,
+                 offline=False,
+                 **kwargs):
+        super().__init__(deps, sleep_period, last_block, max_attempts, **kwargs)
+        if archive is None:
+            cfg = deps.cfg.get('native_scanner.archive', SubConfig({})) if deps.cfg else SubConfig({})
+            archive = BlockArchive.from_config(cfg)
+        self.archive = archive
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+    async def _fetch_cached(self, block_no, kind, fetch_real):
+        cached_data = self.archive.get(block_no, kind)
+        if cached_data is not None:
+            self.hits += 1
+            return cached_data
+
+        self.misses += 1
+        if self.offline:
+            return self._offline_miss(block_no)
+
+        real_data = await fetch_real(block_no)
+        if real_data and 'error' not in real_data and not self.archive.read_only:
+            self.archive.put(block_no, kind, real_data)
+        return real_data
+
+    def _offline_miss(self, block_no):
+        if block_no > self.archive.last_height:
+            # mimic the node's answer, so the scanner just waits for the next block instead of failing
+            return {'error': {
+                'code': -32603,
+                'message': 'Internal error',
+                'data': f'height {block_no} must be less than or equal to the current blockchain height '
+                        f'{self.archive.last_height}',
+            }}
 
     async def _fetch_block_results_raw(self, block_no):
-        cached_data = await self.deps.db.redis.hget(self.DB_KEY_BLOCK, str(block_no))
-        if cached_data:
-            return ujson.loads(cached_data)
-        else:
-            real_block = await super()._fetch_block_results_raw(block_no)
-            if real_block:
-                await self.deps.db.redis.hset(self.DB_KEY_BLOCK, str(block_no), ujson.dumps(real_block))
-            return real_block
+        return await self._fetch_cached(block_no, BlockArchive.KIND_RESULTS, super()._fetch_block_results_raw)
 
     async def _fetch_block_txs_raw(self, block_no):
-        cached_data = await self.deps.db.redis.hget(self.DB_KEY_TXS, str(block_no))
-        if cached_data:
-            return ujson.loads(cached_data)
-        else:
-            real_block_txs = await super()._fetch_block_txs_raw(block_no)
-            if real_block_txs:
-                await self.deps.db.redis.hset(self.DB_KEY_TXS, str(block_no), ujson.dumps(real_block_txs))
-            return real_block_txs
+        return await self._fetch_cached(block_no, BlockArchive.KIND_TXS, super()._fetch_block_txs_raw)
+
+    async def _fetch_last_block(self):
+        if self.offline:
+            return self.archive.last_height
+        return await super()._fetch_last_block()
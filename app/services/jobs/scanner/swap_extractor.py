@@ -63,12 +63,14 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
     async def register_new_swaps(self, swaps: List[AlertSwapStart], height):
         self.logger.info(f"New swaps {len(swaps)} in block #{height}")
 
+        existing = await self._db.read_tx_statuses(swap.tx_id for swap in swaps)
+
+        new_records = {}
         for swap in swaps:
-            props = await self._db.read_tx_status(swap.tx_id)
-            if not props or not props.attrs.get('status'):
+            props = existing.get(swap.tx_id)
+            if (not props or not props.attrs.get('status')) and swap.tx_id not in new_records:
                 # self.logger.debug(f'Detect new swap: {swap.tx_id} from {swap.from_address} ({swap.memo})')
-                await self._db.write_tx_status_kw(
-                    swap.tx_id,
+                new_records[swap.tx_id] = dict(
                     id=swap.tx_id,
                     status=SwapProps.STATUS_OBSERVED_IN,
                     memo=swap.memo_str,
@@ -90,6 +92,8 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
 
                 self.dbg_start_observed = True
 
+        await self._db.write_tx_statuses(new_records)
+
     @staticmethod
     def suspect_outbound_internal(ev: EventOutbound):
         return ev.out_id == ZERO_HASH and ev.chain == Chains.MAYA
@@ -100,15 +104,16 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
     async def register_swap_events(self, block: BlockResult, interesting_events: List[TypeEventSwapAndOut]):
         # boom = False
 
+        # all events of the block are written at once
+        events_by_tx = defaultdict(dict)
+
         for swap_ev in interesting_events:
             if not swap_ev.tx_id:
                 continue
 
             hash_key = hash_of_string_repr(swap_ev, block.block_no)
 
-            await self._db.write_tx_status(swap_ev.tx_id, {
-                f"ev_{hash_key}": swap_ev.original.to_dict
-            })
+            events_by_tx[swap_ev.tx_id][f"ev_{hash_key}"] = swap_ev.original.to_dict
 
             # --8<-- debugging stuff --8<--
             # if isinstance(swap_ev, EventSwap):
@@ -128,6 +133,8 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
             #         self.dbg_print('Scheduled outbound!\n')
             # --8<-- debugging stuff --8<--
 
+        await self._db.write_tx_statuses(events_by_tx)
+
     @staticmethod
     def get_events_of_interest(block: BlockResult) -> List[TypeEventSwapAndOut]:
         for ev in block.end_block_events:
@@ -157,9 +164,12 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
             if isinstance(ev, (EventOutbound, EventScheduledOutbound)):
                 group_by_in[ev.tx_id].append(ev)
 
+        all_swap_props = await self._db.read_tx_statuses(group_by_in.keys())
+
         results = []
+        given_away_records = {}
         for tx_id, group in group_by_in.items():
-            swap_props = await self._db.read_tx_status(tx_id)
+            swap_props = all_swap_props.get(tx_id)
             if not swap_props:
                 self.logger.warning(f'There are outbounds for tx {tx_id}, but there is no info about its initiation.')
                 continue
@@ -171,10 +181,12 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
             # if no swaps, it is full refund
             if swap_props.has_started and swap_props.has_swaps and swap_props.is_finished and not given_away:
                 # to ignore it in the future
-                await self._db.write_tx_status_kw(tx_id, status=SwapProps.STATUS_GIVEN_AWAY)
+                given_away_records[tx_id] = {'status': SwapProps.STATUS_GIVEN_AWAY}
 
                 results.append(swap_props.build_tx())
 
+        await self._db.write_tx_statuses(given_away_records)
+
         if results:
             self.logger.info(f'Give away {len(results)} Txs.')
 
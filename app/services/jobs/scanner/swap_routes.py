@@ -1,9 +1,9 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import List
 
 from services.lib.db import DB
 from services.lib.delegates import INotified
+from services.lib.key_registry import scan_batches
 from services.lib.logs import WithLogger
 from services.lib.money import pretty_dollar
 from services.models.key_stats_model import SwapRouteEntry
@@ -13,84 +13,134 @@ ROUTE_SEP = '=='
 
 
 class SwapRouteRecorder(WithLogger, INotified):
+    """
+    One pair of sorted sets per day: route -> volume and route -> number of swaps.
+    A day expires by itself "keep_days" after it ends. A query for N days is ZUNIONSTORE into a temporary key,
+    which is cached for a short time, so it takes a constant number of Redis calls whatever N is.
+    """
+
+    UNION_CACHE_TTL = 300  # sec
+
     def __init__(self, db: DB, key_prefix="tx"):
         super().__init__()
+        self.db = db
         self.redis = db.redis
         self.key_prefix = key_prefix
         self.keep_days = 60
-        self.clear_every_ticks = 10
-        self._clear_counter = 0
+        self._migrated = False
 
     @staticmethod
     def _date_format(date):
         return date.strftime('%d.%m.%Y')
 
     def _prefixed_key(self, route, date):
+        """Legacy: a hash per route and day"""
         return f"{self.key_prefix}:route:{route}:{self._date_format(date)}"
 
-    async def store_swap_event(self, from_asset, to_asset, volume, dt: datetime):
-        if volume <= 0:
-            return
-
-        route = f"{from_asset}{ROUTE_SEP}{to_asset}"
-        key = self._prefixed_key(route, dt)
-        await self.redis.hincrbyfloat(key, "volume", volume)
-        self.logger.debug(f"Stored swap event: {route} {pretty_dollar(volume)} at {dt}")
-
-    async def get_top_swap_routes_by_volume(self, days=7, top_n=3) -> List[SwapRouteEntry]:
-        end_time = datetime.now()
-        start_time = end_time - timedelta(days=days)
-        date_range = [start_time + timedelta(days=i) for i in range(days + 1)]
-
-        route_volume = defaultdict(float)
+    def key_day_volume(self, date):
+        return f"{self.key_prefix}:routes:volume:{self._date_format(date)}"
 
-        key_start_pos = len(self.key_prefix) + 1
+    def key_day_count(self, date):
+        return f"{self.key_prefix}:routes:count:{self._date_format(date)}"
 
-        for date in date_range:
-            keys = await self.redis.keys(self._prefixed_key('*', date))
+    def _keys_union(self, days, end_date):
+        suffix = f"{days}:{self._date_format(end_date)}"
+        return f"{self.key_prefix}:routes:top-volume:{suffix}", f"{self.key_prefix}:routes:top-count:{suffix}"
 
-            for key in keys:
-                route = key[key_start_pos:].split(':')[1]
-                volume = float(await self.redis.hget(key, "volume") or 0)
+    @property
+    def key_migrated(self):
+        return f"{self.key_prefix}:routes:migrated"
 
-                from_asset, to_asset = route.split(ROUTE_SEP)
-                route_volume[(from_asset, to_asset)] += volume
+    def _expire_at(self, date) -> int:
+        day_start = datetime(date.year, date.month, date.day, tzinfo=timezone.utc)
+        return int((day_start + timedelta(days=self.keep_days + 1)).timestamp())
 
-        # Get the top N routes by volume
-        top_routes = sorted(route_volume.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    def _add_in(self, pipe, route, volume, count, date):
+        key_volume, key_count = self.key_day_volume(date), self.key_day_count(date)
+        pipe.zincrby(key_volume, volume, route)
+        pipe.zincrby(key_count, count, route)
+        expire_at = self._expire_at(date)
+        pipe.expireat(key_volume, expire_at)
+        pipe.expireat(key_count, expire_at)
 
-        # convert to SwapRouteEntry
-        top_routes = [
-            SwapRouteEntry(from_asset=from_asset, to_asset=to_asset, volume_cacao=volume)
-            for (from_asset, to_asset), volume in top_routes
-        ]
+    async def store_swap_event(self, from_asset, to_asset, volume, dt: datetime):
+        if volume <= 0:
+            return
 
-        return top_routes
+        route = f"{from_asset}{ROUTE_SEP}{to_asset}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._add_in(pipe, route, volume, 1, dt)
+            await pipe.execute()
+        self.logger.debug(f"Stored swap event: {route} {pretty_dollar(volume)} at {dt}")
 
-    async def clear_old_events(self, days, look_back=90):
-        cutoff_time = datetime.now() - timedelta(days=days)
-        fail_count = 0
-        total_deleted = 0
-        while True:
-            keys = await self.redis.keys(self._prefixed_key('*', cutoff_time))
-            if keys:
-                await self.redis.delete(*keys)
-                total_deleted += len(keys)
-            else:
-                fail_count += 1
-                if fail_count > look_back:
-                    break
+    async def migrate_legacy_routes(self):
+        """
+        Moves the old per-route hashes into the daily sorted sets. It runs once (SCAN, not KEYS).
+        The old format has no swap count, so every old route-day counts as one swap.
+        """
+        if await self.redis.exists(self.key_migrated):
+            self._migrated = True
+            return
 
-            cutoff_time -= timedelta(days=1)
+        moved = 0
+        async for keys in scan_batches(self.redis, f"{self.key_prefix}:route:*:*"):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hget(key, "volume")
+                volumes = await pipe.execute()
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, volume in zip(keys, volumes):
+                    route, date_str = key[len(self.key_prefix) + len(':route:'):].rsplit(':', 1)
+                    try:
+                        date = datetime.strptime(date_str, '%d.%m.%Y')
+                    except ValueError:
+                        continue
+                    if volume:
+                        self._add_in(pipe, route, float(volume), 1, date)
+                        moved += 1
+                    pipe.delete(key)
+                await pipe.execute()
+
+        await self.redis.set(self.key_migrated, 1)
+        self._migrated = True
+        if moved:
+            self.logger.info(f"Migrated {moved} legacy swap route records")
 
-        self.logger.info(f"Deleted {total_deleted} old swap events older than {days} days")
+    async def get_top_swap_routes_by_volume(self, days=7, top_n=3) -> List[SwapRouteEntry]:
+        if not self._migrated:
+            await self.migrate_legacy_routes()
 
-    async def _clear_routes_if_needed(self):
-        if self.keep_days > 0:
-            self._clear_counter += 1
-            if self._clear_counter >= self.clear_every_ticks:
-                self._clear_counter = 0
-                await self.clear_old_events(self.keep_days)
+        end_time = datetime.now()
+        key_volume, key_count = self._keys_union(days, end_time)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(key_volume)
+            pipe.zrevrange(key_volume, 0, top_n - 1, withscores=True)
+            cached, top_routes = await pipe.execute()
+
+        if not cached:
+            start_time = end_time - timedelta(days=days)
+            date_range = [start_time + timedelta(days=i) for i in range(days + 1)]
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zunionstore(key_volume, [self.key_day_volume(d) for d in date_range])
+                pipe.zunionstore(key_count, [self.key_day_count(d) for d in date_range])
+                pipe.expire(key_volume, self.UNION_CACHE_TTL)
+                pipe.expire(key_count, self.UNION_CACHE_TTL)
+                pipe.zrevrange(key_volume, 0, top_n - 1, withscores=True)
+                *_, top_routes = await pipe.execute()
+
+        if not top_routes:
+            return []
+
+        routes = [route for route, _ in top_routes]
+        counts = await self.redis.zmscore(key_count, routes)
+
+        results = []
+        for (route, volume), count in zip(top_routes, counts):
+            from_asset, to_asset = route.split(ROUTE_SEP)
+            results.append(SwapRouteEntry(from_asset, to_asset, volume_cacao=volume, count=int(count or 0)))
+        return results
 
     @property
     def key_counted_routes(self):
@@ -126,6 +176,3 @@ class SwapRouteRecorder(WithLogger, INotified):
                 )
 
             await self.register(tx.tx_hash)
-
-        # Sometimes we need to clear old dates
-        await self._clear_routes_if_needed()
@@ -2,6 +2,7 @@ import asyncio
 
 from services.lib.date_utils import now_ts
 from services.lib.db import DB
+from services.lib.key_registry import scan_keys
 from services.lib.utils import take_closest
 
 
@@ -88,7 +89,7 @@ class Accumulator:
         return {k: float(v) for k, v in r.items()}
 
     async def all_my_keys(self):
-        return await self.db.redis.keys(self.key('*'))
+        return await scan_keys(self.db.redis, self.key('*'))
 
     async def clear(self, before=None):
         keys = await self.all_my_keys()
@@ -5,6 +5,7 @@ from datetime import datetime
 from redis.asyncio import Redis
 
 from services.lib.date_utils import now_ts, DAY
+from services.lib.key_registry import delete_by_pattern
 
 
 class ActiveUserCounter:
@@ -34,9 +35,7 @@ class ActiveUserCounter:
         await self.r.expire(self._key(postfix), time)
 
     async def clear(self):
-        keys = await self.r.keys(self._key('*'))
-        if keys:
-            await self.r.delete(*keys)
+        await delete_by_pattern(self.r, self._key('*'))
 
 
 class UserStats(typing.NamedTuple):
@@ -1,12 +1,88 @@
 import asyncio
 import json
 from dataclasses import dataclass
+from typing import List
 
 from services.lib.date_utils import DAY, now_ts
 from services.lib.db import DB
 
 INFINITE_TIME = 10000 * DAY
 
+# Lua helper: reads a cooldown record (JSON {"time": ..., "count": ...}) => time, count
+LUA_READ_COOLDOWN = """
+local function read_cooldown(key)
+    local raw = redis.call('GET', key)
+    if raw then
+        local ok, rec = pcall(cjson.decode, raw)
+        if ok and type(rec) == 'table' then
+            return tonumber(rec['time']) or 0, tonumber(rec['count']) or 0
+        end
+    end
+    return 0, 0
+end
+"""
+
+# KEYS: cooldown keys; ARGV: now, then (cooldown, max_times) for every key
+# Returns 1 for every key that was not on cooldown (and is counted now), otherwise 0
+LUA_COOLDOWN_DO = LUA_READ_COOLDOWN + """
+local now = tonumber(ARGV[1])
+local results = {}
+for i, key in ipairs(KEYS) do
+    local cooldown = tonumber(ARGV[i * 2])
+    local max_times = tonumber(ARGV[i * 2 + 1])
+    local t, count = read_cooldown(key)
+    if now - cooldown > t then
+        count = count + 1
+        if count >= max_times then
+            t = now
+            count = 0
+        end
+        redis.call('SET', key, cjson.encode({time = t, count = count}))
+        results[i] = 1
+    else
+        results[i] = 0
+    end
+end
+return results
+"""
+
+# KEYS: state, last-on-ts, last-off-ts, last-switch-ts, switch cooldown
+# ARGV: on, now, cooldown, default state, track switch ts, switch cooldown
+LUA_BI_TRIGGER_TURN = LUA_READ_COOLDOWN + """
+local on = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local cooldown = tonumber(ARGV[3])
+local switch_cooldown = tonumber(ARGV[6])
+
+if switch_cooldown > 0 then
+    local t = read_cooldown(KEYS[5])
+    if now - switch_cooldown <= t then
+        return 0
+    end
+end
+
+local state = tonumber(redis.call('GET', KEYS[1]) or ARGV[4])
+if state ~= 0 then state = 1 end
+local last_update_key = KEYS[3]
+if on == 1 then last_update_key = KEYS[2] end
+local last_update_ts = tonumber(redis.call('GET', last_update_key) or 0)
+
+local switched = on ~= state
+if not switched and last_update_ts + cooldown >= now then
+    return 0
+end
+
+redis.call('SET', KEYS[1], on)
+redis.call('SET', last_update_key, ARGV[2])
+if switched and ARGV[5] == '1' then
+    redis.call('SET', KEYS[4], ARGV[2])
+end
+if switch_cooldown > 0 then
+    redis.call('SET', KEYS[5], cjson.encode({time = now, count = 0}))
+end
+return 1
+"""
+
 
 @dataclass
 class CooldownRecord:
@@ -38,14 +114,18 @@ class Cooldown:
     def get_key(name):
         return f"cooldown:{name}"
 
-    async def read(self, event_name):
-        redis = await self.db.get_redis()
-        data = await redis.get(self.get_key(event_name))
+    @staticmethod
+    def parse_record(data) -> CooldownRecord:
         try:
             return CooldownRecord(**json.loads(data))
         except (TypeError, json.decoder.JSONDecodeError):
             return CooldownRecord(0.0, 0)
 
+    async def read(self, event_name):
+        redis = await self.db.get_redis()
+        data = await redis.get(self.get_key(event_name))
+        return self.parse_record(data)
+
     async def write(self, event_name, cd: CooldownRecord):
         await self.db.redis.set(self.get_key(event_name),
                                 json.dumps(cd.__dict__))
@@ -54,12 +134,39 @@ class Cooldown:
         cd = await self.read(self.event_name)
         return cd.can_do(self.cooldown)
 
-    async def do(self):
-        cd = await self.read(self.event_name)
-        if not cd.can_do(self.cooldown):
-            return
-        cd.increment_count(self.max_times, self.cooldown)
-        await self.write(self.event_name, cd)
+    async def do(self) -> bool:
+        """Counts the event unless it is on cooldown. One atomic call. Returns False if it was on cooldown"""
+        results = await self.do_many(self.db, [self])
+        return results[0]
+
+    async def try_do(self) -> bool:
+        """Atomic replacement for "if await cd.can_do(): await cd.do()". Returns True if the event may happen"""
+        return await self.do()
+
+    @classmethod
+    async def can_do_many(cls, db: DB, cooldowns: List['Cooldown']) -> List[bool]:
+        """Checks many cooldowns at once (MGET)"""
+        if not cooldowns:
+            return []
+        redis = await db.get_redis()
+        raw_records = await redis.mget([cls.get_key(cd.event_name) for cd in cooldowns])
+        return [
+            cls.parse_record(data).can_do(cd.cooldown)
+            for cd, data in zip(cooldowns, raw_records)
+        ]
+
+    @classmethod
+    async def do_many(cls, db: DB, cooldowns: List['Cooldown']) -> List[bool]:
+        """Does "do" for many cooldowns in one atomic call"""
+        if not cooldowns:
+            return []
+        args = [now_ts()]
+        for cd in cooldowns:
+            args += [cd.cooldown, cd.max_times]
+        results = await db.run_script(LUA_COOLDOWN_DO,
+                                      keys=[cls.get_key(cd.event_name) for cd in cooldowns],
+                                      args=args)
+        return [bool(r) for r in results]
 
     async def clear(self, event_name=None):
         event_name = event_name or self.event_name
@@ -118,22 +225,18 @@ class CooldownBiTrigger:
         return float(r) if r is not None else 0.0
 
     async def turn(self, on=True) -> bool:
-        has_switch_cd = self.switch_cooldown_sec > 0.0
-        if has_switch_cd and not await self.cd_switch.can_do():
-            return False
-
+        """Check and update in one atomic call (Lua)"""
         on = bool(on)
-        state, last_update_ts = await asyncio.gather(self.get_state(), self.get_last_update_ts(on))
         cd_sec = self.cooldown_on_sec if on else self.cooldown_off_sec
-
-        switched = on != state
-        can_do = last_update_ts + cd_sec < now_ts()
-
-        if switched or can_do:
-            await self.write_state(on, switched)
-
-            if has_switch_cd:
-                await self.cd_switch.do()
-            return True
-
-        return False
+        result = await self.db.run_script(
+            LUA_BI_TRIGGER_TURN,
+            keys=[
+                self._key_last_state, self._key_last_on_ts, self._key_last_off_ts, self._key_last_switch_ts,
+                Cooldown.get_key(self.cd_switch.event_name),
+            ],
+            args=[
+                int(on), now_ts(), cd_sec, int(self.default), int(self.track_last_switch_ts),
+                max(0.0, self.switch_cooldown_sec),
+            ]
+        )
+        return bool(result)
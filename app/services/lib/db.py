@@ -1,21 +1,43 @@
 import os
+import time
 import typing
+from collections import defaultdict
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 
 from redis import asyncio as aioredis
 
+from services.lib.lru import WindowAverage
 from services.lib.redis_storage_3 import RedisStorage3
 
 
+@dataclass
+class RedisCommandStats:
+    calls: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    latency: WindowAverage = field(default_factory=lambda: WindowAverage(500))
+
+    def add(self, duration, error=False):
+        self.calls += 1
+        self.total_time += duration
+        self.latency.append(duration)
+        if error:
+            self.errors += 1
+
+
 class DB:
     def __init__(self, loop):
         self.loop = loop
         self.redis: typing.Optional[aioredis.Redis] = None
+        self.redis_binary: typing.Optional[aioredis.Redis] = None
         self.storage: typing.Optional[RedisStorage3] = None
         self.host = os.environ.get('REDIS_HOST', 'localhost')
         self.port = os.environ.get('REDIS_PORT', 6379)
         self.db_index = os.environ.get('REDIS_DB_INDEX', 0)
         self.password = os.environ.get('REDIS_PASSWORD', None)
+        self.command_stats: typing.Dict[str, RedisCommandStats] = defaultdict(RedisCommandStats)
+        self._scripts = {}
 
     async def get_redis(self) -> aioredis.Redis:
         if self.redis is not None:
@@ -31,14 +53,80 @@ class DB:
         self.storage = RedisStorage3(prefix='fsm', redis=self.redis)
         self.storage._redis = self.redis
 
+        self._observe_latency(self.redis)
+
         return self.redis
 
+    async def get_redis_binary(self) -> aioredis.Redis:
+        """The same server and DB, but the replies are raw bytes (for compressed blobs)"""
+        if self.redis_binary is not None:
+            return self.redis_binary
+
+        self.redis_binary = await aioredis.from_url(
+            f'redis://{self.host}:{self.port}/{self.db_index}',
+            password=self.password,
+            decode_responses=False
+        )
+        self._observe_latency(self.redis_binary)
+        return self.redis_binary
+
+    def _observe_latency(self, redis):
+        """Measures every command (by name) and every pipeline execution (as "PIPELINE") for the metrics"""
+        stats = self.command_stats
+        original_execute_command = redis.execute_command
+        original_pipeline = redis.pipeline
+
+        async def execute_command(*args, **options):
+            t0 = time.perf_counter()
+            error = False
+            try:
+                return await original_execute_command(*args, **options)
+            except Exception:
+                error = True
+                raise
+            finally:
+                stats[str(args[0]).upper() if args else '?'].add(time.perf_counter() - t0, error)
+
+        def pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            original_pipe_execute = pipe.execute
+
+            async def pipe_execute(*e_args, **e_kwargs):
+                t0 = time.perf_counter()
+                error = False
+                try:
+                    return await original_pipe_execute(*e_args, **e_kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    stats['PIPELINE'].add(time.perf_counter() - t0, error)
+
+            pipe.execute = pipe_execute
+            return pipe
+
+        redis.execute_command = execute_command
+        redis.pipeline = pipeline
+
+    async def run_script(self, source: str, keys=(), args=()):
+        """
+        Runs a Lua script atomically on the server. It is sent once (SCRIPT LOAD),
+        then only its SHA goes over the wire (EVALSHA); after a server restart it is loaded again.
+        """
+        r = await self.get_redis()
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = r.register_script(source)
+        return await script(keys=list(keys), args=list(args), client=r)
+
     async def get_storage(self):
         await self.get_redis()
         return self.storage
 
     async def close_redis(self):
         await self.redis.close()
+        if self.redis_binary is not None:
+            await self.redis_binary.close()
 
     async def test_db_connection(self):
         r = await self.get_redis()
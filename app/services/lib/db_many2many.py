@@ -4,6 +4,7 @@ from typing import List
 from redis.asyncio import Redis
 
 from services.lib.db import DB
+from services.lib.key_registry import KeyRegistry
 
 
 class ManyToManySet:
@@ -11,6 +12,9 @@ class ManyToManySet:
         self.db = db
         self.left_prefix = left_prefix
         self.right_prefix = right_prefix
+        # names of both sides, so we never list them with KEYS
+        self.left_registry = KeyRegistry(db, f'{left_prefix}-2-{right_prefix}:{left_prefix}')
+        self.right_registry = KeyRegistry(db, f'{left_prefix}-2-{right_prefix}:{right_prefix}')
 
     async def _redis(self) -> Redis:
         return await self.db.get_redis()
@@ -21,22 +25,26 @@ class ManyToManySet:
     def right_key(self, k):
         return f'set:{self.left_prefix}-2-{self.right_prefix}:{self.right_prefix}:{k}'
 
+    async def _ensure_registries(self):
+        for registry, key_gen in ((self.left_registry, self.left_key), (self.right_registry, self.right_key)):
+            prefix_len = len(key_gen(''))
+            await registry.ensure_built(key_gen('*'), name_from_key=lambda k: k[prefix_len:])
+
     async def clear(self):
-        r = await self._redis()
-        lefts = await r.keys(self.left_key('*'))
-        rights = await r.keys(self.right_key('*'))
-        keys = lefts + rights
-        if keys:
-            await r.delete(*keys)
+        await self._ensure_registries()
+        await self.left_registry.delete_all(key_of_name=self.left_key)
+        await self.right_registry.delete_all(key_of_name=self.right_key)
 
     async def associate_many(self, lefts: List[str], rights: List[str]):
         r = await self._redis()
         if rights:
             for left_one in lefts:
                 await r.sadd(self.left_key(left_one), *rights)
+            await self.left_registry.add(*lefts)
         if lefts:
             for right_one in rights:
                 await r.sadd(self.right_key(right_one), *lefts)
+            await self.right_registry.add(*rights)
 
     async def associate(self, left_one: str, right_one: str):
         await self.associate_many([left_one], [right_one])
@@ -75,27 +83,33 @@ class ManyToManySet:
         r = await self._redis()
         return set(await r.smembers(self.left_key(left_one)))
 
-    async def all_from_side(self, key_gen):
-        r = await self._redis()
-        key_pattern = key_gen('*')
-        start_pos = len(key_pattern) - 1
-        names = await r.keys(key_pattern)
-        return set(n[start_pos:] for n in names)
-
     async def all_lefts(self):
-        return await self.all_from_side(key_gen=self.left_key)
+        await self._ensure_registries()
+        return await self.left_registry.all()
 
     async def all_rights(self):
-        return await self.all_from_side(key_gen=self.right_key)
+        await self._ensure_registries()
+        return await self.right_registry.all()
 
     async def all_right(self):
         r = await self._redis()
-        lefts = await r.keys(self.left_key('*'))
         results = []
-        for left_one in lefts:
-            results += await r.smembers(left_one)
+        for left_one in await self.all_lefts():
+            results += await r.smembers(self.left_key(left_one))
         return results
 
+    async def _forget_if_empty(self, registry: KeyRegistry, key_gen, names):
+        """A set is gone when its last member is removed: then the name is removed from the registry"""
+        names = list(names)
+        if not names:
+            return
+        r = await self._redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.exists(key_gen(name))
+            exists = await pipe.execute()
+        await registry.remove(*(name for name, e in zip(names, exists) if not e))
+
     # noinspection PyArgumentList
     async def remove_association(self, item: str, is_item_left: bool):
         r = await self._redis()
@@ -109,10 +123,19 @@ class ManyToManySet:
             this_side_key = self.right_key(other_item) if is_item_left else self.left_key(other_item)
             await r.srem(this_side_key, item)
 
+        if is_item_left:
+            await self.left_registry.remove(item)
+            await self._forget_if_empty(self.right_registry, self.right_key, all_items)
+        else:
+            await self.right_registry.remove(item)
+            await self._forget_if_empty(self.left_registry, self.left_key, all_items)
+
     async def remove_one_item(self, left_item, right_item):
         r = await self._redis()
         await r.srem(self.left_key(left_item), right_item)
         await r.srem(self.right_key(right_item), left_item)
+        await self._forget_if_empty(self.left_registry, self.left_key, [left_item])
+        await self._forget_if_empty(self.right_registry, self.right_key, [right_item])
 
     async def remove_all_rights(self, left_one: str):
         await self.remove_association(left_one, is_item_left=True)
@@ -3,6 +3,7 @@ import asyncio
 from redis.asyncio import Redis
 
 from services.lib.db import DB
+from services.lib.key_registry import delete_by_pattern
 
 
 class OneToOne:
@@ -18,9 +19,7 @@ class OneToOne:
 
     async def clear(self):
         r = await self._redis()
-        keys = await r.keys(self.key('*'))
-        if keys:
-            await r.delete(*keys)
+        await delete_by_pattern(r, self.key('*'))
 
     async def put(self, one, two, safe=True):
         r = self.db.redis
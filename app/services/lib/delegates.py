@@ -1,6 +1,11 @@
+import asyncio
 import logging
 import time
 from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Optional
+
+from services.lib.lru import percentile
 
 
 class INotified(ABC):
@@ -11,14 +16,110 @@ class INotified(ABC):
         ...
 
 
+class EdgeStats:
+    """Rolling latency window and counters of one emitter -> listener edge"""
+
+    WINDOW = 500
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))  # upper bounds, sec
+
+    def __init__(self, window=WINDOW, timeout: Optional[float] = None):
+        self.latencies = deque(maxlen=window)
+        self.timeout = timeout
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_error = None
+        self.total_time = 0.0
+        self.bucket_counts = [0] * len(self.BUCKETS)  # all the calls, not only the window
+
+    def add(self, duration, error: Optional[BaseException] = None):
+        self.calls += 1
+        self.total_time += duration
+        self.latencies.append(duration)
+        for i, bound in enumerate(self.BUCKETS):
+            if duration <= bound:
+                self.bucket_counts[i] += 1
+                break
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        elif error is not None:
+            self.errors += 1
+            self.last_error = error
+
+    def percentile(self, q) -> Optional[float]:
+        return percentile(self.latencies, q)
+
+    @property
+    def average(self):
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    def histogram(self) -> Dict[float, int]:
+        """Upper bound -> number of the calls that took no more than that (cumulative, like Prometheus "le")"""
+        counts, total = {}, 0
+        for bound, n in zip(self.BUCKETS, self.bucket_counts):
+            total += n
+            counts[bound] = total
+        return counts
+
+    @classmethod
+    def merged(cls, stats_list):
+        result = cls(window=sum(s.latencies.maxlen for s in stats_list) or cls.WINDOW)
+        for s in stats_list:
+            result.latencies.extend(s.latencies)
+            result.calls += s.calls
+            result.errors += s.errors
+            result.timeouts += s.timeouts
+            result.last_error = s.last_error or result.last_error
+            result.total_time += s.total_time
+            result.bucket_counts = [a + b for a, b in zip(result.bucket_counts, s.bucket_counts)]
+        return result
+
+    def __repr__(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        latency = f'p50={p50 * 1000:.1f}ms, p95={p95 * 1000:.1f}ms' if p50 is not None else 'no data'
+        return f'EdgeStats(calls={self.calls}, errors={self.errors}, timeouts={self.timeouts}, {latency})'
+
+
 class WithDelegates:
+    # set by DataController.set_fan_out; the listeners added later get the same fan-out mode
+    fan_out_policy = None
+
     def __init__(self):
         super().__init__()
         self.delegates = []  # list for fixed order
 
-    def add_subscriber(self, delegate: INotified):
+        # listeners are called one by one by default; if concurrent, a slow listener does not delay the others
+        self.concurrent_fan_out = False
+
+    def add_subscriber(self, delegate: INotified, timeout: Optional[float] = None):
         if delegate not in self.delegates:
             self.delegates.append(delegate)
+        if self.fan_out_policy:
+            self.fan_out_policy.apply_to_edge(self, delegate)
+        if timeout is not None:
+            self.edge_stats_for(delegate).timeout = timeout
+        return self
+
+    @property
+    def edge_stats(self) -> Dict[int, EdgeStats]:
+        """id(delegate) -> EdgeStats"""
+        # not every subclass calls WithDelegates.__init__ in time, so it is created on demand
+        if '_edge_stats' not in self.__dict__:
+            self._edge_stats = {}
+        return self._edge_stats
+
+    def edge_stats_for(self, delegate) -> EdgeStats:
+        stats = self.edge_stats.get(id(delegate))
+        if stats is None:
+            stats = self.edge_stats[id(delegate)] = EdgeStats()
+        return stats
+
+    def set_fan_out(self, concurrent: bool, timeout: Optional[float] = None):
+        """timeout applies to every listener of this emitter; None = keep as is, 0 = no limit"""
+        self.concurrent_fan_out = concurrent
+        if timeout is not None:
+            for delegate in self.delegates:
+                self.edge_stats_for(delegate).timeout = timeout or None
         return self
 
     async def handle_error(self, e, sender=None):
@@ -26,21 +127,48 @@ class WithDelegates:
         for delegate in self.delegates:
             await delegate.on_error(sender, e)
 
-    async def pass_data_to_listeners(self, data, sender=None):
-        if not data:
-            return
-        sender = sender or self
-
-        summary = {}
+    async def _call_delegate(self, delegate: INotified, sender, data):
+        stats = self.edge_stats_for(delegate)
+        t0 = time.monotonic()
 
-        for delegate in self.delegates:
-            delegate: INotified
-            t0 = time.monotonic()
+        if not stats.timeout:
+            error = None
             try:
                 await delegate.on_data(sender, data)
             except Exception as e:
+                error = e
                 logging.exception(f"{e!r}")
-            t1 = time.monotonic()
-            summary[str(delegate)] = t1 - t0
+            duration = time.monotonic() - t0
+            stats.add(duration, error)
+            return duration
+
+        def on_done(t: asyncio.Future):
+            error = asyncio.CancelledError() if t.cancelled() else t.exception()
+            if error:
+                logging.error(f"{error!r}", exc_info=error)
+            stats.add(time.monotonic() - t0, error)
+
+        # A slow listener is not cancelled: it may be in the middle of a Redis write or a send.
+        # The emitter just stops waiting for it; its duration is recorded when it is done.
+        task = asyncio.ensure_future(delegate.on_data(sender, data))
+        task.add_done_callback(on_done)
+        await asyncio.wait({task}, timeout=stats.timeout)
+        if not task.done():
+            stats.timeouts += 1
+            logging.warning(f"{delegate} did not handle data from {sender} in {stats.timeout} sec. "
+                            f"Not waiting for it any longer.")
+        return time.monotonic() - t0
+
+    async def pass_data_to_listeners(self, data, sender=None):
+        if not data:
+            return
+        sender = sender or self
+
+        if self.concurrent_fan_out and len(self.delegates) > 1:
+            durations = await asyncio.gather(*(
+                self._call_delegate(delegate, sender, data) for delegate in self.delegates
+            ))
+        else:
+            durations = [await self._call_delegate(delegate, sender, data) for delegate in self.delegates]
 
-        return summary
+        return {str(delegate): duration for delegate, duration in zip(self.delegates, durations)}
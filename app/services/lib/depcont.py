@@ -4,7 +4,7 @@ from dataclasses import dataclass, field
 from typing import Optional, Set, Dict
 
 import ujson
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 from aionode.connector import ThorConnector
 from aionode.env import ThorEnvironment
 from aionode.types import ThorChainInfo
@@ -68,8 +68,12 @@ class DepContainer:
     dex_analytics = None
     user_counter = None  # type: 'UserCounter'
     route_recorder = None  # type: 'SwapRouteRecorder'
+    price_history = None  # type: 'PriceHistoryCache'
+    render_service = None  # type: 'RenderService'
+    logo_downloader = None  # type: 'CryptoLogoDownloader'
 
     scheduler: Optional[Scheduler] = None
+    lp_report_jobs = None  # type: 'LPReportJobs'
 
     gen_alert_settings_proc = None
     alert_watcher: Optional[AlertWatchers] = None
@@ -100,10 +104,15 @@ class DepContainer:
 
     def make_http_session(self):
         session_timeout = self.cfg.get_timeout_global
+        # one slow host must not take all the connections of the shared session
+        limit = self.cfg.as_int('thor.connection.limit', 100)
+        limit_per_host = self.cfg.as_int('thor.connection.limit_per_host', 20)
         self.session = ObservableSession(
             json_serialize=ujson.dumps,
+            connector=TCPConnector(limit=limit, limit_per_host=limit_per_host),
             timeout=ClientTimeout(total=session_timeout))
-        logging.info(f'HTTP Session timeout is {session_timeout} sec')
+        logging.info(f'HTTP Session timeout is {session_timeout} sec, '
+                     f'connections: {limit} max, {limit_per_host} per host')
 
     def get_messenger(self, t: str):
         return {
@@ -81,6 +81,25 @@ class RequestEntry:
         self.update_time(ts_start)
 
 
+@dataclass
+class HostEntry:
+    host: str
+    total_calls: int = 0
+    total_errors: int = 0
+    total_time: float = 0.0
+    response_codes: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    avg_time: WindowAverage = field(default_factory=lambda: WindowAverage(WINDOW_SIZE_TO_AVERAGE))
+
+    def update(self, time_elapsed, status=None, error=False):
+        self.total_calls += 1
+        self.total_time += time_elapsed
+        self.avg_time.append(time_elapsed)
+        if status is not None:
+            self.response_codes[status] += 1
+        if error:
+            self.total_errors += 1
+
+
 class ObservableSession(aiohttp.ClientSession, WithLogger):
     """
     This class is a wrapper around aiohttp.ClientSession that records all requests and responses
@@ -93,6 +112,18 @@ class ObservableSession(aiohttp.ClientSession, WithLogger):
     def debug_top_calls(self, n=10):
         return sorted(self._debug_cache.values(), key=lambda r: r.total_calls, reverse=True)[:n]
 
+    @property
+    def host_stats(self) -> Dict[str, HostEntry]:
+        """Unlike the per-URL cache, these are never evicted, so the counters only grow"""
+        return self._host_stats
+
+    def _register_host(self, url, ts_start, status=None, error=False):
+        host = urlparse(str(url)).netloc or '?'
+        entry = self._host_stats.get(host)
+        if entry is None:
+            entry = self._host_stats[host] = HostEntry(host)
+        entry.update(now_ts() - ts_start, status, error)
+
     @property
     def rps(self):
         return self._rps_counter.get_rps()
@@ -199,8 +230,10 @@ class ObservableSession(aiohttp.ClientSession, WithLogger):
                                             ssl_context=ssl_context, ssl=ssl, proxy_headers=proxy_headers,
                                             trace_request_ctx=trace_request_ctx, read_bufsize=read_bufsize)
             await self._register_end(str_or_url, method, ts_start, result)
+            self._register_host(str_or_url, ts_start, status=result.status)
         except Exception as e:
             self._register_error(str_or_url, method, ts_start, e)
+            self._register_host(str_or_url, ts_start, error=True)
             raise e
         return result
 
@@ -228,3 +261,4 @@ class ObservableSession(aiohttp.ClientSession, WithLogger):
 
         self._debug_cache = LRUCache(debug_deque_size)
         self._rps_counter = RPSCounter()
+        self._host_stats: Dict[str, HostEntry] = {}
@@ -0,0 +1,150 @@
+import fnmatch
+from typing import AsyncIterator, List, Optional, Set, Union
+
+from redis.asyncio import Redis
+
+from services.lib.db import DB
+
+DEFAULT_SCAN_BATCH = 1000
+
+
+async def scan_batches(r: Redis, pattern: str, batch_size=DEFAULT_SCAN_BATCH) -> AsyncIterator[List[str]]:
+    """
+    Cursor-based SCAN: yields the keys matching the pattern batch by batch.
+    Unlike KEYS, it never blocks the server for long. A key may be yielded twice (Redis guarantees).
+    """
+    cursor = 0
+    while True:
+        cursor, keys = await r.scan(cursor, match=pattern, count=batch_size)
+        if keys:
+            yield keys
+        if not cursor:
+            break
+
+
+async def scan_keys_iter(r: Redis, pattern: str, batch_size=DEFAULT_SCAN_BATCH) -> AsyncIterator[str]:
+    seen = set()
+    async for keys in scan_batches(r, pattern, batch_size):
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+
+async def scan_keys(r: Redis, pattern: str, batch_size=DEFAULT_SCAN_BATCH) -> List[str]:
+    """Drop-in replacement for "await r.keys(pattern)" """
+    return [key async for key in scan_keys_iter(r, pattern, batch_size)]
+
+
+async def delete_by_pattern(r: Redis, pattern: str, batch_size=DEFAULT_SCAN_BATCH) -> int:
+    deleted = 0
+    async for keys in scan_batches(r, pattern, batch_size):
+        deleted += await r.delete(*keys)
+    return deleted
+
+
+class KeyRegistry:
+    """
+    Index set of the names in one namespace, maintained on write,
+    so listing them does not need KEYS (or even SCAN) over the whole database.
+    The data written before the registry existed is picked up once by "ensure_built" with SCAN.
+    """
+
+    def __init__(self, db: Union[DB, Redis], namespace: str):
+        self.db = db
+        self.namespace = namespace
+
+    async def _redis(self) -> Redis:
+        return await self.db.get_redis() if isinstance(self.db, DB) else self.db
+
+    @property
+    def index_key(self):
+        return f'KeyRegistry:{self.namespace}'
+
+    @property
+    def built_key(self):
+        return f'KeyRegistry:{self.namespace}:built'
+
+    async def add(self, *names):
+        if names:
+            r = await self._redis()
+            await r.sadd(self.index_key, *names)
+
+    async def remove(self, *names):
+        if names:
+            r = await self._redis()
+            await r.srem(self.index_key, *names)
+
+    def add_in(self, pipe, *names):
+        """Same as "add", but as a part of a pipeline"""
+        if names:
+            pipe.sadd(self.index_key, *names)
+
+    def remove_in(self, pipe, *names):
+        if names:
+            pipe.srem(self.index_key, *names)
+
+    async def has(self, name) -> bool:
+        r = await self._redis()
+        return bool(await r.sismember(self.index_key, name))
+
+    async def all(self) -> Set[str]:
+        r = await self._redis()
+        return set(await r.smembers(self.index_key))
+
+    async def match(self, pattern: str) -> Set[str]:
+        """Names matching a glob-style pattern (as in KEYS/SCAN)"""
+        names = await self.all()
+        if pattern == '*':
+            return names
+        return {name for name in names if fnmatch.fnmatchcase(name, pattern)}
+
+    async def iter(self, batch_size=DEFAULT_SCAN_BATCH) -> AsyncIterator[str]:
+        """SSCAN over the index: for big namespaces"""
+        r = await self._redis()
+        async for name in r.sscan_iter(self.index_key, count=batch_size):
+            yield name
+
+    async def size(self) -> int:
+        r = await self._redis()
+        return await r.scard(self.index_key)
+
+    async def clear(self):
+        r = await self._redis()
+        await r.delete(self.index_key, self.built_key)
+
+    async def ensure_built(self, pattern: str, name_from_key=None, batch_size=DEFAULT_SCAN_BATCH,
+                           expire: Optional[float] = None):
+        """
+        Fills the index from the existing keys once (SCAN, not KEYS).
+        :param pattern: pattern of the keys of this namespace
+        :param name_from_key: key -> name; by default the name is the key itself
+        :param expire: TTL of the index and the marker, sec
+        """
+        r = await self._redis()
+        if await r.exists(self.built_key):
+            return
+
+        async for keys in scan_batches(r, pattern, batch_size):
+            names = [name_from_key(k) for k in keys] if name_from_key else keys
+            await r.sadd(self.index_key, *names)
+
+        await r.set(self.built_key, 1)
+        if expire:
+            await r.expire(self.built_key, int(expire))
+            await r.expire(self.index_key, int(expire))
+
+    async def delete_all(self, key_of_name=None, batch_size=DEFAULT_SCAN_BATCH) -> int:
+        """Deletes all the registered keys and the index itself"""
+        r = await self._redis()
+        deleted = 0
+        batch = []
+        async for name in self.iter(batch_size):
+            batch.append(key_of_name(name) if key_of_name else name)
+            if len(batch) >= batch_size:
+                deleted += await r.delete(*batch)
+                batch.clear()
+        if batch:
+            deleted += await r.delete(*batch)
+        await self.clear()
+        return deleted
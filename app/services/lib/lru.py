@@ -4,6 +4,15 @@ from statistics import median
 from services.lib.date_utils import now_ts
 
 
+def percentile(values, q, default=None):
+    """Nearest-rank percentile (q = 0..100) of unsorted values"""
+    if not values:
+        return default
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100.0 * len(values))) - 1))
+    return values[index]
+
+
 class LRUCache:
     def __init__(self, capacity: int):
         self.capacity = capacity
@@ -26,6 +35,12 @@ class LRUCache:
             self._deque.append(key)
             self._cache[key] = value
 
+    def pop(self, key, default=None):
+        if key in self._cache:
+            self._deque.remove(key)
+            return self._cache.pop(key)
+        return default
+
     def __repr__(self):
         return f'LRUCache({self.capacity}, size={len(self._cache)})'
 
@@ -69,6 +84,9 @@ class WindowAverage:
     def median(self):
         return median(self._values) if self._values else None
 
+    def percentile(self, q):
+        return percentile(self._values, q)
+
 
 class RPSCounter:
     def __init__(self, window_size=60, max_requests=10_000):
@@ -0,0 +1,328 @@
+from collections import defaultdict
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from services.lib.depcont import DepContainer
+from services.lib.lru import WindowAverage
+from services.lib.utils import WithLogger
+
+
+class PrometheusWriter:
+    """Builds the Prometheus text exposition format (version 0.0.4)"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, prefix='mayabot_'):
+        self.prefix = prefix
+        self._meta: Dict[str, tuple] = {}
+        self._samples: Dict[str, list] = defaultdict(list)
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+    @staticmethod
+    def _format_value(value):
+        if value is None:
+            return 'NaN'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def add(self, name, value, labels: Optional[dict] = None, help_text='', metric_type='gauge', suffix=''):
+        full_name = self.prefix + name
+        if full_name not in self._meta:
+            self._meta[full_name] = (help_text, metric_type)
+        if labels:
+            label_str = ','.join(f'{k}="{self._escape(v)}"' for k, v in labels.items())
+            sample = f'{full_name}{suffix}{{{label_str}}} {self._format_value(value)}'
+        else:
+            sample = f'{full_name}{suffix} {self._format_value(value)}'
+        self._samples[full_name].append(sample)
+
+    def add_summary(self, name, window: WindowAverage, total_sum, count, labels: Optional[dict] = None,
+                    help_text=''):
+        """Quantiles come from the recent window; _sum and _count are totals"""
+        labels = labels or {}
+        for q in self.QUANTILES:
+            self.add(name, window.percentile(q * 100), {**labels, 'quantile': q}, help_text, 'summary')
+        self.add(name, total_sum, labels, help_text, 'summary', suffix='_sum')
+        self.add(name, count, labels, help_text, 'summary', suffix='_count')
+
+    def add_histogram(self, name, buckets: Dict[float, int], total_sum, count, labels: Optional[dict] = None,
+                      help_text=''):
+        """buckets: upper bound -> cumulative number of observations; the last bound is +Inf"""
+        labels = labels or {}
+        for bound, n in buckets.items():
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            self.add(name, n, {**labels, 'le': le}, help_text, 'histogram', suffix='_bucket')
+        self.add(name, total_sum, labels, help_text, 'histogram', suffix='_sum')
+        self.add(name, count, labels, help_text, 'histogram', suffix='_count')
+
+    def render(self) -> str:
+        lines = []
+        for full_name, (help_text, metric_type) in self._meta.items():
+            if help_text:
+                lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {metric_type}')
+            lines.extend(self._samples[full_name])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer(WithLogger):
+    """
+    Serves /metrics for Prometheus from within the bot process.
+    Everything is read from the in-memory counters, no I/O is done while handling a scrape.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, deps: DepContainer, host='0.0.0.0', port=9108, path='/metrics'):
+        super().__init__()
+        self.deps = deps
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner: Optional[web.AppRunner] = None
+
+    @classmethod
+    def from_config(cls, deps: DepContainer, cfg):
+        """cfg is the "metrics" sub-config"""
+        return cls(deps,
+                   host=cfg.as_str('host', '0.0.0.0'),
+                   port=cfg.as_int('port', 9108),
+                   path=cfg.as_str('path', '/metrics'))
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(self.path, self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f'Metrics are served at http://{self.host}:{self.port}{self.path}')
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, _request):
+        try:
+            text = self.render()
+        except Exception as e:
+            self.logger.exception(f'Failed to render metrics: {e!r}')
+            raise web.HTTPInternalServerError()
+        return web.Response(body=text.encode(), headers={'Content-Type': self.CONTENT_TYPE})
+
+    def render(self) -> str:
+        w = PrometheusWriter()
+        self._collect_fetchers(w)
+        self._collect_listeners(w)
+        self._collect_scanner(w)
+        self._collect_redis(w)
+        self._collect_http(w)
+        self._collect_node_endpoints(w)
+        self._collect_delivery(w)
+        self._collect_price_history(w)
+        self._collect_render(w)
+        self._collect_logo_cache(w)
+        self._collect_pool_states(w)
+        self._collect_report_jobs(w)
+        return w.render()
+
+    def _collect_fetchers(self, w: PrometheusWriter):
+        data_ctrl = self.deps.data_controller
+        if not data_ctrl:
+            return
+
+        for name, fetcher in data_ctrl.summary.items():
+            labels = {'fetcher': name}
+            w.add('fetcher_ticks_total', fetcher.total_ticks, labels, 'Number of fetcher runs', 'counter')
+            w.add('fetcher_errors_total', fetcher.error_counter, labels, 'Number of failed fetcher runs', 'counter')
+            w.add('fetcher_success_rate', fetcher.success_rate, labels, 'Successful runs, %')
+            w.add('fetcher_last_tick_timestamp_seconds', fetcher.last_timestamp, labels,
+                  'Unix time of the last run')
+            w.add('fetcher_sleep_period_seconds', fetcher.sleep_period, labels, 'Interval between runs')
+            run_times = getattr(fetcher, 'run_times', None)
+            if run_times:
+                w.add('fetcher_last_run_seconds', run_times[-1], labels, 'Duration of the last run')
+                w.add('fetcher_avg_run_seconds', sum(run_times) / len(run_times), labels,
+                      'Average duration of the recent runs')
+
+    def _collect_listeners(self, w: PrometheusWriter):
+        data_ctrl = self.deps.data_controller
+        if not data_ctrl:
+            return
+
+        for emitter_name, listener_name, stats in data_ctrl.edge_stats():
+            if not stats.calls:
+                continue
+            labels = {'emitter': emitter_name, 'listener': listener_name}
+            w.add('listener_calls_total', stats.calls, labels, 'Data passed from emitter to listener', 'counter')
+            w.add('listener_errors_total', stats.errors, labels, 'Listener exceptions', 'counter')
+            w.add('listener_timeouts_total', stats.timeouts, labels, 'Listener timeouts', 'counter')
+            w.add_histogram('listener_duration_seconds', stats.histogram(), stats.total_time, stats.calls, labels,
+                            'Listener on_data duration')
+
+    def _collect_scanner(self, w: PrometheusWriter):
+        scanner = self.deps.block_scanner
+        if scanner:
+            w.add('scanner_last_block', scanner.last_block, help_text='Next block the scanner will process')
+            w.add('scanner_lag_blocks', scanner.blocks_behind,
+                  help_text='How many blocks the scanner is behind the node')
+            w.add('scanner_prefetch_in_flight', scanner.prefetch_in_flight,
+                  help_text='Block requests currently in flight')
+            w.add('scanner_last_block_timestamp_seconds', scanner.last_block_ts,
+                  help_text='Unix time when the last block was processed')
+            source = getattr(scanner, 'block_source', None)
+            if source:
+                w.add('scanner_ws_connected', int(source.connected),
+                      help_text='1 if new blocks are pushed over the websocket, 0 if polling')
+                w.add('scanner_ws_events_total', source.total_events, help_text='NewBlock events received',
+                      metric_type='counter')
+                w.add('scanner_ws_connections_total', source.total_connections,
+                      help_text='Websocket (re)connections', metric_type='counter')
+
+        if self.deps.last_block_store:
+            w.add('node_last_block', int(self.deps.last_block_store), help_text='Last block height of the node')
+
+    def _collect_redis(self, w: PrometheusWriter):
+        db = self.deps.db
+        if not db or not getattr(db, 'command_stats', None):
+            return
+
+        for command, stats in list(db.command_stats.items()):
+            labels = {'command': command}
+            w.add('redis_commands_total', stats.calls, labels, 'Redis commands (pipelines as PIPELINE)', 'counter')
+            w.add('redis_errors_total', stats.errors, labels, 'Failed Redis commands', 'counter')
+            w.add_summary('redis_command_duration_seconds', stats.latency, stats.total_time, stats.calls,
+                          labels, 'Redis command latency')
+
+    def _collect_http(self, w: PrometheusWriter):
+        session = self.deps.session
+        host_stats = getattr(session, 'host_stats', None)
+        if not host_stats:
+            return
+
+        for host, entry in list(host_stats.items()):
+            labels = {'host': host}
+            w.add('http_requests_total', entry.total_calls, labels, 'Outgoing HTTP requests', 'counter')
+            w.add('http_errors_total', entry.total_errors, labels, 'Outgoing HTTP requests failed', 'counter')
+            for code, count in list(entry.response_codes.items()):
+                w.add('http_responses_total', count, {**labels, 'code': code}, 'HTTP responses by code',
+                      'counter')
+            w.add_summary('http_request_duration_seconds', entry.avg_time, entry.total_time, entry.total_calls,
+                          labels, 'Outgoing HTTP request latency')
+
+        buckets = getattr(self.deps.midgard_connector, '_buckets', None) or {}
+        for host, bucket in list(buckets.items()):
+            labels = {'host': host}
+            w.add('midgard_rate_limit_acquired_total', bucket.total_acquired, labels,
+                  'Midgard requests let through by the rate limiter', 'counter')
+            w.add('midgard_rate_limit_wait_seconds_total', bucket.total_wait_time, labels,
+                  'Time spent waiting for the Midgard rate limiter', 'counter')
+
+    def _collect_node_endpoints(self, w: PrometheusWriter):
+        cache = getattr(self.deps.thor_connector, 'cache', None)
+        if cache is not None:
+            w.add('node_cache_hits_total', cache.hits, help_text='Node answers served from the cache',
+                  metric_type='counter')
+            w.add('node_cache_misses_total', cache.misses, help_text='Node requests actually sent',
+                  metric_type='counter')
+            w.add('node_cache_coalesced_total', cache.coalesced,
+                  help_text='Node requests that joined an identical request in flight', metric_type='counter')
+            w.add('node_cache_size', cache.size, help_text='Node answers in the cache')
+
+        health = getattr(self.deps.thor_connector, 'health', None)
+        if not health:
+            return
+
+        for url, endpoint in list(health.items()):
+            labels = {'url': url}
+            w.add('node_endpoint_open', endpoint.state != endpoint.STATE_CLOSED, labels,
+                  '1 if the circuit breaker skips this endpoint')
+            w.add('node_endpoint_error_rate', endpoint.error_rate, labels, 'Recent error rate')
+            w.add('node_endpoint_median_latency_seconds', endpoint.median_latency, labels, 'Recent median latency')
+            w.add('node_endpoint_breaker_opened_total', endpoint.times_opened, labels,
+                  'How many times the circuit breaker opened', 'counter')
+
+    def _collect_delivery(self, w: PrometheusWriter):
+        delivery = getattr(self.deps.broadcaster, 'delivery', None)
+        if not delivery:
+            return
+
+        for platform, queue in list(delivery.platforms.items()):
+            labels = {'platform': platform}
+            stats = queue.stats
+            w.add('delivery_queue_size', queue.queue_size, labels, 'Messages waiting to be sent')
+            w.add('delivery_sent_total', stats.sent, labels, 'Messages delivered', 'counter')
+            w.add('delivery_failed_total', stats.failed, labels, 'Messages failed', 'counter')
+            w.add('delivery_retried_total', stats.retried, labels, 'Messages rescheduled by flood control',
+                  'counter')
+            for q in PrometheusWriter.QUANTILES:
+                w.add('delivery_latency_seconds', stats.latency.percentile(q * 100), {**labels, 'quantile': q},
+                      'Time from queueing to delivery (recent window)', 'summary')
+
+    def _collect_price_history(self, w: PrometheusWriter):
+        cache = self.deps.price_history
+        if not cache:
+            return
+        w.add('price_history_cache_rows', cache.size, help_text='Rows in the in-memory price history')
+        w.add('price_history_cache_capacity', cache.capacity, help_text='Max rows in the in-memory price history')
+        w.add('price_history_cache_memory_bytes', cache.memory_bytes,
+              help_text='Memory taken by the in-memory price history')
+
+    def _collect_render(self, w: PrometheusWriter):
+        service = self.deps.render_service
+        if not service:
+            return
+        for name, stats in list(service.stats.items()):
+            labels = {'picture': name}
+            w.add('render_cache_hits_total', stats.cache_hits, labels, 'Pictures taken from the render cache', 'counter')
+            w.add('render_errors_total', stats.errors, labels, 'Failed renders', 'counter')
+            w.add_summary('render_duration_seconds', stats.latency, stats.total_time, stats.renders,
+                          labels, 'Picture render time (without the cache hits)')
+        w.add('render_cache_items', len(service.cache), help_text='PNGs in the render cache')
+        w.add('render_cache_bytes', service.cache.total_bytes, help_text='Size of the PNGs in the render cache')
+        w.add('render_fallbacks_total', service.fallbacks,
+              help_text='Pictures rendered in a thread because the input could not be sent to a worker',
+              metric_type='counter')
+
+    def _collect_logo_cache(self, w: PrometheusWriter):
+        logos = self.deps.logo_downloader
+        if not logos:
+            return
+        for source, count in list(logos.stats.items()):
+            w.add('logo_requests_total', count, {'source': source},
+                  'Coin logo requests by where the logo came from (memory, atlas, disk, download, miss)', 'counter')
+        w.add('logo_cache_hit_rate', logos.hit_rate, help_text='Share of the logo requests served from memory/atlas')
+        w.add('logo_cache_items', logos.memory_cache_items, help_text='Resized logos in memory')
+        w.add('logo_atlas_items', logos.atlas_items, help_text='Logos in the atlas')
+
+    def _collect_pool_states(self, w: PrometheusWriter):
+        pool_fetcher = self.deps.pool_fetcher
+        if not pool_fetcher:
+            return
+        for kind, count in list(pool_fetcher.state_store.stats.items()):
+            w.add('pool_state_store_total', count, {'kind': kind},
+                  'Historical pool states: cache hits, misses, fetched from THORNode, saved, decode errors', 'counter')
+
+    def _collect_report_jobs(self, w: PrometheusWriter):
+        jobs = self.deps.lp_report_jobs
+        if not jobs:
+            return
+        stats = jobs.stats
+        w.add('lp_report_queue_depth', jobs.queue_depth, help_text='Scheduled LP report jobs waiting or running')
+        w.add('lp_report_running', jobs.running, help_text='Scheduled LP report jobs running')
+        w.add('lp_report_delayed', jobs.delayed, help_text='Scheduled LP reports waiting for their jitter delay')
+        w.add('lp_report_requests_total', stats.requests, help_text='Scheduled LP reports requested',
+              metric_type='counter')
+        w.add('lp_report_cache_hits_total', stats.cache_hits, help_text='LP reports reused from the cache',
+              metric_type='counter')
+        w.add('lp_report_coalesced_total', stats.coalesced,
+              help_text='LP report requests that joined an identical job in flight', metric_type='counter')
+        w.add('lp_report_errors_total', stats.errors, help_text='Failed LP report jobs', metric_type='counter')
+        w.add('lp_report_dedup_ratio', stats.dedup_ratio, help_text='Share of the LP report requests not computed')
+        w.add_summary('lp_report_duration_seconds', stats.latency, stats.total_time, stats.computed,
+                      help_text='LP report computation time')
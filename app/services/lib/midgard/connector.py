@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import Optional, Dict
+from urllib.parse import urlparse
 
 import aiohttp
 from aionode.connector import ThorConnector
@@ -7,6 +8,7 @@ from aionode.nodeclient import ThorNodeClient
 from services.lib.constants import HTTP_CLIENT_ID
 from services.lib.midgard.parser import MidgardParserV2, TxParseResult
 from services.lib.midgard.urlgen import free_url_gen
+from services.lib.rate_limit import TokenBucket
 from services.lib.utils import WithLogger
 from services.models.earnings_history import EarningHistoryResponse
 from services.models.savers import MidgardSaversHistory
@@ -32,6 +34,32 @@ class MidgardConnector(WithLogger):
         self.urlgen = free_url_gen
         self.parser = MidgardParserV2(network_id)
 
+        # per host rate limit; None = no limit
+        self.rate_limit_rps = 0.0
+        self.rate_limit_burst = 1
+        self.rate_limit_backoff = 5.0
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def set_rate_limit(self, rps: float, burst=1, backoff=5.0):
+        """
+        :param rps: max requests per second to one Midgard host; 0 = no limit
+        :param burst: how many requests can go at once after a quiet period
+        :param backoff: pause for the host after it has answered 503/429, sec
+        """
+        self.rate_limit_rps = float(rps)
+        self.rate_limit_burst = max(1, int(burst))
+        self.rate_limit_backoff = float(backoff)
+        self._buckets.clear()
+
+    def bucket_for(self, url: str) -> Optional[TokenBucket]:
+        if self.rate_limit_rps <= 0:
+            return None
+        host = urlparse(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate_limit_rps, self.rate_limit_burst)
+        return bucket
+
     async def _request_json_from_midgard_by_ip(self, ip_address: str, path: str):
         path = path.lstrip('/')
 
@@ -41,6 +69,10 @@ class MidgardConnector(WithLogger):
             port = DEFAULT_MIDGARD_PORT
             full_url = f'http://{ip_address}:{port}/{path}'
 
+        bucket = self.bucket_for(full_url)
+        if bucket:
+            await bucket.acquire()
+
         self.logger.info(f"Getting Midgard endpoint: {full_url}")
         try:
             headers = {ThorNodeClient.HEADER_CLIENT_ID: HTTP_CLIENT_ID}
@@ -49,6 +81,12 @@ class MidgardConnector(WithLogger):
 
                 if resp.status == 404:
                     return self.ERROR_NOT_FOUND
+                elif resp.status in (429, 503) and bucket:
+                    # the server is overloaded: everybody waits for this host
+                    bucket.backoff(self.rate_limit_backoff)
+                    self.logger.warning(f'Midgard ({full_url}) is busy ({resp.status}), '
+                                        f'backing off for {self.rate_limit_backoff} sec.')
+                    return self.ERROR_RESPONSE
                 elif resp.status != 200:
                     try:
                         answer = resp.content[:200]
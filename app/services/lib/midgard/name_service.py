@@ -6,8 +6,9 @@ from typing import Optional, List, Iterable, Dict, NamedTuple
 from proto.types import ThorName, ThorNameAlias
 from services.lib.config import Config
 from services.lib.constants import Chains
-from services.lib.date_utils import parse_timespan_to_seconds
+from services.lib.date_utils import parse_timespan_to_seconds, now_ts
 from services.lib.db import DB
+from services.lib.lru import LRUCache
 from services.lib.midgard.connector import MidgardConnector
 from services.lib.utils import WithLogger, keys_to_lower, filter_none_values
 from services.models.node_info import NodeListHolder
@@ -94,38 +95,88 @@ class NameService(WithLogger):
         if not address:
             return
 
-        local_results = self._cache.lookup_name_by_address_local(address)
-        if local_results:
-            return local_results
+        return (await self.lookup_names_by_addresses([address])).get(address)
 
-        if not self._thorname_enabled:
-            return
+    async def lookup_multiple_names_by_addresses(self, addresses: Iterable) -> Dict[str, ThorName]:
+        if not addresses:
+            return {}
 
-        names = await self._cache.load_name_list(address)
-        if names is None:
-            names = await self._api.thorname_reversed_lookup(address)
-            await self._cache.save_name_list(address, names)
+        return await self.lookup_names_by_addresses(addresses)
 
-        if not names:
-            return
+    async def lookup_names_by_addresses(self, addresses: Iterable[str]) -> Dict[str, Optional[ThorName]]:
+        """
+        Address -> ThorName (or None) for many addresses at once:
+        one MGET for the cached name lists, one MGET for the ThorNames,
+        and the Midgard requests for the cache misses go concurrently.
+        """
+        addresses = [address for address in dict.fromkeys(addresses) if address]  # unique, ordered
+        results, remaining = {}, []
+        for address in addresses:
+            if local_result := self._cache.lookup_name_by_address_local(address):
+                results[address] = local_result
+            elif not self._thorname_enabled or self._cache.is_known_without_name(address):
+                results[address] = None
+            else:
+                remaining.append(address)
 
-        # todo: find a ThorName locally or pick any of this list
-        name = names[0]
-        if len(names) > 1:
-            self.logger.warning(f'Address {address} resolves to more than 1 ThorNames: "{names}". '
-                                f'I will take the first one "{name}"')
+        if not remaining:
+            return results
 
-        return await self.lookup_thorname_by_name(name)
+        name_lists = await self._cache.load_name_lists(remaining)
+        misses = [address for address in remaining if name_lists.get(address) is None]
+        if misses:
+            fetched = await asyncio.gather(*[self._api.thorname_reversed_lookup(address) for address in misses])
+            fetched = dict(zip(misses, fetched))
+            await self._cache.save_name_lists(fetched)
+            name_lists.update(fetched)
+
+        name_by_address = {}
+        for address in remaining:
+            names = name_lists.get(address)
+            if not names:
+                results[address] = None
+                continue
+
+            # todo: find a ThorName locally or pick any of this list
+            name_by_address[address] = names[0].strip()
+            if len(names) > 1:
+                self.logger.warning(f'Address {address} resolves to more than 1 ThorNames: "{names}". '
+                                    f'I will take the first one "{names[0]}"')
+
+        thornames = await self.lookup_thornames_by_names(name_by_address.values())
+        for address, name in name_by_address.items():
+            results[address] = thornames.get(name)
+
+        return {address: results[address] for address in addresses}
+
+    async def lookup_thornames_by_names(self, names: Iterable[str]) -> Dict[str, Optional[ThorName]]:
+        """Bulk version of lookup_thorname_by_name; the names that are not registered map to None"""
+        names = [name for name in dict.fromkeys(name.strip() for name in names) if name]
+        results, remaining = {}, []
+        for name in names:
+            if known_name := self._cache.lookup_name_by_address_local(name):
+                results[name] = known_name
+            elif not self._thorname_enabled:
+                results[name] = None
+            else:
+                remaining.append(name)
 
-    async def lookup_multiple_names_by_addresses(self, addresses: Iterable) -> Dict[str, ThorName]:
-        if not addresses:
-            return {}
+        if not remaining:
+            return results
 
-        thor_names = await asyncio.gather(
-            *[self.lookup_name_by_address(address) for address in addresses]
-        )
-        entries = [(address, thor_name) for address, thor_name in zip(addresses, thor_names)]
-        return dict(entries)
+        cached = await self._cache.load_thor_names(remaining)
+        misses = [name for name in remaining if cached.get(name) is None]
+        if misses:
+            fetched = await asyncio.gather(*[self._api.thorname_lookup(name) for name in misses])
+            fetched = dict(zip(misses, fetched))
+            await self._cache.save_thor_names(fetched)  # save anyway, even if there is no registered ThorName!
+            cached.update(fetched)
+
+        for name in remaining:
+            thorname = cached.get(name)
+            results[name] = None if thorname == self._cache.NO_VALUE else thorname
+
+        return results
 
     async def lookup_thorname_by_name(self, name: str, forced=False) -> Optional[ThorName]:
         name = name.strip()
@@ -186,11 +237,35 @@ class THORNameCache:
 
         self.thorname_expire = int(parse_timespan_to_seconds(cfg.as_str('names.thorname.expire', '24h'))) or None
 
+        # addresses without ThorName are remembered for a shorter while: somebody may register one
+        self.negative_expire = int(parse_timespan_to_seconds(cfg.as_str('names.thorname.negative_expire', '1h')))
+        self._no_name_until = LRUCache(self.NEGATIVE_CACHE_SIZE)  # address -> expiry timestamp
+
         self._load_preconfigured_names()
 
+    NEGATIVE_CACHE_SIZE = 10_000
+
     def lookup_name_by_address_local(self, address: str) -> Optional[ThorName]:
         return self._known_address.get(address)
 
+    def is_known_without_name(self, address: str) -> bool:
+        expiry = self._no_name_until.get(address)
+        if expiry is None:
+            return False
+        if expiry < now_ts():
+            self._no_name_until.pop(address)
+            return False
+        return True
+
+    def _remember_names(self, address: str, names: Optional[List[str]]):
+        if names:
+            self._no_name_until.pop(address)
+        elif names is not None and self.negative_expire > 0:
+            self._no_name_until[address] = now_ts() + self.negative_expire
+
+    def _name_list_expire(self, names: List[str]):
+        return self.thorname_expire if names else (self.negative_expire or self.thorname_expire)
+
     def _load_preconfigured_names(self):
         name_dic: dict = self.cfg.get_pure('names.preconfig', {})
         for address, label in name_dic.items():
@@ -212,15 +287,37 @@ class THORNameCache:
         return f'THORName:Address-to-Names:{address}'
 
     async def save_name_list(self, address: str, names: List[str], expiring: bool = True):
-        ex = self.thorname_expire if expiring else None
+        ex = self._name_list_expire(names) if expiring else None
         await self.db.redis.set(self._key_address_to_names(address),
                                 value=json.dumps(names),
                                 ex=ex)
+        self._remember_names(address, names)
 
     async def load_name_list(self, address: str) -> List[str]:
         data = await self.db.redis.get(self._key_address_to_names(address))
         return json.loads(data) if data else None
 
+    async def save_name_lists(self, name_lists: Dict[str, List[str]]):
+        if not name_lists:
+            return
+        pipe = self.db.redis.pipeline()
+        for address, names in name_lists.items():
+            pipe.set(self._key_address_to_names(address), json.dumps(names), ex=self._name_list_expire(names))
+            self._remember_names(address, names)
+        await pipe.execute()
+
+    async def load_name_lists(self, addresses: List[str]) -> Dict[str, Optional[List[str]]]:
+        """Address -> the list of its ThorNames, or None if it is not in the cache"""
+        if not addresses:
+            return {}
+        values = await self.db.redis.mget([self._key_address_to_names(address) for address in addresses])
+        results = {}
+        for address, data in zip(addresses, values):
+            names = json.loads(data) if data else None
+            self._remember_names(address, names)
+            results[address] = names
+        return results
+
     NO_VALUE = 'no_value'
 
     async def save_thor_name(self, name, thorname: ThorName, expiring: bool = True):
@@ -235,6 +332,18 @@ class THORNameCache:
             ex=ex
         )
 
+    async def save_thor_names(self, thornames: Dict[str, Optional[ThorName]], expiring: bool = True):
+        thornames = {name: thorname for name, thorname in thornames.items() if name}
+        if not thornames:
+            return
+
+        ex = self.thorname_expire if expiring else None
+        pipe = self.db.redis.pipeline()
+        for name, thorname in thornames.items():
+            value = thorname.to_json() if thorname else self.NO_VALUE
+            pipe.set(self._key_thorname_to_addresses(name), value, ex=ex)
+        await pipe.execute()
+
     async def save_custom_name(self, name, address: str, expiring: bool = True):
         if not name:
             return
@@ -257,10 +366,30 @@ class THORNameCache:
         except (TypeError, struct.error):
             return
 
+    async def load_thor_names(self, names: List[str]) -> Dict[str, Optional[ThorName]]:
+        """Name -> ThorName, NO_VALUE (known to be not registered) or None (not in the cache)"""
+        if not names:
+            return {}
+
+        values = await self.db.redis.mget([self._key_thorname_to_addresses(name) for name in names])
+        results = {}
+        for name, data in zip(names, values):
+            try:
+                if not data:
+                    results[name] = None
+                elif data == self.NO_VALUE:
+                    results[name] = data
+                else:
+                    results[name] = ThorName().from_json(data)
+            except (TypeError, struct.error):
+                results[name] = None
+        return results
+
     async def clear_cache_for_name(self, name: str):
         await self.db.redis.delete(self._key_thorname_to_addresses(name))
 
     async def clear_cache_for_address(self, address: str):
+        self._no_name_until.pop(address)
         await self.db.redis.delete(self._key_address_to_names(address))
 
 
@@ -322,6 +451,12 @@ class LocalWalletNameDB:
             return
         return await self.db.redis.hget(self.db_key, address)
 
+    async def get_wallet_local_names(self, addresses: List[str]) -> Dict[str, Optional[str]]:
+        if not addresses or not self.user_id:
+            return {}
+        names = await self.db.redis.hmget(self.db_key, addresses)
+        return dict(zip(addresses, names))
+
     async def delete_wallet_local_name(self, address: str):
         if not address or not self.user_id:
             return
@@ -1,6 +1,52 @@
-from services.lib.cooldown import Cooldown
+import asyncio
+import time
+
+from services.lib.cooldown import Cooldown, LUA_READ_COOLDOWN
+from services.lib.date_utils import now_ts
 from services.lib.db import DB
 
+# GCRA. KEYS[1] = TAT key; ARGV: limit, period
+# Returns 1 if limited, 0 if the call is allowed (and counted)
+LUA_GCRA = """
+-- TIME before writes: replicate the effects, not the script (needed before Redis 5)
+if redis.replicate_commands then redis.replicate_commands() end
+
+local function is_limited(key, limit, period)
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) * 1e-6
+    local separation = period / limit
+    local tat = tonumber(redis.call('GET', key) or 0) or 0
+    if tat < now then tat = now end
+    if tat - now <= period - separation then
+        local new_tat = tat + separation
+        -- the key is useless after TAT is gone
+        redis.call('SET', key, string.format('%.6f', new_tat), 'EX', math.ceil(new_tat - now) + 1)
+        return 0
+    end
+    return 1
+end
+"""
+
+LUA_RATE_LIMIT = LUA_GCRA + """
+return is_limited(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]))
+"""
+
+# KEYS: TAT key, cooldown key; ARGV: limit, period, cooldown, now
+# Returns 0 = good, 1 = just hit the limit (cooldown starts), 2 = on cooldown
+LUA_RATE_LIMIT_COOLDOWN = LUA_GCRA + LUA_READ_COOLDOWN + """
+local now = tonumber(ARGV[4])
+local cooldown = tonumber(ARGV[3])
+local t = read_cooldown(KEYS[2])
+if now - cooldown <= t then
+    return 2
+end
+if is_limited(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2])) == 0 then
+    return 0
+end
+redis.call('SET', KEYS[2], cjson.encode({time = now, count = 0}))
+return 1
+"""
+
 
 class RateLimiter:
     def __init__(self, db: DB, key, limit: int, period: float):
@@ -27,19 +73,8 @@ class RateLimiter:
         if limit <= 0 or period <= 0:
             return False
 
-        key = cls._full_key(key)
-
-        r = db.redis
-        sec, micro_sec = (await r.time())
-        t = sec + micro_sec * 1e-6
-        separation = period / limit
-        await r.setnx(key, 0.0)
-        tat = max(float(await r.get(key)), t)
-        if tat - t <= period - separation:
-            new_tat = max(tat, t) + separation
-            await r.set(key, new_tat)
-            return False
-        return True
+        # check and update in one atomic call
+        return bool(await db.run_script(LUA_RATE_LIMIT, keys=[cls._full_key(key)], args=[limit, period]))
 
     @classmethod
     async def clear_s(cls, db: DB, key: str):
@@ -52,16 +87,89 @@ class RateLimitCooldown(RateLimiter):
     GOOD = 'good'
 
     def __init__(self, db: DB, key, limit: int, period: float, cd_sec: float):
+        if not key:
+            raise ValueError('RateLimitCooldown needs a key')
         super().__init__(db, key, limit, period)
         self.cd = Cooldown(db, f'RateLimitCooldown:{key}', cd_sec)
 
+    _OUTCOMES = [GOOD, HIT_LIMIT, ON_COOLDOWN]
+
     async def hit(self):
-        if not await self.cd.can_do():
-            return self.ON_COOLDOWN
-        else:
-            good = not await self.is_limited()
-            if good:
-                return self.GOOD
-            else:
-                await self.cd.do()
-                return self.HIT_LIMIT
+        if self.limit <= 0 or self.period <= 0:
+            return self.GOOD
+
+        # cooldown check, rate limit and starting the cooldown: one atomic call
+        outcome = await self.db.run_script(
+            LUA_RATE_LIMIT_COOLDOWN,
+            keys=[self._full_key(self.key), Cooldown.get_key(self.cd.event_name)],
+            args=[self.limit, self.period, self.cd.cooldown, now_ts()]
+        )
+        return self._OUTCOMES[int(outcome)]
+
+
+class TokenBucket:
+    """
+    In-process async rate limiter: "rate" tokens per second, up to "burst" tokens accumulated.
+    acquire() waits until a token is available; the waiters are served in FIFO order.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        assert rate > 0 and burst >= 1
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._last = self._now()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.total_acquired = 0
+        self.total_wait_time = 0.0
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def _refill(self):
+        now = self._now()
+        if now > self._last:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def _delay_needed(self, tokens):
+        now = self._now()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill()
+        if self._tokens >= tokens:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens=1.0):
+        t0 = self._now()
+        async with self._lock:
+            while (delay := self._delay_needed(tokens)) > 0:
+                await asyncio.sleep(delay)
+            self._tokens -= tokens
+        self.total_acquired += 1
+        self.total_wait_time += self._now() - t0
+
+    def try_acquire(self, tokens=1.0) -> float:
+        """Takes the tokens if they are available right now (returns 0), otherwise returns how long to wait"""
+        delay = self._delay_needed(tokens)
+        if delay > 0:
+            return delay
+        self._tokens -= tokens
+        self.total_acquired += 1
+        return 0.0
+
+    def backoff(self, seconds: float):
+        """The server asked to slow down (e.g. 503 or 429): no tokens for a while and the bucket is drained"""
+        self._paused_until = max(self._paused_until, self._now() + seconds)
+        self._tokens = 0.0
+        self._last = self._paused_until
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
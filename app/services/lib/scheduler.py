@@ -4,6 +4,7 @@ from redis.asyncio import Redis
 
 from services.lib.date_utils import now_ts, DAY
 from services.lib.delegates import WithDelegates
+from services.lib.key_registry import KeyRegistry
 from services.lib.utils import WithLogger
 
 
@@ -16,6 +17,8 @@ class Scheduler(WithLogger, WithDelegates):
         self._r = r
         self._running = False
         self.forget_after = forget_after
+        # idents of the periodic events
+        self._periodic_registry = KeyRegistry(r, f'Scheduler:{name}:Periodic')
 
     async def schedule(self, ident, timestamp=0.0, period=0.0):
         assert isinstance(ident, (str, int, float)) and ident, 'ident must be a string or number'
@@ -35,8 +38,10 @@ class Scheduler(WithLogger, WithDelegates):
         key_period = self.key_period(ident)
         if period > 0:
             await self._r.set(key_period, period)
+            await self._periodic_registry.add(ident)
         else:
             await self._r.delete(key_period)
+            await self._periodic_registry.remove(ident)
 
     def ev_desc(self, ident):
         return f'"{self.name}:{ident}"'
@@ -82,19 +87,26 @@ class Scheduler(WithLogger, WithDelegates):
     async def awaiting_events(self):
         return await self._r.zrange(self.key_timeline(), 0, -1, withscores=True)
 
+    async def all_periodic_idents(self, ident_pattern=None):
+        prefix = self.key_period('')
+        await self._periodic_registry.ensure_built(self.key_period('*'), name_from_key=lambda k: k[len(prefix):])
+        return await self._periodic_registry.match(ident_pattern or '*')
+
     async def all_periodic_events(self, ident=None):
-        return await self._r.keys(self.key_period(ident or '*'))
+        return [self.key_period(i) for i in await self.all_periodic_idents(ident)]
 
     async def cancel(self, ident):
         await self._r.zrem(self.key_timeline(), ident)
         await self._r.delete(self.key_period(ident))
+        await self._periodic_registry.remove(ident)
         self.logger.debug(f'Cancelled: {self.ev_desc(ident)}')
 
     async def cancel_all_periodic(self, ident=None):
-        keys = await self.all_periodic_events(ident)
-        if keys:
-            await self._r.delete(*keys)
-            await self._r.zrem(self.key_timeline(), *keys)
+        idents = list(await self.all_periodic_idents(ident))
+        if idents:
+            await self._r.delete(*(self.key_period(i) for i in idents))
+            await self._r.zrem(self.key_timeline(), *idents)
+            await self._periodic_registry.remove(*idents)
 
     async def _process(self):
         now = now_ts()
@@ -4,6 +4,7 @@ from services.lib.config import Config
 from services.lib.db import DB
 from services.lib.db_one2one import OneToOne
 from services.lib.delegates import INotified, WithDelegates
+from services.lib.key_registry import KeyRegistry
 from services.lib.utils import random_hex, WithLogger
 from services.models.node_watchers import AlertWatchers
 from services.notify.channel import Messengers, ChannelDescriptor
@@ -21,6 +22,7 @@ class SettingsManager(WithDelegates, WithLogger):
         self.cfg = cfg
         self.public_url = cfg.as_str('web.public_url').rstrip('/')
         self.token_channel_db = OneToOne(db, 'Token-Channel')
+        self.channel_registry = KeyRegistry(db, 'Settings:Data')
 
     def get_link(self, token):
         return f'{self.public_url}/?token={token}'
@@ -82,10 +84,12 @@ class SettingsManager(WithDelegates, WithLogger):
 
         if settings:
             await self.db.redis.set(self.db_key_settings(channel_id), ujson.dumps(settings))
+            await self.channel_registry.add(channel_id)
             # additional processing
             await self.pass_data_to_listeners((channel_id, settings))
         else:
             await self.db.redis.delete(self.db_key_settings(channel_id))
+            await self.channel_registry.remove(channel_id)
 
     def get_context(self, user_id) -> 'SettingsContext':
         return SettingsContext(self, user_id)
@@ -97,9 +101,10 @@ class SettingsManager(WithDelegates, WithLogger):
             self.logger.warning(f'Auto-paused alerts for {user}! It is marked as "Inactive" now!')
 
     async def all_users_having_settings(self):
-        pattern = self.db_key_settings('*')
-        keys = await self.db.redis.keys(pattern)
-        return [str(k).split(':', 3)[2] for k in keys]
+        prefix = self.db_key_settings('')
+        await self.channel_registry.ensure_built(self.db_key_settings('*'),
+                                                 name_from_key=lambda k: str(k)[len(prefix):])
+        return list(await self.channel_registry.all())
 
 
 class SettingsContext:
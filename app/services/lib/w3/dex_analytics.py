@@ -2,7 +2,7 @@ import json
 from contextlib import suppress
 from typing import List, NamedTuple, Dict
 
-from services.lib.date_utils import DAY
+from services.lib.date_utils import DAY, now_ts
 from services.lib.delegates import INotified
 from services.lib.depcont import DepContainer
 from services.lib.utils import WithLogger
@@ -56,7 +56,7 @@ class DexAnalyticsCollector(WithLogger, INotified):
     def __init__(self, deps: DepContainer):
         super().__init__()
         self.deps = deps
-        self.series = TimeSeries(self.KEY_DEX_TIME_SERIES, deps.db)
+        self.series = TimeSeries(self.KEY_DEX_TIME_SERIES, deps.db, max_len=self.MAX_POINTS)
 
     async def is_counted(self, tx_hash) -> bool:
         if tx_hash:
@@ -101,7 +101,6 @@ class DexAnalyticsCollector(WithLogger, INotified):
                         volume=tx.full_rune,
                     )
                     await self._mark_as_counted(tx_hash)
-        await self.series.trim_oldest(self.MAX_POINTS)
 
     @staticmethod
     def make_dex_report_entry(points: List[DexTxPoint], name=None):
@@ -109,6 +108,15 @@ class DexAnalyticsCollector(WithLogger, INotified):
             name, sum(p.rune_volume for p in points), len(points)
         )
 
+    def usd_per_rune_over(self, period) -> float:
+        """Average CACAO price over the period from the in-memory price history; the current one if it has no data"""
+        cache = self.deps.price_history
+        if cache and cache.covers(period):
+            now = now_ts()
+            if (price := cache.average(cache.COL_POOL_PRICE, now - period, now)) is not None:
+                return price
+        return self.deps.price_holder.usd_per_rune
+
     async def get_analytics(self, period=DAY) -> DexReport:
         def cvt_point(point) -> DexTxPoint:
             ts, d = point
@@ -158,6 +166,6 @@ class DexAnalyticsCollector(WithLogger, INotified):
             swap_ins=swap_in_report,
             swap_outs=swap_out_report,
             period_sec=period,
-            usd_per_rune=self.deps.price_holder.usd_per_rune,
+            usd_per_rune=self.usd_per_rune_over(period),
             points=all_points,
         )
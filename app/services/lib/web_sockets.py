@@ -1,5 +1,6 @@
 import abc
 import asyncio
+import inspect
 import socket
 
 import ujson
@@ -8,6 +9,10 @@ import websockets
 from services.lib.utils import WithLogger
 from services.lib.texts import shorten_text
 
+# websockets >= 14 renamed "extra_headers" to "additional_headers"
+_HEADERS_ARG = 'additional_headers' if 'additional_headers' in inspect.signature(websockets.connect).parameters \
+    else 'extra_headers'
+
 
 class WSClient(WithLogger, abc.ABC):
     @abc.abstractmethod
@@ -17,6 +22,9 @@ class WSClient(WithLogger, abc.ABC):
     async def on_connected(self):
         ...
 
+    async def on_disconnected(self):
+        ...
+
     def __init__(self, url, reply_timeout=13.3, ping_timeout=5, sleep_time=5, headers=None):
         self.url = url
         self.reply_timeout = reply_timeout
@@ -34,41 +42,47 @@ class WSClient(WithLogger, abc.ABC):
     async def listen_forever(self):
         while True:
             self.logger.info(f'Creating new connection... to {self.url}')
+            reconnect_delay = 0
             try:
-                async with websockets.connect(self.url, extra_headers=self.headers) as self.ws:
-                    await self.on_connected()
-                    while True:
-                        # listener loop
-                        try:
-                            reply = await asyncio.wait_for(self.ws.recv(), timeout=self.reply_timeout)
-                        except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                async with websockets.connect(self.url, **{_HEADERS_ARG: self.headers}) as self.ws:
+                    try:
+                        await self.on_connected()
+                        while True:
+                            # listener loop
                             try:
-                                if self.ping_timeout:
-                                    pong = await self.ws.ping()
-                                    await asyncio.wait_for(pong, timeout=self.ping_timeout)
-                                    self.logger.info('Ping OK, keeping connection alive...')
-                                    continue
-                                else:
-                                    self.logger.warning('Reconnect on timeout!')
+                                reply = await asyncio.wait_for(self.ws.recv(), timeout=self.reply_timeout)
+                            except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                                try:
+                                    if self.ping_timeout:
+                                        pong = await self.ws.ping()
+                                        await asyncio.wait_for(pong, timeout=self.ping_timeout)
+                                        self.logger.info('Ping OK, keeping connection alive...')
+                                        continue
+                                    else:
+                                        self.logger.warning('Reconnect on timeout!')
+                                        break
+                                except Exception:
+                                    self.logger.info(
+                                        'Ping error - retrying connection in {} sec (Ctrl-C to quit)'.format(
+                                            self.sleep_time))
+                                    reconnect_delay = self.sleep_time
                                     break
-                            except Exception:
-                                self.logger.info(
-                                    'Ping error - retrying connection in {} sec (Ctrl-C to quit)'.format(
-                                        self.sleep_time))
-                                await asyncio.sleep(self.sleep_time)
-                                break
-                        self.logger.debug('Server said > {}'.format(reply))
-                        try:
-                            message = ujson.loads(reply)
-                            await self.handle_wss_message(message)
-                        except (ValueError, TypeError, LookupError) as e:
-                            r = shorten_text(reply, 256)
-                            self.logger.error(f'Error decoding WebSocket JSON message! {e!r} Data: "{r}"')
-                        except Exception as e:
-                            if not self.exception_safe:
-                                raise
-                            else:
-                                self.logger.error(f'Other error: {e!r}')
+                            self.logger.debug('Server said > {}'.format(reply))
+                            try:
+                                message = ujson.loads(reply)
+                                await self.handle_wss_message(message)
+                            except (ValueError, TypeError, LookupError) as e:
+                                r = shorten_text(reply, 256)
+                                self.logger.error(f'Error decoding WebSocket JSON message! {e!r} Data: "{r}"')
+                            except Exception as e:
+                                if not self.exception_safe:
+                                    raise
+                                else:
+                                    self.logger.error(f'Other error: {e!r}')
+                    finally:
+                        await self.on_disconnected()
+                if reconnect_delay:
+                    await asyncio.sleep(reconnect_delay)
 
             except socket.gaierror:
                 self.logger.warning(f'Socket error - retrying connection in {self.sleep_time} sec ')
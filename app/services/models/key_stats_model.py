@@ -98,6 +98,7 @@ class SwapRouteEntry(NamedTuple):
     from_asset: str
     to_asset: str
     volume_cacao: float
+    count: int = 0
 
 
 class MayaDividend(NamedTuple):
@@ -70,7 +70,8 @@ class MimirVoting:
 
 class MimirVoteManager:
     def __init__(self, all_votes: List[ThorMimirVote], active_nodes: List[NodeInfo], exclude_keys):
-        active_signers = [n.node_address for n in active_nodes if n.node_address and n.is_active]
+        active_signers = {n.node_address for n in active_nodes if n.node_address and n.is_active}
+        exclude_keys = set(exclude_keys)
 
         # only active signer is allowed to vote
         active_votes = [vote for vote in all_votes if vote.singer in active_signers]
@@ -78,17 +79,17 @@ class MimirVoteManager:
         self.votes = active_votes
         self.active_node_count = len(active_nodes)
 
-        self.all_voting = {}
+        self.all_voting: Dict[str, MimirVoting] = {}
         for vote in active_votes:
             if vote.key in exclude_keys:
                 continue
-            if vote.key not in self.all_voting:
-                self.all_voting[vote.key] = MimirVoting(vote.key, {}, self.active_node_count, [])
             voting = self.all_voting.get(vote.key)
-            if voting:
-                if vote.value not in voting.options:
-                    voting.options[vote.value] = MimirVoteOption(vote.value, [])
-                voting.options[vote.value].signers.append(vote.singer)
+            if voting is None:
+                voting = self.all_voting[vote.key] = MimirVoting(vote.key, {}, self.active_node_count, [])
+            option = voting.options.get(vote.value)
+            if option is None:
+                option = voting.options[vote.value] = MimirVoteOption(vote.value, [])
+            option.signers.append(vote.singer)
 
         for voting in self.all_voting.values():
             voting.finalize_calculations()
@@ -97,8 +98,8 @@ class MimirVoteManager:
     def all_voting_list(self) -> List[MimirVoting]:
         return list(self.all_voting.values())
 
-    def find_voting(self, const_name):
-        return next((v for v in self.all_voting.values() if v.key == const_name), None)
+    def find_voting(self, const_name) -> Optional[MimirVoting]:
+        return self.all_voting.get(const_name)
 
 
 @dataclass
@@ -4,7 +4,7 @@ from typing import List, Optional, Set
 
 from services.jobs.fetch.circulating import CacaoCirculatingSupply
 from services.lib.config import Config
-from services.lib.constants import BTC_SYMBOL, STABLE_COIN_POOLS, thor_to_float
+from services.lib.constants import BTC_SYMBOL, STABLE_COIN_POOLS, thor_to_float, cacao_to_float
 from services.lib.date_utils import now_ts, DAY
 from services.lib.money import weighted_mean, Asset, is_cacao
 from services.lib.texts import fuzzy_search
@@ -63,6 +63,10 @@ class RuneMarketInfo:
     def total_active_pools(self):
         return len([p for p in self.pools.values() if p.is_enabled])
 
+    @property
+    def total_pooled_cacao(self):
+        return sum(cacao_to_float(p.balance_rune) for p in (self.pools or {}).values() if p.is_enabled)
+
 
 REAL_REGISTERED_ATH = 0.806  # $ / Cacao
 REAL_REGISTERED_ATH_DATE = 1700155613  # 17 nov 2023
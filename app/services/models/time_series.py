@@ -1,8 +1,8 @@
 import json
 import logging
-from typing import Tuple
+from typing import Tuple, List, NamedTuple, Optional
 
-from services.lib.date_utils import now_ts, MINUTE
+from services.lib.date_utils import now_ts, MINUTE, HOUR, DAY
 from services.lib.db import DB
 
 MAX_POINTS_DEFAULT = 10000
@@ -11,9 +11,15 @@ MS = 1000  # milliseconds in 1 second
 
 
 class TimeSeries:
-    def __init__(self, name: str, db: DB):
+    def __init__(self, name: str, db: DB, max_len: Optional[int] = None, max_age: Optional[float] = None):
+        """
+        :param max_len: the stream is trimmed to about this number of points on every insert (XADD MAXLEN ~)
+        :param max_age: or the points older than this (sec) are trimmed on insert (XADD MINID ~)
+        """
         self.db = db
         self.name = name
+        self.max_len = max_len
+        self.max_age = max_age
 
     @property
     def stream_name(self):
@@ -52,10 +58,19 @@ class TimeSeries:
         exact_point = ref_ts - ago_sec
         if tolerance_percent is not None:
             tolerance_sec = max(tolerance_sec, ago_sec * tolerance_percent * 0.01)
-        points = await self.select(*self.range_ago(ago_sec, tolerance_sec))
+        start, end = self.range_ago(ago_sec, tolerance_sec)
+        exact_id = int(exact_point * MS)
+
+        # only the nearest point on either side is needed
+        r = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.xrange(self.stream_name, max(start, exact_id), end, count=1)
+            pipe.xrevrange(self.stream_name, min(end, exact_id), start, count=1)
+            after, before = await pipe.execute()
+
         best_point = None
         best_diff = 1e30
-        for index, data in points:
+        for index, data in after + before:
             ts = self.get_ts_from_index(index)
             diff = abs(exact_point - ts)
             if diff < best_diff:
@@ -103,11 +118,17 @@ class TimeSeries:
         values = await self.get_last_values(period_sec, key, max_points, tolerance_sec)
         return sum(values)
 
+    def _trim_args(self):
+        if self.max_age:
+            return {'minid': int((now_ts() - self.max_age) * MS), 'approximate': True}
+        elif self.max_len:
+            return {'maxlen': self.max_len, 'approximate': True}
+        return {}
+
     async def add(self, message_id=b'*', **kwargs):
+        """Returns the ID of the new point"""
         r = await self.db.get_redis()
-        # todo: MAXLEN
-        # todo: usage: XADD mystream MAXLEN ~ 1000 * ... entry fields here ...
-        await r.xadd(self.stream_name, kwargs, id=message_id)
+        return await r.xadd(self.stream_name, kwargs, id=message_id, **self._trim_args())
 
     async def add_as_json(self, j: dict = None, message_id=b'*'):
         await self.add(message_id, json=json.dumps(j))
@@ -141,26 +162,243 @@ class TimeSeries:
                 yield ts, v
                 ts0 = ts
 
-    async def trim_oldest(self, max_len):
+    async def trim_oldest(self, max_len, approximate=True):
+        """
+        One-off trimming. For a regular one, pass "max_len" to the constructor: then it happens on insert.
+        """
         if not max_len:
             return
-        prev_len = await self.get_length()
-        await self.db.redis.xtrim(self.stream_name, maxlen=max_len)
-        curr_len = await self.get_length()
-        if curr_len != prev_len:
-            logging.debug(f'Stream {self.stream_name} purged {prev_len - curr_len} old points. Now: {curr_len}.')
+        r = await self.db.get_redis()
+        purged = await r.xtrim(self.stream_name, maxlen=max_len, approximate=approximate)
+        if purged:
+            logging.debug(f'Stream {self.stream_name} purged {purged} old points.')
+        return purged
+
+    async def trim_older_than(self, age_sec, approximate=True):
+        r = await self.db.get_redis()
+        purged = await r.xtrim(self.stream_name, minid=int((now_ts() - age_sec) * MS), approximate=approximate)
+        if purged:
+            logging.debug(f'Stream {self.stream_name} purged {purged} points older than {age_sec} sec.')
+        return purged
 
     async def get_length(self):
         return int(await self.db.redis.xlen(self.stream_name))
 
 
+ROLLUP_RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+# KEYS: (open bucket hash, rollup stream) for every resolution
+# ARGV: timestamp (ms), value, max length of the rollup streams, resolutions (ms)...
+LUA_ROLLUP_UPDATE = """
+local ts = tonumber(ARGV[1])
+local value = tonumber(ARGV[2])
+local max_len = ARGV[3]
+
+local function num(x)
+    return string.format('%.17g', x)
+end
+
+local function int(x)
+    return string.format('%d', x)
+end
+
+for i = 1, #KEYS / 2 do
+    local current, stream = KEYS[2 * i - 1], KEYS[2 * i]
+    local resolution = tonumber(ARGV[3 + i])
+    local bucket = ts - ts % resolution
+    local h = redis.call('HMGET', current, 'bucket', 'count', 'sum', 'min', 'max', 'last')
+    local open_bucket = tonumber(h[1])
+
+    if open_bucket == bucket then
+        redis.call('HSET', current,
+            'count', tonumber(h[2]) + 1,
+            'sum', num(tonumber(h[3]) + value),
+            'min', num(math.min(tonumber(h[4]), value)),
+            'max', num(math.max(tonumber(h[5]), value)),
+            'last', num(value))
+    elseif open_bucket == nil or bucket > open_bucket then
+        if open_bucket ~= nil then
+            local count = tonumber(h[2])
+            -- pcall: the bucket may be in the stream already after a rebuild
+            redis.pcall('XADD', stream, 'MAXLEN', '~', max_len, int(open_bucket) .. '-0',
+                'avg', num(tonumber(h[3]) / count), 'min', h[4], 'max', h[5], 'last', h[6], 'count', count)
+        end
+        redis.call('HSET', current,
+            'bucket', int(bucket), 'count', 1,
+            'sum', num(value), 'min', num(value), 'max', num(value), 'last', num(value))
+    end
+    -- a late point of an already closed bucket is not counted
+end
+return 1
+"""
+
+
+class RollupPoint(NamedTuple):
+    ts: float  # start of the bucket, sec
+    avg: float
+    min: float
+    max: float
+    last: float
+    count: int
+
+
+class TimeSeriesRollup:
+    """
+    Downsampled copies of one numeric field of a TimeSeries: a stream per resolution (1m, 1h, 1d by default),
+    one entry (avg/min/max/last/count) per closed bucket. The open bucket is kept in a hash until the next one starts.
+    Long-range queries read the coarsest resolution that is accurate enough instead of the raw points.
+    """
+
+    def __init__(self, series: TimeSeries, field: str, resolutions=ROLLUP_RESOLUTIONS, max_len=20_000):
+        self.series = series
+        self.field = field
+        self.resolutions = sorted(int(res) for res in resolutions)
+        self.max_len = max_len
+
+    @property
+    def db(self) -> DB:
+        return self.series.db
+
+    def stream_name(self, resolution):
+        return f'{self.series.stream_name}:rollup:{int(resolution)}'
+
+    def current_key(self, resolution):
+        return f'{self.stream_name(resolution)}:current'
+
+    def _keys(self):
+        keys = []
+        for res in self.resolutions:
+            keys += [self.current_key(res), self.stream_name(res)]
+        return keys
+
+    async def update(self, ts: float, value: float):
+        await self.db.run_script(
+            LUA_ROLLUP_UPDATE,
+            keys=self._keys(),
+            args=[int(ts * MS), value, self.max_len, *(res * MS for res in self.resolutions)]
+        )
+
+    def resolution_for_tolerance(self, tolerance_sec) -> Optional[int]:
+        """The coarsest resolution not exceeding the tolerance"""
+        fitting = [res for res in self.resolutions if res <= tolerance_sec]
+        return fitting[-1] if fitting else None
+
+    def resolution_for_period(self, period_sec, min_points) -> Optional[int]:
+        """The coarsest resolution that still gives at least "min_points" points over the period"""
+        fitting = [res for res in self.resolutions if period_sec / res >= min_points]
+        return fitting[-1] if fitting else None
+
+    @staticmethod
+    def _parse(ts, d: dict) -> RollupPoint:
+        return RollupPoint(
+            ts, float(d['avg']), float(d['min']), float(d['max']), float(d['last']), int(d['count'])
+        )
+
+    async def select(self, resolution, start_sec, end_sec, count=None) -> List[RollupPoint]:
+        """Buckets overlapping [start_sec, end_sec], including the open one"""
+        start_ms = int(start_sec // resolution * resolution * MS)
+        end_ms = int(end_sec * MS)
+
+        r = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.xrange(self.stream_name(resolution), start_ms, end_ms, count=count)
+            pipe.hgetall(self.current_key(resolution))
+            closed, current = await pipe.execute()
+
+        points = [self._parse(TimeSeries.get_ts_from_index(index), d) for index, d in closed]
+        if current and start_ms <= int(current['bucket']) <= end_ms and (not count or len(points) < count):
+            n = int(current['count'])
+            points.append(self._parse(int(current['bucket']) / MS, {
+                **current,
+                'avg': float(current['sum']) / n,
+            }))
+        return points
+
+    async def clear(self):
+        r = await self.db.get_redis()
+        keys = self._keys()
+        await r.delete(*keys)
+
+    async def rebuild(self, batch_size=10_000):
+        """
+        Recalculates all the rollups from the raw points. Stop the writers while it works.
+        Returns the number of raw points read.
+        """
+        r = await self.db.get_redis()
+        buckets = {res: {} for res in self.resolutions}
+
+        n = 0
+        start = '-'
+        while True:
+            points = await r.xrange(self.series.stream_name, start, '+', count=batch_size)
+            for index, d in points:
+                try:
+                    value = float(d[self.field])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                ts_ms = int(index.split('-')[0])
+                n += 1
+                for res in self.resolutions:
+                    res_ms = res * MS
+                    bucket = ts_ms - ts_ms % res_ms
+                    b = buckets[res].get(bucket)
+                    if b is None:
+                        buckets[res][bucket] = [1, value, value, value, value]  # count, sum, min, max, last
+                    else:
+                        b[0] += 1
+                        b[1] += value
+                        b[2] = min(b[2], value)
+                        b[3] = max(b[3], value)
+                        b[4] = value
+            if len(points) < batch_size:
+                break
+            start = '(' + points[-1][0]
+
+        await self.clear()
+        for res in self.resolutions:
+            items = sorted(buckets[res].items())[-(self.max_len + 1):]
+            if not items:
+                continue
+            *closed, (open_bucket, (count, total, min_v, max_v, last)) = items
+            async with r.pipeline(transaction=False) as pipe:
+                for bucket, (c, s, mi, ma, la) in closed:
+                    pipe.xadd(self.stream_name(res), {
+                        'avg': s / c, 'min': mi, 'max': ma, 'last': la, 'count': c
+                    }, id=f'{bucket}-0')
+                pipe.hset(self.current_key(res), mapping={
+                    'bucket': open_bucket, 'count': count, 'sum': total, 'min': min_v, 'max': max_v, 'last': last
+                })
+                await pipe.execute()
+        return n
+
+
 class PriceTimeSeries(TimeSeries):
-    def __init__(self, coin: str, db: DB):
-        super().__init__(f'price-{coin}', db)
+    def __init__(self, coin: str, db: DB, max_len: Optional[int] = None):
+        super().__init__(f'price-{coin}', db, max_len=max_len)
+        self.rollup = TimeSeriesRollup(self, self.KEY)
 
     KEY = 'price'
 
-    async def select_average_ago(self, ago, tolerance):
+    async def add(self, message_id=b'*', **kwargs):
+        message_id = await super().add(message_id, **kwargs)
+        if message_id and kwargs.get(self.KEY) is not None:
+            await self.rollup.update(self.get_ts_from_index(message_id), float(kwargs[self.KEY]))
+        return message_id
+
+    async def clear(self):
+        await super().clear()
+        await self.rollup.clear()
+
+    async def select_average_ago(self, ago, tolerance, use_rollups=True):
+        if use_rollups:
+            resolution = self.rollup.resolution_for_tolerance(tolerance)
+            if resolution:
+                now = now_ts()
+                buckets = await self.rollup.select(resolution, now - ago - tolerance, now - ago + tolerance)
+                buckets = [b for b in buckets if b.avg > 0]
+                if buckets:
+                    return sum(b.avg * b.count for b in buckets) / sum(b.count for b in buckets)
+
         items = await self.select(*self.range_ago(ago, tolerance))
         n, accum = 0, 0
         for _, item in items:
@@ -182,3 +420,18 @@ class PriceTimeSeries(TimeSeries):
                               decoder=float):
         key = key or self.KEY
         return await super().get_last_values(period_sec, key, max_points, tolerance_sec, with_ts)
+
+    async def get_last_values_rolled(self, period_sec, min_points=150, min_resolution=HOUR,
+                                     max_points=MAX_POINTS_DEFAULT, with_ts=False):
+        """
+        Averages of the coarsest rollup that gives at least "min_points" points over the period.
+        Falls back to the raw points if the period is too short or the rollups do not cover it (not built yet).
+        The prices come once a minute, so by default the 1m rollup is not used here: it is as big as the raw stream.
+        """
+        resolution = self.rollup.resolution_for_period(period_sec, min_points)
+        if resolution and resolution >= min_resolution:
+            start = now_ts() - period_sec
+            buckets = await self.rollup.select(resolution, start, now_ts())
+            if buckets and buckets[0].ts <= start + resolution:
+                return [(b.ts, b.avg) if with_ts else b.avg for b in buckets]
+        return await self.get_last_values(period_sec, max_points=max_points, with_ts=with_ts)
@@ -1,15 +1,18 @@
 import asyncio
 import random
+import weakref
 from typing import List
 
 from localization.eng_base import BaseLocalization
 from localization.manager import LocalizationManager
+from services.lib.config import SubConfig
 from services.lib.date_utils import parse_timespan_to_seconds, now_ts, DAY
 from services.lib.depcont import DepContainer
 from services.lib.rate_limit import RateLimitCooldown
 from services.lib.texts import shorten_text
 from services.lib.utils import WithLogger
-from services.notify.channel import Messengers, ChannelDescriptor, CHANNEL_INACTIVE, BoardMessage
+from services.notify.channel import Messengers, ChannelDescriptor, CHANNEL_INACTIVE, BoardMessage, DeliveryRetry
+from services.notify.delivery import DeliveryEngine, PRIORITY_HIGH, PRIORITY_NORMAL
 
 
 class Broadcaster(WithLogger):
@@ -19,8 +22,8 @@ class Broadcaster(WithLogger):
         super().__init__()
         self.deps = d
 
-        self._broadcast_lock = asyncio.Lock()
-        self._rate_limit_lock = asyncio.Lock()
+        # one lock per channel: the rate limiter's check and update must not interleave
+        self._rate_limit_locks = weakref.WeakValueDictionary()
         self._rng = random.Random(now_ts())
 
         # public channels
@@ -35,6 +38,8 @@ class Broadcaster(WithLogger):
         self._limit_period = parse_timespan_to_seconds(_rate_limit_cfg.as_str('period', '1m'))
         self._limit_cooldown = parse_timespan_to_seconds(_rate_limit_cfg.as_str('cooldown', '5m'))
 
+        self.delivery = DeliveryEngine.from_config(self._send_now, d.cfg.get('broadcasting.delivery', SubConfig({})))
+
     def get_channels(self, channel_type):
         return [c for c in self.channels if c.type == channel_type]
 
@@ -58,15 +63,18 @@ class Broadcaster(WithLogger):
             await self.broadcast(all_channels, f, *args, **kwargs)
             return
 
-        # not to generate same content for different channels with the same languages. test it!
+        # not to generate same content for different channels with the same languages.
+        # The rendering in progress is shared too, so the concurrent callers do not render it again
         results_cached_by_lang = {}
 
         async def message_gen(chat_id):
             locale: BaseLocalization = user_lang_map[chat_id]
 
-            if prev_content := results_cached_by_lang.get(locale.name):
-                return prev_content
+            if (task := results_cached_by_lang.get(locale.name)) is None:
+                task = results_cached_by_lang[locale.name] = asyncio.ensure_future(render(locale))
+            return await asyncio.shield(task)
 
+        async def render(locale: BaseLocalization):
             if hasattr(locale, f.__name__):
                 # if we pass function name it like "BaseLocalization.notification_text_foo"
                 loc_f = getattr(locale, f.__name__)
@@ -77,12 +85,9 @@ class Broadcaster(WithLogger):
                 call_args = [locale, *args]
 
             if asyncio.iscoroutinefunction(loc_f):
-                result = await loc_f(*call_args, **kwargs)
+                return await loc_f(*call_args, **kwargs)
             else:
-                result = loc_f(*call_args, **kwargs)
-
-            results_cached_by_lang[locale.name] = result
-            return result
+                return loc_f(*call_args, **kwargs)
 
         await self.broadcast(all_channels, message_gen)
 
@@ -106,9 +111,16 @@ class Broadcaster(WithLogger):
             else:
                 self.logger.warning(f'Fail counter for {channel_id} is {context.fail_counter}/{max_fails}.')
 
-    # noinspection PyBroadException
     async def safe_send_message(self, channel_info: ChannelDescriptor,
-                                message: BoardMessage, **kwargs) -> bool:
+                                message: BoardMessage, priority=PRIORITY_NORMAL, **kwargs) -> bool:
+        """Puts the message in the platform's delivery queue and waits until it is sent"""
+        if isinstance(message, str):
+            message = BoardMessage(message)
+        return await self.delivery.deliver(channel_info, message, priority, **kwargs)
+
+    # noinspection PyBroadException
+    async def _send_now(self, channel_info: ChannelDescriptor,
+                        message: BoardMessage, **kwargs) -> bool:
         result = False
         try:
             if isinstance(message, str):
@@ -125,6 +137,8 @@ class Broadcaster(WithLogger):
                         await self._handle_bad_user(channel_info)
                 else:
                     self.logger.error(f'{channel_info.type} bot is disabled!')
+        except DeliveryRetry:
+            raise  # the delivery queue reschedules it
         except Exception:
             self.logger.exception('We are still safe!', stack_info=True)
 
@@ -132,7 +146,11 @@ class Broadcaster(WithLogger):
 
     async def safe_send_message_rate(self, channel_info: ChannelDescriptor,
                                      message: BoardMessage, **kwargs) -> (bool, bool):
-        async with self._rate_limit_lock:
+        key = channel_info.short_coded
+        if (lock := self._rate_limit_locks.get(key)) is None:
+            lock = self._rate_limit_locks[key] = asyncio.Lock()
+
+        async with lock:
             message = await self._form_message(message, channel_info)
 
             limiter = RateLimitCooldown(self.deps.db,
@@ -144,12 +162,12 @@ class Broadcaster(WithLogger):
             send_result = None
             if outcome == limiter.GOOD:
                 # all good: pass through
-                send_result = await self.safe_send_message(channel_info, message, **kwargs)
+                send_result = await self.safe_send_message(channel_info, message, PRIORITY_HIGH, **kwargs)
             elif outcome == limiter.HIT_LIMIT:
                 # oops! just hit the limit, tell about it once
                 loc = self.deps.loc_man.get_from_lang(channel_info.lang)
                 warning_message = BoardMessage(loc.RATE_LIMIT_WARNING)
-                send_result = await self.safe_send_message(channel_info, warning_message, **kwargs)
+                send_result = await self.safe_send_message(channel_info, warning_message, PRIORITY_HIGH, **kwargs)
             else:
                 s_text = shorten_text(message.text, 200)
                 self.logger.warning(f'Rate limit for channel "{channel_info.short_coded}"! Text: "{s_text}"')
@@ -170,31 +188,36 @@ class Broadcaster(WithLogger):
         else:
             return BoardMessage(str(data_source))
 
-    async def broadcast(self, channels: List[ChannelDescriptor], message, delay=0.075, **kwargs) -> int:
+    async def broadcast(self, channels: List[ChannelDescriptor], message, **kwargs) -> int:
+        """
+        All the messages are queued at once; the per-platform delivery queues take care of the rate limits.
+        Returns the number of successfully sent messages.
+        """
         if now_ts() < self._skip_all_before:
             self.logger.info('Skip message.')
             return 0
 
-        async with self._broadcast_lock:
-            count = 0
-
-            try:
-                for channel_info in channels:
-                    # make from any message a BoardMessage
-                    b_message = await self._form_message(message, channel_info, **kwargs)
-                    if b_message.empty:
-                        continue
-
-                    send_results = await self.safe_send_message(
-                        channel_info, b_message,
-                        disable_web_page_preview=True,
-                        disable_notification=False, **kwargs)
-
-                    if send_results is True:
-                        count += 1
-
-                    await asyncio.sleep(delay)  # 10 messages per second (Limit: 30 messages per second)
-            finally:
-                self.logger.info(f"{count} messages successful sent (of {len(channels)})")
-
-            return count
+        count = 0
+        try:
+            futures = []
+            for channel_info in channels:
+                # make from any message a BoardMessage
+                b_message = await self._form_message(message, channel_info, **kwargs)
+                if b_message.empty:
+                    continue
+
+                futures.append(self.delivery.submit(
+                    channel_info, b_message, PRIORITY_NORMAL,
+                    disable_web_page_preview=True,
+                    disable_notification=False, **kwargs))
+
+            for send_results in await asyncio.gather(*futures):
+                if send_results is True:
+                    count += 1
+        finally:
+            self.logger.info(f"{count} messages successful sent (of {len(channels)})")
+
+        return count
+
+    async def stop(self):
+        await self.delivery.stop()
@@ -13,6 +13,14 @@ CHANNEL_INACTIVE = 'channel_inactive'
 MESSAGE_SEPARATOR = '------'
 
 
+class DeliveryRetry(Exception):
+    """A messenger asks to send the message again after "delay" seconds (e.g. flood control)"""
+
+    def __init__(self, delay: float):
+        super().__init__(delay)
+        self.delay = delay
+
+
 class MessageType(Enum):
     TEXT = 'text'
     STICKER = 'sticker'
@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Awaitable, Dict, Optional
+
+from services.lib.config import SubConfig
+from services.lib.lru import WindowAverage
+from services.lib.rate_limit import TokenBucket
+from services.lib.utils import WithLogger
+from services.notify.channel import ChannelDescriptor, BoardMessage, Messengers, DeliveryRetry
+
+
+@dataclass
+class PlatformLimits:
+    workers: int = 4
+    rate: float = 25.0  # messages per second for the whole platform
+    burst: float = 25.0
+    per_chat_rate: float = 1.0  # messages per second for a single chat
+    per_chat_burst: float = 3.0
+    max_retries: int = 5
+
+    @classmethod
+    def from_config(cls, cfg, default: 'PlatformLimits'):
+        return cls(
+            workers=cfg.as_int('workers', default.workers),
+            rate=cfg.as_float('rate', default.rate),
+            burst=cfg.as_float('burst', default.burst),
+            per_chat_rate=cfg.as_float('per_chat_rate', default.per_chat_rate),
+            per_chat_burst=cfg.as_float('per_chat_burst', default.per_chat_burst),
+            max_retries=cfg.as_int('max_retries', default.max_retries),
+        )
+
+
+# a bit below the documented platform limits
+DEFAULT_LIMITS = {
+    # 30 msg/sec globally, about 1 msg/sec to one chat
+    Messengers.TELEGRAM: PlatformLimits(workers=8, rate=25.0, burst=25.0, per_chat_rate=1.0, per_chat_burst=3.0),
+    # 50 req/sec globally, 5 msg per 5 sec to one channel
+    Messengers.DISCORD: PlatformLimits(workers=4, rate=40.0, burst=20.0, per_chat_rate=1.0, per_chat_burst=5.0),
+    # about 1 msg/sec to one channel
+    Messengers.SLACK: PlatformLimits(workers=4, rate=20.0, burst=10.0, per_chat_rate=1.0, per_chat_burst=2.0),
+    # one account, posts are rare
+    Messengers.TWITTER: PlatformLimits(workers=1, rate=0.2, burst=3.0, per_chat_rate=0.2, per_chat_burst=3.0),
+}
+
+PRIORITY_HIGH = 0  # personal alerts
+PRIORITY_NORMAL = 1  # mass broadcasts
+
+
+@dataclass
+class DeliveryJob:
+    channel: ChannelDescriptor
+    message: BoardMessage
+    kwargs: dict
+    future: asyncio.Future
+    priority: int = PRIORITY_NORMAL
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+@dataclass
+class DeliveryStats:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    latency: WindowAverage = field(default_factory=lambda: WindowAverage(1000))
+
+
+SendFunction = Callable[..., Awaitable]
+
+
+class PlatformQueue(WithLogger):
+    """
+    Queue and workers of a single platform. The jobs are sharded between the workers by chat ID,
+    so the messages to one chat keep their order. If the chat's token bucket is empty, the job is parked
+    and put back in line when the chat has a token again; the worker does not wait, so the other chats
+    of its shard go on. Then the worker waits for the platform's token bucket. If the messenger raises
+    DeliveryRetry, the whole platform pauses and the job is parked for the delay, ahead of the chat's later messages.
+    """
+
+    MAX_CHAT_BUCKETS = 50_000
+
+    def __init__(self, platform: str, send: SendFunction, limits: PlatformLimits):
+        super().__init__()
+        self.platform = platform
+        self.send = send
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self._chat_buckets: OrderedDict = OrderedDict()
+        self._parked: Dict[str, deque] = {}  # chat ID -> jobs waiting for the chat's token bucket, in order
+        self._queues = [asyncio.PriorityQueue() for _ in range(max(1, limits.workers))]
+        self._workers = []
+        self._seq = itertools.count()
+        self.stats = DeliveryStats()
+
+    @property
+    def queue_size(self):
+        return sum(q.qsize() for q in self._queues) + self.parked_count
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.limits.per_chat_rate, self.limits.per_chat_burst)
+            if len(self._chat_buckets) > self.MAX_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _put(self, job: DeliveryJob):
+        shard = hash(job.channel.channel_id) % len(self._queues)
+        self._queues[shard].put_nowait((job.priority, next(self._seq), job))
+
+    def _park(self, job: DeliveryJob, delay: float, first=False):
+        chat_id = job.channel.channel_id
+        parked = self._parked.get(chat_id)
+        if parked is None:
+            parked = self._parked[chat_id] = deque()
+            asyncio.get_running_loop().call_later(delay, self._unpark, chat_id)
+        if first:
+            parked.appendleft(job)
+        else:
+            parked.append(job)
+
+    def _unpark(self, chat_id):
+        for job in self._parked.pop(chat_id, ()):
+            self._put(job)
+
+    @property
+    def parked_count(self):
+        return sum(len(jobs) for jobs in self._parked.values())
+
+    def submit(self, job: DeliveryJob):
+        self.start()
+        self._put(job)
+
+    async def _worker(self, queue: asyncio.PriorityQueue):
+        while True:
+            *_, job = await queue.get()
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception(f'Delivery to {job.channel.short_coded} failed: {e!r}')
+                self._finish(job, False)
+            finally:
+                queue.task_done()
+
+    async def _process(self, job: DeliveryJob):
+        if job.future.done():
+            return
+
+        chat_id = job.channel.channel_id
+        if chat_id in self._parked:
+            # behind the earlier messages to this chat
+            self._parked[chat_id].append(job)
+            return
+        if (delay := self._chat_bucket(chat_id).try_acquire()) > 0:
+            self._park(job, delay)
+            return
+
+        await self.bucket.acquire()
+
+        job.attempts += 1
+        try:
+            result = await self.send(job.channel, job.message, retry_later=True, **job.kwargs)
+        except DeliveryRetry as e:
+            if job.attempts > self.limits.max_retries:
+                self.logger.error(f'Gave up delivering to {job.channel.short_coded} after {job.attempts} attempts.')
+                self._finish(job, False)
+                return
+
+            self.stats.retried += 1
+            self.logger.warning(f'{self.platform}: flood control, retry to {job.channel.short_coded} '
+                                f'in {e.delay:.1f} sec.')
+            self.bucket.backoff(e.delay)
+            self._park(job, e.delay, first=True)
+        else:
+            self._finish(job, result)
+
+    def _finish(self, job: DeliveryJob, result):
+        if result is True:
+            self.stats.sent += 1
+        else:
+            self.stats.failed += 1
+        self.stats.latency.append(time.monotonic() - job.enqueued_at)
+        if not job.future.done():
+            job.future.set_result(result)
+
+
+class DeliveryEngine(WithLogger):
+    """
+    Delivers messages through a separate queue and worker pool for every platform,
+    so a big Telegram broadcast does not hold up Discord, Slack or Twitter.
+    """
+
+    def __init__(self, send: SendFunction, limits: Optional[Dict[str, PlatformLimits]] = None):
+        super().__init__()
+        self.send = send
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.platforms: Dict[str, PlatformQueue] = {}
+
+    @classmethod
+    def from_config(cls, send: SendFunction, cfg):
+        """cfg is the "broadcasting.delivery" sub-config"""
+        limits = {
+            platform: PlatformLimits.from_config(cfg.get(platform, SubConfig({})), default)
+            for platform, default in DEFAULT_LIMITS.items()
+        }
+        return cls(send, limits)
+
+    def queue_for(self, platform: str) -> PlatformQueue:
+        queue = self.platforms.get(platform)
+        if queue is None:
+            limits = self.limits.get(platform) or PlatformLimits()
+            queue = self.platforms[platform] = PlatformQueue(platform, self.send, limits)
+        return queue
+
+    def submit(self, channel: ChannelDescriptor, message: BoardMessage, priority=PRIORITY_NORMAL,
+               **kwargs) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        job = DeliveryJob(channel, message, kwargs, future, priority)
+        self.queue_for(channel.type).submit(job)
+        return future
+
+    async def deliver(self, channel: ChannelDescriptor, message: BoardMessage, priority=PRIORITY_NORMAL, **kwargs):
+        return await self.submit(channel, message, priority, **kwargs)
+
+    async def stop(self):
+        for queue in self.platforms.values():
+            await queue.stop()
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import Dict, Tuple
+
+from services.jobs.fetch.runeyield import get_rune_yield_connector
+from services.lib.config import SubConfig
+from services.lib.date_utils import MINUTE
+from services.lib.depcont import DepContainer
+from services.lib.lru import WindowAverage
+from services.lib.utils import WithLogger
+from services.models.lp_info import LiquidityPoolReport
+
+ReportKey = Tuple[str, str, int]  # address, pool, height bucket
+
+
+class ReportJobStats:
+    def __init__(self, window=200):
+        self.requests = 0
+        self.computed = 0
+        self.cache_hits = 0
+        self.coalesced = 0  # joined the same job in flight
+        self.errors = 0
+        self.total_time = 0.0
+        self.latency = WindowAverage(window)
+
+    def add_report(self, seconds):
+        self.computed += 1
+        self.total_time += seconds
+        self.latency.append(seconds)
+
+    @property
+    def dedup_ratio(self):
+        return (self.cache_hits + self.coalesced) / self.requests if self.requests else 0.0
+
+
+class LPReportJobs(WithLogger):
+    """
+    LP reports for the scheduled personal notifications. Many users may watch the same address/pool,
+    so the jobs are keyed by (address, pool, height bucket): identical requests in flight are joined,
+    the finished reports are reused for "cache_ttl" seconds, and no more than "max_concurrent" are computed at once.
+    The height bucket is taken when the report is requested, before the jitter delay: the requests spread
+    over the jitter window still share one job even if the chain has moved to the next bucket meanwhile.
+    """
+
+    def __init__(self, deps: DepContainer, cache_ttl=10 * MINUTE, height_bucket=100, max_concurrent=4):
+        super().__init__()
+        self.deps = deps
+        self.cache_ttl = cache_ttl
+        self.height_bucket = max(1, int(height_bucket))
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.stats = ReportJobStats()
+        self.delayed = 0  # waiting for their jitter delay
+        self.waiting = 0  # waiting for a free slot
+        self.running = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._pending: Dict[ReportKey, asyncio.Future] = {}
+        self._cache: Dict[ReportKey, Tuple[float, LiquidityPoolReport]] = {}
+
+    @classmethod
+    def from_config(cls, deps: DepContainer):
+        cfg = deps.cfg.get('personal.report_jobs', SubConfig({}))
+        return cls(deps,
+                   cache_ttl=cfg.as_interval('cache_ttl', '10m'),
+                   height_bucket=cfg.as_int('height_bucket', 100),
+                   max_concurrent=cfg.as_int('max_concurrent', 4))
+
+    @property
+    def queue_depth(self):
+        return self.waiting + self.running
+
+    def key(self, address, pool) -> ReportKey:
+        last_block = self.deps.last_block_store.last_maya_block if self.deps.last_block_store else 0
+        return address, pool, int(last_block) // self.height_bucket
+
+    async def get_report(self, address, pool, delay=0.0) -> LiquidityPoolReport:
+        key = self.key(address, pool)
+
+        if delay > 0:
+            self.delayed += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.delayed -= 1
+
+        self.stats.requests += 1
+
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and now - cached[0] < self.cache_ttl:
+            self.stats.cache_hits += 1
+            return cached[1]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._run_job(key))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.stats.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def _run_job(self, key: ReportKey) -> LiquidityPoolReport:
+        address, pool, _ = key
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        t0 = time.perf_counter()
+        try:
+            rune_yield = get_rune_yield_connector(self.deps)
+            rune_yield.add_il_protection_to_final_figures = True
+            report = await rune_yield.generate_yield_report_single_pool(address, pool)
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+        self.stats.add_report(time.perf_counter() - t0)
+
+        self._forget_old()
+        self._cache[key] = time.monotonic(), report
+        return report
+
+    def _forget_old(self):
+        now = time.monotonic()
+        for key in [k for k, (ts, _) in self._cache.items() if now - ts >= self.cache_ttl]:
+            del self._cache[key]
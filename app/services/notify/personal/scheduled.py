@@ -1,7 +1,7 @@
 import asyncio
+import random
 
 from services.dialog.picture.lp_picture import generate_yield_picture
-from services.jobs.fetch.runeyield import get_rune_yield_connector
 from services.lib.date_utils import today_str, MONTH
 from services.lib.db_one2one import OneToOne
 from services.lib.delegates import INotified
@@ -11,6 +11,7 @@ from services.lib.scheduler import Scheduler
 from services.lib.settings_manager import SettingsManager
 from services.lib.utils import WithLogger, generate_random_code
 from services.notify.channel import BoardMessage, ChannelDescriptor
+from services.notify.personal.report_jobs import LPReportJobs
 
 
 class PersonalPeriodicNotificationService(WithLogger, INotified):
@@ -18,6 +19,9 @@ class PersonalPeriodicNotificationService(WithLogger, INotified):
         super().__init__()
         self.deps = deps
         self._unsub_db = OneToOne(deps.db, 'Unsubscribe')
+        self.jobs: LPReportJobs = deps.lp_report_jobs or LPReportJobs.from_config(deps)
+        # the reports due at the same moment are spread over this window, so THORNode is not hit all at once
+        self.jitter = deps.cfg.as_interval('personal.scheduler.jitter', '0')
 
     @staticmethod
     def key(user_id, address, pool):
@@ -75,22 +79,21 @@ class PersonalPeriodicNotificationService(WithLogger, INotified):
 
     async def on_data(self, sender: Scheduler, ident: str):
         user_id, address, pool = self.key_parts(ident)
-        asyncio.create_task(self._deliver_report_safe(user_id, address, pool))
+        delay = random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+        asyncio.create_task(self._deliver_report_safe(user_id, address, pool, delay))
 
-    async def _deliver_report_safe(self, user, address, pool):
+    async def _deliver_report_safe(self, user, address, pool, delay=0.0):
         try:
-            await self._deliver_report(user, address, pool)
+            await self._deliver_report(user, address, pool, delay)
         except Exception as e:
             self.logger.exception(f'Error while delivering report for {user}/{address}/{pool}: {e}')
             await self.unsubscribe(user, address, pool)
 
-    async def _deliver_report(self, user, address, pool):
-        self.logger.info(f'Generating report for {user}/{address}/{pool}...')
+    async def _deliver_report(self, user, address, pool, delay=0.0):
+        self.logger.info(f'Generating report for {user}/{address}/{pool} (in {delay:.0f} sec)...')
 
-        # Generate report
-        rune_yield = get_rune_yield_connector(self.deps)
-        rune_yield.add_il_protection_to_final_figures = True
-        lp_report = await rune_yield.generate_yield_report_single_pool(address, pool)
+        # Generate report (or take the one made for another user)
+        lp_report = await self.jobs.get_report(address, pool, delay)
 
         # Convert it to a picture
         value_hidden = False
@@ -55,8 +55,7 @@ class BestPoolsNotifier(INotified, WithDelegates, WithLogger):
         prev = await self._get_previous_data()
         self.last_pool_detail = PoolMapPair(curr=data, prev=prev)
 
-        if await self._cooldown.can_do():
-            await self._cooldown.do()
+        if await self._cooldown.try_do():
             await self._notify(self.last_pool_detail)
             await self._write_previous_data(sender.last_raw_result)
 
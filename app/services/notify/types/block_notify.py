@@ -27,7 +27,7 @@ class LastBlockStore(INotified, WithDelegates, WithLogger):
     def __init__(self, deps: DepContainer):
         super().__init__()
         self.deps = deps
-        self.series = TimeSeries(self.KEY_SERIES_BLOCK_HEIGHT, self.deps.db)
+        self.series = TimeSeries(self.KEY_SERIES_BLOCK_HEIGHT, self.deps.db, max_len=self.BLOCK_HEIGHT_MAX_LEN)
         self.last_maya_block = 0
         self.sleep_period = deps.last_block_fetcher.sleep_period
 
@@ -51,8 +51,6 @@ class LastBlockStore(INotified, WithDelegates, WithLogger):
 
         await self.series.add(thor_block=maya_block)
 
-        await self.series.trim_oldest(self.BLOCK_HEIGHT_MAX_LEN)
-
         await self.pass_data_to_listeners(maya_block)
 
     async def get_last_block_height_points(self, duration_sec=DAY):
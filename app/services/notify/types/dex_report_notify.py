@@ -18,8 +18,7 @@ class DexReportNotifier(WithDelegates, INotified, WithLogger):
 
     async def on_data(self, sender, data):
         with suppress(Exception):
-            if await self.spam_cd.can_do():
-                await self.spam_cd.do()
+            if await self.spam_cd.try_do():
                 report = await self.dex_analytics.get_analytics(self.spam_cd.cooldown)
                 # only if there is some data
                 if report.total.count > 0:
@@ -43,7 +43,10 @@ class MimirChangedNotifier(INotified, WithDelegates, WithLogger):
                 self.deps.mimir_const_holder.register_change_ts(name, ts)
 
     async def on_data(self, sender: ConstMimirFetcher, data: MimirTuple):
-        _, fresh_mimir, node_mimir, votes = data
+        if not data.has_changed(MimirTuple.MIMIR, MimirTuple.NODE_MIMIR):
+            return
+
+        fresh_mimir, node_mimir = data.mimir, data.node_mimir
 
         if not fresh_mimir or not fresh_mimir.constants:
             return
@@ -136,8 +139,7 @@ class MimirChangedNotifier(INotified, WithDelegates, WithLogger):
             return False
 
         cd = Cooldown(self.deps.db, f"MimirChange:{c.entry.name}", self.cd_sec_change, max_times=2)
-        if await cd.can_do():
-            await cd.do()
+        if await cd.try_do():
             return True
         else:
             self.logger.warning(f'Mimir {c.entry.name!r} changes too often! Ignore.')
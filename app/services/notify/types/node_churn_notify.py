@@ -70,13 +70,11 @@ class NodeChurnNotifier(INotified, WithDelegates, WithLogger):
         await self._notify_when_node_churn_finished(event)
 
     async def _notify_when_node_churn_started(self, changes: NodeSetChanges):
-        if await self._start_cd.can_do():
-            await self._start_cd.do()
+        if await self._start_cd.try_do():
             await self.pass_data_to_listeners(AlertNodeChurn(changes, finished=False, with_picture=False))
 
     async def _notify_when_node_churn_finished(self, changes: NodeSetChanges):
-        if await self._finish_cd.can_do():
-            await self._finish_cd.do()
+        if await self._finish_cd.try_do():
             with_picture = changes.count_of_changes >= self._min_changes_to_post_picture
 
             if with_picture:
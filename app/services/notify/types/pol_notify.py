@@ -79,6 +79,5 @@ class POLNotifier(WithDelegates, INotified, WithLogger):
             self.logger.warning('Got zero POL, ignoring it...')
             return
 
-        if await self.spam_cd.can_do():
-            await self.spam_cd.do()
+        if await self.spam_cd.try_do():
             await self.pass_data_to_listeners(event)
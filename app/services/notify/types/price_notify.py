@@ -50,12 +50,25 @@ class PriceNotifier(INotified, WithDelegates, WithLogger):
 
     # -----
 
+    TRIPLET_WINDOWS = [
+        # (ago, tolerance)
+        (HOUR, MINUTE * 7),
+        (DAY, MINUTE * 40),
+        (DAY * 7, HOUR * 2),
+    ]
+
     async def historical_get_triplet(self):
-        price_1h, price_24h, price_7d = await asyncio.gather(
-            self.time_series.select_average_ago(HOUR, tolerance=MINUTE * 7),
-            self.time_series.select_average_ago(DAY, tolerance=MINUTE * 40),
-            self.time_series.select_average_ago(DAY * 7, tolerance=HOUR * 2)
-        )
+        cache = self.deps.price_history
+        if cache and cache.covers(DAY * 7 + HOUR * 2):
+            price_1h, price_24h, price_7d = (
+                cache.average_ago(cache.COL_POOL_PRICE, ago, tolerance) or 0
+                for ago, tolerance in self.TRIPLET_WINDOWS
+            )
+        else:
+            price_1h, price_24h, price_7d = await asyncio.gather(*(
+                self.time_series.select_average_ago(ago, tolerance=tolerance)
+                for ago, tolerance in self.TRIPLET_WINDOWS
+            ))
         return price_1h, price_24h, price_7d
 
     # async def send_ath_sticker(self):
@@ -101,27 +114,25 @@ class PriceNotifier(INotified, WithDelegates, WithLogger):
         price = market_info.pool_rune_price
 
         price_1h = hist_prices[0]
-        send_it = False
-        if price_1h:
-            percent_change = calc_percent_change(price_1h, price)
-
-            if abs(percent_change) >= self.percent_change_threshold:  # significant price change
-                if percent_change > 0 and (await self._cd_price_rise.can_do()):
-                    self.logger.info(f'price rise {pretty_money(percent_change)} %')
-                    await self._cd_price_rise.do()
-                    send_it = True
-                elif percent_change < 0 and (await self._cd_price_fall.can_do()):
-                    self.logger.info(f'price fall {pretty_money(percent_change)} %')
-                    await self._cd_price_fall.do()
-                    send_it = True
-
-        if not send_it and await self._cd_price_regular.can_do():
+
+        # the regular cooldown goes along with the change one, so a change alert restarts it too
+        cooldowns = [self._cd_price_regular]
+        percent_change = calc_percent_change(price_1h, price) if price_1h else 0.0
+        if percent_change and abs(percent_change) >= self.percent_change_threshold:  # significant price change
+            cooldowns.insert(0, self._cd_price_rise if percent_change > 0 else self._cd_price_fall)
+
+        # check and set in one atomic call, so the concurrent ticks do not both notify
+        results = await Cooldown.do_many(self.deps.db, cooldowns)
+
+        if len(results) > 1 and results[0]:
+            direction = 'rise' if percent_change > 0 else 'fall'
+            self.logger.info(f'price {direction} {pretty_money(percent_change)} %')
+        elif results[-1]:
             self.logger.info('no price change but it is long time elapsed (global cd), so notify anyway')
-            send_it = True
+        else:
+            return
 
-        if send_it:
-            await self._cd_price_regular.do()
-            await self.do_notify_price_table(market_info, hist_prices, ath=False)
+        await self.do_notify_price_table(market_info, hist_prices, ath=False)
 
     async def get_prev_ath(self) -> PriceATH:
         try:
@@ -151,12 +162,11 @@ class PriceNotifier(INotified, WithDelegates, WithLogger):
                 int(now_ts()), price
             ))
 
-            if await self._cd_price_ath.can_do():
-                await self._cd_price_ath.do()
-                await self._cd_price_rise.do()  # prevent 2 notifications
+            if await self._cd_price_ath.try_do():
+                # prevent 2 notifications
+                await Cooldown.do_many(self.deps.db, [self._cd_price_rise, self._cd_price_regular])
 
                 hist_prices = await self.historical_get_triplet()
-                await self._cd_price_regular.do()
                 await self.do_notify_price_table(market_info, hist_prices, ath=True, last_ath=last_ath)
                 return True
 
@@ -24,7 +24,7 @@ class QueueNotifier(INotified, WithLogger):
         self.threshold_free = int(cfg.threshold.free)
         self.avg_period = parse_timespan_to_seconds(cfg.threshold.avg_period)
         self.watch_queues = cfg.get('watch_queues', self.DEFAULT_WATCH_QUEUES)
-        self.ts = TimeSeries(QUEUE_TIME_SERIES, self.deps.db)
+        self.ts = TimeSeries(QUEUE_TIME_SERIES, self.deps.db, max_len=self.MAX_POINTS)
 
         self.logger.info(f'config: {deps.cfg.queue}')
 
@@ -75,14 +75,12 @@ class QueueNotifier(INotified, WithLogger):
         for key in self.watch_queues:
             await self.handle_entry(key, sender.ts)
 
-        await self.ts.trim_oldest(self.MAX_POINTS)
-
 
 class QueueStoreMetrics(INotified, WithDelegates):
     def __init__(self, deps: DepContainer):
         super().__init__()
         self.deps = deps
-        self.ts = TimeSeries(QUEUE_TIME_SERIES, deps.db)
+        self.ts = TimeSeries(QUEUE_TIME_SERIES, deps.db, max_len=QueueNotifier.MAX_POINTS)
 
     async def store_queue_info(self, data: QueueInfo):
         self.deps.queue_holder = data
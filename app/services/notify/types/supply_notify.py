@@ -17,8 +17,7 @@ class SupplyNotifier(INotified, WithLogger):
         self._cd = Cooldown(self.deps.db, 'SupplyNotifyPublic', cd_period)
 
     async def on_data(self, sender, market_info: RuneMarketInfo):
-        if await self._cd.can_do():
-            await self._cd.do()
+        if await self._cd.try_do():
             await self._notify(market_info)
 
     async def _notify(self, market_info: RuneMarketInfo):
@@ -126,7 +126,7 @@ class CEXFlowTracker:
 
     def __init__(self, deps: DepContainer):
         self.deps = deps
-        self.series = TimeSeries('Rune.CEXFlow', deps.db)
+        self.series = TimeSeries('Rune.CEXFlow', deps.db, max_len=self.MAX_POINTS)
 
     async def add(self, inflow_amount: float, outflow_amount: float):
         if inflow_amount > 0 or outflow_amount > 0:
@@ -135,8 +135,6 @@ class CEXFlowTracker:
                 'out': outflow_amount
             })
 
-        await self.series.trim_oldest(self.MAX_POINTS)
-
     async def read_within_period(self, period=DAY) -> TokenCexFlow:
         points = await self.series.get_last_values_json(period, max_points=self.MAX_POINTS)
         inflow, outflow = 0.0, 0.0
@@ -137,8 +137,7 @@ class VersionNotifier(INotified, WithDelegates, WithLogger):
 
         more_than_min = ver_con.top_version_count >= self.min_nodes_for_upgrade
 
-        if more_than_min and await self.cd_upgrade.can_do():
-            await self.cd_upgrade.do()
+        if more_than_min and await self.cd_upgrade.try_do():
             await self.store.set_upgrade_progress(ver_con.ratio)
             await self.deps.broadcaster.notify_preconfigured_channels(
                 BaseLocalization.notification_text_version_upgrade_progress,
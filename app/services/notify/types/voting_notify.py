@@ -63,6 +63,9 @@ class VotingNotifier(INotified, WithDelegates, WithLogger):
             await cd.do()
 
     async def on_data(self, sender: ConstMimirFetcher, data: MimirTuple):
+        if not data.has_changed(MimirTuple.VOTES):
+            return  # the tally is the same, so is the progress
+
         holder = self.deps.mimir_const_holder
 
         prev_state = await self.read_prev_state()
@@ -12,3 +12,55 @@ def fixture_deps():
     d.loop = asyncio.get_event_loop()
     d.db = DB(d.loop)
     return d
+
+
+class FakeDB(DB):
+    """
+    DB backed by fakeredis, so the tests do not need a running Redis server.
+    It counts round trips: every single command or pipeline execution is one round trip.
+    """
+
+    def __init__(self, loop=None):
+        super().__init__(loop)
+        self.round_trips = 0
+        self._server = None
+
+    def _make_client(self, decode_responses):
+        import fakeredis
+
+        db = self
+
+        class CountingFakeRedis(fakeredis.FakeAsyncRedis):
+            async def execute_command(self, *args, **options):
+                db.round_trips += 1
+                return await super().execute_command(*args, **options)
+
+            def pipeline(self, transaction=True, shard_hint=None):
+                pipe = super().pipeline(transaction, shard_hint)
+                original_execute = pipe.execute
+
+                async def execute(*args, **kwargs):
+                    db.round_trips += 1
+                    return await original_execute(*args, **kwargs)
+
+                pipe.execute = execute
+                return pipe
+
+        if self._server is None:
+            self._server = fakeredis.FakeServer()
+        return CountingFakeRedis(server=self._server, decode_responses=decode_responses)
+
+    async def get_redis(self):
+        if self.redis is None:
+            self.redis = self._make_client(decode_responses=True)
+        return self.redis
+
+    async def get_redis_binary(self):
+        if self.redis_binary is None:
+            self.redis_binary = self._make_client(decode_responses=False)
+        return self.redis_binary
+
+
+@pytest.fixture(scope="function")
+def fake_db():
+    return FakeDB()
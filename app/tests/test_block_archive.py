@@ -0,0 +1,117 @@
+import pytest
+
+from services.jobs.scanner.block_archive import BlockArchive
+from services.jobs.scanner.scan_cache import NativeScannerBlockCached
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+
+
+def block_results(height):
+    return {'result': {'height': str(height), 'txs_results': [], 'end_block_events': []}}
+
+
+def block_txs(height):
+    return {'result': {'block': {'header': {'height': str(height)}, 'data': {'txs': []}}}}
+
+
+def test_put_get_reopen(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=10)
+    for h in range(95, 125):
+        archive.put_block(h, block_results(h), block_txs(h))
+
+    assert archive.first_height == 95
+    assert archive.last_height == 124
+    assert archive.get_block(100) == (block_results(100), block_txs(100))
+    assert archive.get(125, BlockArchive.KIND_RESULTS) is None
+    assert archive.get(5, BlockArchive.KIND_RESULTS) is None
+    archive.close()
+
+    # segment size is taken from the archive itself
+    reopened = BlockArchive(str(tmp_path), segment_size=1000, read_only=True)
+    assert reopened.segment_size == 10
+    assert reopened.total_records == 60
+    assert [h for h, *_ in reopened.iter_blocks(110, 114)] == [110, 111, 112, 113, 114]
+    assert reopened.get(124, BlockArchive.KIND_TXS) == block_txs(124)
+    with pytest.raises(PermissionError):
+        reopened.put_block(125, block_results(125), block_txs(125))
+
+
+def test_torn_write_is_ignored(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=10)
+    archive.put_block(1, block_results(1), block_txs(1))
+    archive.put_block(2, block_results(2), block_txs(2))
+    data_path = archive._segment(2).data_path
+    archive.close()
+
+    # cut the data file as if the process died in the middle of writing
+    with open(data_path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    reopened = BlockArchive(str(tmp_path))
+    assert reopened.has_block(1)
+    assert not reopened.has_block(2)
+    assert reopened.has(2, BlockArchive.KIND_RESULTS)
+
+
+def test_retention(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=10, retention_blocks=15)
+    for h in range(0, 50):
+        archive.put_block(h, block_results(h), block_txs(h))
+
+    # segments entirely older than 49 - 15 = 34 are gone
+    assert archive.first_height == 30
+    assert not archive.has_block(29)
+    assert archive.has_block(30)
+    assert len(list(tmp_path.glob('seg_*.dat'))) == 2
+
+
+class FakeConnector:
+    def __init__(self, missing=()):
+        self.calls = 0
+        self.missing = missing
+
+    async def query_native_block_results_raw(self, height):
+        self.calls += 1
+        return None if height in self.missing else block_results(height)
+
+    async def query_tendermint_block_raw(self, height):
+        self.calls += 1
+        return block_txs(height)
+
+
+@pytest.mark.asyncio
+async def test_import_range(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=100)
+    connector = FakeConnector(missing={205})
+    assert await archive.import_range(connector, 200, 220, concurrency=3) == 20
+    assert archive.has_block(220) and not archive.has_block(205)
+
+    # the existing blocks are not downloaded again
+    connector.calls = 0
+    assert await archive.import_range(connector, 200, 220) == 0
+    assert connector.calls == 2
+
+
+class Collector(INotified):
+    def __init__(self):
+        self.heights = []
+
+    async def on_data(self, sender, data):
+        self.heights.append(data.block_no)
+
+
+@pytest.mark.asyncio
+async def test_offline_scanner_replays_archive(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=100)
+    for h in range(300, 310):
+        archive.put_block(h, block_results(h), block_txs(h))
+
+    scanner = NativeScannerBlockCached(DepContainer(), archive=archive, offline=True, last_block=300)
+    collector = Collector()
+    scanner.add_subscriber(collector)
+
+    await scanner.fetch()
+
+    assert collector.heights == list(range(300, 310))
+    assert scanner.last_block == 310
+    assert scanner.hits == 20
@@ -0,0 +1,44 @@
+import pytest
+
+from proto.types import MsgDeposit
+from services.jobs.scanner.block_decoder import BlockDecoder
+from tools.lib.sample_blocks import make_raw_block, make_raw_block_results
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', BlockDecoder.MODES)
+async def test_decoder_modes_give_same_result(mode):
+    decoder = BlockDecoder(mode, workers=2, min_items_to_offload=1)
+    try:
+        txs = await decoder.load_txs(make_raw_block(10), 100)
+        block = await decoder.load_block(make_raw_block_results(10), 100)
+    finally:
+        decoder.close()
+
+    assert len(txs) == 10
+    assert [tx.memo for tx in txs] == [f'=:BTC.BTC:bc1test{i}' for i in range(10)]
+    assert isinstance(txs[0].first_message, MsgDeposit)
+    assert txs[0].first_message.coins == []
+    assert len(txs[0].hash) == 64
+
+    block.fill_transactions(txs)
+    assert block.block_no == 100
+    assert len(block.only_successful.txs) == 10
+    ev = block.end_block_events[0]
+    assert ev.attributes['amount'] == 1000 and ev.attributes['asset'] == 'MAYA.CACAO'
+
+
+@pytest.mark.asyncio
+async def test_decoder_error_block():
+    decoder = BlockDecoder(BlockDecoder.MODE_THREAD, min_items_to_offload=0)
+    try:
+        assert await decoder.load_txs({'error': {'code': -1, 'message': 'oops'}}, 100) is None
+        block = await decoder.load_block({'error': {'code': -1, 'message': 'oops'}}, 100)
+        assert block.is_error
+    finally:
+        decoder.close()
+
+
+def test_decoder_bad_mode():
+    with pytest.raises(ValueError):
+        BlockDecoder('gpu')
@@ -0,0 +1,96 @@
+import asyncio
+import random
+
+import pytest
+
+from services.jobs.scanner.block_prefetch import BlockPrefetcher
+from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+
+TIP = 120
+
+
+class FakeScanner(NativeScannerBlock):
+    def __init__(self, deps, **kwargs):
+        super().__init__(deps, **kwargs)
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def _fake_request(self, block_no, payload):
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        await asyncio.sleep(random.uniform(0.0, 0.01))
+        self.concurrent -= 1
+        if block_no > TIP:
+            return {'error': {'code': -32603, 'message': 'Internal error',
+                              'data': f'height {block_no} must be less than or equal to the current '
+                                      f'blockchain height {TIP}'}}
+        return payload
+
+    async def _fetch_block_results_raw(self, block_no):
+        return await self._fake_request(block_no, {'result': {'txs_results': [], 'end_block_events': []}})
+
+    async def _fetch_block_txs_raw(self, block_no):
+        return await self._fake_request(block_no, {'result': {'block': {'data': {'txs': []}}}})
+
+
+class Collector(INotified):
+    def __init__(self):
+        self.heights = []
+
+    async def on_data(self, sender, data):
+        self.heights.append(data.block_no)
+
+
+class FakeLastBlockStore:
+    def __int__(self):
+        return TIP
+
+
+def make_scanner(**kwargs):
+    deps = DepContainer()
+    deps.last_block_store = FakeLastBlockStore()
+    scanner = FakeScanner(deps, last_block=100, **kwargs)
+    collector = Collector()
+    scanner.add_subscriber(collector)
+    return scanner, collector
+
+
+@pytest.mark.asyncio
+async def test_prefetch_keeps_order():
+    scanner, collector = make_scanner(prefetch_window=6, max_in_flight=4)
+    assert scanner.blocks_behind == TIP - 100
+
+    await scanner.fetch()
+
+    assert collector.heights == list(range(100, TIP + 1))
+    assert scanner.last_block == TIP + 1
+    assert 1 < scanner.max_concurrent <= 4
+    assert scanner.prefetch_in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_no_prefetch_is_sequential():
+    scanner, collector = make_scanner(prefetch_window=1)
+
+    await scanner.fetch()
+
+    assert collector.heights == list(range(100, TIP + 1))
+    assert scanner.max_concurrent == 1
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_jump_forward():
+    calls = []
+
+    async def fetch(h):
+        calls.append(h)
+        return h
+
+    prefetcher = BlockPrefetcher(fetch, window=3, max_in_flight=2)
+    assert await prefetcher.get(10) == 10
+    assert await prefetcher.get(20, limit=21) == 20
+    assert prefetcher.scheduled == 1  # only 21 is left due to the limit
+    prefetcher.cancel()
+    assert prefetcher.scheduled == 0
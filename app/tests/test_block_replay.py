@@ -0,0 +1,58 @@
+import pytest
+
+from services.jobs.scanner.block_archive import BlockArchive
+from services.jobs.scanner.replay import BlockReplay
+from services.jobs.scanner.scan_cache import NativeScannerBlockCached
+from services.lib.delegates import INotified, WithDelegates
+from services.lib.depcont import DepContainer
+from tests.helpers import FakeDB
+from tools.lib.sample_blocks import make_raw_block, make_raw_block_results
+
+
+class TxCounter(WithDelegates, INotified):
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+
+    async def on_data(self, sender, block):
+        r = await self.db.get_redis()
+        await r.incrby('replay:txs', len(block.txs))
+        await self.pass_data_to_listeners(block, self)
+
+
+class Failing(INotified):
+    async def on_data(self, sender, data):
+        raise ValueError('boom')
+
+
+@pytest.mark.asyncio
+async def test_replay_through_graph(tmp_path):
+    archive = BlockArchive(str(tmp_path), segment_size=100)
+    for h in range(1000, 1010):
+        archive.put_block(h, make_raw_block_results(3), make_raw_block(3))
+
+    db = FakeDB()
+    scanner = NativeScannerBlockCached(DepContainer(), archive=archive, offline=True)
+    counter = TxCounter(db)
+    failing = Failing()
+    counter.add_subscriber(failing)
+    scanner.add_subscriber(counter)
+
+    engine = BlockReplay(scanner, redis=await db.get_redis()).instrument()
+    report = await engine.run(1000, 1011)
+
+    assert report.blocks == 10
+    assert report.skipped_blocks == 2  # beyond the archive tip
+    assert report.txs == 30
+    assert report.redis_round_trips == 10
+    assert report.redis_commands_per_block == 1.0
+    assert await (await db.get_redis()).get('replay:txs') == '30'
+
+    assert set(report.subscribers) == {'TxCounter', 'Failing'}
+    assert report.subscribers['TxCounter'].calls == 10
+    assert report.subscribers['Failing'].errors == 10
+    assert 'blocks/sec' in report.format()
+
+    # the stats are reset for every run
+    report = await engine.run(1005, 1009)
+    assert report.subscribers['TxCounter'].calls == 5
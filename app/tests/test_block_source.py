@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+
+import pytest
+import websockets
+
+from services.jobs.scanner.block_source import TendermintBlockSource
+from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+
+
+class FakeTendermint:
+    """The chain tip plus a websocket server sending NewBlock events"""
+
+    def __init__(self, tip):
+        self.tip = tip
+        self.clients = set()
+        self.server = None
+        self.port = 0
+
+    async def _handler(self, ws):
+        self.clients.add(ws)
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': {}}))
+        finally:
+            self.clients.discard(ws)
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, '127.0.0.1', self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def url(self):
+        return f'ws://127.0.0.1:{self.port}/websocket'
+
+    async def new_block(self, announce=True):
+        self.tip += 1
+        if announce:
+            event = {'jsonrpc': '2.0', 'id': 1, 'result': {
+                'query': TendermintBlockSource.SUBSCRIBE_QUERY,
+                'data': {'type': 'tendermint/event/NewBlock',
+                         'value': {'block': {'header': {'height': str(self.tip)}}}}}}
+            for ws in list(self.clients):
+                await ws.send(json.dumps(event))
+
+
+class FakeScanner(NativeScannerBlock):
+    def __init__(self, deps, chain: FakeTendermint, **kwargs):
+        super().__init__(deps, **kwargs)
+        self.chain = chain
+        self.initial_sleep = 0
+
+    async def _fetch_block_results_raw(self, block_no):
+        if block_no > self.chain.tip:
+            return {'error': {'code': -32603, 'message': 'Internal error',
+                              'data': f'height {block_no} must be less than or equal to the current '
+                                      f'blockchain height {self.chain.tip}'}}
+        return {'result': {'txs_results': [], 'end_block_events': []}}
+
+    async def _fetch_block_txs_raw(self, block_no):
+        return {'result': {'block': {'data': {'txs': []}}}}
+
+
+class Collector(INotified):
+    def __init__(self):
+        self.heights = []
+        self.times = []
+
+    async def on_data(self, sender, data):
+        self.heights.append(data.block_no)
+        self.times.append(time.monotonic())
+
+
+async def wait_until(condition, timeout=5.0):
+    t0 = time.monotonic()
+    while not condition():
+        assert time.monotonic() - t0 < timeout
+        await asyncio.sleep(0.01)
+
+
+def test_url_from_rpc():
+    assert TendermintBlockSource.url_from_rpc('https://rpc.host/') == 'wss://rpc.host/websocket'
+    assert TendermintBlockSource.url_from_rpc('http://1.2.3.4:26657') == 'ws://1.2.3.4:26657/websocket'
+
+
+@pytest.mark.asyncio
+async def test_push_fallback_and_backfill():
+    chain = FakeTendermint(tip=100)
+    await chain.start()
+
+    source = TendermintBlockSource(chain.url, sleep_time=0.05)
+    scanner = FakeScanner(DepContainer(), chain, sleep_period=1.0, last_block=101, block_source=source)
+    collector = Collector()
+    scanner.add_subscriber(collector)
+    task = asyncio.create_task(scanner._run())
+    try:
+        await wait_until(lambda: source.connected and chain.clients)
+
+        # pushed: much faster than the poll period
+        t0 = time.monotonic()
+        await chain.new_block()
+        await wait_until(lambda: collector.heights == [101])
+        assert collector.times[0] - t0 < 0.5
+
+        # the socket is down: the scanner polls
+        await chain.stop()
+        await wait_until(lambda: not source.connected)
+        await chain.new_block(announce=False)
+        await wait_until(lambda: collector.heights[-1] == 102)
+
+        # the blocks produced before the reconnection are backfilled
+        for _ in range(3):
+            await chain.new_block(announce=False)
+        await chain.start()
+        await wait_until(lambda: source.connected and chain.clients)
+        await chain.new_block()
+        await wait_until(lambda: collector.heights[-1] == 106, timeout=1.0)
+        assert collector.heights == list(range(101, 107))
+        assert source.total_connections == 2 and source.last_height == 106
+    finally:
+        task.cancel()
+        await chain.stop()
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from aionode.types import ThorConstants, ThorMimir, ThorMimirVote
+from services.jobs.fetch.const_mimir import ConstMimirFetcher, MimirTuple
+from services.lib.config import Config
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+from services.models.mimir import MimirHolder, MimirVoteManager
+from services.models.node_info import NodeInfo, NodeListHolder
+
+NODES = [f'maya1node{i}' for i in range(10)]
+
+
+class FakeThor:
+    def __init__(self):
+        self.constants = {'MinimumBond': 100, 'ChurnInterval': 43200}
+        self.mimir = {'HALTBTCCHAIN': 0}
+        self.node_mimir = {}
+        self.votes = [ThorMimirVote('ACCEPT_RADIX', 1, node) for node in NODES[:4]]
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _reply(self, data):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return data
+
+    async def query_constants(self):
+        return await self._reply(ThorConstants(dict(self.constants), {}))
+
+    async def query_mimir(self):
+        return await self._reply(ThorMimir(dict(self.mimir)))
+
+    async def query_mimir_node_accepted(self):
+        return await self._reply(dict(self.node_mimir))
+
+    async def query_mimir_votes(self):
+        return await self._reply(list(self.votes))
+
+
+class Collector(INotified):
+    def __init__(self):
+        self.received = []
+
+    async def on_data(self, sender, data: MimirTuple):
+        self.received.append(data)
+
+
+def make_fetcher(thor, **cfg):
+    deps = DepContainer()
+    deps.cfg = Config(data={'constants': {'fetch_period': '1m', **cfg}})
+    deps.thor_connector = thor
+    deps.mimir_const_holder = MimirHolder()
+    deps.node_holder = NodeListHolder([NodeInfo.from_json({'node_address': n, 'status': 'Active'}) for n in NODES])
+    return ConstMimirFetcher(deps)
+
+
+def test_vote_manager():
+    nodes = [NodeInfo.from_json({'node_address': n, 'status': 'Active'}) for n in NODES[:3]]
+    votes = [
+        ThorMimirVote('A', 1, NODES[0]), ThorMimirVote('A', 1, NODES[1]), ThorMimirVote('A', 2, NODES[2]),
+        ThorMimirVote('A', 1, 'maya1stranger'), ThorMimirVote('HIDDEN', 1, NODES[0]),
+    ]
+    manager = MimirVoteManager(votes, nodes, ['HIDDEN'])
+    assert len(manager.votes) == 4
+    voting = manager.find_voting('A')
+    assert voting.options[1].signers == NODES[:2] and voting.total_voters == 3
+    assert voting.top_options[0].value == 1 and not voting.passed  # 2/3 < super majority
+    assert manager.find_voting('HIDDEN') is None
+
+
+@pytest.mark.asyncio
+async def test_change_only_propagation():
+    thor = FakeThor()
+    fetcher = make_fetcher(thor, concurrent=True, change_only=True, rate_limit={'rps': 100, 'burst': 4})
+    fetcher.step_sleep = 10.0  # not used in the concurrent mode
+
+    await fetcher.run_once()  # at startup, before the subscription
+    assert fetcher.deps.mimir_const_holder.get_constant('MinimumBond') == 100
+    assert thor.max_in_flight == 4
+
+    collector = Collector()
+    fetcher.add_subscriber(collector)
+
+    await fetcher.run_once()  # the listeners have not seen it yet
+    assert collector.received[-1].changed == MimirTuple.ALL_PARTS
+
+    await fetcher.run_once()
+    assert len(collector.received) == 1 and fetcher.rebuilds == 1 and fetcher.unchanged_ticks == 2
+
+    thor.votes.append(ThorMimirVote('ACCEPT_RADIX', 1, NODES[5]))
+    await fetcher.run_once()
+    assert collector.received[-1].changed == {MimirTuple.VOTES}
+    assert fetcher.rebuilds == 2
+    voting = fetcher.deps.mimir_const_holder.voting_manager.find_voting('ACCEPT_RADIX')
+    assert voting.options[1].number_votes == 5
+
+    # churn: the tally changes without new votes
+    fetcher.deps.node_holder.nodes.pop()
+    thor.mimir['HALTBTCCHAIN'] = 1
+    await fetcher.run_once()
+    assert collector.received[-1].changed == {MimirTuple.VOTES, MimirTuple.MIMIR}
+    assert fetcher.deps.mimir_const_holder.get_constant('HALTBTCCHAIN') == 1
+    assert len(collector.received) == 3
+
+
+@pytest.mark.asyncio
+async def test_every_tick_by_default():
+    thor = FakeThor()
+    fetcher = make_fetcher(thor)
+    fetcher.step_sleep = 0
+    collector = Collector()
+    fetcher.add_subscriber(collector)
+
+    for _ in range(3):
+        await fetcher.run_once()
+    assert thor.max_in_flight == 1
+    assert [d.changed for d in collector.received] == [MimirTuple.ALL_PARTS, frozenset(), frozenset()]
+    assert fetcher.rebuilds == 1
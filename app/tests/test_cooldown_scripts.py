@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from services.lib.cooldown import Cooldown, CooldownBiTrigger
+from services.lib.rate_limit import RateLimitCooldown
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+@pytest.mark.asyncio
+async def test_can_do_many_is_one_round_trip(fake_db: FakeDB):
+    r = await fake_db.get_redis()
+    cds = [Cooldown(fake_db, f'Multi{i}', 100) for i in range(5)]
+    await r.set(Cooldown.get_key('Multi1'), '{"time": 1e12, "count": 0}')
+    await r.set(Cooldown.get_key('Multi3'), 'garbage')
+
+    before = fake_db.round_trips
+    assert await Cooldown.can_do_many(fake_db, cds) == [True, False, True, True, True]
+    assert fake_db.round_trips - before == 1
+
+
+# the rest needs Lua: fakeredis runs the scripts with "lupa"
+
+@pytest.mark.asyncio
+async def test_cooldown_do_is_atomic(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    await fake_db.get_redis()
+
+    cd = Cooldown(fake_db, 'Atomic', 100)
+    results = await asyncio.gather(*(cd.try_do() for _ in range(20)))
+    assert sum(results) == 1
+    assert not await cd.can_do()
+
+    # the script is loaded already: one round trip per call
+    before = fake_db.round_trips
+    assert not await cd.do()
+    assert fake_db.round_trips - before == 1
+
+
+@pytest.mark.asyncio
+async def test_cooldown_max_times(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    await fake_db.get_redis()
+
+    cd = Cooldown(fake_db, 'MaxTimes', 100, max_times=3)
+    assert [await cd.try_do() for _ in range(4)] == [True, True, True, False]
+
+    # the record format is the same as before, so the old readers still work
+    record = await cd.read(cd.event_name)
+    assert record.count == 0 and record.time > 0
+
+
+@pytest.mark.asyncio
+async def test_do_many(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    await fake_db.get_redis()
+
+    a, b = Cooldown(fake_db, 'ManyA', 100), Cooldown(fake_db, 'ManyB', 100)
+    await a.do()
+    assert await Cooldown.do_many(fake_db, [a, b]) == [False, True]
+    assert await Cooldown.can_do_many(fake_db, [a, b]) == [False, False]
+
+
+@pytest.mark.asyncio
+async def test_bi_trigger(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    await fake_db.get_redis()
+
+    trigger = CooldownBiTrigger(fake_db, 'LuaTrigger', 0.1, 0.1, switch_cooldown_sec=0.02,
+                                track_last_switch_ts=True)
+    assert await trigger.turn_on()
+    assert not await trigger.turn_on()
+    assert not await trigger.turn_off()  # switch cooldown
+    assert await trigger.get_state()
+
+    await asyncio.sleep(0.11)
+    assert await trigger.turn_off()
+    assert not await trigger.get_state()
+    assert await trigger.get_last_switch_ts() > 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_cooldown_single_call(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    await fake_db.get_redis()
+
+    limiter = RateLimitCooldown(fake_db, 'LuaRL', 3, 10.0, 10.0)
+    assert [await limiter.hit() for _ in range(5)] == [
+        limiter.GOOD, limiter.GOOD, limiter.GOOD, limiter.HIT_LIMIT, limiter.ON_COOLDOWN
+    ]
+
+    before = fake_db.round_trips
+    await limiter.hit()
+    assert fake_db.round_trips - before == 1
+
+
+def test_rate_limit_cooldown_needs_key(fake_db: FakeDB):
+    with pytest.raises(ValueError):
+        RateLimitCooldown(fake_db, '', 3, 10.0, 10.0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_price_ticks_notify_once(fake_db: FakeDB):
+    pytest.importorskip('lupa')
+    from types import SimpleNamespace
+    from services.notify.types.price_notify import PriceNotifier
+    from services.lib.utils import WithLogger
+
+    await fake_db.get_redis()
+    notifier = PriceNotifier.__new__(PriceNotifier)
+    WithLogger.__init__(notifier)
+    notifier.deps = SimpleNamespace(db=fake_db)
+    notifier.percent_change_threshold = 5.0
+    notifier._cd_price_regular = Cooldown(fake_db, 'PriceRegular', 100)
+    notifier._cd_price_rise = Cooldown(fake_db, 'PriceRise', 100)
+    notifier._cd_price_fall = Cooldown(fake_db, 'PriceFall', 100)
+
+    sent = []
+
+    async def historical_get_triplet():
+        return 1.0, 1.0, 1.0
+
+    async def do_notify_price_table(market_info, hist_prices, ath):
+        sent.append(market_info.pool_rune_price)
+
+    notifier.historical_get_triplet = historical_get_triplet
+    notifier.do_notify_price_table = do_notify_price_table
+
+    rise = SimpleNamespace(pool_rune_price=1.2)
+    await asyncio.gather(*(notifier.handle_new_price(rise) for _ in range(5)))
+    assert sent == [1.2]
+
+    # the rise alert restarted the regular cooldown too, but a fall has its own
+    await notifier.handle_new_price(SimpleNamespace(pool_rune_price=1.01))
+    await notifier.handle_new_price(SimpleNamespace(pool_rune_price=0.8))
+    assert sent == [1.2, 0.8]
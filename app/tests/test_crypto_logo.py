@@ -0,0 +1,79 @@
+import pytest
+from PIL import Image
+
+from services.dialog.picture.crypto_logo import CryptoLogoDownloader as Logos
+
+
+def make_logos(tmp_path):
+    Image.new('RGBA', (256, 256), 'red').save(tmp_path / 'BTC.BTC.png')
+    Image.new('RGBA', (128, 64), 'blue').save(tmp_path / 'ETH.ETH.png')
+    Image.new('RGBA', (128, 128), 'gray').save(tmp_path / Logos.UNKNOWN_LOGO)
+
+
+def make_downloader(tmp_path, **kwargs):
+    logos = Logos(str(tmp_path), **kwargs)
+    logos.downloads = []
+
+    async def download(asset):
+        logos.downloads.append(asset)
+        raise FileNotFoundError
+
+    logos._download_logo = download
+    return logos
+
+
+@pytest.mark.asyncio
+async def test_memory_and_sizes(tmp_path):
+    make_logos(tmp_path)
+    logos = make_downloader(tmp_path)
+
+    btc = await logos.get_logo('BTC.BTC')
+    assert btc.size == (128, 128) and btc.mode == 'RGBA'
+    assert await logos.get_logo('BTC.BTC') is btc
+
+    small = await logos.get_logo('BTC.BTC', 50)
+    assert small.size == (50, 50)
+    assert await logos.get_logo('BTC.BTC', 50) is small
+    assert logos.stats == {Logos.SRC_DISK: 1, Logos.SRC_MEMORY: 3}
+    assert logos.hit_rate == 0.75
+
+    # the old API gives a copy that may be modified
+    copy = await logos.get_or_download_logo_cached('BTC.BTC')
+    copy.thumbnail((10, 10))
+    assert btc.size == (128, 128)
+
+
+@pytest.mark.asyncio
+async def test_miss_is_remembered(tmp_path):
+    make_logos(tmp_path)
+    logos = make_downloader(tmp_path)
+
+    for _ in range(3):
+        logo = await logos.get_logo('DASH.DASH', 64)
+        assert logo.size == (64, 64) and logo.getpixel((0, 0)) == (128, 128, 128, 255)
+    assert logos.downloads == ['DASH.DASH']
+    assert logos.stats[Logos.SRC_MISS] == 3
+
+    logos.miss_ttl = 0.0
+    await logos.get_logo('DASH.DASH')
+    assert logos.downloads == ['DASH.DASH'] * 2
+
+
+@pytest.mark.asyncio
+async def test_atlas(tmp_path):
+    make_logos(tmp_path)
+    logos = make_downloader(tmp_path)
+    await logos.warm_up(['BTC.BTC', 'ETH.ETH', 'DASH.DASH'])
+    assert (tmp_path / Logos.ATLAS_FILE).exists()
+    assert logos.atlas_items == 2  # no DASH logo
+    assert 'DASH.DASH' in logos.downloads
+
+    # next start: all from the atlas, the files are not read
+    (tmp_path / 'BTC.BTC.png').unlink()
+    logos = make_downloader(tmp_path)
+    await logos.warm_up(['BTC.BTC', 'ETH.ETH'])
+    btc = await logos.get_logo('BTC.BTC')
+    eth = await logos.get_logo('ETH.ETH')
+    assert btc.getpixel((5, 5)) == (255, 0, 0, 255)
+    assert eth.size == (128, 64)
+    assert logos.stats == {Logos.SRC_ATLAS: 2}
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+
+from services.jobs.fetch.runeyield.date2block import DateToBlockMapper, interpolate_height, BlockAnchorIndex
+from services.lib.config import Config
+from services.lib.date_utils import now_ts, DAY, HOUR
+from services.lib.depcont import DepContainer
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+class FakeChain:
+    """6 sec blocks, then a 3-hour halt, then 5 sec blocks up to now"""
+
+    def __init__(self, now, blocks_before=20_000, blocks_after=100_000):
+        self.halt_height = blocks_before
+        self.top = blocks_before + blocks_after
+        self.t_halt_end = now - blocks_after * 5.0
+        self.t_start = self.t_halt_end - 3 * HOUR - blocks_before * 6.0
+        self.calls = 0
+
+    def block_ts(self, height):
+        if height <= self.halt_height:
+            return self.t_start + height * 6.0
+        return self.t_halt_end + (height - self.halt_height) * 5.0
+
+    async def query_tendermint_block_raw(self, height):
+        self.calls += 1
+        if not 1 <= height <= self.top:
+            return None
+        rfc = datetime.fromtimestamp(self.block_ts(height)).strftime('%Y-%m-%dT%H:%M:%S.%f') + '000Z'
+        return {'result': {'block': {'header': {'time': rfc}}}}
+
+
+def make_mapper(db, chain):
+    deps = DepContainer()
+    deps.cfg = Config(data={})
+    deps.db = db
+    deps.thor_connector = chain
+    return DateToBlockMapper(deps)
+
+
+def test_interpolate_height():
+    anchors = [(1000.0, 100), (2000.0, 300)]
+    assert interpolate_height(anchors, 1500.0) == 200
+    assert interpolate_height(anchors, 1000.0) == 100
+    assert interpolate_height(anchors, 2060.0) == 310  # extrapolated with 6 sec blocks
+    assert interpolate_height(anchors, 880.0) == 80
+    assert interpolate_height([], 880.0) is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_lookup_and_anchors(fake_db: FakeDB):
+    now = now_ts()
+    chain = FakeChain(now)
+    mapper = make_mapper(fake_db, chain)
+
+    timestamps = [now - day * DAY for day in range(1, 8)] + [chain.block_ts(19_000), chain.block_ts(21_000)]
+    heights = await mapper.get_block_heights_by_timestamps(timestamps, last_block=chain.top)
+    for ts, height in zip(timestamps, heights):
+        assert abs(chain.block_ts(height) - ts) <= mapper.iterative_algo_tolerance * 2, height
+
+    first_calls = chain.calls
+    assert first_calls <= 3 * len(timestamps)  # cold start: just one anchor (now)
+    assert await mapper.anchors.count() == first_calls
+
+    # the same and the nearby timestamps are resolved from the anchors alone
+    chain.calls = 0
+    heights = await mapper.get_block_heights_by_timestamps(timestamps, last_block=chain.top)
+    for ts, height in zip(timestamps, heights):
+        assert abs(chain.block_ts(height) - ts) <= mapper.iterative_algo_tolerance * 2, height
+    assert chain.calls == 0
+    assert mapper.lookups == 2 * len(timestamps) and mapper.rpc_calls == first_calls
+
+
+@pytest.mark.asyncio
+async def test_dense_anchors(fake_db: FakeDB):
+    now = now_ts()
+    chain = FakeChain(now)
+    mapper = make_mapper(fake_db, chain)
+    # as if the last block ticks were coming every 10 min (there are none during the halt)
+    await mapper.anchors.add_many((chain.block_ts(h), h) for h in range(1, chain.top, 100))
+
+    for i in range(50):
+        ts = chain.t_start + 1000 + i * 11_111.1
+        chain.calls = 0
+        [height] = await mapper.get_block_heights_by_timestamps([ts])
+        if chain.block_ts(chain.halt_height) < ts < chain.t_halt_end:
+            assert height == chain.halt_height and chain.calls <= mapper.iterative_algo_max_steps
+        else:
+            assert abs(chain.block_ts(height) - ts) <= mapper.iterative_algo_tolerance and chain.calls <= 1
+
+
+@pytest.mark.asyncio
+async def test_dates_and_ticks(fake_db: FakeDB):
+    now = now_ts()
+    chain = FakeChain(now)
+    mapper = make_mapper(fake_db, chain)
+
+    ticks = BlockAnchorIndex(fake_db, min_tick_interval=HOUR, deps=mapper.deps)
+    await ticks.on_data(None, chain.top - 100)  # the tick came late: the block is 500 sec old
+    await ticks.on_data(None, chain.top)  # too soon
+    assert await ticks.load(now - HOUR, now) == [(pytest.approx(chain.block_ts(chain.top - 100), abs=1e-3),
+                                                  chain.top - 100)]
+
+    day = datetime.fromtimestamp(now - 3 * DAY).date()
+    height = await mapper.get_block_height_by_date(day)
+    assert abs(chain.block_ts(height) - datetime(day.year, day.month, day.day).timestamp()) < 20.0
+    assert await mapper.load_height_from_day_cache(day) == height
+
+    chain.calls = 0
+    assert await mapper.get_block_heights_by_dates([day, day]) == [height, height]
+    assert chain.calls == 0
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from services.jobs.fetch.base import DataController, GraphBuilder, WatchedEntity
+from services.lib.delegates import INotified, WithDelegates, EdgeStats
+
+
+class Sleeper(INotified):
+    def __init__(self, delay, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+
+    async def on_data(self, sender, data):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError('boom')
+        self.received.append(data)
+
+
+class Emitter(WithDelegates, WatchedEntity):
+    pass
+
+
+def test_edge_stats():
+    stats = EdgeStats(window=4)
+    for d in (0.002, 0.02, 0.2, 2.0, 20.0):
+        stats.add(d)
+    stats.add(0.3, ValueError())
+    stats.add(0.4, asyncio.TimeoutError())
+
+    assert stats.calls == 7
+    assert stats.errors == 1 and stats.timeouts == 1
+    assert list(stats.latencies) == [2.0, 20.0, 0.3, 0.4]  # rolling window
+    assert stats.percentile(50) == 0.4
+    hist = stats.histogram()  # all the calls, cumulative
+    assert hist[0.001] == 0 and hist[0.005] == 1
+    assert hist[0.5] == 5 and hist[5.0] == 6 and hist[float('inf')] == stats.calls
+
+
+@pytest.mark.asyncio
+async def test_sequential_fan_out_records_edges():
+    emitter = Emitter()
+    good, bad = Sleeper(0.0), Sleeper(0.0, fail=True)
+    emitter.add_subscriber(bad).add_subscriber(good)
+
+    summary = await emitter.pass_data_to_listeners('x')
+
+    assert good.received == ['x']
+    assert len(summary) == 2
+    assert emitter.edge_stats_for(good).calls == 1
+    assert emitter.edge_stats_for(bad).errors == 1
+    assert isinstance(emitter.edge_stats_for(bad).last_error, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fan_out_with_timeout():
+    emitter = Emitter()
+    slow, fast_1, fast_2 = Sleeper(0.5), Sleeper(0.05), Sleeper(0.05)
+    emitter.add_subscriber(slow, timeout=0.2)
+    emitter.add_subscriber(fast_1).add_subscriber(fast_2)
+    emitter.set_fan_out(concurrent=True)
+
+    t0 = time.monotonic()
+    await emitter.pass_data_to_listeners('x')
+    elapsed = time.monotonic() - t0
+
+    # the slow listener does not delay the others
+    assert elapsed < 0.4
+    assert fast_1.received == fast_2.received == ['x']
+    assert slow.received == []
+    assert emitter.edge_stats_for(slow).timeouts == 1
+    assert emitter.edge_stats_for(fast_1).percentile(50) < 0.2
+
+    # and it is not cancelled
+    await asyncio.sleep(0.5)
+    assert slow.received == ['x']
+    assert emitter.edge_stats_for(slow).calls == 1 and emitter.edge_stats_for(slow).percentile(50) > 0.4
+
+
+@pytest.mark.asyncio
+async def test_data_controller_and_graph_annotations():
+    root = Emitter()
+    middle = Emitter()
+    leaf = Sleeper(0.0)
+    root.add_subscriber(middle)
+    middle.add_subscriber(leaf)
+
+    controller = DataController()
+    controller.register(root)
+
+    # middle is a pure emitter in this test, so make it pass the data along
+    async def on_data(sender, data):
+        await middle.pass_data_to_listeners(data)
+
+    middle.on_data = on_data
+    await root.pass_data_to_listeners('x')
+
+    assert [(e, l) for e, l, _ in controller.edge_stats()] == [('Emitter', 'Emitter'), ('Emitter', 'Sleeper')]
+    assert len(controller.slowest_edges()) == 2
+
+    controller.set_fan_out(True, timeout=3)
+    assert root.concurrent_fan_out and middle.concurrent_fan_out
+    assert middle.edge_stats_for(leaf).timeout == 3
+
+    # wired after set_fan_out
+    late_emitter, late_leaf = Emitter(), Sleeper(0.0)
+    middle.add_subscriber(late_emitter)
+    late_emitter.add_subscriber(late_leaf)
+    assert late_emitter.concurrent_fan_out
+    assert middle.edge_stats_for(late_emitter).timeout == 3 and late_emitter.edge_stats_for(late_leaf).timeout == 3
+
+    new_root = Emitter()
+    new_root.name = 'NewRoot'
+    controller.register(new_root)
+    assert new_root.concurrent_fan_out
+
+    builder = GraphBuilder(controller.summary)
+    dot = builder.make_digraph_dot(builder.make_graph(), builder.edge_labels())
+    assert '"Emitter" -> "Sleeper" [label="p50' in dot
+
+
+@pytest.mark.asyncio
+async def test_edge_histogram_metrics():
+    from services.lib.depcont import DepContainer
+    from services.lib.metrics_server import MetricsServer
+
+    root = Emitter()
+    root.add_subscriber(Sleeper(0.0))
+    for _ in range(3):
+        await root.pass_data_to_listeners('x')
+
+    deps = DepContainer()
+    deps.data_controller = DataController()
+    deps.data_controller.register(root)
+    text = MetricsServer(deps).render()
+
+    labels = 'emitter="Emitter",listener="Sleeper"'
+    assert '# TYPE mayabot_listener_duration_seconds histogram' in text
+    assert f'mayabot_listener_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'mayabot_listener_duration_seconds_count{{{labels}}} 3' in text
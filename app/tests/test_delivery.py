@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import pytest
+
+from services.lib.config import Config
+from services.lib.depcont import DepContainer
+from services.notify.broadcast import Broadcaster
+from services.notify.channel import ChannelDescriptor, Messengers, BoardMessage, DeliveryRetry
+from services.notify.delivery import DeliveryEngine, PlatformLimits
+
+
+class SlowMessenger:
+    def __init__(self, delay=0.0, flood_first=0):
+        self.delay = delay
+        self.flood_first = flood_first
+        self.sent = []
+
+    async def send_message(self, chat_id, msg: BoardMessage, **kwargs):
+        if self.flood_first > 0:
+            self.flood_first -= 1
+            raise DeliveryRetry(0.05)
+        await asyncio.sleep(self.delay)
+        self.sent.append((chat_id, msg.text, time.monotonic()))
+        return True
+
+
+class FakeLocale:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeLocMan:
+    def get_from_lang(self, lang):
+        return FakeLocale(lang)
+
+
+def make_broadcaster(messengers, delivery=None):
+    d = DepContainer()
+    d.cfg = Config(data={
+        'broadcasting': {'channels': [], 'startup_delay': 0, 'delivery': delivery or {}},
+        'personal': {'rate_limit': {}},
+    })
+    d.loc_man = FakeLocMan()
+    d.get_messenger = messengers.get
+    return Broadcaster(d)
+
+
+def channels(platform, n, lang='eng'):
+    return [ChannelDescriptor(platform, f'{platform}{i}', lang) for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_slow_platform_does_not_block_others():
+    tg, discord = SlowMessenger(delay=0.01), SlowMessenger()
+    b = make_broadcaster({Messengers.TELEGRAM: tg, Messengers.DISCORD: discord},
+                         {'telegram': {'workers': 2, 'rate': 1000, 'burst': 1000}})
+    try:
+        t0 = time.monotonic()
+        tg_task = asyncio.create_task(b.broadcast(channels(Messengers.TELEGRAM, 100), 'hello'))
+        await asyncio.sleep(0.005)
+        assert await b.broadcast(channels(Messengers.DISCORD, 3), 'hello') == 3
+        discord_done = time.monotonic() - t0
+
+        assert await tg_task == 100
+        tg_done = time.monotonic() - t0
+        assert discord_done < tg_done / 3
+    finally:
+        await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_global_token_bucket():
+    tg = SlowMessenger()
+    b = make_broadcaster({Messengers.TELEGRAM: tg}, {'telegram': {'rate': 100, 'burst': 10}})
+    try:
+        t0 = time.monotonic()
+        assert await b.broadcast(channels(Messengers.TELEGRAM, 30), 'hi') == 30
+        # 10 at once, then 20 more at 100/sec
+        assert time.monotonic() - t0 >= 0.18
+    finally:
+        await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_reschedules():
+    tg = SlowMessenger(flood_first=2)
+    b = make_broadcaster({Messengers.TELEGRAM: tg}, {'telegram': {'workers': 1}})
+    try:
+        assert await b.broadcast(channels(Messengers.TELEGRAM, 3), 'hi') == 3
+        assert len(tg.sent) == 3
+        assert b.delivery.platforms[Messengers.TELEGRAM].stats.retried == 2
+    finally:
+        await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_retry_keeps_chat_order():
+    tg = SlowMessenger(flood_first=1)
+    b = make_broadcaster({Messengers.TELEGRAM: tg},
+                         {'telegram': {'workers': 1, 'per_chat_rate': 1000, 'per_chat_burst': 1000}})
+    chat = ChannelDescriptor(Messengers.TELEGRAM, 'chat', 'eng')
+    try:
+        futures = [b.delivery.submit(chat, BoardMessage(f'm{i}')) for i in range(3)]
+        assert await asyncio.gather(*futures) == [True] * 3
+        assert [text for _, text, _ in tg.sent] == ['m0', 'm1', 'm2']
+    finally:
+        await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_rendered_once_per_language():
+    tg = SlowMessenger()
+    b = make_broadcaster({Messengers.TELEGRAM: tg})
+    b.channels = channels(Messengers.TELEGRAM, 20, 'eng') + \
+        [ChannelDescriptor(Messengers.TELEGRAM, f'r{i}', 'rus') for i in range(10)]
+
+    renders = []
+
+    async def get_subscribed_channels():
+        return []
+
+    async def render_text(locale, value):
+        renders.append(locale.name)
+        await asyncio.sleep(0.01)
+        return BoardMessage(f'{locale.name}:{value}')
+
+    b.get_subscribed_channels = get_subscribed_channels
+    try:
+        await b.notify_preconfigured_channels(render_text, 42)
+        assert sorted(renders) == ['eng', 'rus']
+        assert len(tg.sent) == 30
+    finally:
+        await b.stop()
+
+
+def test_limits_from_config():
+    cfg = Config(data={'delivery': {'telegram': {'rate': 5}}})
+    engine = DeliveryEngine.from_config(None, cfg.get('delivery'))
+    assert engine.limits[Messengers.TELEGRAM].rate == 5.0
+    assert engine.limits[Messengers.TELEGRAM].workers == 8
+    assert engine.limits[Messengers.SLACK] == PlatformLimits(workers=4, rate=20.0, burst=10.0,
+                                                             per_chat_rate=1.0, per_chat_burst=2.0)
+
+
+@pytest.mark.asyncio
+async def test_busy_chat_does_not_block_its_shard():
+    tg = SlowMessenger()
+    b = make_broadcaster({Messengers.TELEGRAM: tg},
+                         {'telegram': {'workers': 1, 'rate': 1000, 'burst': 1000,
+                                       'per_chat_rate': 10, 'per_chat_burst': 1}})
+    busy = ChannelDescriptor(Messengers.TELEGRAM, 'busy', 'eng')
+    other = ChannelDescriptor(Messengers.TELEGRAM, 'other', 'eng')
+    try:
+        busy_futures = [b.delivery.submit(busy, BoardMessage(f'm{i}')) for i in range(5)]
+        assert await b.delivery.deliver(other, BoardMessage('x')) is True
+        assert [text for _, text, _ in tg.sent] == ['m0', 'x']  # not behind the busy chat's waits
+
+        await asyncio.gather(*busy_futures)
+        busy_sent = [(text, t) for chat_id, text, t in tg.sent if chat_id == 'busy']
+        assert [text for text, _ in busy_sent] == [f'm{i}' for i in range(5)]
+        assert busy_sent[-1][1] - busy_sent[0][1] >= 0.35
+    finally:
+        await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_telegram_flood_control_outside_the_queue():
+    from aiogram.utils import exceptions
+    from services.dialog.telegram.telegram import TelegramBot
+    from services.lib.utils import WithLogger
+
+    class FloodedBot:
+        async def send_message(self, *args, **kwargs):
+            raise exceptions.RetryAfter(3)
+
+    tg = TelegramBot.__new__(TelegramBot)
+    WithLogger.__init__(tg)
+    tg.bot = FloodedBot()
+
+    # a direct call (e.g. from a dialog handler) just fails
+    assert await tg.send_message(1, BoardMessage('hi')) is False
+    # the delivery queue sends it again later
+    with pytest.raises(DeliveryRetry):
+        await tg.send_message(1, BoardMessage('hi'), retry_later=True)
@@ -0,0 +1,73 @@
+import pytest
+
+from proto.access import DecodedEvent
+from services.jobs.scanner.block_loader import BlockResult
+from services.jobs.scanner.event_db import EventDatabase
+from services.jobs.scanner.swap_extractor import SwapExtractorBlock
+from services.lib.config import Config
+from services.lib.depcont import DepContainer
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+@pytest.mark.asyncio
+async def test_batch_read_write(fake_db: FakeDB):
+    ev_db = EventDatabase(fake_db, expiration_sec=100)
+
+    await ev_db.write_tx_statuses({
+        'A': {'status': 'observed_in', 'memo': '=:BTC.BTC:bc1', 'is_streaming': True},
+        'B': {'status': 'observed_in', 'memo': '=:ETH.ETH:0x1'},
+        'C': {},
+    })
+    assert fake_db.round_trips == 1
+
+    await ev_db.write_tx_statuses({'A': {'status': 'given_away'}})
+    results = await ev_db.read_tx_statuses(['A', 'B', 'C', 'A'])
+    assert fake_db.round_trips == 3
+
+    assert list(results.keys()) == ['A', 'B', 'C']
+    assert results['A'].attrs == {'status': 'given_away', 'memo': '=:BTC.BTC:bc1', 'is_streaming': '1'}
+    assert results['B'].status == 'observed_in'
+    assert results['C'] is None
+
+    r = await fake_db.get_redis()
+    assert 0 < await r.ttl(ev_db.key_to_tx('A')) <= 100
+
+
+def make_swap_event(tx_id, i, height):
+    return DecodedEvent('swap', {
+        'pool': 'BTC.BTC', 'id': tx_id, 'chain': 'BTC', 'coin': f'{i} BTC.BTC', 'amount': i, 'asset': 'BTC.BTC',
+        'streaming_swap_quantity': '10', 'streaming_swap_count': str(i), 'memo': '=:ETH.ETH:0x1',
+    }, height)
+
+
+def make_outbound_event(tx_id, height):
+    return DecodedEvent('outbound', {
+        'in_tx_id': tx_id, 'id': '0' * 64, 'chain': 'MAYA', 'to': 'maya1xxx',
+        'coin': '100 MAYA.CACAO', 'amount': 100, 'asset': 'MAYA.CACAO', 'memo': '',
+    }, height)
+
+
+@pytest.mark.asyncio
+async def test_swap_extractor_constant_round_trips(fake_db: FakeDB):
+    deps = DepContainer()
+    deps.db = fake_db
+    deps.cfg = Config(data={'native_scanner': {'db': {'ttl': '1d'}}})
+    extractor = SwapExtractorBlock(deps)
+
+    async def round_trips_for_block(n_txs, height):
+        events = []
+        for t in range(n_txs):
+            events += [make_swap_event(f'TX{t}', i, height) for i in range(3)]
+            events.append(make_outbound_event(f'TX{t}', height))
+        block = BlockResult(height, [], [], events)
+
+        before = fake_db.round_trips
+        interesting_events = list(extractor.get_events_of_interest(block))
+        await extractor.register_swap_events(block, interesting_events)
+        await extractor.detect_swap_finished(block, interesting_events)
+        return fake_db.round_trips - before
+
+    assert await round_trips_for_block(2, 100) == await round_trips_for_block(20, 101) <= 3
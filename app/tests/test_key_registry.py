@@ -0,0 +1,134 @@
+import os
+import time
+
+import pytest
+
+from services.lib.config import Config
+from services.lib.db_many2many import ManyToManySet
+from services.lib.key_registry import KeyRegistry, scan_keys, delete_by_pattern, scan_batches
+from services.lib.scheduler import Scheduler
+from services.lib.settings_manager import SettingsManager
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+# 1_000_000 to see it at the production scale; filling fakeredis with that many keys takes a minute or so
+NOISE_KEYS = int(os.environ.get('KEY_REGISTRY_TEST_KEYS', 100_000))
+
+
+async def record_commands(db: FakeDB):
+    r = await db.get_redis()
+    commands = []
+    original = r.execute_command
+
+    async def execute_command(*args, **options):
+        commands.append(str(args[0]).upper())
+        return await original(*args, **options)
+
+    r.execute_command = execute_command
+    return commands
+
+
+async def fill_noise(db: FakeDB, n, batch=10_000):
+    r = await db.get_redis()
+    for start in range(0, n, batch):
+        await r.mset({f'Noise:{i}': 1 for i in range(start, min(n, start + batch))})
+
+
+def settings_manager(db):
+    return SettingsManager(db, Config(data={'web': {'public_url': 'https://example.com'}}))
+
+
+async def median_time(f, n=20):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await f()
+        times.append(time.perf_counter() - t0)
+    return sorted(times)[n // 2]
+
+
+@pytest.mark.asyncio
+async def test_scan_iteration(fake_db: FakeDB):
+    r = await fake_db.get_redis()
+    await r.mset({f'A:{i}': i for i in range(250)})
+    await r.mset({f'B:{i}': i for i in range(10)})
+
+    batches = [keys async for keys in scan_batches(r, 'A:*', batch_size=50)]
+    assert len(batches) > 1
+    assert set(await scan_keys(r, 'A:*', batch_size=50)) == {f'A:{i}' for i in range(250)}
+
+    assert await delete_by_pattern(r, 'A:*', batch_size=50) == 250
+    assert await scan_keys(r, 'A:*') == []
+    assert len(await scan_keys(r, 'B:*')) == 10
+
+
+@pytest.mark.asyncio
+async def test_registry_picks_up_old_keys(fake_db: FakeDB):
+    r = await fake_db.get_redis()
+    await r.mset({'Old:1': 1, 'Old:2': 1})
+
+    registry = KeyRegistry(fake_db, 'Old')
+    await registry.ensure_built('Old:*', name_from_key=lambda k: k.split(':')[1])
+    assert await registry.all() == {'1', '2'}
+
+    # built once: the new keys must be added explicitly
+    await r.set('Old:3', 1)
+    await registry.ensure_built('Old:*', name_from_key=lambda k: k.split(':')[1])
+    assert not await registry.has('3')
+    await registry.add('3')
+    assert await registry.match('[12]') == {'1', '2'}
+
+    assert await registry.delete_all(key_of_name=lambda name: f'Old:{name}') == 3
+    assert await registry.size() == 0
+    assert await scan_keys(r, 'Old:*') == []
+
+
+@pytest.mark.asyncio
+async def test_settings_scheduler_many2many_without_keys(fake_db: FakeDB):
+    commands = await record_commands(fake_db)
+    r = await fake_db.get_redis()
+
+    sm = settings_manager(fake_db)
+    await sm.set_settings('chat1', {'lang': 'eng'})
+    await sm.set_settings('chat2', {'lang': 'rus'})
+    await sm.set_settings('chat2', {})
+    assert await sm.all_users_having_settings() == ['chat1']
+
+    scheduler = Scheduler(r, 'Test')
+    await scheduler.schedule('lp_report:1', period=100)
+    await scheduler.schedule('lp_report:2', period=100)
+    await scheduler.schedule('other', period=100)
+    assert set(await scheduler.all_periodic_idents('lp_report:*')) == {'lp_report:1', 'lp_report:2'}
+    await scheduler.cancel_all_periodic('lp_report:*')
+    assert await scheduler.all_periodic_idents() == {'other'}
+    assert [ident for ident, _ in await scheduler.awaiting_events()] == ['other']
+
+    mm = ManyToManySet(fake_db, 'L', 'R')
+    await mm.associate_many(['A', 'B'], ['X'])
+    await mm.remove_one_item('A', 'X')
+    assert set(await mm.all_lefts()) == {'B'}
+    assert set(await mm.all_rights()) == {'X'}
+    await mm.clear()
+    assert not await mm.all_lefts()
+
+    assert commands and 'KEYS' not in commands
+
+
+@pytest.mark.asyncio
+async def test_registry_latency_is_flat(fake_db: FakeDB):
+    commands = await record_commands(fake_db)
+
+    sm = settings_manager(fake_db)
+    for i in range(100):
+        await sm.set_settings(f'chat{i}', {'lang': 'eng'})
+    assert len(await sm.all_users_having_settings()) == 100
+
+    before = await median_time(sm.all_users_having_settings)
+    await fill_noise(fake_db, NOISE_KEYS)
+    after = await median_time(sm.all_users_having_settings)
+
+    assert len(await sm.all_users_having_settings()) == 100
+    assert after < before * 5 + 0.005
+    assert 'KEYS' not in commands and 'SCAN' not in commands[-20:]
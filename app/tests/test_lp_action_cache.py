@@ -0,0 +1,185 @@
+import random
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from services.jobs.fetch.runeyield.action_cache import AddressActionCache
+from services.jobs.fetch.runeyield.lp_my import HomebrewLPConnector
+from services.lib.config import Config
+from services.lib.constants import ETH_USDT_SYMBOL, NATIVE_CACAO_SYMBOL
+from services.lib.depcont import DepContainer
+from services.lib.midgard.urlgen import free_url_gen
+from services.models.mimir import MimirHolder
+from services.models.pool_info import PoolInfo
+from services.models.price import LastPriceHolder
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+ADDRESS = 'maya1lpwallet'
+POOL = 'BTC.BTC'
+TX_TYPES = free_url_gen.LIQUIDITY_TX_TYPES
+
+
+def make_lp_action(i, height, address=ADDRESS, pool=POOL, add=True, units=10 ** 10, status='success'):
+    """A Midgard action of the user (addLiquidity or withdraw), as it comes from /v2/actions"""
+    date = str((1_700_000_000 + height * 6) * 10 ** 9)
+    tx_id = f'{i + 1:064X}'
+    cacao = {'amount': str(units * 3), 'asset': NATIVE_CACAO_SYMBOL}
+    asset = {'amount': str(units // 1000), 'asset': pool}
+    if add:
+        return {
+            'date': date, 'height': str(height), 'status': status, 'type': 'addLiquidity', 'pools': [pool],
+            'in': [{'address': address, 'coins': [cacao], 'txID': tx_id},
+                   {'address': 'bc1qlpwallet', 'coins': [asset], 'txID': tx_id}],
+            'out': [],
+            'metadata': {'addLiquidity': {'liquidityUnits': str(units)}},
+        }
+    else:
+        return {
+            'date': date, 'height': str(height), 'status': status, 'type': 'withdraw', 'pools': [pool],
+            'in': [{'address': address, 'coins': [], 'txID': tx_id}],
+            'out': [{'address': address, 'coins': [cacao], 'txID': ''},
+                    {'address': 'bc1qlpwallet', 'coins': [asset], 'txID': f'{i + 1:064X}'[::-1]}],
+            'metadata': {'withdraw': {'asymmetry': '0', 'basisPoints': '2000', 'liquidityUnits': str(-units),
+                                      'networkFees': []}},
+        }
+
+
+def make_lp_history(n, first_height=1_000_000, seed=42):
+    """A wallet with n actions: mostly additions, some partial withdrawals; oldest first"""
+    rng = random.Random(seed)
+    actions, height = [], first_height
+    for i in range(n):
+        height += rng.randint(50, 5000)
+        add = i < 2 or rng.random() < 0.7
+        actions.append(make_lp_action(i, height, add=add, units=rng.randint(1, 5) * 10 ** 9 if add else 10 ** 9))
+    return actions
+
+
+def pools_at(height) -> dict:
+    """Deterministic pool states that drift with the height"""
+    k = 1.0 + (height % 100_000) / 1_000_000
+    return {
+        POOL: PoolInfo(POOL, balance_asset=int(50 * 10 ** 8 * k), balance_rune=int(1_500_000 * 10 ** 10 / k),
+                       pool_units=10 ** 15, status=PoolInfo.AVAILABLE, units=10 ** 15),
+        ETH_USDT_SYMBOL: PoolInfo(ETH_USDT_SYMBOL, balance_asset=int(900_000 * 10 ** 8 * k),
+                                  balance_rune=10 ** 6 * 10 ** 10, pool_units=10 ** 14,
+                                  status=PoolInfo.AVAILABLE, units=10 ** 14),
+    }
+
+
+class FakeMidgard:
+    ERROR_RESPONSE = 'ERROR_Midgard'
+    ERROR_NOT_FOUND = 'NotFound_Midgard'
+
+    def __init__(self, actions):
+        self.actions = actions  # oldest first
+        self.requests = []
+
+    async def request(self, path):
+        self.requests.append(path)
+        q = parse_qs(urlparse(path).query)
+        types = q['type'][0].split(',')
+        offset, limit = int(q['offset'][0]), int(q['limit'][0])
+        mine = [a for a in reversed(self.actions) if a['type'] in types and q['address'][0] in str(a)]
+        return {'count': str(len(mine)), 'actions': mine[offset:offset + limit]}
+
+
+class FakePoolFetcher:
+    def __init__(self):
+        self.loaded_heights = []
+
+    async def load_pools_at_heights(self, heights):
+        self.loaded_heights.extend(heights)
+        return {h: pools_at(h) for h in heights}
+
+
+async def make_connector(db: FakeDB, midgard: FakeMidgard, cache=True, pool_fetcher=None) -> HomebrewLPConnector:
+    await db.get_redis()
+    deps = DepContainer()
+    deps.db = db
+    deps.cfg = Config(data={'tx': {
+        'fetch_period': 60, 'tx_per_batch': 50, 'max_page_deep': 5, 'max_age': '2d',
+        'announce_pending_after_blocks': 500,
+        'lp_action_cache': {'enabled': cache, 'expire': '30d'},
+    }})
+    deps.midgard_connector = midgard
+    deps.pool_fetcher = pool_fetcher or FakePoolFetcher()
+    deps.mimir_const_holder = MimirHolder()
+    deps.price_holder = LastPriceHolder()
+    deps.price_holder.update(pools_at(2_000_000))
+    deps.last_block_store = type('LastBlock', (), {'last_maya_block': 2_000_000})()
+    return HomebrewLPConnector(deps)
+
+
+@pytest.mark.asyncio
+async def test_action_cache_fetches_only_new_pages(fake_db: FakeDB):
+    history = make_lp_history(260)
+    midgard = FakeMidgard(history[:240])
+    await fake_db.get_redis()
+    deps = DepContainer()
+    deps.db, deps.midgard_connector = fake_db, midgard
+    cache = AddressActionCache(deps, page_size=50)
+
+    actions, unchanged_below = await cache.fetch(ADDRESS, TX_TYPES)
+    assert len(actions) == 240 and unchanged_below == 0
+    assert len(midgard.requests) == 5
+
+    # nothing new: one page is enough
+    midgard.requests.clear()
+    actions, unchanged_below = await cache.fetch(ADDRESS, TX_TYPES)
+    assert len(actions) == 240 and len(midgard.requests) == 1
+    assert unchanged_below == int(history[239]['height']) + 1
+
+    # a pending withdrawal and new actions
+    midgard.actions = history[:259] + [make_lp_action(259, int(history[259]['height']), add=False, status='pending')]
+    midgard.requests.clear()
+    actions, _ = await cache.fetch(ADDRESS, TX_TYPES)
+    assert len(actions) == 260 and len(midgard.requests) == 1
+    assert actions[0]['status'] == 'pending'
+
+    # the pending one is requested again (and now it is done)
+    midgard.actions = history
+    actions, unchanged_below = await cache.fetch(ADDRESS, TX_TYPES)
+    assert actions[0]['status'] == 'success' and len(actions) == 260
+    assert unchanged_below == int(history[259]['height'])
+
+    # Midgard says there are fewer actions than we have: everything is loaded again
+    midgard.actions = history[:100] + history[101:]
+    midgard.requests.clear()
+    actions, _ = await cache.fetch(ADDRESS, TX_TYPES)
+    assert len(actions) == 259 and cache.stats['resyncs'] == 1
+    assert len(midgard.requests) == 1 + 6
+
+
+@pytest.mark.asyncio
+async def test_incremental_report_equals_full_one(fake_db: FakeDB):
+    history = make_lp_history(300)
+    midgard = FakeMidgard(history[:290])
+
+    lp = await make_connector(fake_db, midgard)
+    await lp.generate_yield_report_single_pool(ADDRESS, POOL)
+    assert lp.stats['txs_processed'] == 290
+
+    # 10 more actions: only they are processed, only their pool states (+1) are loaded
+    midgard.actions = history
+    midgard.requests.clear()
+    pool_fetcher = FakePoolFetcher()
+    lp = await make_connector(fake_db, midgard, pool_fetcher=pool_fetcher)
+    report = await lp.generate_yield_report_single_pool(ADDRESS, POOL)
+    assert lp.stats['checkpoint_hits'] == 1 and lp.stats['txs_processed'] == 10
+    assert len(midgard.requests) == 1
+    assert len(set(pool_fetcher.loaded_heights)) <= 11
+
+    # the same as if it was calculated from scratch
+    full_lp = await make_connector(FakeDB(), FakeMidgard(history), cache=False)
+    full_report = await full_lp.generate_yield_report_single_pool(ADDRESS, POOL)
+    assert full_lp.stats['txs_processed'] == 300
+    assert report == full_report
+
+    # nothing new: nothing to process
+    lp = await make_connector(fake_db, midgard)
+    assert await lp.generate_yield_report_single_pool(ADDRESS, POOL) == full_report
+    assert lp.stats['checkpoint_hits'] == 1 and lp.stats['txs_processed'] == 0
@@ -0,0 +1,20 @@
+from services.lib.lru import percentile, WindowAverage
+
+
+def test_percentile():
+    values = [float(x) for x in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values[::-1], 99) == 99.0  # unsorted is fine
+    assert percentile([], 50) is None
+    assert percentile([], 50, default=0.0) == 0.0
+
+
+def test_window_average_percentile():
+    w = WindowAverage(10)
+    assert w.percentile(50) is None
+    for x in range(100):
+        w.append(x)
+    # only the last 10 values
+    assert w.percentile(0) == 90
+    assert w.percentile(100) == 99
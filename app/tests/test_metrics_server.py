@@ -0,0 +1,102 @@
+import socket
+
+import aiohttp
+import fakeredis
+import pytest
+
+from services.jobs.fetch.base import BaseFetcher
+from services.lib.db import DB
+from services.lib.depcont import DepContainer
+from services.lib.http_ses import HostEntry
+from services.lib.metrics_server import MetricsServer, PrometheusWriter
+
+
+class DummyFetcher(BaseFetcher):
+    async def fetch(self):
+        return {'x': 1}
+
+
+class DummyScanner:
+    last_block = 1000
+    blocks_behind = 7
+    prefetch_in_flight = 2
+    last_block_ts = 1700000000.0
+
+
+class DummySession:
+    def __init__(self):
+        self.host_stats = {'mayanode.mayachain.info': HostEntry('mayanode.mayachain.info')}
+        self.host_stats['mayanode.mayachain.info'].update(0.25, status=200)
+        self.host_stats['mayanode.mayachain.info'].update(1.0, error=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_writer_format():
+    w = PrometheusWriter(prefix='t_')
+    w.add('a', 1, {'x': 'q"uote'}, 'help A', 'counter')
+    w.add('a', 2.5, {'x': 'y'}, 'help A', 'counter')
+    w.add('b', None)
+    assert w.render() == (
+        '# HELP t_a help A\n'
+        '# TYPE t_a counter\n'
+        't_a{x="q\\"uote"} 1\n'
+        't_a{x="y"} 2.5\n'
+        '# TYPE t_b gauge\n'
+        't_b NaN\n'
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_latency_is_observed():
+    db = DB(None)
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    db._observe_latency(r)
+
+    await r.set('a', '1')
+    await r.get('a')
+    async with r.pipeline() as pipe:
+        pipe.get('a')
+        pipe.get('b')
+        await pipe.execute()
+
+    assert db.command_stats['SET'].calls == 1
+    assert db.command_stats['GET'].calls == 1
+    assert db.command_stats['PIPELINE'].calls == 1
+    assert db.command_stats['GET'].latency.percentile(50) >= 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    d = DepContainer()
+    d.db = DB(None)
+    d.db.command_stats['GET'].add(0.002)
+    d.block_scanner = DummyScanner()
+    d.session = DummySession()
+
+    fetcher = DummyFetcher(d, sleep_period=10)
+    await fetcher.run_once()
+
+    server = MetricsServer(d, host='127.0.0.1', port=free_port())
+    await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'http://127.0.0.1:{server.port}/metrics') as resp:
+                assert resp.status == 200
+                assert resp.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+                text = await resp.text()
+    finally:
+        await server.stop()
+
+    assert 'mayabot_fetcher_ticks_total{fetcher="DummyFetcher"} 1' in text
+    assert 'mayabot_fetcher_errors_total{fetcher="DummyFetcher"} 0' in text
+    assert 'mayabot_scanner_lag_blocks 7' in text
+    assert 'mayabot_redis_commands_total{command="GET"} 1' in text
+    assert 'mayabot_redis_command_duration_seconds{command="GET",quantile="0.5"} 0.002' in text
+    assert 'mayabot_http_requests_total{host="mayanode.mayachain.info"} 2' in text
+    assert 'mayabot_http_errors_total{host="mayanode.mayachain.info"} 1' in text
+    assert 'mayabot_http_request_duration_seconds_sum{host="mayanode.mayachain.info"} 1.25' in text
@@ -0,0 +1,100 @@
+import pytest
+
+from services.lib.config import Config
+from services.lib.midgard.name_service import NameService
+from services.models.node_info import NodeListHolder
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+NAMES = {
+    'maya1alice': 'alice',
+    'maya1bob': 'bob',
+}
+
+
+class FakeMidgard:
+    ERROR_RESPONSE = 'ERROR_Midgard'
+    ERROR_NOT_FOUND = 'NotFound_Midgard'
+
+    def __init__(self):
+        self.requests = []
+
+    async def request(self, path):
+        self.requests.append(path)
+        if path.startswith('/v2/thorname/rlookup/'):
+            address = path.split('/')[-1]
+            return [NAMES[address]] if address in NAMES else self.ERROR_NOT_FOUND
+        if path.startswith('/v2/thorname/lookup/'):
+            name = path.split('/')[-1]
+            address = next((a for a, n in NAMES.items() if n == name), None)
+            if not address:
+                return self.ERROR_NOT_FOUND
+            return {'expire': 1000, 'owner': address, 'entries': [{'chain': 'MAYA', 'address': address}]}
+        return self.ERROR_RESPONSE
+
+
+async def make_name_service(db: FakeDB, **thorname_cfg):
+    await db.get_redis()
+    cfg = Config(data={'names': {
+        'thorname': {'enabled': True, 'expire': '24h', **thorname_cfg},
+        'preconfig': {'maya1reserve': 'Reserve'},
+        'affiliates': {},
+    }})
+    midgard = FakeMidgard()
+    return NameService(db, cfg, midgard, NodeListHolder()), midgard
+
+
+@pytest.mark.asyncio
+async def test_bulk_lookup(fake_db: FakeDB):
+    ns, midgard = await make_name_service(fake_db)
+    addresses = ['maya1alice', 'maya1bob', 'maya1reserve'] + [f'maya1nobody{i}' for i in range(20)]
+
+    results = await ns.lookup_names_by_addresses(addresses)
+    assert list(results.keys()) == addresses
+    assert results['maya1alice'].name == 'alice' and results['maya1bob'].name == 'bob'
+    assert results['maya1reserve'].name == 'Reserve'
+    assert all(results[a] is None for a in addresses[3:])
+    assert len(midgard.requests) == 22 + 2
+    assert fake_db.round_trips == 4  # MGET + SET pipeline for the addresses, the same for the names
+
+    # the same from Redis: the addresses without names are not even there
+    ns, midgard = await make_name_service(fake_db)
+    fake_db.round_trips = 0
+    results = await ns.lookup_names_by_addresses(addresses)
+    assert results['maya1alice'].name == 'alice' and results['maya1nobody0'] is None
+    assert not midgard.requests and fake_db.round_trips == 2
+
+    # the negative cache is in memory
+    fake_db.round_trips = 0
+    assert await ns.lookup_name_by_address('maya1nobody5') is None
+    assert (await ns.lookup_name_by_address('maya1bob')).name == 'bob'
+    assert not midgard.requests and fake_db.round_trips == 2
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_expires(fake_db: FakeDB):
+    ns, midgard = await make_name_service(fake_db, negative_expire='1h')
+    assert await ns.lookup_name_by_address('maya1carol') is None
+    assert await fake_db.redis.ttl(ns.cache._key_address_to_names('maya1carol')) <= 3600
+
+    NAMES['maya1carol'] = 'carol'
+    try:
+        ns.cache._no_name_until['maya1carol'] = 0  # expired
+        await ns.cache.clear_cache_for_address('maya1carol')
+        assert (await ns.lookup_name_by_address('maya1carol')).name == 'carol'
+        assert not ns.cache.is_known_without_name('maya1carol')
+    finally:
+        del NAMES['maya1carol']
+
+
+@pytest.mark.asyncio
+async def test_local_wallet_names(fake_db: FakeDB):
+    ns, _ = await make_name_service(fake_db)
+    local = ns.get_local_service(user_id=42)
+    await local.set_wallet_local_name('maya1alice', 'Savings')
+    fake_db.round_trips = 0
+    assert await local.get_wallet_local_names(['maya1alice', 'maya1bob']) == {'maya1alice': 'Savings',
+                                                                            'maya1bob': None}
+    assert fake_db.round_trips == 1
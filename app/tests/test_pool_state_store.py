@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from services.jobs.fetch.pool_state_store import PoolStateStore
+from services.lib.date_utils import DAY
+from services.models.pool_info import PoolInfo
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+def make_pools(height):
+    return {
+        asset: PoolInfo(asset, 10 ** 12 + height, 10 ** 22 + height * 7, 10 ** 20, PoolInfo.AVAILABLE,
+                        pool_apr=12.5, units=10 ** 20 + 1)
+        for asset in ('BTC.BTC', 'ETH.ETH', 'ETH.USDT-0XDAC17F958D2EE523A2206206994597C13D831EC7')
+    }
+
+
+def test_encode_decode():
+    pools = make_pools(100)
+    blob = PoolStateStore.encode(pools)
+    assert PoolStateStore.decode(blob) == pools
+    assert len(blob) < len(str({k: p.as_dict_brief() for k, p in pools.items()})) / 3
+
+    assert PoolStateStore.decode(bytes([PoolStateStore.FORMAT + 1]) + blob[1:]) is None
+
+
+@pytest.mark.asyncio
+async def test_prefetch(fake_db: FakeDB):
+    store = PoolStateStore(fake_db, concurrency=2, bucket_size=100)
+    calls = []
+
+    async def fetch(height):
+        calls.append(height)
+        return make_pools(height) if height != 666 else {}
+
+    heights = [10, 20, 150, 250, 666]
+    states = await store.prefetch(heights, fetch)
+    assert sorted(calls) == heights
+    assert states[150] == make_pools(150) and states[666] == {}
+
+    calls.clear()
+    fake_db.round_trips = 0
+    states = await store.prefetch(heights + [30], fetch)
+    assert calls == [30, 666]  # the failed one is not remembered
+    assert states[250]['BTC.BTC'].balance_rune == 10 ** 22 + 250 * 7
+    assert fake_db.round_trips == 2  # one read for all buckets, one write
+    assert store.stats == {'hits': 4, 'misses': 5 + 2, 'fetched': 7, 'saved': 4 + 1}
+
+    assert await store.get(20) == make_pools(20)
+    assert await store.get(21) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_prefetch(fake_db: FakeDB):
+    store = PoolStateStore(fake_db, concurrency=2)
+    calls = []
+
+    async def fetch(height):
+        calls.append(height)
+        await asyncio.sleep(0.01)
+        return make_pools(height)
+
+    a, b = await asyncio.gather(store.prefetch([1, 2, 3], fetch), store.prefetch([2, 3, 4], fetch))
+    assert sorted(calls) == [1, 2, 3, 4]
+    assert a[3] == b[3] == make_pools(3)
+    assert store.stats['fetched'] == store.stats['saved'] == 4
+
+
+@pytest.mark.asyncio
+async def test_retention_by_buckets(fake_db: FakeDB):
+    store = PoolStateStore(fake_db, retention_sec=10 * DAY, block_time=6.0, bucket_size=1000)
+    top = 1_000_000
+    blocks_per_day = int(DAY / 6)
+
+    await store.put_many({
+        top: make_pools(top),
+        top - 3 * blocks_per_day: make_pools(1),
+        top - 11 * blocks_per_day: make_pools(2),  # already too old
+    }, top_height=top)
+
+    r = await fake_db.get_redis()
+    assert not await r.exists(store.bucket_key(top - 11 * blocks_per_day))
+    assert 6 * DAY < await r.ttl(store.bucket_key(top - 3 * blocks_per_day)) <= 7 * DAY + 1000 * 6
+    assert await r.ttl(store.bucket_key(top)) == 10 * DAY
+
+    assert await store.clear() == 2
+    assert await store.get(top) is None
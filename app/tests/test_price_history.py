@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from services.jobs.price_history import PriceHistoryCache, POOL_DEPTH_SERIES
+from services.lib.constants import RUNE_SYMBOL_POOL, RUNE_SYMBOL_DET
+from services.lib.date_utils import DAY, HOUR, MINUTE, now_ts
+from services.models.time_series import PriceTimeSeries, TimeSeries, MS
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+def fill(cache: PriceHistoryCache, start, n, step=MINUTE):
+    for i in range(n):
+        cache.append(start + i * step, pool_price=1.0 + i, det_price=0.5, cex_price=0.0, pool_depth=1000.0)
+
+
+def test_bounded_memory():
+    cache = PriceHistoryCache(None, max_age=HOUR, tick_interval=MINUTE)
+    memory = cache.memory_bytes
+    assert cache.capacity == 73
+
+    fill(cache, 0, 500)
+    assert cache.size <= cache.capacity
+    assert cache.memory_bytes == memory
+
+    # only the last hour (and a bit) is kept
+    ts, values = cache.window(cache.COL_POOL_PRICE, 0, 1e9)
+    assert ts[-1] == 499 * MINUTE and ts[-1] - HOUR * 1.2 <= ts[0] <= ts[-1] - HOUR
+    assert values[-1] == 500.0
+
+    # out of order: ignored
+    cache.append(0, pool_price=1.0)
+    assert cache.window(cache.COL_POOL_PRICE, 0, 1e9)[0][-1] == 499 * MINUTE
+
+
+def test_slices_and_aggregations():
+    cache = PriceHistoryCache(None, max_age=DAY, tick_interval=MINUTE)
+    fill(cache, 0, 600)
+
+    assert cache.average(cache.COL_POOL_PRICE, 0, 2 * MINUTE) == 2.0
+    assert cache.average_ago(cache.COL_POOL_PRICE, 10 * MINUTE, MINUTE, now=100 * MINUTE) == 91.0
+    assert cache.average(cache.COL_CEX_PRICE, 0, 1e9) is None  # no valid values
+
+    chart = cache.last_values(cache.COL_POOL_PRICE, 600 * MINUTE, max_points=100, now=599 * MINUTE)
+    assert len(chart) == 100
+    assert chart[0] == (2.5 * MINUTE, 3.5)
+    assert np.isclose(np.mean([v for _, v in chart]), 300.5)
+
+    assert len(cache.last_values(cache.COL_DET_PRICE, 10 * MINUTE, now=599 * MINUTE)) == 11
+
+
+@pytest.mark.asyncio
+async def test_rebuild_from_redis(fake_db: FakeDB):
+    r = await fake_db.get_redis()
+    now = int(now_ts())
+    pool = PriceTimeSeries(RUNE_SYMBOL_POOL, fake_db)
+    det = PriceTimeSeries(RUNE_SYMBOL_DET, fake_db)
+    depth = TimeSeries(POOL_DEPTH_SERIES, fake_db)
+
+    async with r.pipeline(transaction=False) as pipe:
+        for i, ts in enumerate(range(now - 2 * DAY, now, MINUTE)):
+            pipe.xadd(pool.stream_name, {'price': 1.0 + i % 2}, id=f'{ts * MS}-0')
+            # written a moment later on the same tick; some are missing
+            if i % 10:
+                pipe.xadd(det.stream_name, {'price': 0.25}, id=f'{ts * MS + 300}-0')
+            pipe.xadd(depth.stream_name, {'cacao': 1e6}, id=f'{ts * MS + 500}-0')
+        await pipe.execute()
+
+    cache = PriceHistoryCache(fake_db, max_age=DAY, tick_interval=MINUTE)
+    assert not cache.covers(HOUR)
+
+    await cache.rebuild()
+    assert cache.is_ready and DAY // MINUTE - 1 <= cache.size <= DAY // MINUTE
+    assert cache.covers(DAY - MINUTE) and not cache.covers(2 * DAY)
+
+    assert cache.average(cache.COL_POOL_PRICE, 0, now) == pytest.approx(1.5, abs=0.01)
+    assert cache.average(cache.COL_DET_PRICE, 0, now) == 0.25
+    _, det_values = cache.window(cache.COL_DET_PRICE, 0, now)
+    assert 0.85 < np.count_nonzero(~np.isnan(det_values)) / len(det_values) < 0.95
+    assert cache.average(cache.COL_POOL_DEPTH, 0, now) == 1e6
+    assert cache.average(cache.COL_CEX_PRICE, 0, now) is None
+
+
+@pytest.mark.asyncio
+async def test_dex_report_price_over_period(fake_db: FakeDB):
+    from types import SimpleNamespace
+    from services.lib.depcont import DepContainer
+    from services.lib.w3.dex_analytics import DexAnalyticsCollector
+
+    deps = DepContainer()
+    deps.db = fake_db
+    deps.price_holder = SimpleNamespace(usd_per_rune=9.0)
+    dex = DexAnalyticsCollector(deps)
+
+    # no price history: the current price
+    assert (await dex.get_analytics(HOUR)).usd_per_rune == 9.0
+
+    deps.price_history = cache = PriceHistoryCache(fake_db, max_age=DAY, tick_interval=MINUTE)
+    # not loaded yet
+    assert (await dex.get_analytics(HOUR)).usd_per_rune == 9.0
+
+    await cache.rebuild()  # Redis has nothing older, so the cache is complete
+    now = now_ts()
+    for i in range(10):
+        cache.append(now - 9 * MINUTE + i * MINUTE, pool_price=1.0 + i)
+    assert (await dex.get_analytics(HOUR)).usd_per_rune == 5.5
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from localization.eng_base import EnglishLocalization
+from localization.rus import RussianLocalization
+from services.dialog.picture.render_service import RenderService, RenderCache, async_render
+from services.lib.config import Config
+
+N_CALLS = []
+
+
+@async_render
+def square_picture(size, loc, color='red'):
+    N_CALLS.append(loc.name)
+    return Image.new('RGBA', (size, size), color)
+
+
+@pytest.fixture
+def locs():
+    cfg = Config(data={})
+    return EnglishLocalization(cfg), RussianLocalization(cfg)
+
+
+def test_cache_limits(tmp_path):
+    cache = RenderCache(max_items=3, max_bytes=3 * 100 * 4, ttl=60, disk_dir=str(tmp_path))
+    for i in range(5):
+        cache.put(f'k{i}', Image.new('RGBA', (10, 10)), ts=1000)
+    assert len(cache) == 3 and cache.get('k0', now=1001) is None
+    assert cache.get('k2', now=1001) is not None  # now it is the freshest one
+
+    cache.put('big', Image.new('RGBA', (10, 20)), ts=1000)
+    assert len(cache) == 2 and cache.total_bytes == 3 * 400
+    assert cache.get('k2', now=1001) is not None and cache.get('k3', now=1001) is None
+
+    assert cache.get('k2', now=1061) is None  # expired
+
+    cache.save_to_disk('disk', Image.new('RGB', (5, 5), 'blue'))
+    cache.clear()
+    image = cache.load_from_disk('disk')
+    assert image.size == (5, 5) and image.getpixel((0, 0)) == (0, 0, 255)
+    assert cache.get('disk') is not None
+
+
+@pytest.mark.asyncio
+async def test_cached_by_data_and_locale(locs):
+    eng, rus = locs
+    N_CALLS.clear()
+
+    # not installed: just like async_wrap
+    image = await square_picture(8, eng)
+    assert image.size == (8, 8) and N_CALLS == [eng.name]
+
+    service = RenderService(workers=0).install()
+    try:
+        N_CALLS.clear()
+        # the same picture for many chats at once: rendered once
+        images = await asyncio.gather(*(square_picture(8, eng) for _ in range(5)))
+        assert N_CALLS == [eng.name] and all(im.size == (8, 8) for im in images)
+        assert images[0] is not images[1]  # everybody gets its own copy
+
+        await square_picture(8, eng)
+        await square_picture(8, rus)
+        await square_picture(8, eng, color='blue')
+        assert N_CALLS == [eng.name, rus.name, eng.name]
+
+        stats = service.stats[square_picture.__qualname__]
+        assert stats.renders == 3 and stats.cache_hits == 5
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_process(locs):
+    eng, rus = locs
+    service = RenderService(config_data={}, workers=1).install()
+    try:
+        image = await square_picture(16, rus, color='green')
+        assert image.size == (16, 16) and image.getpixel((0, 0)) == (0, 128, 0, 255)
+        assert service.stats[square_picture.__qualname__].renders == 1
+    finally:
+        service.shutdown()
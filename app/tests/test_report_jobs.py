@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from services.lib.depcont import DepContainer
+from services.lib.metrics_server import MetricsServer
+from services.notify.personal import report_jobs
+from services.notify.personal.report_jobs import LPReportJobs
+
+
+class FakeLastBlock:
+    last_maya_block = 1050
+
+    def __int__(self):
+        return self.last_maya_block
+
+
+class FakeYieldConnector:
+    calls = []
+    running = 0
+    max_running = 0
+
+    def __init__(self, deps):
+        self.add_il_protection_to_final_figures = False
+
+    async def generate_yield_report_single_pool(self, address, pool):
+        cls = FakeYieldConnector
+        cls.calls.append((address, pool))
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        try:
+            await asyncio.sleep(0.02)
+            if address == 'broken':
+                raise ValueError('Midgard is down')
+            return f'report {address} {pool} #{len(cls.calls)}'
+        finally:
+            cls.running -= 1
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    FakeYieldConnector.calls, FakeYieldConnector.max_running = [], 0
+    monkeypatch.setattr(report_jobs, 'get_rune_yield_connector', FakeYieldConnector)
+    deps = DepContainer()
+    deps.last_block_store = FakeLastBlock()
+    return LPReportJobs(deps, cache_ttl=60, height_bucket=100, max_concurrent=2)
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_computed_once(jobs: LPReportJobs):
+    requests = [('maya1a', 'BTC.BTC')] * 10 + [('maya1b', 'BTC.BTC')] * 5 + [('maya1c', 'ETH.ETH')] * 5
+    results = await asyncio.gather(*(jobs.get_report(address, pool) for address, pool in requests))
+
+    assert len(FakeYieldConnector.calls) == 3
+    assert FakeYieldConnector.max_running == 2
+    assert len(set(results[:10])) == 1 and results[0].startswith('report maya1a BTC.BTC')
+    assert jobs.stats.coalesced == 17 and jobs.queue_depth == 0
+
+    # reused from the cache until the next height bucket
+    assert await jobs.get_report('maya1a', 'BTC.BTC') == results[0]
+    assert jobs.stats.cache_hits == 1 and jobs.stats.dedup_ratio == 18 / 21
+
+    jobs.deps.last_block_store.last_maya_block = 1100
+    assert await jobs.get_report('maya1a', 'BTC.BTC') != results[0]
+    assert len(FakeYieldConnector.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_height_bucket_is_taken_before_the_jitter(jobs: LPReportJobs):
+    # fired at the same time, spread by the jitter; the chain moves to the next bucket in between
+    early = asyncio.ensure_future(jobs.get_report('maya1a', 'BTC.BTC', delay=0.01))
+    late = asyncio.ensure_future(jobs.get_report('maya1a', 'BTC.BTC', delay=0.05))
+    await asyncio.sleep(0.02)
+    jobs.deps.last_block_store.last_maya_block = 1100
+
+    assert await early == await late
+    assert len(FakeYieldConnector.calls) == 1 and jobs.stats.cache_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(jobs: LPReportJobs):
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await asyncio.gather(jobs.get_report('broken', 'BTC.BTC'), jobs.get_report('broken', 'BTC.BTC'))
+    assert len(FakeYieldConnector.calls) == 2 and jobs.stats.errors == 2
+
+
+@pytest.mark.asyncio
+async def test_jitter_and_metrics(jobs: LPReportJobs):
+    task = asyncio.ensure_future(jobs.get_report('maya1a', 'BTC.BTC', delay=0.05))
+    await asyncio.sleep(0.01)
+    assert jobs.delayed == 1 and not FakeYieldConnector.calls
+    await task
+    assert jobs.delayed == 0 and len(FakeYieldConnector.calls) == 1
+
+    jobs.deps.lp_report_jobs = jobs
+    text = MetricsServer(jobs.deps).render()
+    assert 'mayabot_lp_report_dedup_ratio 0.0' in text
+    assert 'mayabot_lp_report_duration_seconds_count 1' in text
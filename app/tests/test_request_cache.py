@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from aionode.cache import RequestCache
+from aionode.connector import ThorConnector
+from aionode.env import ThorEnvironment
+
+
+class CountingClient:
+    def __init__(self, delay=0.02):
+        self.env = ThorEnvironment(thornode_url='https://node', rpc_url='https://rpc')
+        self.delay = delay
+        self.calls = []
+
+    async def request(self, path, is_rpc=False):
+        self.calls.append(path)
+        await asyncio.sleep(self.delay)
+        if 'height=999' in path:
+            return {'error': {'code': -32603}}
+        return {'path': path}
+
+
+def make_connector(cache):
+    client = CountingClient()
+    connector = ThorConnector(client.env, session=None, cache=cache)
+    connector._clients = [client]
+    return connector, client
+
+
+def test_ttl_rules():
+    cache = RequestCache({'/mayachain/pool': 1, '/mayachain/pools': 5})
+    assert cache.ttl_for('/mayachain/pools') == 5
+    assert cache.ttl_for('/mayachain/pool/BTC.BTC') == 1
+    assert cache.ttl_for('/mayachain/pools?height=100') == RequestCache.FOREVER
+    assert cache.ttl_for('/mayachain/nodes?height=0') == 0
+    assert cache.ttl_for('/status?') == 0
+    assert cache.ttl_for('/block?height=100') == 0
+    assert cache.ttl_for('/mayachain/pool/BTC.BTC/liquidity_providers?height=100') == 1
+    assert RequestCache(historical_prefixes=()).ttl_for('/mayachain/pools?height=100') == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced():
+    connector, client = make_connector(RequestCache())
+
+    results = await asyncio.gather(*(connector.query_raw('/mayachain/mimir') for _ in range(10)))
+
+    assert all(r == {'path': '/mayachain/mimir'} for r in results)
+    assert len(client.calls) == 1
+    assert connector.cache.misses == 1 and connector.cache.coalesced == 9
+
+    # no TTL: the next request goes to the node again
+    await connector.query_raw('/mayachain/mimir')
+    assert len(client.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_historical_heights(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(RequestCache, '_now', staticmethod(lambda: now[0]))
+    connector, client = make_connector(RequestCache({'/mayachain/pools': 5}))
+
+    await connector.query_raw('/mayachain/pools')
+    await connector.query_raw('/mayachain/pools')
+    assert len(client.calls) == 1 and connector.cache.hits == 1
+
+    now[0] += 6
+    await connector.query_raw('/mayachain/pools')
+    assert len(client.calls) == 2
+
+    await connector.query_raw('/mayachain/pools?height=123')
+    now[0] += 1e6
+    await connector.query_raw('/mayachain/pools?height=123')
+    assert client.calls.count('/mayachain/pools?height=123') == 1
+
+    # errors are not cached
+    await connector.query_raw('/block?height=999', is_rpc=True)
+    await connector.query_raw('/block?height=999', is_rpc=True)
+    assert client.calls.count('/block?height=999') == 2
+
+
+@pytest.mark.asyncio
+async def test_scanner_blocks_are_not_retained():
+    connector, client = make_connector(RequestCache(max_size=2))
+    await connector.query_raw('/mayachain/pools?height=100')
+
+    for height in range(100, 110):
+        await connector.query_tendermint_block_raw(height)
+        await connector.query_native_block_results_raw(height)
+    await connector.query_tendermint_block_raw(100)
+
+    assert client.calls.count('/block?height=100') == 2
+    assert connector.cache.size == 1  # only the historical pools
+    await connector.query_raw('/mayachain/pools?height=100')
+    assert client.calls.count('/mayachain/pools?height=100') == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_break_others():
+    connector, client = make_connector(RequestCache())
+
+    first = asyncio.create_task(connector.query_raw('/mayachain/nodes'))
+    second = asyncio.create_task(connector.query_raw('/mayachain/nodes'))
+    await asyncio.sleep(0.001)
+    first.cancel()
+
+    assert await second == {'path': '/mayachain/nodes'}
+    assert len(client.calls) == 1
+
+
+def test_lru_limit():
+    cache = RequestCache(max_size=2)
+    for i in range(3):
+        cache._put(i, i, 10)
+    assert cache.size == 2 and cache._get_cached(0) is None
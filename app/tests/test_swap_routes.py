@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.jobs.scanner.swap_routes import SwapRouteRecorder
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+async def make_recorder(db: FakeDB):
+    await db.get_redis()
+    recorder = SwapRouteRecorder(db)
+    await recorder.migrate_legacy_routes()
+    return recorder
+
+
+async def put(recorder, from_asset, to_asset, volume, days_ago):
+    await recorder.store_swap_event(from_asset, to_asset, volume, datetime.now() - timedelta(days=days_ago))
+
+
+@pytest.mark.asyncio
+async def test_top_routes(fake_db: FakeDB):
+    recorder = await make_recorder(fake_db)
+
+    await put(recorder, 'BTC.BTC', 'MAYA.CACAO', 100.0, 0)
+    await put(recorder, 'BTC.BTC', 'MAYA.CACAO', 50.0, 3)
+    await put(recorder, 'ETH.ETH', 'BTC.BTC', 120.0, 1)
+    await put(recorder, 'DASH.DASH', 'ETH.ETH', 10.0, 2)
+    await put(recorder, 'DASH.DASH', 'ETH.ETH', 1000.0, 20)
+
+    top = await recorder.get_top_swap_routes_by_volume(days=7, top_n=2)
+    assert [(e.from_asset, e.to_asset, e.volume_cacao, e.count) for e in top] == [
+        ('BTC.BTC', 'MAYA.CACAO', 150.0, 2),
+        ('ETH.ETH', 'BTC.BTC', 120.0, 1),
+    ]
+
+    top = await recorder.get_top_swap_routes_by_volume(days=30, top_n=1)
+    assert top[0].from_asset == 'DASH.DASH' and top[0].volume_cacao == 1010.0
+
+    # the days expire by themselves
+    r = fake_db.redis
+    ttl = await r.ttl(recorder.key_day_volume(datetime.now()))
+    assert (recorder.keep_days - 1) * 86400 < ttl <= (recorder.keep_days + 1) * 86400
+    assert await r.ttl(recorder.key_day_count(datetime.now())) == ttl
+
+
+@pytest.mark.asyncio
+async def test_constant_number_of_calls(fake_db: FakeDB):
+    recorder = await make_recorder(fake_db)
+    for days_ago in range(90):
+        await put(recorder, 'BTC.BTC', 'ETH.ETH', 1.0, days_ago)
+
+    for days in (1, 7, 30, 60):
+        rt0 = fake_db.round_trips
+        await recorder.get_top_swap_routes_by_volume(days=days)
+        assert fake_db.round_trips - rt0 == 3
+
+    # cached union
+    rt0 = fake_db.round_trips
+    top = await recorder.get_top_swap_routes_by_volume(days=60)
+    assert fake_db.round_trips - rt0 == 2
+    # the days older than "keep_days" are already gone
+    assert top[0].volume_cacao == 61.0 and top[0].count == 61
+
+
+@pytest.mark.asyncio
+async def test_legacy_migration(fake_db: FakeDB):
+    r = await fake_db.get_redis()
+    recorder = SwapRouteRecorder(fake_db)
+    yesterday = datetime.now() - timedelta(days=1)
+    await r.hincrbyfloat(recorder._prefixed_key('BTC.BTC==ETH.ETH', yesterday), 'volume', 42.0)
+    await r.hincrbyfloat(recorder._prefixed_key('BTC.BTC==ETH.ETH', datetime.now()), 'volume', 8.0)
+    await r.sadd(recorder.key_counted_routes, 'hash1')
+
+    top = await recorder.get_top_swap_routes_by_volume(days=7)
+    assert top[0].volume_cacao == 50.0 and top[0].count == 2
+
+    assert await r.exists(recorder._prefixed_key('BTC.BTC==ETH.ETH', yesterday)) == 0
+    assert await recorder.is_registered('hash1')
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from aionode.connector import ThorConnector
+from aionode.env import ThorEnvironment
+from aionode.health import EndpointHealth
+
+
+class FakeClient:
+    def __init__(self, env, delay=0.0, fail=False, error=ConnectionError):
+        self.env = env
+        self.delay = delay
+        self.fail = fail
+        self.error = error
+        self.calls = 0
+
+    async def request(self, path, is_rpc=False):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise self.error('dead')
+        return {'from': self.env.thornode_url}
+
+    def set_client_id_header(self, _):
+        pass
+
+
+def make_connector(clients, **kwargs):
+    connector = ThorConnector(clients[0].env, session=None, **kwargs)
+    connector._clients = clients
+    return connector
+
+
+def env(name):
+    return ThorEnvironment(thornode_url=f'https://{name}', rpc_url=f'https://{name}-rpc')
+
+
+def test_health_breaker_cycle(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(EndpointHealth, '_now', staticmethod(lambda: now[0]))
+
+    h = EndpointHealth('x', failure_threshold=2, cool_off=10.0)
+    h.record_success(0.1)
+    h.record_failure(1.0)
+    assert h.state == h.STATE_CLOSED
+    h.record_failure(1.0)
+    assert h.state == h.STATE_OPEN and not h.is_available()
+
+    now[0] += 11
+    assert h.state == h.STATE_HALF_OPEN and h.is_available()
+    h.on_start()
+    assert not h.is_available()  # only one probe
+    h.record_failure()
+    assert h.state == h.STATE_OPEN  # cool-off doubled
+    now[0] += 11
+    assert h.state == h.STATE_OPEN
+    now[0] += 10
+    h.on_start()
+    h.record_success(0.2)
+    assert h.state == h.STATE_CLOSED
+    assert h.times_opened == 2
+
+
+@pytest.mark.asyncio
+async def test_dead_primary_is_skipped():
+    dead, backup = FakeClient(env('dead'), fail=True), FakeClient(env('backup'))
+    connector = make_connector([dead, backup], failure_threshold=2, cool_off=60)
+
+    for _ in range(5):
+        assert await connector._request('/x') == {'from': 'https://backup'}
+
+    # the failed node goes to the end of the line at once
+    assert dead.calls == 1
+    assert backup.calls == 5
+    assert connector.ranked_clients() == [backup, dead]
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast():
+    dead = FakeClient(env('dead'), fail=True)
+    connector = make_connector([dead], failure_threshold=2, cool_off=60)
+
+    for _ in range(4):
+        assert await connector._request('/x') is None
+
+    # after 2 failures the breaker opens and the node is not asked anymore
+    assert dead.calls == 2
+    assert connector.health['https://dead'].state == EndpointHealth.STATE_OPEN
+    assert connector.ranked_clients() == []
+
+
+@pytest.mark.parametrize('error', [ValueError, KeyError])
+@pytest.mark.asyncio
+async def test_failed_probe_is_settled(monkeypatch, error):
+    now = [100.0]
+    monkeypatch.setattr(EndpointHealth, '_now', staticmethod(lambda: now[0]))
+
+    # e.g. ValueError from a 502 HTML page that is not JSON
+    node = FakeClient(env('node'), fail=True, error=error)
+    connector = make_connector([node], failure_threshold=1, cool_off=10)
+    health = connector.endpoint_health(node, False)
+    health.record_failure()
+
+    now[0] += 11
+    assert health.state == health.STATE_HALF_OPEN
+    try:
+        await connector._request('/x')
+    except error:
+        pass
+    assert health.state == health.STATE_OPEN
+
+    # the node gets another probe after the cool-off, so it can recover
+    node.fail = False
+    now[0] += 21
+    assert await connector._request('/x') == {'from': 'https://node'}
+    assert health.state == health.STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_fastest_endpoint_goes_first():
+    slow, fast = FakeClient(env('slow'), delay=0.05), FakeClient(env('fast'), delay=0.0)
+    connector = make_connector([slow, fast])
+    connector.endpoint_health(slow, False).record_success(0.05)
+    connector.endpoint_health(fast, False).record_success(0.001)
+
+    assert connector.ranked_clients() == [fast, slow]
+    assert await connector._request('/x') == {'from': 'https://fast'}
+    assert slow.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_hedged_request():
+    slow, fast = FakeClient(env('slow'), delay=1.0), FakeClient(env('fast'))
+    connector = make_connector([slow, fast], hedge_after=0.05)
+
+    result = await asyncio.wait_for(connector._request('/x', is_rpc=True, hedge=True), 0.5)
+
+    assert result == {'from': 'https://fast'}
+    assert slow.calls == fast.calls == 1
+    # the cancelled request tells nothing about the slow endpoint
+    assert connector.health['https://slow-rpc'].total_requests == 0
+    assert connector.health['https://fast-rpc'].total_requests == 1
@@ -0,0 +1,112 @@
+import pytest
+
+from services.lib.date_utils import MINUTE, HOUR, now_ts
+from services.models.time_series import TimeSeries, PriceTimeSeries, MS
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+
+def point_id(ts):
+    return f'{int(ts * MS)}-0'
+
+
+@pytest.mark.asyncio
+async def test_trim_on_insert(fake_db: FakeDB):
+    series = TimeSeries('Capped', fake_db, max_len=50)
+    for i in range(300):
+        await series.add(value=i)
+    # approximate trimming may keep a bit more (whole nodes are dropped), never less
+    assert 50 <= await series.get_length() < 300
+
+    aged = TimeSeries('Aged', fake_db, max_age=HOUR)
+    now = int(now_ts())
+    for ts in (now - 3 * HOUR, now - 2 * HOUR, now - 10, now):
+        await aged.add(message_id=point_id(ts), value=ts)
+    assert await aged.get_length() == 2
+
+    uncapped = TimeSeries('Uncapped', fake_db)
+    for i in range(25):
+        await uncapped.add(value=i)
+    assert await uncapped.trim_oldest(5, approximate=False) == 20
+    assert await uncapped.get_length() == 5
+
+
+@pytest.mark.asyncio
+async def test_best_point_ago(fake_db: FakeDB):
+    series = TimeSeries('Points', fake_db)
+    now = int(now_ts())
+    for ago in reversed(range(0, 600, 10)):
+        await series.add(message_id=point_id(now - ago), ago=ago)
+
+    rt0 = fake_db.round_trips
+    point, diff = await series.get_best_point_ago(304, tolerance_sec=60, ref_ts=now)
+    assert fake_db.round_trips - rt0 == 1
+    assert point['ago'] == '300' and diff == pytest.approx(4, abs=1)
+
+    point, _ = await series.get_best_point_ago(2000, tolerance_sec=60, ref_ts=now)
+    assert point is None
+
+
+async def fill_prices(series: PriceTimeSeries, start, prices, step):
+    for i, price in enumerate(prices):
+        await series.add(message_id=point_id(start + i * step), price=price)
+
+
+@pytest.mark.asyncio
+async def test_rollups(fake_db: FakeDB):
+    pytest.importorskip('lupa')  # fakeredis needs it to run Lua
+
+    series = PriceTimeSeries('Test', fake_db)
+    start = (int(now_ts()) // HOUR - 2) * HOUR
+    # 2 hours of points every 20 sec: 3 per minute
+    prices = [1.0 + (i % 3) for i in range(360)]
+    await fill_prices(series, start, prices, 20)
+
+    minutes = await series.rollup.select(MINUTE, start, start + 2 * HOUR)
+    assert len(minutes) == 120
+    first = minutes[0]
+    assert first.ts == start and first.count == 3
+    assert (first.avg, first.min, first.max, first.last) == (2.0, 1.0, 3.0, 3.0)
+
+    hours = await series.rollup.select(HOUR, start, start + 2 * HOUR)
+    assert [h.count for h in hours] == [180, 180]  # the last one is still open
+    assert all(h.avg == pytest.approx(2.0) for h in hours)
+
+    # a late point of a closed bucket does not break anything
+    await series.rollup.update(start + 5, 100.0)
+    assert (await series.rollup.select(MINUTE, start, start))[0].max == 3.0
+
+    # rebuilding from the raw points gives the same buckets
+    incremental = await series.rollup.select(HOUR, start, start + 2 * HOUR)
+    await series.rollup.rebuild()
+    rebuilt = await series.rollup.select(HOUR, start, start + 2 * HOUR)
+    assert rebuilt == incremental
+
+
+@pytest.mark.asyncio
+async def test_average_ago_and_chart_from_rollups(fake_db: FakeDB):
+    series = PriceTimeSeries('Chart', fake_db)
+    r = await fake_db.get_redis()
+    now = int(now_ts())
+    start = now - 10 * 24 * HOUR
+    async with r.pipeline(transaction=False) as pipe:
+        for ts in range(start, now, MINUTE):
+            pipe.xadd(series.stream_name, {'price': 2.0 if ts < now - 5 * 24 * HOUR else 4.0}, id=point_id(ts))
+        await pipe.execute()
+
+    # not built yet: the raw points are used
+    chart = await series.get_last_values_rolled(7 * 24 * HOUR, max_points=20_000)
+    assert len(chart) > 7 * 24 * 60 - 10
+
+    await series.rollup.rebuild()
+    chart = await series.get_last_values_rolled(7 * 24 * HOUR, with_ts=True)
+    assert 7 * 24 <= len(chart) <= 7 * 24 + 2
+    assert chart[0][1] == 2.0 and chart[-1][1] == 4.0
+
+    rt0 = fake_db.round_trips
+    price_7d = await series.select_average_ago(7 * 24 * HOUR, tolerance=2 * HOUR)
+    assert fake_db.round_trips - rt0 == 1
+    assert price_7d == 2.0
+    assert await series.select_average_ago(HOUR, tolerance=7 * MINUTE) == 4.0
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from services.jobs.fetch.tx import TxFetcher
+from services.lib.config import Config
+from services.lib.date_utils import now_ts
+from services.lib.depcont import DepContainer
+from services.lib.midgard.parser import TxParseResult
+from services.lib.rate_limit import TokenBucket
+from services.models.tx import ThorTx, SUCCESS
+from tests.helpers import fake_db, FakeDB
+
+# noinspection PyStatementEffect
+fake_db
+
+PER_PAGE = 4
+
+
+def make_tx(i, status=SUCCESS):
+    # no sub-TXs: the date is the hash
+    date = int((now_ts() - i) * 1e9)
+    return ThorTx(date=date, height=10_000 - i, status=status, type='refund', pools=[], in_tx=[], out_tx=[])
+
+
+class PagedTxFetcher(TxFetcher):
+    def __init__(self, deps, txs, delay=0.01):
+        super().__init__(deps)
+        self.txs = txs
+        self.delay = delay
+        self.requested_pages = []
+        self.max_in_flight = self.in_flight = 0
+
+    async def fetch_one_batch(self, page=0, txid=None, tx_types=None, next_page_token=None):
+        self.requested_pages.append(page)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        txs = self.txs[page * self.tx_per_batch:(page + 1) * self.tx_per_batch]
+        return TxParseResult(len(self.txs), txs, len(txs))
+
+
+def make_fetcher(db, txs, concurrent=3, max_pages=5):
+    deps = DepContainer()
+    deps.db = db
+    deps.cfg = Config(data={'tx': {
+        'fetch_period': 60, 'tx_per_batch': PER_PAGE, 'max_page_deep': max_pages, 'max_age': '1d',
+        'announce_pending_after_blocks': 500, 'max_concurrent_pages': concurrent,
+    }})
+    return PagedTxFetcher(deps, txs)
+
+
+@pytest.mark.asyncio
+async def test_all_pages_fetched_concurrently(fake_db: FakeDB):
+    txs = [make_tx(i) for i in range(PER_PAGE * 5)]
+    fetcher = make_fetcher(fake_db, txs)
+    await fake_db.get_redis()
+
+    result = await fetcher._fetch_unseen_txs()
+
+    assert [t.tx_hash for t in result] == [t.tx_hash for t in txs]
+    assert fetcher.max_in_flight == 3
+    # one seen-check per page, not per TX
+    assert fake_db.round_trips == 5
+
+
+@pytest.mark.asyncio
+async def test_stop_on_fully_seen_page(fake_db: FakeDB):
+    txs = [make_tx(i) for i in range(PER_PAGE * 5)]
+    fetcher = make_fetcher(fake_db, txs, concurrent=1)
+    await fake_db.get_redis()
+    await fetcher.mark_tx_hashes_as_seen([t.tx_hash for t in txs[PER_PAGE + 1:]])
+
+    result = await fetcher._fetch_unseen_txs()
+
+    assert [t.tx_hash for t in result] == [t.tx_hash for t in txs[:PER_PAGE + 1]]
+    # page 1 has a new TX, page 2 is all seen => stop there
+    assert fetcher.requested_pages == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_pending_below_prevents_early_stop(fake_db: FakeDB):
+    txs = [make_tx(i) for i in range(PER_PAGE * 3)]
+    fetcher = make_fetcher(fake_db, txs, concurrent=1, max_pages=3)
+    await fake_db.get_redis()
+    await fetcher.mark_tx_hashes_as_seen([t.tx_hash for t in txs])
+    # this one was pending on the last page during the previous tick
+    fetcher.pending_hash_to_height[txs[-1].tx_hash] = txs[-1].height_int
+
+    await fetcher._fetch_unseen_txs()
+    assert fetcher.requested_pages == [0, 1, 2]
+
+    fetcher.pending_hash_to_height.clear()
+    fetcher.requested_pages.clear()
+    await fetcher._fetch_unseen_txs()
+    assert fetcher.requested_pages == [0]
+
+
+@pytest.mark.asyncio
+async def test_are_seen(fake_db: FakeDB):
+    fetcher = make_fetcher(fake_db, [])
+    await fake_db.get_redis()
+    await fetcher.mark_tx_hashes_as_seen(['a', 'c'])
+    assert await fetcher.are_seen(['a', 'b', '', 'c']) == [True, False, True, True]
+    assert await fetcher.are_seen([]) == []
+
+
+@pytest.mark.asyncio
+async def test_token_bucket(monkeypatch):
+    now = [0.0]
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+        now[0] += delay
+
+    monkeypatch.setattr(TokenBucket, '_now', staticmethod(lambda: now[0]))
+    monkeypatch.setattr('services.lib.rate_limit.asyncio.sleep', fake_sleep)
+
+    bucket = TokenBucket(rate=2.0, burst=2)
+    for _ in range(4):
+        await bucket.acquire()
+    # 2 at once, then one every 0.5 sec
+    assert slept == [0.5, 0.5]
+
+    bucket.backoff(3.0)
+    await bucket.acquire()
+    assert now[0] == pytest.approx(1.0 + 3.0 + 0.5)
@@ -0,0 +1,125 @@
+# Benchmark: block-to-alert latency of the block scanner, polling vs. NewBlock events over the websocket.
+# A fake chain produces blocks with a jittered block time; a local websocket server announces them.
+# Reports the median/p90 delay from a block to its delivery to the scanner's listeners and the RPC calls per block.
+# $ PYTHONPATH="/app" python tools/bench_block_source.py
+# $ PYTHONPATH="/app" python tools/bench_block_source.py --block-time 6 --blocks 20   # real time, ~4 min
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import websockets
+
+from services.jobs.scanner.block_source import TendermintBlockSource
+from services.jobs.scanner.native_scan import NativeScannerBlock
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+from services.lib.texts import sep
+
+
+class FakeChain:
+    def __init__(self, tip, rpc_latency):
+        self.tip = tip
+        self.rpc_latency = rpc_latency
+        self.produced_at = {}
+        self.clients = set()
+        self.rpc_calls = 0
+
+    async def ws_handler(self, ws):
+        self.clients.add(ws)
+        try:
+            async for message in ws:
+                await ws.send(json.dumps({'jsonrpc': '2.0', 'id': json.loads(message)['id'], 'result': {}}))
+        finally:
+            self.clients.discard(ws)
+
+    async def produce(self, n, block_time):
+        for _ in range(n):
+            await asyncio.sleep(block_time * random.uniform(0.9, 1.1))
+            self.tip += 1
+            self.produced_at[self.tip] = time.monotonic()
+            event = {'jsonrpc': '2.0', 'id': 1, 'result': {'data': {
+                'value': {'block': {'header': {'height': str(self.tip)}}}}}}
+            for ws in list(self.clients):
+                await ws.send(json.dumps(event))
+
+
+class Scanner(NativeScannerBlock):
+    def __init__(self, deps, chain: FakeChain, **kwargs):
+        super().__init__(deps, **kwargs)
+        self.chain = chain
+        self.initial_sleep = 0
+
+    async def _fetch_block_results_raw(self, block_no):
+        self.chain.rpc_calls += 1
+        await asyncio.sleep(self.chain.rpc_latency)
+        if block_no > self.chain.tip:
+            return {'error': {'code': -32603, 'message': 'Internal error',
+                              'data': f'height {block_no} must be less than or equal to the current '
+                                      f'blockchain height {self.chain.tip}'}}
+        return {'result': {'txs_results': [], 'end_block_events': []}}
+
+    async def _fetch_block_txs_raw(self, block_no):
+        self.chain.rpc_calls += 1
+        await asyncio.sleep(self.chain.rpc_latency)
+        return {'result': {'block': {'data': {'txs': []}}}}
+
+
+class AlertTimer(INotified):
+    def __init__(self, chain: FakeChain):
+        self.chain = chain
+        self.delays = []
+
+    async def on_data(self, sender, data):
+        produced_at = self.chain.produced_at.get(data.block_no)
+        if produced_at:
+            self.delays.append(time.monotonic() - produced_at)
+
+
+async def measure(title, args, push):
+    chain = FakeChain(tip=1000, rpc_latency=args.rpc_latency)
+    server = await websockets.serve(chain.ws_handler, '127.0.0.1', 0)
+    url = f'ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/websocket'
+
+    source = TendermintBlockSource(url) if push else None
+    scanner = Scanner(DepContainer(), chain, sleep_period=args.block_time * 0.99, last_block=1001,
+                      block_source=source)
+    timer = AlertTimer(chain)
+    scanner.add_subscriber(timer)
+
+    task = asyncio.create_task(scanner._run())
+    if source:
+        while not chain.clients:
+            await asyncio.sleep(0.01)
+    chain.rpc_calls = 0
+    await chain.produce(args.blocks, args.block_time)
+    await asyncio.sleep(args.block_time)
+    task.cancel()
+    server.close()
+
+    delays = sorted(timer.delays)
+    p90 = delays[int(len(delays) * 0.9)]
+    print(f'{title:<12} median {statistics.median(delays) * 1000:>7.0f} ms, p90 {p90 * 1000:>7.0f} ms, '
+          f'{chain.rpc_calls / len(delays):.2f} RPC calls per block ({len(delays)} blocks)')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--block-time', type=float, default=1.0, help='sec (6 on the real chain)')
+    parser.add_argument('--blocks', type=int, default=30)
+    parser.add_argument('--rpc-latency', type=float, default=0.02, help='sec per RPC call')
+    args = parser.parse_args()
+
+    random.seed(3)
+    sep()
+    print(f'Block time {args.block_time} sec, poll period {args.block_time * 0.99:.2f} sec')
+    await measure('polling', args, push=False)
+    await measure('websocket', args, push=True)
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
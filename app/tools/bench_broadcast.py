@@ -0,0 +1,162 @@
+# Benchmark of the Broadcaster's delivery queues: one mass broadcast to N subscribers across the platforms,
+# while personal alerts keep coming. Redis is in-memory (fakeredis), the messengers are stubs with a fixed latency.
+# Nothing is sent anywhere and no config is needed.
+# $ PYTHONPATH="/app" python tools/bench_broadcast.py
+# $ PYTHONPATH="/app" python tools/bench_broadcast.py --subscribers 10000 --tg-rate 1000 --send-latency 0.02
+# Use --tg-rate 25 to see the real-life pace (10k messages take about 7 minutes then).
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+
+import fakeredis
+
+from services.lib.config import Config
+from services.lib.db import DB
+from services.lib.depcont import DepContainer
+from services.lib.lru import percentile
+from services.lib.texts import sep
+from services.notify.broadcast import Broadcaster
+from services.notify.channel import ChannelDescriptor, Messengers, BoardMessage
+
+
+class LatencyMessenger:
+    """Pretends to be a messenger bot: sleeps a bit and remembers when every message was sent"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent_at = {}
+
+    async def send_message(self, chat_id, msg: BoardMessage, **kwargs):
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        self.sent_at[chat_id] = time.monotonic()
+        return True
+
+
+class FakeLocale:
+    def __init__(self, name):
+        self.name = name
+        self.RATE_LIMIT_WARNING = 'Rate limit!'
+
+
+class FakeLocMan:
+    def get_from_lang(self, lang):
+        return FakeLocale(lang)
+
+
+def make_broadcaster(args, messengers):
+    d = DepContainer()
+    d.cfg = Config(data={
+        'broadcasting': {
+            'channels': [],
+            'startup_delay': 0,
+            'delivery': {
+                'telegram': {'rate': args.tg_rate, 'burst': args.tg_rate, 'workers': args.workers},
+                'discord': {'rate': args.tg_rate},
+                'slack': {'rate': args.tg_rate},
+            },
+        },
+        'personal': {'rate_limit': {'number': 1000, 'period': '1m', 'cooldown': '1m'}},
+    })
+    d.db = DB(asyncio.get_running_loop())
+    d.db.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    d.loc_man = FakeLocMan()
+    d.get_messenger = messengers.get
+    return Broadcaster(d)
+
+
+def make_subscribers(n):
+    # roughly like in production: mostly Telegram
+    platforms = [Messengers.TELEGRAM] * 90 + [Messengers.DISCORD] * 6 + [Messengers.SLACK] * 4
+    return [
+        ChannelDescriptor(random.choice(platforms), f'chat{i}', random.choice(['eng', 'rus']))
+        for i in range(n)
+    ]
+
+
+def print_latency(title, values):
+    values = sorted(values)
+    if not values:
+        print(f'{title}: no data')
+        return
+    print(f'{title}: n = {len(values)}, '
+          f'p50 = {percentile(values, 50) * 1000:.0f} ms, '
+          f'p95 = {percentile(values, 95) * 1000:.0f} ms, '
+          f'p99 = {percentile(values, 99) * 1000:.0f} ms, '
+          f'max = {values[-1] * 1000:.0f} ms')
+
+
+async def personal_alerts(broadcaster: Broadcaster, stop_event: asyncio.Event, interval):
+    latencies = []
+    i = 0
+    while not stop_event.is_set():
+        channel = ChannelDescriptor(Messengers.TELEGRAM, f'personal{i}')
+        t0 = time.monotonic()
+        await broadcaster.safe_send_message_rate(channel, BoardMessage('Your bond has changed'))
+        latencies.append(time.monotonic() - t0)
+        i += 1
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=10_000)
+    parser.add_argument('--tg-rate', type=float, default=1000.0, help='Telegram messages/sec limit')
+    parser.add_argument('--workers', type=int, default=8, help='Telegram workers')
+    parser.add_argument('--send-latency', type=float, default=0.02, help='average time of one API call, sec')
+    parser.add_argument('--personal-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(42)
+
+    messengers = {
+        platform: LatencyMessenger(args.send_latency)
+        for platform in (Messengers.TELEGRAM, Messengers.DISCORD, Messengers.SLACK)
+    }
+    broadcaster = make_broadcaster(args, messengers)
+    subscribers = make_subscribers(args.subscribers)
+
+    renders = defaultdict(int)
+
+    async def render(locale, value):
+        renders[locale.name] += 1
+        await asyncio.sleep(0.05)  # like drawing a picture
+        return BoardMessage(f'[{locale.name}] Big swap: {value}')
+
+    async def get_subscribed_channels():
+        return subscribers
+
+    broadcaster.get_subscribed_channels = get_subscribed_channels
+
+    stop_event = asyncio.Event()
+    personal_task = asyncio.create_task(personal_alerts(broadcaster, stop_event, args.personal_interval))
+
+    t0 = time.monotonic()
+    await broadcaster.notify_preconfigured_channels(render, 1_000_000)
+    elapsed = time.monotonic() - t0
+
+    stop_event.set()
+    personal_latencies = await personal_task
+    await broadcaster.stop()
+
+    sep()
+    total = 0
+    for platform, messenger in messengers.items():
+        subscribers_here = [c.channel_id for c in subscribers if c.type == platform]
+        latencies = [messenger.sent_at[c] - t0 for c in subscribers_here if c in messenger.sent_at]
+        total += len(latencies)
+        print_latency(f'{platform:>8} broadcast delivery', latencies)
+
+    print_latency('Personal alerts (Telegram)', personal_latencies)
+    print(f'Renders per language: {dict(renders)}')
+    sep()
+    print(f'{total} of {len(subscribers)} messages in {elapsed:.2f} sec: {total / elapsed:.0f} msg/sec')
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,212 @@
+# Benchmark: ConstMimirFetcher ticks, the old sequential mode vs. the concurrent one with change-only propagation.
+# Replays a recorded snapshot (constants, mimir, node mimir, votes and nodes) against a simulated THORNode.
+# The snapshot changes (a new vote) every few ticks; reports the tick latency, the time to rebuild the MimirHolder
+# and how many times the listeners are called.
+# Record the snapshot once (needs a THORNode):
+# $ PYTHONPATH="/app" python tools/bench_const_mimir.py --record mimir_snapshot.json
+# Replay:
+# $ PYTHONPATH="/app" python tools/bench_const_mimir.py mimir_snapshot.json
+# $ PYTHONPATH="/app" python tools/bench_const_mimir.py          # synthetic snapshot: 120 nodes, ~950 votes
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+from aionode.types import ThorConstants, ThorMimir, ThorMimirVote
+from services.jobs.fetch.const_mimir import ConstMimirFetcher, MimirTuple
+from services.lib.config import Config
+from services.lib.delegates import INotified
+from services.lib.depcont import DepContainer
+from services.lib.rate_limit import TokenBucket
+from services.lib.texts import sep
+from services.models.mimir import MimirHolder, MimirVoting, MimirVoteOption, MimirVoteManager
+from services.models.mimir_naming import EXCLUDED_VOTE_KEYS
+from services.models.node_info import NodeInfo, NodeListHolder
+
+
+async def record(path):
+    from tools.lib.lp_common import LpAppFramework
+
+    app = LpAppFramework()
+    async with app(brief=True):
+        thor = app.deps.thor_connector
+        snapshot = {
+            'constants': await thor.query_raw(thor.env.path_constants),
+            'mimir': await thor.query_raw(thor.env.path_mimir),
+            'node_mimir': await thor.query_raw(thor.env.path_mimir_nodes),
+            'votes': await thor.query_raw(thor.env.path_mimir_votes),
+            'nodes': await thor.query_raw(thor.env.path_nodes),
+        }
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+    print(f'Saved {len(snapshot["votes"].get("mimirs", []))} votes and {len(snapshot["nodes"])} nodes to {path}')
+
+
+def synthetic_snapshot(n_nodes=120, n_keys=60):
+    random.seed(5)
+    nodes = [{'node_address': f'maya1node{i:03}', 'status': 'Active' if i < n_nodes * 0.8 else 'Standby'}
+             for i in range(n_nodes)]
+    votes = []
+    for k in range(n_keys):
+        options = [random.randint(0, 3) for _ in range(3)]
+        for node in random.sample(nodes, random.randint(1, n_nodes // 4)):
+            votes.append({'key': f'MIMIRKEY{k}', 'value': str(random.choice(options)), 'signer': node['node_address']})
+    return {
+        'constants': {'int_64_values': {f'Constant{i}': i for i in range(150)}},
+        'mimir': {f'MIMIRKEY{i}': i for i in range(100)},
+        'node_mimir': {f'MIMIRKEY{i}': 1 for i in range(10)},
+        'votes': {'mimirs': votes},
+        'nodes': nodes,
+    }
+
+
+class FakeThor:
+    def __init__(self, snapshot, latency):
+        self.constants = snapshot['constants']
+        self.mimir = snapshot['mimir']
+        self.node_mimir = snapshot['node_mimir']
+        self.votes = ThorMimirVote.from_json_array(snapshot['votes'].get('mimirs'))
+        self.latency = latency
+
+    async def query_constants(self):
+        await asyncio.sleep(self.latency)
+        return ThorConstants.from_json(self.constants)
+
+    async def query_mimir(self):
+        await asyncio.sleep(self.latency)
+        return ThorMimir.from_json(self.mimir)
+
+    async def query_mimir_node_accepted(self):
+        await asyncio.sleep(self.latency)
+        return dict(self.node_mimir)
+
+    async def query_mimir_votes(self):
+        await asyncio.sleep(self.latency)
+        return list(self.votes)
+
+
+class OldMimirVoteManager(MimirVoteManager):
+    """Previous implementation, for reference: list lookups"""
+
+    # noinspection PyMissingConstructor
+    def __init__(self, all_votes: List[ThorMimirVote], active_nodes: List[NodeInfo], exclude_keys):
+        active_signers = [n.node_address for n in active_nodes if n.node_address and n.is_active]
+        active_votes = [vote for vote in all_votes if vote.singer in active_signers]
+        self.votes = active_votes
+        self.active_node_count = len(active_nodes)
+        self.all_voting = {}
+        for vote in active_votes:
+            if vote.key in exclude_keys:
+                continue
+            if vote.key not in self.all_voting:
+                self.all_voting[vote.key] = MimirVoting(vote.key, {}, self.active_node_count, [])
+            voting = self.all_voting.get(vote.key)
+            if voting:
+                if vote.value not in voting.options:
+                    voting.options[vote.value] = MimirVoteOption(vote.value, [])
+                voting.options[vote.value].signers.append(vote.singer)
+        for voting in self.all_voting.values():
+            voting.finalize_calculations()
+
+
+class TimedHolder(MimirHolder):
+    def __init__(self, manager_class):
+        super().__init__()
+        self.manager_class = manager_class
+        self.rebuild_time = 0.0
+        self.rebuilds = 0
+
+    def update(self, constants, mimir, node_mimir, node_votes, active_nodes):
+        t0 = time.perf_counter()
+        super().update(constants, mimir, node_mimir, [], active_nodes)
+        self.voting_manager = self.manager_class(node_votes, active_nodes, EXCLUDED_VOTE_KEYS)
+        self.rebuild_time += time.perf_counter() - t0
+        self.rebuilds += 1
+
+
+class Listener(INotified):
+    def __init__(self):
+        self.calls = 0
+        self.votes_changed = 0
+
+    async def on_data(self, sender, data: MimirTuple):
+        self.calls += 1
+        if data.has_changed(MimirTuple.VOTES):
+            self.votes_changed += 1
+
+
+async def measure(title, snapshot, args, manager_class, rebuild_always=False, **cfg):
+    thor = FakeThor(snapshot, args.latency)
+    deps = DepContainer()
+    deps.cfg = Config(data={'startup_step_delay': args.step, 'constants': {'fetch_period': '1m', **cfg}})
+    deps.thor_connector = thor
+    deps.mimir_const_holder = TimedHolder(manager_class)
+    deps.node_holder = NodeListHolder([NodeInfo.from_json(j) for j in snapshot['nodes']])
+    fetcher = ConstMimirFetcher(deps)
+    listener = Listener()
+    fetcher.add_subscriber(listener)
+
+    random.seed(11)
+    active = [n.node_address for n in deps.node_holder.active_nodes]
+    tick_times = []
+    for tick in range(args.ticks):
+        if tick and tick % args.change_every == 0:
+            thor.votes.append(ThorMimirVote(f'MIMIRKEY{tick}', 1, random.choice(active)))
+        if fetcher.rate_limit:
+            # the real ticks are minutes apart: the bucket is full by then
+            fetcher.rate_limit = TokenBucket(fetcher.rate_limit.rate, fetcher.rate_limit.burst)
+        if rebuild_always:
+            fetcher._digests = {}  # as it was before
+        t0 = time.perf_counter()
+        await fetcher.run_once()
+        tick_times.append(time.perf_counter() - t0)
+
+    holder: TimedHolder = deps.mimir_const_holder
+    print(f'{title:<36} tick {sum(tick_times) / len(tick_times) * 1000:>6.0f} ms, '
+          f'{holder.rebuilds:>2} rebuilds, {holder.rebuild_time * 1000:>5.1f} ms total, '
+          f'listener calls {listener.calls:>3}, with vote changes {listener.votes_changed:>2}')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('snapshot', nargs='?', help='recorded snapshot (JSON)')
+    parser.add_argument('--record', help='record the snapshot to this file and exit')
+    parser.add_argument('--ticks', type=int, default=40)
+    parser.add_argument('--change-every', type=int, default=10, help='a new vote every N ticks')
+    parser.add_argument('--latency', type=float, default=0.1, help='sec per THORNode query')
+    parser.add_argument('--step', type=float, default=0.3, help='startup_step_delay, sec (3 in production)')
+    args = parser.parse_args()
+
+    if args.record:
+        await record(args.record)
+        return
+
+    if args.snapshot:
+        with open(args.snapshot) as f:
+            snapshot = json.load(f)
+    else:
+        snapshot = synthetic_snapshot()
+
+    print(f'Snapshot: {len(snapshot["votes"].get("mimirs", []))} votes, {len(snapshot["nodes"])} nodes'
+          f'{"" if args.snapshot else " (synthetic)"}; {args.ticks} ticks, a new vote every {args.change_every}')
+    sep()
+    votes = ThorMimirVote.from_json_array(snapshot['votes'].get('mimirs'))
+    nodes = [NodeInfo.from_json(j) for j in snapshot['nodes']]
+    for manager_class in (OldMimirVoteManager, MimirVoteManager):
+        t0 = time.perf_counter()
+        for _ in range(100):
+            manager_class(votes, nodes, EXCLUDED_VOTE_KEYS)
+        print(f'{manager_class.__name__:<36} vote tally {(time.perf_counter() - t0) * 10:.2f} ms')
+    sep()
+    await measure('old: sequential, rebuild every tick', snapshot, args, OldMimirVoteManager, rebuild_always=True)
+    await measure('sequential, rebuild on change', snapshot, args, MimirVoteManager)
+    await measure('concurrent, change-only', snapshot, args, MimirVoteManager,
+                  concurrent=True, change_only=True, rate_limit={'rps': 2, 'burst': 4})
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
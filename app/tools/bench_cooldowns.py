@@ -0,0 +1,106 @@
+# Microbenchmark: cooldowns and rate limits, the old read-modify-write in Python vs. the Lua scripts.
+# Reports ops/sec and Redis round trips per operation.
+# $ PYTHONPATH="/app" python tools/bench_cooldowns.py              # in-memory fakeredis (needs "lupa")
+# $ PYTHONPATH="/app" python tools/bench_cooldowns.py --redis      # REDIS_HOST/REDIS_PORT, real network latency
+# fakeredis runs Lua via lupa, much slower than Redis itself; there, look at the round trips.
+# Note: it writes keys "cooldown:Bench*" and "RateLimit:Bench*" into the selected DB.
+
+import argparse
+import asyncio
+import json
+import time
+
+from services.jobs.scanner.replay import RedisOpsCounter
+from services.lib.cooldown import Cooldown, CooldownRecord
+from services.lib.db import DB
+from services.lib.rate_limit import RateLimiter
+from services.lib.texts import sep
+
+
+# --- the previous implementations, for reference ---
+
+async def legacy_cooldown_do(db: DB, cd: Cooldown):
+    r = db.redis
+    data = await r.get(Cooldown.get_key(cd.event_name))
+    try:
+        record = CooldownRecord(**json.loads(data))
+    except (TypeError, json.decoder.JSONDecodeError):
+        record = CooldownRecord(0.0, 0)
+    if not record.can_do(cd.cooldown):
+        return
+    record.increment_count(cd.max_times, cd.cooldown)
+    await r.set(Cooldown.get_key(cd.event_name), json.dumps(record.__dict__))
+
+
+async def legacy_can_do_many(db: DB, cds):
+    return [await cd.can_do() for cd in cds]
+
+
+async def legacy_is_limited(db: DB, key, limit, period):
+    r = db.redis
+    key = RateLimiter._full_key(key)
+    sec, micro_sec = (await r.time())
+    t = sec + micro_sec * 1e-6
+    separation = period / limit
+    await r.setnx(key, 0.0)
+    tat = max(float(await r.get(key)), t)
+    if tat - t <= period - separation:
+        await r.set(key, max(tat, t) + separation)
+        return False
+    return True
+
+
+# ---
+
+async def measure(title, counter: RedisOpsCounter, n, make_coro):
+    rt0 = counter.round_trips
+    t0 = time.perf_counter()
+    for i in range(n):
+        await make_coro(i)
+    elapsed = time.perf_counter() - t0
+    round_trips = (counter.round_trips - rt0) / n
+    print(f'{title:<40} {n / elapsed:>10.0f} ops/sec {round_trips:>6.2f} round trips/op')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=5000)
+    parser.add_argument('--redis', action='store_true', help='use the real Redis instead of fakeredis')
+    parser.add_argument('--batch', type=int, default=5, help='cooldowns per batch check')
+    args = parser.parse_args()
+
+    db = DB(asyncio.get_running_loop())
+    if not args.redis:
+        import fakeredis
+        db.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    r = await db.get_redis()
+    counter = RedisOpsCounter(r)
+
+    n = args.n
+    # a short cooldown: about half of the calls do write
+    cds = [Cooldown(db, f'Bench{i}', 1e-4) for i in range(args.batch)]
+    await Cooldown.do_many(db, cds)  # load the scripts
+
+    sep()
+    await measure('Cooldown.do: legacy GET + SET', counter, n, lambda i: legacy_cooldown_do(db, cds[0]))
+    await measure('Cooldown.do: Lua', counter, n, lambda i: cds[0].do())
+    await measure(f'{args.batch} x can_do: legacy', counter, n // args.batch,
+                  lambda i: legacy_can_do_many(db, cds))
+    await measure(f'{args.batch} x can_do: MGET', counter, n // args.batch,
+                  lambda i: Cooldown.can_do_many(db, cds))
+    await measure(f'{args.batch} x do: legacy', counter, n // args.batch,
+                  lambda i: asyncio.gather(*(legacy_cooldown_do(db, cd) for cd in cds)))
+    await measure(f'{args.batch} x do: Lua do_many', counter, n // args.batch,
+                  lambda i: Cooldown.do_many(db, cds))
+    await measure('RateLimiter: legacy GCRA', counter, n,
+                  lambda i: legacy_is_limited(db, 'BenchLegacy', 1_000_000, 1.0))
+    await measure('RateLimiter: Lua GCRA', counter, n,
+                  lambda i: RateLimiter.is_limited_s(db, 'BenchLua', 1_000_000, 1.0))
+    sep()
+
+    await r.delete(*[Cooldown.get_key(cd.event_name) for cd in cds],
+                   RateLimiter._full_key('BenchLegacy'), RateLimiter._full_key('BenchLua'))
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,170 @@
+# Benchmark: timestamp => block height, the old iterative search vs. the interpolation over the anchor index.
+# Replays a recorded block-time trace (height, timestamp) against a simulated THORNode and reports
+# the average RPC calls per lookup and the error.
+# Record the trace once (needs a THORNode):
+# $ PYTHONPATH="/app" python tools/bench_date2block.py --record trace.json --days 60
+# Replay:
+# $ PYTHONPATH="/app" python tools/bench_date2block.py trace.json
+# $ PYTHONPATH="/app" python tools/bench_date2block.py            # synthetic trace with a halt if there is no file
+
+import argparse
+import asyncio
+import json
+import random
+from bisect import bisect_left
+from datetime import datetime
+
+import fakeredis
+
+from services.jobs.fetch.runeyield.date2block import DateToBlockMapper
+from services.lib.config import Config
+from services.lib.date_utils import DAY, HOUR, MINUTE, now_ts
+from services.lib.db import DB
+from services.lib.depcont import DepContainer
+from services.lib.texts import sep
+
+
+async def record(path, days, samples):
+    from tools.lib.lp_common import LpAppFramework
+
+    app = LpAppFramework()
+    async with app(brief=True):
+        mapper = DateToBlockMapper(app.deps)
+        top = await mapper.get_last_thorchain_block()
+        first = max(1, int(top - days * DAY / 5.0))
+        trace = []
+        for i in range(samples + 1):
+            height = first + (top - first) * i // samples
+            ts = await mapper.get_timestamp_by_block_height(height)
+            if ts > 0:
+                trace.append((height, ts))
+                print(f'#{height}: {datetime.fromtimestamp(ts)}')
+    with open(path, 'w') as f:
+        json.dump(trace, f)
+    print(f'Saved {len(trace)} points to {path}')
+
+
+def synthetic_trace(days):
+    """5-7 sec blocks, drifting, with a 4-hour halt in the middle"""
+    random.seed(7)
+    trace, height, ts = [], 1, 0.0
+    block_time = 6.0
+    while ts < days * DAY:
+        trace.append((height, ts))
+        block_time = min(7.0, max(5.0, block_time + random.uniform(-0.05, 0.05)))
+        ts += block_time * 100
+        height += 100
+        if len(trace) == 3000:
+            ts += 4 * HOUR
+    return trace
+
+
+class FakeNode:
+    """Block timestamps interpolated between the points of the trace, which ends now"""
+
+    def __init__(self, trace):
+        shift = now_ts() - trace[-1][1]
+        self.heights = [h for h, _ in trace]
+        self.times = [ts + shift for _, ts in trace]
+        self.calls = 0
+
+    @property
+    def top(self):
+        return self.heights[-1]
+
+    def block_ts(self, height):
+        i = min(max(1, bisect_left(self.heights, height)), len(self.heights) - 1)
+        h0, h1, t0, t1 = self.heights[i - 1], self.heights[i], self.times[i - 1], self.times[i]
+        return t0 + (height - h0) * (t1 - t0) / (h1 - h0)
+
+    async def query_tendermint_block_raw(self, height):
+        self.calls += 1
+        if not self.heights[0] <= height <= self.top:
+            return None
+        rfc = datetime.fromtimestamp(self.block_ts(height)).strftime('%Y-%m-%dT%H:%M:%S.%f') + '000Z'
+        return {'result': {'block': {'header': {'time': rfc}}}}
+
+
+def make_mapper(node):
+    deps = DepContainer()
+    deps.cfg = Config(data={})
+    deps.db = DB(None)
+    deps.db.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    deps.thor_connector = node
+    return DateToBlockMapper(deps)
+
+
+def report(title, node: FakeNode, lookups, timestamps, heights):
+    errors = [abs(node.block_ts(h) - ts) for ts, h in zip(timestamps, heights)]
+    print(f'{title:<40} {node.calls / lookups:>6.2f} RPC/lookup, '
+          f'error: avg {sum(errors) / len(errors):.1f} s, max {max(errors):.1f} s')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('trace', nargs='?', help='recorded trace (JSON list of [height, timestamp])')
+    parser.add_argument('--record', help='record the trace to this file and exit')
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--samples', type=int, default=2000, help='points in the recorded trace')
+    parser.add_argument('-n', type=int, default=200, help='lookups')
+    args = parser.parse_args()
+
+    if args.record:
+        await record(args.record, args.days, args.samples)
+        return
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    else:
+        trace = synthetic_trace(args.days)
+
+    node = FakeNode(trace)
+    random.seed(1)
+    first_ts = node.times[0] + HOUR
+    timestamps = sorted(random.uniform(first_ts, now_ts() - MINUTE) for _ in range(args.n))
+    print(f'Trace: {len(trace)} points, {(node.times[-1] - node.times[0]) / DAY:.1f} days'
+          f'{"" if args.trace else " (synthetic)"}; {len(timestamps)} random timestamps')
+    sep()
+
+    mapper = make_mapper(node)
+    heights = [await mapper.iterative_block_discovery_by_timestamp(ts, node.top, mapper.iterative_algo_max_steps,
+                                                                   mapper.iterative_algo_tolerance)
+               for ts in timestamps]
+    report('old: iterative, one by one', node, len(timestamps), timestamps, heights)
+
+    node.calls = 0
+    mapper = make_mapper(node)
+    heights = [(await mapper.get_block_heights_by_timestamps([ts], node.top))[0] for ts in timestamps]
+    report('anchors: empty index, one by one', node, len(timestamps), timestamps, heights)
+
+    node.calls = 0
+    mapper = make_mapper(node)
+    heights = await mapper.get_block_heights_by_timestamps(timestamps, node.top)
+    report('anchors: empty index, bulk', node, len(timestamps), timestamps, heights)
+
+    # the bot has been running: LastBlockStore ticks every 10 minutes
+    ticks = [(node.block_ts(h), h) for h in range(node.heights[0], node.top, int(10 * MINUTE / 6))]
+    node.calls = 0
+    mapper = make_mapper(node)
+    await mapper.anchors.add_many(ticks)
+    heights = [(await mapper.get_block_heights_by_timestamps([ts]))[0] for ts in timestamps]
+    report('anchors: 10-min ticks, one by one', node, len(timestamps), timestamps, heights)
+
+    node.calls = 0
+    mapper = make_mapper(node)
+    await mapper.anchors.add_many(ticks)
+    heights = await mapper.get_block_heights_by_timestamps(timestamps)
+    report('anchors: 10-min ticks, bulk', node, len(timestamps), timestamps, heights)
+
+    # an LP chart: 30 days at midnight
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    chart = [today - day * DAY for day in range(30) if today - day * DAY > first_ts]
+    node.calls = 0
+    heights = await mapper.get_block_heights_by_timestamps(chart)
+    report('anchors: 10-min ticks, 30-day chart', node, len(chart), chart, heights)
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
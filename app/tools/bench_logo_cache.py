@@ -0,0 +1,140 @@
+# Benchmark: coin logos for the pool and LP pictures, the old load-and-resize on every picture vs. the logo cache.
+# Uses the logos in ./data/asset_logo (no network). Reports ms per picture for the logo part and the whole pool picture.
+# $ PYTHONPATH="/app" python tools/bench_logo_cache.py
+# $ PYTHONPATH="/app" python tools/bench_logo_cache.py -n 50
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+
+from localization.manager import LocalizationManager
+from services.dialog.picture.crypto_logo import CryptoLogoDownloader
+from services.dialog.picture.pool_picture import PoolPictureGenerator
+from services.dialog.picture.resources import Resources
+from services.lib.config import Config
+from services.lib.texts import sep
+from services.models.pool_info import PoolInfo, PoolMapPair
+
+
+# --- the previous implementation, for reference ---
+
+def legacy_logo(downloader: CryptoLogoDownloader, asset, size=None):
+    logo = Image.open(downloader.path_to_local_coin_image(asset)).convert('RGBA')
+    logo.thumbnail((downloader.LOGO_WIDTH, downloader.LOGO_HEIGHT))
+    if size:  # this was done while drawing
+        logo = logo.copy()
+        logo.thumbnail((size, size))
+    return logo
+
+
+def pool_assets(base_dir, n):
+    files = sorted(f[:-4] for f in os.listdir(base_dir) if f.endswith('.png') and not f.startswith(('_', 'unknown')))
+    return files[:n]
+
+
+def make_pool_event(assets):
+    pools = {
+        asset: PoolInfo(asset, random.randint(10 ** 10, 10 ** 13), random.randint(10 ** 14, 10 ** 16),
+                        10 ** 12, PoolInfo.AVAILABLE, usd_per_asset=random.uniform(0.1, 40000),
+                        volume_24h=random.randint(10 ** 12, 10 ** 14), pool_apr=random.uniform(1, 40))
+        for asset in assets
+    }
+    return PoolMapPair(pools, pools)
+
+
+async def timed(f, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await f()
+    return (time.perf_counter() - t0) / n * 1000.0
+
+
+def report(title, ms):
+    print(f'{title:<52} {ms:>8.2f} ms')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=20, help='pictures')
+    parser.add_argument('--pools', type=int, default=40)
+    args = parser.parse_args()
+
+    # a copy, not to write the atlas into the repository
+    work_dir = tempfile.mkdtemp()
+    shutil.copytree(Resources.LOGO_BASE, work_dir, dirs_exist_ok=True)
+
+    try:
+        assets = pool_assets(work_dir, args.pools)
+        downloader = CryptoLogoDownloader(work_dir)
+        size = PoolPictureGenerator.LOGO_SIZE
+
+        sep()
+        print(f'Logos of {len(assets)} pools per picture')
+
+        async def legacy_pool_logos():
+            for asset in assets:
+                legacy_logo(downloader, asset, size)
+
+        legacy_ms = await timed(legacy_pool_logos, args.n)
+        report('old: load + resize every time', legacy_ms)
+
+        async def cached_pool_logos():
+            for asset in assets:
+                await downloader.get_logo(asset, size)
+
+        report('cache: first picture (cold)', await timed(cached_pool_logos, 1))
+        report('cache: next pictures (memory)', await timed(cached_pool_logos, args.n))
+
+        t0 = time.perf_counter()
+        await downloader.warm_up(assets)
+        report('atlas: build on the first start', (time.perf_counter() - t0) * 1000.0)
+
+        restarted = CryptoLogoDownloader(work_dir)
+        t0 = time.perf_counter()
+        await restarted.warm_up(assets)
+        report('atlas: load on the next starts', (time.perf_counter() - t0) * 1000.0)
+        downloader = restarted
+        report('atlas: first picture after the start', await timed(cached_pool_logos, 1))
+
+        sep()
+        print('LP picture (two logos)')
+
+        async def legacy_lp_logos():
+            legacy_logo(downloader, assets[0])
+            legacy_logo(downloader, assets[1])
+
+        async def cached_lp_logos():
+            await downloader.get_logo(assets[0])
+            await downloader.get_logo(assets[1])
+
+        report('old', await timed(legacy_lp_logos, args.n))
+        report('cache', await timed(cached_lp_logos, args.n))
+
+        sep()
+        print('Whole pool picture (prepare + render)')
+        loc = LocalizationManager(Config(data={})).default
+        event = make_pool_event(assets)
+        Resources().logo_downloader = downloader
+
+        async def pool_picture():
+            gen = PoolPictureGenerator(loc, event)
+            await gen.prepare()
+            await gen._get_picture_sync()
+
+        picture_ms = await timed(pool_picture, max(1, args.n // 4))
+        report('with the logo cache', picture_ms)
+        report('old (estimated: + the old logo part)', picture_ms + legacy_ms)
+        print(f'hit rate: {downloader.hit_rate:.1%}, {dict(downloader.stats)}')
+        sep()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
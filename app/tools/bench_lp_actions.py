@@ -0,0 +1,115 @@
+# Benchmark: LP report of a wallet with hundreds of actions, the old way (all the actions are downloaded and
+# processed every time) vs. the action cache with the per-pool checkpoints.
+# Replays recorded actions against a simulated Midgard; the historical pool states are simulated too.
+# Reports the time, Midgard requests, pool state heights loaded and txs processed:
+# cold (empty cache), warm (nothing new) and after one new action.
+# Record the actions once (needs Midgard):
+# $ PYTHONPATH="/app" python tools/bench_lp_actions.py --record maya1xxx wallet.json
+# Replay:
+# $ PYTHONPATH="/app" python tools/bench_lp_actions.py wallet.json --pool BTC.BTC
+# $ PYTHONPATH="/app" python tools/bench_lp_actions.py          # synthetic wallet with 400 actions
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from services.lib.midgard.urlgen import free_url_gen
+from services.lib.texts import sep
+from tests.helpers import FakeDB
+from tests.test_lp_action_cache import make_lp_history, FakeMidgard, FakePoolFetcher, \
+    make_connector, ADDRESS, POOL
+
+
+async def record(address, path):
+    from tools.lib.lp_common import LpAppFramework
+
+    app = LpAppFramework()
+    async with app(brief=True):
+        mdg = app.deps.midgard_connector
+        actions, page = [], 0
+        while True:
+            j = await mdg.request(free_url_gen.url_for_tx(page * 50, 50, address=address,
+                                                          tx_type=free_url_gen.LIQUIDITY_TX_TYPES))
+            batch = j.get('actions', []) if isinstance(j, dict) else []
+            actions += batch
+            if len(batch) < 50:
+                break
+            page += 1
+    with open(path, 'w') as f:
+        json.dump({'address': address, 'actions': list(reversed(actions))}, f)
+    print(f'Saved {len(actions)} actions of {address} to {path}')
+
+
+class SlowMidgard(FakeMidgard):
+    def __init__(self, actions, latency):
+        super().__init__(actions)
+        self.latency = latency
+
+    async def request(self, path):
+        await asyncio.sleep(self.latency)
+        return await super().request(path)
+
+
+class SlowPoolFetcher(FakePoolFetcher):
+    """One Redis round trip plus a bit per height (the pool states are cached in Redis)"""
+
+    async def load_pools_at_heights(self, heights):
+        heights = list(heights)
+        await asyncio.sleep(0.003 + 0.0002 * len(heights))
+        return await super().load_pools_at_heights(heights)
+
+
+async def measure(title, midgard: SlowMidgard, db, address, pool, cache):
+    pool_fetcher = SlowPoolFetcher()
+    midgard.requests.clear()
+    lp = await make_connector(db, midgard, cache=cache, pool_fetcher=pool_fetcher)
+    t0 = time.perf_counter()
+    report = await lp.generate_yield_report_single_pool(address, pool)
+    dt = time.perf_counter() - t0
+    print(f'{title:<28} {dt * 1000:>7.0f} ms, {len(midgard.requests):>2} Midgard requests, '
+          f'{len(set(pool_fetcher.loaded_heights)):>3} pool heights, {lp.stats["txs_processed"]:>3} txs processed')
+    return report
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('wallet', nargs='?', help='recorded actions (JSON)')
+    parser.add_argument('--record', nargs=2, metavar=('ADDRESS', 'FILE'), help='record the actions and exit')
+    parser.add_argument('--pool', default=POOL)
+    parser.add_argument('--actions', type=int, default=400, help='synthetic wallet size')
+    parser.add_argument('--latency', type=float, default=0.15, help='sec per Midgard request')
+    args = parser.parse_args()
+
+    if args.record:
+        await record(*args.record)
+        return
+
+    if args.wallet:
+        with open(args.wallet) as f:
+            j = json.load(f)
+        address, actions = j['address'], j['actions']
+    else:
+        address, actions = ADDRESS, make_lp_history(args.actions)
+    logging.disable(logging.WARNING)
+
+    print(f'{len(actions)} actions of {address}{"" if args.wallet else " (synthetic)"}, pool {args.pool}')
+    sep()
+    old_midgard = SlowMidgard(actions, args.latency)
+    for render in ('cold', 'warm'):
+        old_report = await measure(f'old: {render}', old_midgard, FakeDB(), address, args.pool, cache=False)
+    sep()
+
+    db = FakeDB()
+    midgard = SlowMidgard(actions[:-1], args.latency)
+    await measure('cached: cold', midgard, db, address, args.pool, cache=True)
+    await measure('cached: warm', midgard, db, address, args.pool, cache=True)
+    midgard.actions = actions
+    report = await measure('cached: +1 action', midgard, db, address, args.pool, cache=True)
+    print(f'Same report as the old one: {report == old_report}')
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
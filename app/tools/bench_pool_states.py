@@ -0,0 +1,191 @@
+# Benchmark: historical pool states for the LP yield reports, the old JSON hash vs. the PoolStateStore.
+# Replays recorded pool snapshots against a simulated THORNode (fixed latency) and reports
+# the node calls, the time of a cold/warm report and the bytes stored.
+# Record the snapshots once (needs a THORNode):
+# $ PYTHONPATH="/app" python tools/bench_pool_states.py --record pools.json --start 4000000 --count 200 --step 1000
+# Replay:
+# $ PYTHONPATH="/app" python tools/bench_pool_states.py pools.json
+# $ PYTHONPATH="/app" python tools/bench_pool_states.py            # synthetic snapshots if there is no file
+# $ PYTHONPATH="/app" python tools/bench_pool_states.py pools.json --redis   # REDIS_HOST/REDIS_PORT
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from services.jobs.fetch.pool_state_store import PoolStateStore
+from services.lib.db import DB
+from services.lib.texts import sep
+from services.models.pool_info import PoolInfo
+
+LEGACY_KEY = 'Bench:PoolInfo:hashtable_v2'
+
+
+async def record(path, start, count, step):
+    from tools.lib.lp_common import LpAppFramework
+
+    app = LpAppFramework()
+    async with app(brief=True):
+        ppf = app.deps.pool_fetcher
+        snapshots = {}
+        for i in range(count):
+            height = start + i * step
+            pool_map = await ppf._fetch_current_pool_data_from_thornode(height)
+            if pool_map:
+                snapshots[height] = {asset: p.as_dict_brief() for asset, p in pool_map.items()}
+            print(f'#{height}: {len(pool_map)} pools')
+    with open(path, 'w') as f:
+        json.dump(snapshots, f)
+    print(f'Saved {len(snapshots)} snapshots to {path}')
+
+
+def load_snapshots(path):
+    with open(path) as f:
+        raw = json.load(f)
+    return {int(h): {a: PoolInfo.from_dict_brief(p) for a, p in pools.items()} for h, pools in raw.items()}
+
+
+def synthetic_snapshots(count=200, step=1000, n_pools=30, start=4_000_000):
+    random.seed(42)
+    pools = {
+        f'CHAIN{i}.COIN{i}': PoolInfo(f'CHAIN{i}.COIN{i}', random.randint(10 ** 10, 10 ** 14),
+                                      random.randint(10 ** 18, 10 ** 20), random.randint(10 ** 18, 10 ** 20),
+                                      PoolInfo.AVAILABLE, pool_apr=random.uniform(1, 30))
+        for i in range(n_pools)
+    }
+    snapshots = {}
+    for i in range(count):
+        for p in pools.values():
+            p.balance_asset = int(p.balance_asset * random.uniform(0.99, 1.01))
+            p.balance_rune = int(p.balance_rune * random.uniform(0.99, 1.01))
+            p.units = p.pool_units = int(p.pool_units * random.uniform(0.999, 1.001))
+            p.volume_24h = random.randint(10 ** 16, 10 ** 18)
+        snapshots[start + i * step] = {a: p.copy() for a, p in pools.items()}
+    return snapshots
+
+
+class FakeNode:
+    def __init__(self, snapshots, latency):
+        self.snapshots = snapshots
+        self.latency = latency
+        self.calls = 0
+
+    async def query_pools(self, height):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {a: p.copy() for a, p in self.snapshots[height].items()}
+
+
+# --- the previous implementation, for reference ---
+
+async def legacy_load_pools(r, node: FakeNode, height):
+    cached = await r.hget(LEGACY_KEY, str(height))
+    if cached:
+        return {k: PoolInfo.from_dict_brief(it) for k, it in json.loads(cached).items()}
+    pool_map = await node.query_pools(height)
+    await r.hset(LEGACY_KEY, str(height), json.dumps({k: p.as_dict_brief() for k, p in pool_map.items()}))
+    return pool_map
+
+
+async def legacy_report(r, node, tx_heights, chart_heights):
+    await asyncio.gather(*(legacy_load_pools(r, node, h) for h in set(tx_heights)))  # unbounded
+    for h in chart_heights:  # the chart: one by one
+        await legacy_load_pools(r, node, h)
+
+
+# --- now ---
+
+async def store_report(store: PoolStateStore, node, tx_heights, chart_heights):
+    await store.prefetch(tx_heights, node.query_pools)
+    await store.prefetch(chart_heights, node.query_pools)
+
+
+async def used_bytes(r, key, real_redis):
+    if real_redis:
+        return await r.memory_usage(key) or 0
+    return sum(len(k) + len(v) for k, v in (await r.hgetall(key)).items())
+
+
+async def timed(title, node, coro):
+    node.calls = 0
+    t0 = time.perf_counter()
+    await coro
+    print(f'{title:<34} {(time.perf_counter() - t0) * 1000:>9.1f} ms {node.calls:>5} node calls')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('snapshots', nargs='?', help='recorded snapshots (JSON)')
+    parser.add_argument('--record', help='record the snapshots to this file and exit')
+    parser.add_argument('--start', type=int, default=4_000_000)
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--step', type=int, default=1000)
+    parser.add_argument('--redis', action='store_true', help='use the real Redis instead of fakeredis')
+    parser.add_argument('--latency', type=float, default=0.1, help='simulated THORNode latency, sec')
+    parser.add_argument('--txs', type=int, default=60, help='LP transactions in the report')
+    args = parser.parse_args()
+
+    if args.record:
+        await record(args.record, args.start, args.count, args.step)
+        return
+
+    snapshots = load_snapshots(args.snapshots) if args.snapshots else synthetic_snapshots(args.count, args.step)
+    heights = sorted(snapshots)
+    print(f'{len(heights)} snapshots, {len(snapshots[heights[0]])} pools each'
+          f'{"" if args.snapshots else " (synthetic)"}')
+
+    db = DB(asyncio.get_running_loop())
+    if not args.redis:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        db.redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True, max_connections=10_000)
+        db.redis_binary = fakeredis.FakeAsyncRedis(server=server, max_connections=10_000)
+    r, r_bin = await db.get_redis(), await db.get_redis_binary()
+
+    store = PoolStateStore(db, bucket_size=max(1, args.step) * 50)
+    store.KEY_PREFIX = 'Bench:PoolState'
+    await r.delete(LEGACY_KEY)
+    await store.clear()
+
+    random.seed(1)
+    tx_heights = random.sample(heights, min(args.txs, len(heights)))
+    chart_heights = heights[-30:]
+    node = FakeNode(snapshots, args.latency)
+
+    sep()
+    await timed('old: report, cold', node, legacy_report(r, node, tx_heights, chart_heights))
+    await timed('old: report, warm', node, legacy_report(r, node, tx_heights, chart_heights))
+    await timed('store: report, cold', node, store_report(store, node, tx_heights, chart_heights))
+    await timed('store: report, warm', node, store_report(store, node, tx_heights, chart_heights))
+
+    # the same LP opens the report for all its pools at once (common in the wallet menu)
+    await r.delete(LEGACY_KEY)
+    await store.clear()
+    await timed('old: 3 reports at once, cold', node, asyncio.gather(
+        *(legacy_report(r, node, tx_heights, chart_heights) for _ in range(3))))
+    await timed('store: 3 reports at once, cold', node, asyncio.gather(
+        *(store_report(store, node, tx_heights, chart_heights) for _ in range(3))))
+
+    sep()
+    await r.delete(LEGACY_KEY)
+    await store.clear()
+    for h in heights:
+        await legacy_load_pools(r, node, h)
+    await store.put_many(snapshots)
+
+    legacy_bytes = await used_bytes(r, LEGACY_KEY, args.redis)
+    store_bytes = 0
+    for key in {store.bucket_key(h) for h in heights}:
+        store_bytes += await used_bytes(r_bin, key, args.redis)
+    print(f'old: {legacy_bytes / 1024:.1f} KB; store: {store_bytes / 1024:.1f} KB '
+          f'(x{legacy_bytes / max(1, store_bytes):.1f} less), {legacy_bytes / len(heights):.0f} => '
+          f'{store_bytes / len(heights):.0f} bytes per snapshot')
+    sep()
+
+    await r.delete(LEGACY_KEY)
+    await store.clear()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,156 @@
+# Benchmark: picture rendering, the old "async_wrap" (default thread pool) vs. the RenderService worker processes.
+# Reports renders/sec and p95 latency per picture type; the inputs are made from the test sample data.
+# Every request gets slightly different data, so the cache does not help; the last pass repeats the same data.
+# $ PYTHONPATH="/app" python tools/bench_render.py
+# $ PYTHONPATH="/app" python tools/bench_render.py -n 40 --concurrency 8 --workers 0,2,4
+
+import argparse
+import asyncio
+import random
+import time
+from copy import deepcopy
+
+from localization.manager import LocalizationManager
+from services.dialog.picture import render_service
+from services.dialog.picture.nodes_pictures import NodePictureGenerator
+from services.dialog.picture.pool_picture import PoolPictureGenerator
+from services.dialog.picture.price_picture import price_graph
+from services.dialog.picture.render_service import RenderService, RenderCache
+from services.jobs.volume_recorder import VolumeRecorder
+from services.lib.config import Config
+from services.lib.date_utils import DAY, MINUTE, now_ts
+from services.lib.texts import sep
+from services.lib.utils import load_json
+from services.models.location_info import LocationInfo
+from services.models.node_info import NodeInfo, NetworkNodeIpInfo, NodeStatsItem
+from services.models.pool_info import PoolInfo, PoolMapPair
+
+CONFIG_DATA = {}
+SAMPLE_NODES = './tests/sample_data/nodes_7_9_22.json'
+POOLS = ['BTC.BTC', 'ETH.ETH', 'DASH.DASH', 'ETH.USDT-0XDAC17F958D2EE523A2206206994597C13D831EC7',
+         'ETH.USDC-0XA0B86991C6218B36C1D19D4A2E9EB0CE3606EB48', 'ARB.ETH', 'ARB.ARB-0X912CE59144191C1204E64559FE8253A0E49E6548',
+         'AVAX.AVAX', 'DOGE.DOGE', 'BCH.BCH']
+
+
+def make_price_inputs(period=7 * DAY):
+    now = now_ts()
+    price, prices = 1.0, []
+    for ts in range(int(now - period), int(now), 5 * MINUTE):
+        price *= random.uniform(0.99, 1.01)
+        prices.append((ts, price))
+    det_prices = [(ts, p * random.uniform(0.97, 1.03)) for ts, p in prices]
+    volumes = [
+        (ts, {
+            VolumeRecorder.KEY_SWAP: random.uniform(1e5, 1e6),
+            VolumeRecorder.KEY_SWAP_SYNTH: random.uniform(1e4, 1e5),
+            VolumeRecorder.KEY_ADD_LIQUIDITY: random.uniform(1e4, 1e5),
+            VolumeRecorder.KEY_WITHDRAW_LIQUIDITY: random.uniform(1e4, 1e5),
+        }) for ts in range(int(now - period), int(now), int(period / 58))
+    ]
+    return prices, det_prices, volumes
+
+
+def make_node_info():
+    nodes = [NodeInfo.from_json(j) for j in load_json(SAMPLE_NODES)]
+    ip_info = {
+        n.ip_address: LocationInfo(n.ip_address, random.choice(['AMAZON', 'DIGITALOCEAN', 'HETZNER', 'OVH']),
+                                   random.uniform(-50, 60), random.uniform(-120, 140),
+                                   random.choice(['US', 'Germany', 'Japan', 'France']))
+        for n in nodes if n.ip_address
+    }
+    now = now_ts()
+    stats = [
+        NodeStatsItem(now - i * DAY, 1e6, 1.2e6, 2e6, 1e8 + i * 1e6, 1.2e8, len(nodes), 95)
+        for i in reversed(range(30))
+    ]
+    return NetworkNodeIpInfo(nodes, ip_info), stats
+
+
+def make_pools():
+    pools = {
+        asset: PoolInfo(asset, random.randint(10 ** 10, 10 ** 13), random.randint(10 ** 14, 10 ** 16),
+                        10 ** 12, PoolInfo.AVAILABLE, usd_per_asset=random.uniform(0.1, 40000),
+                        volume_24h=random.randint(10 ** 12, 10 ** 14), pool_apr=random.uniform(1, 40))
+        for asset in POOLS
+    }
+    return pools, deepcopy(pools)
+
+
+async def make_jobs(loc):
+    """picture name => function(i) that renders a picture from a bit different data for every i"""
+    prices, det_prices, volumes = make_price_inputs()
+    network_info, node_stats = make_node_info()
+    pools, prev_pools = make_pools()
+    pool_gen = PoolPictureGenerator(loc, PoolMapPair(pools, prev_pools))
+    await pool_gen.prepare()  # the logos are in ./data/asset_logo
+
+    async def price(i):
+        return await price_graph(prices + [(prices[-1][0] + 1, 1.0 + i * 1e-6)], det_prices, [], volumes, loc)
+
+    async def nodes(i):
+        info = deepcopy(network_info)
+        info.total_rune_supply += i
+        return await NodePictureGenerator(info, node_stats, loc).generate()
+
+    async def pools_pic(i):
+        current = deepcopy(pools)
+        current[POOLS[0]].balance_rune += i
+        gen = PoolPictureGenerator(loc, PoolMapPair(current, prev_pools))
+        gen.logos, gen.chain_logos = pool_gen.logos, pool_gen.chain_logos
+        return await gen._get_picture_sync()
+
+    return {'price': price, 'nodes': nodes, 'pools': pools_pic}
+
+
+async def measure(title, job, n, concurrency, same_data=False):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            t0 = time.perf_counter()
+            image = await job(0 if same_data else i + 1)
+            latencies.append(time.perf_counter() - t0)
+            assert image is not None
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    p95 = latencies[min(n - 1, int(n * 0.95))]
+    print(f'{title:<36} {n / elapsed:>8.2f} renders/sec   p95 {p95 * 1000:>8.1f} ms')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=20, help='renders per picture type')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests at the same time')
+    parser.add_argument('--workers', default='0,2', help='comma separated; 0 = render in a thread, cached')
+    args = parser.parse_args()
+
+    loc = LocalizationManager(Config(data=CONFIG_DATA)).default
+    jobs = await make_jobs(loc)
+
+    sep()
+    print('async_wrap (default thread pool, no cache)')
+    for name, job in jobs.items():
+        await measure(name, job, args.n, args.concurrency)
+
+    for workers in map(int, args.workers.split(',')):
+        service = RenderService(CONFIG_DATA, workers=workers, cache=RenderCache(ttl=60.0)).install()
+        await service.warm_up()
+        sep()
+        print(f'RenderService, workers = {workers}')
+        for name, job in jobs.items():
+            await job(-1)  # to import everything in the workers
+            await measure(name, job, args.n, args.concurrency)
+        for name, job in jobs.items():
+            await measure(f'{name} (same data, cached)', job, args.n, args.concurrency, same_data=True)
+        service.shutdown()
+
+    assert render_service._service is None
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
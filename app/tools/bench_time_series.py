@@ -0,0 +1,88 @@
+# Benchmark: reading a price time series, raw points vs. the 1m/1h/1d rollups.
+# Fills 30 days of prices, then reads charts for 24h/7d/30d and the "price 1h/24h/7d ago" triplet both ways.
+# $ PYTHONPATH="/app" python tools/bench_time_series.py                    # in-memory fakeredis
+# $ PYTHONPATH="/app" python tools/bench_time_series.py --redis --interval 10   # REDIS_HOST/REDIS_PORT
+# Note: with --redis it writes the stream "ts-stream:price-Bench" and its rollups into the selected DB.
+
+import argparse
+import asyncio
+import random
+import time
+
+from services.lib.date_utils import DAY, HOUR, MINUTE, now_ts
+from services.lib.db import DB
+from services.lib.texts import sep
+from services.models.time_series import PriceTimeSeries, MS
+
+PERIODS = [('24h', DAY), ('7d', 7 * DAY), ('30d', 30 * DAY)]
+
+
+async def fill(series: PriceTimeSeries, days, interval, batch=10_000):
+    r = await series.db.get_redis()
+    await series.clear()
+    end = int(now_ts())
+    t = end - days * DAY
+    price = 1.0
+    while t < end:
+        async with r.pipeline(transaction=False) as pipe:
+            for _ in range(batch):
+                if t >= end:
+                    break
+                price *= random.uniform(0.995, 1.005)
+                pipe.xadd(series.stream_name, {series.KEY: price}, id=f'{t * MS}-0')
+                t += interval
+            await pipe.execute()
+    return await series.rollup.rebuild()
+
+
+async def measure(title, n, make_coro):
+    result = None
+    t0 = time.perf_counter()
+    for _ in range(n):
+        result = await make_coro()
+    elapsed = (time.perf_counter() - t0) / n
+    size = len(result) if isinstance(result, (list, tuple)) else 1
+    print(f'{title:<32} {elapsed * 1000:>9.2f} ms {size:>8} points')
+    return result
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--redis', action='store_true', help='use the real Redis instead of fakeredis')
+    parser.add_argument('--interval', type=int, default=60, help='seconds between the raw points')
+    parser.add_argument('-n', type=int, default=5, help='repeats of every read')
+    args = parser.parse_args()
+
+    db = DB(asyncio.get_running_loop())
+    if not args.redis:
+        import fakeredis
+        db.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    random.seed(42)
+    series = PriceTimeSeries('Bench', db)
+    t0 = time.perf_counter()
+    n = await fill(series, 31, args.interval)
+    print(f'Filled {n} raw points and the rollups in {time.perf_counter() - t0:.1f} sec.')
+
+    sep()
+    for name, period in PERIODS:
+        await measure(f'Chart {name}: raw', args.n,
+                      lambda: series.get_last_values(period, max_points=10_000_000))
+        await measure(f'Chart {name}: rollups', args.n,
+                      lambda: series.get_last_values_rolled(period))
+
+    sep()
+    triplet = [(HOUR, MINUTE * 7), (DAY, MINUTE * 40), (DAY * 7, HOUR * 2)]
+    for use_rollups in (False, True):
+        title = 'Triplet: ' + ('rollups' if use_rollups else 'raw')
+        await measure(title, args.n, lambda: asyncio.gather(*(
+            series.select_average_ago(ago, tolerance, use_rollups=use_rollups) for ago, tolerance in triplet
+        )))
+    sep()
+
+    if args.redis:
+        await series.clear()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
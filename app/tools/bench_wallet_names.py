@@ -0,0 +1,109 @@
+# Benchmark: Redis round trips and Midgard requests per render of the wallet list (MyWalletsMenu),
+# the previous per-address name resolution vs. the bulk one.
+# $ PYTHONPATH="/app" python tools/bench_wallet_names.py
+# $ PYTHONPATH="/app" python tools/bench_wallet_names.py --wallets 40 --named 10
+
+import argparse
+import asyncio
+
+from services.lib.config import Config
+from services.lib.midgard.name_service import NameService, add_thor_suffix, LocalWalletNameDB
+from services.lib.texts import sep
+from services.models.node_info import NodeListHolder
+from tests.helpers import FakeDB
+
+
+class FakeMidgard:
+    ERROR_RESPONSE = 'ERROR_Midgard'
+    ERROR_NOT_FOUND = 'NotFound_Midgard'
+
+    def __init__(self, names):
+        self.names = names  # address -> THORName
+        self.requests = 0
+
+    async def request(self, path):
+        self.requests += 1
+        await asyncio.sleep(0.05)
+        key = path.split('/')[-1]
+        if path.startswith('/v2/thorname/rlookup/'):
+            return [self.names[key]] if key in self.names else self.ERROR_NOT_FOUND
+        address = next((a for a, n in self.names.items() if n == key), None)
+        if not address:
+            return self.ERROR_NOT_FOUND
+        return {'expire': 1000, 'owner': address, 'entries': [{'chain': 'MAYA', 'address': address}]}
+
+
+async def old_lookup_name_by_address(ns: NameService, address: str):
+    """Previous implementation, for reference"""
+    names = await ns.cache.load_name_list(address)
+    if names is None:
+        # noinspection PyProtectedMember
+        names = await ns._api.thorname_reversed_lookup(address)
+        await ns.cache.save_name_list(address, names)
+    if not names:
+        return
+    return await ns.lookup_thorname_by_name(names[0])
+
+
+async def old_labels(ns: NameService, local_ns: LocalWalletNameDB, addresses):
+    """Previous implementation, for reference"""
+
+    async def address_label(address):
+        name = await local_ns.get_wallet_local_name(address)
+        if not name:
+            name = await old_lookup_name_by_address(ns, address)
+            if name:
+                name = add_thor_suffix(name)
+        return name or address
+
+    return await asyncio.gather(*[address_label(addr) for addr in addresses])
+
+
+async def new_labels(ns: NameService, local_ns: LocalWalletNameDB, addresses):
+    names = await local_ns.get_wallet_local_names(addresses)
+    unnamed = [address for address in addresses if not names.get(address)]
+    if unnamed:
+        for address, thor_name in (await ns.lookup_names_by_addresses(unnamed)).items():
+            if thor_name:
+                names[address] = add_thor_suffix(thor_name)
+    return [names.get(address) or address for address in addresses]
+
+
+async def measure(title, args, labels_func):
+    addresses = [f'maya1wallet{i:03}' for i in range(args.wallets)]
+    thornames = {address: f'name{i}' for i, address in enumerate(addresses[:args.named])}
+
+    db = FakeDB()
+    await db.get_redis()
+    cfg = Config(data={'names': {'thorname': {'enabled': True, 'expire': '24h', 'negative_expire': '1h'},
+                                 'preconfig': {}, 'affiliates': {}}})
+    midgard = FakeMidgard(thornames)
+    ns = NameService(db, cfg, midgard, NodeListHolder())
+    local_ns = ns.get_local_service(user_id=1)
+    for address in addresses[-args.local:]:
+        await local_ns.set_wallet_local_name(address, f'My {address[-3:]}')
+
+    for render in ('cold', 'warm', 'warm', 'warm'):
+        db.round_trips, midgard.requests = 0, 0
+        labels = await labels_func(ns, local_ns, addresses)
+        assert labels[0] == 'name0.maya'
+        print(f'{title:<6} {render} render: {db.round_trips:>4} Redis round trips, {midgard.requests:>3} Midgard requests')
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wallets', type=int, default=25)
+    parser.add_argument('--named', type=int, default=4, help='wallets with THORNames')
+    parser.add_argument('--local', type=int, default=3, help='wallets with local names')
+    args = parser.parse_args()
+
+    print(f'{args.wallets} wallets: {args.named} with THORNames, {args.local} with local names')
+    sep()
+    await measure('old', args, old_labels)
+    sep()
+    await measure('bulk', args, new_labels)
+    sep()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+# Local block archive maintenance.
+# $ make attach
+# $ PYTHONPATH="/app" python tools/block_archive.py /config/config.yaml info
+# $ PYTHONPATH="/app" python tools/block_archive.py /config/config.yaml import 5500000 5510000
+# $ PYTHONPATH="/app" python tools/block_archive.py /config/config.yaml import-last 2000
+# $ PYTHONPATH="/app" python tools/block_archive.py /config/config.yaml prune
+# $ PYTHONPATH="/app" python tools/block_archive.py /config/config.yaml migrate-redis
+
+import asyncio
+import logging
+import sys
+
+import tqdm
+import ujson
+
+from services.jobs.scanner.block_archive import BlockArchive
+from services.lib.config import SubConfig
+from services.lib.texts import sep
+from tools.lib.lp_common import LpAppFramework
+
+# the old Redis hashes of NativeScannerBlockCached
+OLD_DB_KEY_BLOCK = 'tx:scanner:cache:block'
+OLD_DB_KEY_TXS = 'tx:scanner:cache:transactions'
+
+
+def open_archive(app: LpAppFramework) -> BlockArchive:
+    return BlockArchive.from_config(app.deps.cfg.get('native_scanner.archive', SubConfig({})))
+
+
+def print_info(archive: BlockArchive):
+    sep()
+    print(f'Path: {archive.path}')
+    print(f'Heights: {archive.first_height} .. {archive.last_height}')
+    print(f'Records: {archive.total_records}')
+    print(f'Disk size: {archive.disk_size / 1024 / 1024:.2f} MB')
+    print(f'Retention: {archive.retention_blocks or "forever"} blocks')
+    sep()
+
+
+async def import_range(app: LpAppFramework, archive: BlockArchive, start, end):
+    progress = tqdm.tqdm(total=end - start + 1)
+
+    def on_progress(done, _total):
+        progress.n = done
+        progress.refresh()
+
+    imported = await archive.import_range(app.deps.thor_connector, start, end, on_progress=on_progress)
+    progress.close()
+    print(f'Imported {imported} blocks.')
+
+
+async def migrate_from_redis(app: LpAppFramework, archive: BlockArchive):
+    r = await app.deps.db.get_redis()
+    for key, kind in ((OLD_DB_KEY_BLOCK, BlockArchive.KIND_RESULTS), (OLD_DB_KEY_TXS, BlockArchive.KIND_TXS)):
+        n = 0
+        async for height, raw in r.hscan_iter(key, count=500):
+            archive.put(int(height), kind, ujson.loads(raw))
+            n += 1
+        print(f'Migrated {n} records from "{key}".')
+        await r.delete(key)
+
+
+async def run():
+    command = sys.argv[2] if len(sys.argv) > 2 else 'info'
+
+    app = LpAppFramework(log_level=logging.INFO)
+    async with app(brief=True):
+        archive = open_archive(app)
+        try:
+            if command == 'import':
+                await import_range(app, archive, int(sys.argv[3]), int(sys.argv[4]))
+            elif command == 'import-last':
+                await app.deps.last_block_fetcher.run_once()
+                last_block = int(app.deps.last_block_store)
+                await import_range(app, archive, last_block - int(sys.argv[3]), last_block)
+            elif command == 'prune':
+                print(f'Pruned {archive.prune()} segments.')
+            elif command == 'migrate-redis':
+                await migrate_from_redis(app, archive)
+            print_info(archive)
+        finally:
+            archive.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -10,6 +10,7 @@ from redis.asyncio import Redis
 
 from services.lib.constants import THOR_BLOCK_TIME
 from services.lib.date_utils import DAY
+from services.lib.key_registry import scan_keys
 from services.lib.money import format_percent
 from tools.lib.lp_common import LpAppFramework
 
@@ -19,7 +20,7 @@ MAX_AGE = 30 * DAY
 async def do_job(app):
     r: Redis = await app.deps.db.get_redis()
     logging.info('Loading all txs from DB')
-    tx_keys = await r.keys('tx:tracker:*')
+    tx_keys = await scan_keys(r, 'tx:tracker:*')
     logging.info(f'Found {len(tx_keys)} txs')
     if not tx_keys:
         logging.error('No txs found!')
@@ -0,0 +1,111 @@
+"""
+Per-block decode latency: synchronous vs thread pool vs process pool.
+
+Record some blocks first (needs the node):
+    $ python tools/debug/dbg_bench_block_decode.py record 100 ../temp/blocks
+Then benchmark (offline):
+    $ python tools/debug/dbg_bench_block_decode.py bench ../temp/blocks
+A block archive directory works as well (see tools/block_archive.py):
+    $ python tools/debug/dbg_bench_block_decode.py bench ../temp/block_archive
+Without recorded blocks a synthetic sample is used:
+    $ python tools/debug/dbg_bench_block_decode.py bench
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from services.jobs.scanner.block_decoder import BlockDecoder
+from services.lib.texts import sep
+from tools.lib.sample_blocks import load_recorded_blocks, synthetic_blocks
+
+
+async def record_blocks(app, n_blocks, out_dir):
+    from services.jobs.scanner.native_scan import NativeScannerBlock
+
+    os.makedirs(out_dir, exist_ok=True)
+    scanner = NativeScannerBlock(app.deps)
+    await scanner.ensure_last_block()
+    last = scanner.last_block
+    for height in range(last - n_blocks, last):
+        block_results = await scanner._fetch_block_results_raw(height)
+        block = await scanner._fetch_block_txs_raw(height)
+        with open(os.path.join(out_dir, f'{height}.json'), 'w') as f:
+            json.dump({'block_results': block_results, 'block': block}, f)
+        print(f'Recorded #{height}')
+
+
+async def ticker(period, ticks: list):
+    # measures how late the event loop wakes up while decoding is going on
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(period)
+        ticks.append(time.perf_counter() - t0 - period)
+
+
+async def bench_mode(mode, blocks, workers=2):
+    decoder = BlockDecoder(mode, workers=workers, min_items_to_offload=1)
+    # warm up the pool
+    await decoder.load_txs(blocks[0][2], blocks[0][0])
+
+    loop_delays = []
+    ticker_task = asyncio.create_task(ticker(0.001, loop_delays))
+
+    latencies = []
+    t_start = time.perf_counter()
+    for height, block_results, block in blocks:
+        t0 = time.perf_counter()
+        await asyncio.gather(
+            decoder.load_block(block_results, height),
+            decoder.load_txs(block, height),
+        )
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - t_start
+
+    ticker_task.cancel()
+    decoder.close()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    max_loop_delay = max(loop_delays) if loop_delays else 0.0
+    print(f'{mode:>8}: {len(blocks) / total:8.1f} blocks/sec | '
+          f'median {statistics.median(latencies) * 1000:7.2f} ms | p95 {p95 * 1000:7.2f} ms | '
+          f'max event loop stall {max_loop_delay * 1000:7.2f} ms')
+
+
+async def run_bench(in_dir=None):
+    blocks = load_recorded_blocks(in_dir) if in_dir else synthetic_blocks()
+    if not blocks:
+        print(f'No blocks found in "{in_dir}"')
+        return
+
+    n_txs = sum(len(b[2]['result']['block']['data']['txs'] or []) for b in blocks)
+    sep()
+    print(f'{len(blocks)} blocks, {n_txs} txs in total')
+    sep()
+    for mode in BlockDecoder.MODES:
+        await bench_mode(mode, blocks)
+    sep()
+
+
+async def run_record(n_blocks, out_dir):
+    from tools.lib.lp_common import LpAppFramework
+
+    app = LpAppFramework()
+    async with app(brief=True):
+        await record_blocks(app, n_blocks, out_dir)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'bench'
+    if command == 'record':
+        asyncio.run(run_record(int(sys.argv[2]), sys.argv[3]))
+    else:
+        asyncio.run(run_bench(sys.argv[2] if len(sys.argv) > 2 else None))
+
+
+if __name__ == '__main__':
+    main()
@@ -64,9 +64,7 @@ async def demo_block_scanner_count(app, catch_up_for=0, single_block=0):
 
 
 async def debug_route_tally(app):
-    recorder = SwapRouteRecorder(app.deps.db.redis, key_prefix="_debug")
-
-    await recorder.clear_old_events(0)
+    recorder = SwapRouteRecorder(app.deps.db, key_prefix="_debug")
 
     async def put_one_swap_event(from_asset, to_asset, volume, days_ago):
         await recorder.store_swap_event(from_asset, to_asset, volume, datetime.now() - timedelta(days=days_ago))
@@ -99,9 +97,6 @@ async def debug_route_tally(app):
     top_routes = await recorder.get_top_swap_routes_by_volume(days=7, top_n=3)
     print(f"Top swap routes for the previous 7 days: {top_routes}")
 
-    # Clearing old events older than 7 days
-    await recorder.clear_old_events(31)
-
 
 async def main():
     app = LpAppFramework()
@@ -0,0 +1,67 @@
+import base64
+import glob
+import json
+import os
+
+import betterproto
+
+from proto.cosmos.tx.v1beta1 import Tx, TxBody
+from proto.types import MsgDeposit
+from services.jobs.scanner.block_archive import BlockArchive
+
+
+def make_raw_block(n_txs):
+    """Raw Tendermint /block response with n_txs swap deposits"""
+    txs = []
+    for i in range(n_txs):
+        deposit = MsgDeposit(memo=f'=:BTC.BTC:bc1test{i}', signer=b'12345678901234567890')
+        body = TxBody(messages=[
+            betterproto.lib.google.protobuf.Any(type_url='/types.MsgDeposit', value=bytes(deposit))
+        ])
+        txs.append(base64.b64encode(bytes(Tx(body=body))).decode())
+    return {'result': {'block': {'data': {'txs': txs}}}}
+
+
+def make_raw_block_results(n_txs):
+    """Raw Tendermint /block_results response: n_txs successful txs and one swap end block event"""
+
+    def b64(s):
+        return base64.b64encode(s.encode()).decode()
+
+    return {'result': {
+        'txs_results': [{'code': 0, 'log': '[]'} for _ in range(n_txs)],
+        'end_block_events': [
+            {'type': 'swap', 'attributes': [
+                {'key': b64('coin'), 'value': b64('1000 MAYA.CACAO')},
+                {'key': b64('pool'), 'value': b64('BTC.BTC')},
+            ]}
+        ]
+    }}
+
+
+def synthetic_blocks(n_blocks=50, txs_per_block=40):
+    """[(height, block_results, block)]"""
+    return [
+        (h, make_raw_block_results(txs_per_block), make_raw_block(txs_per_block))
+        for h in range(n_blocks)
+    ]
+
+
+def load_recorded_blocks(in_dir):
+    """
+    [(height, block_results, block)] from a block archive (see tools/block_archive.py)
+    or from a directory of <height>.json files {"block_results": ..., "block": ...}
+    """
+    if os.path.exists(os.path.join(in_dir, BlockArchive.META_FILE)):
+        archive = BlockArchive(in_dir, read_only=True)
+        blocks = list(archive.iter_blocks())
+        archive.close()
+        return blocks
+
+    blocks = []
+    for path in sorted(glob.glob(os.path.join(in_dir, '*.json'))):
+        with open(path) as f:
+            data = json.load(f)
+        height = int(os.path.basename(path).split('.')[0])
+        blocks.append((height, data['block_results'], data['block']))
+    return blocks
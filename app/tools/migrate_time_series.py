@@ -0,0 +1,36 @@
+# Builds the 1m/1h/1d rollups of the price time series from their raw points and trims the raw streams.
+# Run it once after the update; it is safe to re-run (the rollups are recalculated from scratch).
+# Stop the bot first, or some price points written meanwhile may be missing in the rollups.
+# $ make attach
+# $ PYTHONPATH="/app" python tools/migrate_time_series.py /config/config.yaml
+
+import asyncio
+import logging
+import time
+
+from services.lib.constants import RUNE_SYMBOL_POOL, RUNE_SYMBOL_DET, RUNE_SYMBOL_CEX
+from services.models.time_series import PriceTimeSeries
+from tools.lib.lp_common import LpAppFramework
+
+
+async def migrate_series(series: PriceTimeSeries, max_len):
+    t0 = time.monotonic()
+    purged = await series.trim_oldest(max_len, approximate=False)
+    n = await series.rollup.rebuild()
+    print(f'{series.stream_name}: purged {purged} old points, rolled up {n} points '
+          f'in {time.monotonic() - t0:.1f} sec.')
+    for res in series.rollup.resolutions:
+        length = await series.db.redis.xlen(series.rollup.stream_name(res))
+        print(f'  {res} sec: {length} buckets')
+
+
+async def main():
+    app = LpAppFramework(log_level=logging.INFO)
+    async with app(brief=True):
+        max_len = app.deps.pool_fetcher.history_max_points
+        for symbol in (RUNE_SYMBOL_POOL, RUNE_SYMBOL_CEX, RUNE_SYMBOL_DET):
+            await migrate_series(PriceTimeSeries(symbol, app.deps.db), max_len)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
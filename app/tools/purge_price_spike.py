@@ -16,6 +16,7 @@ async def purge_spike_time_series(series: PriceTimeSeries, interval, max_value):
     r = series.db.redis
     if message_ids:
         await r.xdel(series.stream_name, *message_ids)
+        await series.rollup.rebuild()
 
 
 INTERVAL = 5 * DAY
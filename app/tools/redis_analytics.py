@@ -7,13 +7,14 @@ import logging
 
 import tqdm
 
+from services.lib.key_registry import scan_keys
 from tools.lib.lp_common import LpAppFramework
 
 
 async def do_job(app):
     r = await app.deps.db.get_redis()
     logging.info('Loading all txs from DB')
-    tx_keys = await r.keys()
+    tx_keys = await scan_keys(r, '*')  # SCAN does not block the production server like KEYS does
     logging.info(f'Found {len(tx_keys)} txs')
 
     results = []
@@ -0,0 +1,111 @@
+# Offline replay of recorded blocks through the real scanner pipeline (the graph of App._prepare_task_graph).
+# Blocks come from a block archive (see tools/block_archive.py) or from a directory of JSON files
+# recorded by tools/debug/dbg_bench_block_decode.py. Nothing is sent to the messengers.
+# $ make attach
+# $ PYTHONPATH="/app" python tools/replay_blocks.py /config/config.yaml ../temp/block_archive
+# $ PYTHONPATH="/app" python tools/replay_blocks.py /config/config.yaml ../temp/blocks --start 5500000 --end 5500500
+# --fakeredis: use an in-memory Redis instead of the configured one (recommended, no side effects)
+# --pools: load pools, nodes and mimir from the network first (otherwise the volume filler has no prices)
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from services.jobs.scanner.block_archive import BlockArchive
+from services.jobs.scanner.replay import BlockReplay, StubMessenger
+from services.jobs.scanner.scan_cache import NativeScannerBlockCached
+from services.lib.texts import sep
+from tools.lib.lp_common import LpAppFramework
+
+
+def open_block_source(path, temp_dir) -> BlockArchive:
+    if os.path.exists(os.path.join(path, BlockArchive.META_FILE)):
+        return BlockArchive(path, read_only=True)
+
+    # a directory of {height}.json files: put them into a temporary archive
+    archive = BlockArchive(temp_dir)
+    for file_name in sorted(glob.glob(os.path.join(path, '*.json'))):
+        with open(file_name) as f:
+            data = json.load(f)
+        height = int(os.path.basename(file_name).split('.')[0])
+        archive.put_block(height, data['block_results'], data['block'])
+    return archive
+
+
+async def replay(app: LpAppFramework, archive: BlockArchive, args):
+    d = app.deps
+
+    # the messages go nowhere
+    messenger = StubMessenger()
+    d.get_messenger = lambda _t: messenger
+
+    await app._prepare_task_graph()
+    if not d.block_scanner:
+        print('Native scanner is disabled in the config!')
+        return
+
+    start = args.start or archive.first_height
+    end = args.end or archive.last_height
+
+    scanner = NativeScannerBlockCached(d, archive=archive, offline=True, last_block=start,
+                                       decoder=d.block_scanner.decoder)
+    scanner.delegates = d.block_scanner.delegates
+    d.block_scanner = scanner
+
+    engine = BlockReplay(scanner, redis=await d.db.get_redis()).instrument()
+
+    if args.warmup:
+        await engine.run(start, min(end, start + args.warmup - 1))
+        start += args.warmup
+
+    report = await engine.run(start, end)
+    # let the fire-and-forget tasks (e.g. AlertPresenter) finish
+    await asyncio.sleep(args.settle)
+
+    sep()
+    print(report.format())
+    print(f'Messages to stub messenger: {messenger.total_sent}')
+    sep()
+
+
+async def run():
+    parser = argparse.ArgumentParser(description='Replay recorded blocks through the scanner pipeline')
+    parser.add_argument('config', help='path to config.yaml (read by the App)')
+    parser.add_argument('source', help='block archive directory or directory of recorded JSON blocks')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--end', type=int, default=0)
+    parser.add_argument('--warmup', type=int, default=0, help='number of blocks to replay before measuring')
+    parser.add_argument('--settle', type=float, default=1.0, help='seconds to wait for background tasks')
+    parser.add_argument('--fakeredis', action='store_true')
+    parser.add_argument('--pools', action='store_true')
+    args = parser.parse_args()
+
+    app = LpAppFramework(log_level=logging.WARNING)
+
+    # emergency reports are only logged and queued, never sent to the admin
+    app.emergency = False
+    app.deps.emergency._running = True
+
+    if args.fakeredis:
+        import fakeredis
+        app.deps.db.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive = open_block_source(args.source, temp_dir)
+        if not archive.total_records:
+            print(f'No blocks found in "{args.source}"')
+            sys.exit(1)
+        try:
+            async with app(brief=not args.pools):
+                await replay(app, archive, args)
+        finally:
+            archive.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())